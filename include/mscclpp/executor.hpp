@@ -47,11 +47,16 @@ class ExecutionPlan {
   /// Whether this plan performs the operation in-place.
   bool isInPlace() const;
 
- private:
+  /// Internal implementation, only defined in the library.
   struct Impl;
+
+ private:
   std::shared_ptr<Impl> impl_;
 
+  ExecutionPlan(std::shared_ptr<Impl> impl);
+
   friend class Executor;
+  friend class ExecutionPlanRegistry;
 };
 
 /// Request parameters provided when executing a plan.
@@ -121,6 +126,12 @@ class ExecutionPlanRegistry {
   std::shared_ptr<ExecutionPlanHandle> get(const std::string& id);
 
   /// Select a suitable plan handle for the given parameters.
+  ///
+  /// Candidates are looked up in an index of the registered plans bucketed by collective, world size and ranks per
+  /// node, with an interval index over their message size ranges. When no hints are given, the decision is cached
+  /// per (collective, world size, ranks per node, rank, message size, in-place, buffer alignment), so the selectors
+  /// are not called again for the same request. The cache is invalidated whenever plans, selectors or the tag filter
+  /// change.
   std::shared_ptr<ExecutionPlanHandle> select(const std::string& collective, int worldSize, int nRanksPerNode, int rank,
                                               const void* sendBuffer, void* recvBuffer, size_t messageSize,
                                               const std::unordered_map<std::string, std::vector<uint64_t>>& hints);
@@ -131,9 +142,34 @@ class ExecutionPlanRegistry {
   /// Set the default selector used when no custom selector is provided.
   void setDefaultSelector(ExecutionPlanSelector selector);
 
+  /// Only consider plans carrying all the given tags with the given values during selection.
+  /// @param tags The required tags. An empty map disables the filter.
+  void setTagFilter(const std::unordered_map<std::string, uint64_t>& tags);
+
+  /// Set the number of selection decisions cached by select(). Caching is disabled by default.
+  ///
+  /// Cached decisions are keyed by the collective, world size, ranks per node, rank, message size, in-place and
+  /// the alignment of the buffers, and requests with hints are never cached. Only enable the cache if the selector
+  /// depends on nothing else, e.g. not on buffer addresses beyond their alignment or on external state.
+  /// @param size The maximum number of cached decisions, 0 to disable the cache.
+  void setSelectionCacheSize(size_t size);
+
   /// Load built-in/default plans for the given rank.
+  ///
+  /// If the plan directory contains a manifest (see loadManifest()), every plan listed in it is registered. Otherwise
+  /// the built-in default plan files are loaded.
   void loadDefaultPlans(int rank);
 
+  /// Register the plans listed in the `manifest.json` file of a plan directory.
+  ///
+  /// The manifest is written by `python -m mscclpp --install` and holds the selection metadata of every plan, so plan
+  /// files are not read until a plan is executed. A plan whose file size differs from the manifest is loaded from its
+  /// file instead.
+  /// @param planDir The plan directory.
+  /// @param rank The rank of the current process.
+  /// @return The newly registered plan handles.
+  std::vector<std::shared_ptr<ExecutionPlanHandle>> loadManifest(const std::string& planDir, int rank);
+
   /// Clear all registered plans from the registry.
   void clear();
 
@@ -57,6 +57,9 @@ void register_executor(nb::module_& m) {
       .def("get", &ExecutionPlanRegistry::get, nb::arg("id"))
       .def("set_selector", &ExecutionPlanRegistry::setSelector, nb::arg("selector"))
       .def("set_default_selector", &ExecutionPlanRegistry::setDefaultSelector, nb::arg("selector"))
+      .def("set_tag_filter", &ExecutionPlanRegistry::setTagFilter, nb::arg("tags"))
+      .def("set_selection_cache_size", &ExecutionPlanRegistry::setSelectionCacheSize, nb::arg("size"))
+      .def("load_manifest", &ExecutionPlanRegistry::loadManifest, nb::arg("plan_dir"), nb::arg("rank"))
       .def("clear", &ExecutionPlanRegistry::clear);
 
   nb::class_<ExecutionPlan>(m, "ExecutionPlan")
@@ -4,19 +4,24 @@
 """MSCCL++ Python API."""
 
 import atexit
-from dataclasses import dataclass
-from functools import cached_property, wraps
+from dataclasses import dataclass, fields
+from enum import Enum
+from functools import cached_property, partial, wraps
 import inspect
 import json
 import os
 from pathlib import Path
 from typing import Any
 import warnings
+import weakref
 
 from blake3 import blake3
 
+from mscclpp.language.collectives import Collective
 from mscclpp.language.program import CollectiveProgram
 from mscclpp.language.utils import AlgoSpec
+from mscclpp.plan_cache import compile_stats, coordinate_build, get_plan_cache, write_plan_file
+from mscclpp.plan_index import PlanIndex, SelectionCache, buffer_alignment
 from functools import wraps
 from mscclpp._version import __version__, __commit_id__
 
@@ -154,7 +159,7 @@ class ExecutionPlanHandle:
 
     @cached_property
     def constraints(self) -> ExecutionPlanConstraint:
-        return self._handle.constraints
+        return self._handle.constraint
 
 
 @dataclass(frozen=True)
@@ -170,6 +175,7 @@ class ExecutionRequest:
 
 class ExecutionPlanRegistry:
     _instance = None
+    _no_decision = object()
 
     def __new__(cls):
         if cls._instance is None:
@@ -181,24 +187,78 @@ class ExecutionPlanRegistry:
             self._registry = _ExecutionPlanRegistry.get_instance()
             self._id_map = {}
             self._collective_map = {}
+            self._index = PlanIndex()
+            self._selection_cache = SelectionCache()
             self._selector = None
             self._initialized = True
 
     def register_plan(self, plan: ExecutionPlanHandle):
+        self._add_plan(plan)
+        return self._instance._registry.register_plan(plan._handle)
+
+    def load_manifest(self, plan_dir: str, rank: int) -> list:
+        """Register the plans listed in the manifest of a plan directory.
+
+        The plan files are not parsed until the plans are executed, see ``mscclpp.plan_manifest``.
+
+        Args:
+            plan_dir (str): The plan directory.
+            rank (int): The rank of the current process.
+
+        Returns:
+            list: The newly registered ExecutionPlanHandle objects.
+        """
+        plans = [ExecutionPlanHandle(handle) for handle in self._registry.load_manifest(str(plan_dir), rank)]
+        for plan in plans:
+            self._add_plan(plan)
+        return plans
+
+    def _add_plan(self, plan: ExecutionPlanHandle):
         self._id_map[plan.id] = plan
         if plan.plan.collective not in self._collective_map:
             self._collective_map[plan.plan.collective] = []
         self._collective_map[plan.plan.collective].append(plan)
-        return self._instance._registry.register_plan(plan._handle)
+        self._index.add(
+            plan,
+            plan.plan.collective,
+            plan.constraints.world_size,
+            plan.constraints.n_ranks_per_node,
+            plan.plan.min_message_size,
+            plan.plan.max_message_size,
+            plan._handle.tags,
+        )
+        self._selection_cache.clear()
 
     def set_selector(self, selector):
         self._selector = selector
+        self._selection_cache.clear()
         self._instance._registry.set_selector(selector)
 
     def set_default_selector(self, selector):
         self._selector = selector
+        self._selection_cache.clear()
         self._instance._registry.set_default_selector(selector)
 
+    def set_tag_filter(self, tags: dict):
+        """Only pass plans carrying all the given tags with the given values to the selector.
+
+        Args:
+            tags (dict): The required tags. An empty dict disables the filter.
+        """
+        self._index.set_tag_filter(tags)
+        self._selection_cache.clear()
+        self._instance._registry.set_tag_filter(tags)
+
+    def set_selection_cache_size(self, size: int):
+        """Set the number of selection decisions cached by ``select``, 0 (the default) to disable the cache.
+
+        Only enable the cache if the selector depends on nothing but the cache key described in
+        ``select``, e.g. not on buffer addresses beyond their alignment, hints or external state.
+        """
+        self._selection_cache.size = size
+        self._selection_cache.clear()
+        self._instance._registry.set_selection_cache_size(size)
+
     def get(self, id: str) -> ExecutionPlanHandle:
         return self._id_map.get(id, None)
 
@@ -212,18 +272,46 @@ class ExecutionPlanRegistry:
         message_size: int,
         hints: dict = {},
     ) -> ExecutionPlanHandle:
-        if self._selector is None or collective not in self._collective_map:
+        """Select a plan for a collective call.
+
+        The selector receives the registered plans matching the world size, ranks per node, message
+        size and tag filter, looked up in a ``PlanIndex``. Once enabled with ``set_selection_cache_size``,
+        decisions of calls without hints are cached per (collective, world size, ranks per node, message
+        size, in-place, buffer alignment), so repeated calls do not run the selector again. The cache is
+        invalidated whenever plans, selectors or the tag filter change.
+        """
+        if self._selector is None:
             return None
-        req = ExecutionRequest(
-            collective=collective,
-            world_size=world_size,
-            n_ranks_per_node=n_ranks_per_node,
-            send_buffer=send_buffer,
-            recv_buffer=recv_buffer,
-            message_size=message_size,
-            hints=hints,
-        )
-        return self._selector(self._collective_map[collective], req)
+        key = None
+        if not hints:
+            key = (
+                collective,
+                world_size,
+                n_ranks_per_node,
+                message_size,
+                send_buffer == recv_buffer,
+                buffer_alignment(send_buffer),
+                buffer_alignment(recv_buffer),
+            )
+            decision = self._selection_cache.get(key, self._no_decision)
+            if decision is not self._no_decision:
+                return decision
+        plans = self._index.candidates(collective, world_size, n_ranks_per_node, message_size)
+        decision = None
+        if plans:
+            req = ExecutionRequest(
+                collective=collective,
+                world_size=world_size,
+                n_ranks_per_node=n_ranks_per_node,
+                send_buffer=send_buffer,
+                recv_buffer=recv_buffer,
+                message_size=message_size,
+                hints=hints,
+            )
+            decision = self._selector(plans, req)
+        if key is not None:
+            self._selection_cache.put(key, decision)
+        return decision
 
     @classmethod
     def reset_instance(cls):
@@ -231,6 +319,8 @@ class ExecutionPlanRegistry:
             cls._instance._registry.clear()
             cls._instance._id_map = {}
             cls._instance._collective_map = {}
+            cls._instance._index.clear()
+            cls._instance._selection_cache.clear()
             cls._instance._selector = None
             cls._instance = None
 
@@ -240,6 +330,13 @@ atexit.register(ExecutionPlanRegistry.reset_instance)
 _execution_plan_registry = ExecutionPlanRegistry()
 
 
+# Compiled plan handles of this process, keyed by (plan_id, rank, rank_scoped).
+_compiled_plans = {}
+atexit.register(_compiled_plans.clear)
+
+_source_hashes = weakref.WeakKeyDictionary()
+
+
 def _stable_json_bytes(obj: Any) -> bytes:
     return json.dumps(
         obj,
@@ -249,73 +346,121 @@ def _stable_json_bytes(obj: Any) -> bytes:
     ).encode("utf-8")
 
 
+def _source_hash(algo) -> str:
+    try:
+        return _source_hashes[algo]
+    except KeyError:
+        pass
+    except TypeError:
+        # Not weak-referenceable, hash the source every time.
+        return blake3(inspect.getsource(algo).encode("utf-8")).hexdigest()
+    source_hash = blake3(inspect.getsource(algo).encode("utf-8")).hexdigest()
+    _source_hashes[algo] = source_hash
+    return source_hash
+
+
+def _spec_field_key(value):
+    if isinstance(value, Collective):
+        return {"type": type(value).__name__, **vars(value)}
+    if isinstance(value, Enum):
+        return value.value
+    return value
+
+
+def _plan_id(algo, algo_spec: AlgoSpec, kwargs: dict) -> str:
+    plan_key = {
+        "version": __version__,
+        "source_hash": _source_hash(algo),
+        "spec": {f.name: _spec_field_key(getattr(algo_spec, f.name)) for f in fields(algo_spec)},
+    }
+    if kwargs:
+        plan_key["kwargs"] = kwargs
+    try:
+        key_bytes = _stable_json_bytes(plan_key)
+    except (TypeError, ValueError) as e:
+        raise TypeError(f"The algorithm spec and keyword arguments must be JSON serializable: {e}") from e
+    return blake3(key_bytes).hexdigest()
+
+
 def compile(
     algo,
     algo_spec: AlgoSpec,
     rank: int,
+    rank_scoped: bool = True,
+    register: bool = False,
     **kwargs,
 ) -> ExecutionPlanHandle:
     """Compile a MSCCL++ program from a high-level algorithm description.
+
+    Plans are cached in ``MSCCLPP_EXECUTION_PLAN_DIR``. Processes on the same node compiling the
+    same plan coordinate through a file lock: one of them runs the algorithm and writes the plans,
+    the others wait for the files to appear (see ``mscclpp.plan_cache.coordinate_build``). The
+    directory is bounded by an LRU budget, see ``mscclpp.plan_cache.PlanCache``.
+    Handles are also memoized per process, so compiling the same plan again returns the same
+    handle without touching the disk.
+
     Args:
         algo: The high-level algorithm description (e.g., a function or class).
         algo_spec (AlgoSpec): Algorithm specification containing collective type,
             world size, ranks per node, instances, protocol, and other configuration.
         rank (int): The rank of the current process.
-        **kwargs: Additional keyword arguments passed to the algorithm function.
+        rank_scoped (bool): Only lower the operations of ``rank`` and emit a plan file
+            that can be loaded by this rank only. Set to False to emit the whole-world
+            plan shared by all ranks. Defaults to True.
+        register (bool): Register the returned handle in the ``ExecutionPlanRegistry``
+            if it is not registered yet. Defaults to False.
+        **kwargs: Additional keyword arguments passed to the algorithm function. They
+            are part of the plan id, so different values produce different plans, and must
+            be JSON serializable.
     Returns:
         ExecutionPlanHandle: The compiled execution plan handle.
     Raises:
         ValueError: If the 'algo' argument is not callable.
+        TypeError: If the spec or the keyword arguments are not JSON serializable.
     """
     if not callable(algo):
         raise ValueError("The 'algo' argument must be a callable (e.g., a function or class).")
-    prog: CollectiveProgram = algo(
-        algo_spec,
-        **kwargs,
-    )
-    source = inspect.getsource(algo)
-
-    source_hash = blake3(source.encode("utf-8")).hexdigest()
-    plan_id = blake3(
-        _stable_json_bytes(
-            {
-                "version": __version__,
-                "algo_name": algo_spec.name,
-                "collective": algo_spec.collective.name,
-                "tags": sorted(algo_spec.tags.items()),
-                "source_hash": source_hash,
-                "envs": {
-                    "nranks_per_node": algo_spec.nranks_per_node,
-                    "world_size": algo_spec.world_size,
-                    "instances": algo_spec.instances,
-                    "protocol": algo_spec.protocol,
-                },
-            }
-        )
-    ).hexdigest()
+    plan_id = _plan_id(algo, algo_spec, kwargs)
     plan_handle = _execution_plan_registry.get(plan_id)
     if plan_handle is not None:
         return plan_handle
+    plan_handle = _compiled_plans.get((plan_id, rank, rank_scoped))
+    if plan_handle is not None:
+        if register:
+            _execution_plan_registry.register_plan(plan_handle)
+        return plan_handle
 
     plan_dir = os.environ.get("MSCCLPP_EXECUTION_PLAN_DIR", Path.home() / ".cache/mscclpp")
     os.makedirs(plan_dir, exist_ok=True)
-    filename = f"{plan_id}.json"
-    plan_path = os.path.join(plan_dir, filename)
-    tmp_path = plan_path + f".tmp.{os.getpid()}"
-    if not os.path.exists(plan_path):
-        try:
-            # TODO (binyli): Each rank could generate its own execution plan separately. Doesn't need to generate whole plan.
-            with open(tmp_path, "w") as f:
-                prog.post_process_operations()
-                f.write(prog.to_json(indent=None, separators=(",", ":"), ensure_ascii=False))
-                f.flush()
-                os.fsync(f.fileno())
-            if not os.path.exists(plan_path):
-                os.rename(tmp_path, plan_path)
-            else:
-                os.remove(tmp_path)
-        except Exception:
-            Path(plan_path).unlink(missing_ok=True)
+    if rank_scoped:
+        # The first local rank to take the lock builds the plans of every rank on its node, the others skip running
+        # the algorithm and wait for their plan file.
+        node = rank // algo_spec.nranks_per_node
+        local_ranks = range(
+            node * algo_spec.nranks_per_node, min((node + 1) * algo_spec.nranks_per_node, algo_spec.world_size)
+        )
+        plan_path = os.path.join(plan_dir, f"{plan_id}.rank{rank}.json")
+        lock_path = os.path.join(plan_dir, f"{plan_id}.node{node}.lock")
+    else:
+        local_ranks = None
+        plan_path = os.path.join(plan_dir, f"{plan_id}.json")
+        lock_path = os.path.join(plan_dir, f"{plan_id}.lock")
+
+    def build():
+        prog: CollectiveProgram = algo(
+            algo_spec,
+            **kwargs,
+        )
+        if local_ranks is None:
+            write_plan_file(plan_path, prog.write_json)
+            return
+        for local_rank in local_ranks:
+            local_plan_path = os.path.join(plan_dir, f"{plan_id}.rank{local_rank}.json")
+            if not os.path.exists(local_plan_path):
+                write_plan_file(local_plan_path, partial(prog.write_json, rank=local_rank))
+
+    hit = coordinate_build(plan_path, lock_path, build)
+    get_plan_cache(plan_dir).record_use(plan_id, plan_path, lock_path, hit)
     execution_plan = ExecutionPlan(plan_path, rank)
     handle = _ExecutionPlanHandle.create(
         id=plan_id,
@@ -324,4 +469,8 @@ def compile(
         plan=execution_plan,
         tags=algo_spec.tags,
     )
-    return ExecutionPlanHandle(handle)
+    plan_handle = ExecutionPlanHandle(handle)
+    _compiled_plans[(plan_id, rank, rank_scoped)] = plan_handle
+    if register:
+        _execution_plan_registry.register_plan(plan_handle)
+    return plan_handle
@@ -4,11 +4,17 @@
 import os
 import shutil
 import argparse
+from dataclasses import replace
+import json
 from pathlib import Path
+import re
 
 from mscclpp.language import default_algos as def_algo
+from mscclpp.language.autotune import Autotuner, CostModelScorer, MeasuredScorer
 from mscclpp.language.collectives import *
 from mscclpp.language.utils import AlgoSpec
+from mscclpp.plan_format import convert_plan, expand_rank_templates
+from mscclpp.plan_manifest import manifest_entry, write_manifest
 
 default_algo_configs = [
     {
@@ -56,42 +62,323 @@ default_algo_configs = [
 ]
 
 
-def create_default_plans():
+def allreduce_hierarchical_configs(num_nodes, nranks_per_node=8):
+    world_size = num_nodes * nranks_per_node
+    # LL for small and medium messages, Simple above. LL plans grow with the node count, so Simple
+    # plans cover every size from 16 nodes on.
+    ranges = [
+        ("1K_64K", "LL", 1 << 10, 64 << 10, {"thread_block_group_size": 1}),
+        ("64K_1M", "LL", (64 << 10) + 1, 1 << 20, {"thread_block_group_size": 4}),
+        ("1M_max", "Simple", (1 << 20) + 1, 2**64 - 1, {"thread_block_group_size": 2}),
+    ]
+    if num_nodes >= 16:
+        ranges = [("1K_max", "Simple", 1 << 10, 2**64 - 1, {"thread_block_group_size": 2})]
+    configs = []
+    for size_range, protocol, min_message_size, max_message_size, additional_kwargs in ranges:
+        name = f"allreduce_hierarchical_{num_nodes}nodes_{size_range}"
+        configs.append(
+            {
+                "filename": f"{name}.json",
+                "function": def_algo.allreduce_hierarchical,
+                "spec": AlgoSpec(
+                    name=name,
+                    collective=AllReduce(world_size, 1, True),
+                    nranks_per_node=nranks_per_node,
+                    world_size=world_size,
+                    in_place=True,
+                    instances=1,
+                    protocol=protocol,
+                    auto_sync=False,
+                    num_threads_per_block=1024,
+                    reuse_resources=True,
+                    use_double_scratch_buffer=protocol == "LL",
+                    deduplicate_ranks=protocol == "Simple",
+                    min_message_size=min_message_size,
+                    max_message_size=max_message_size,
+                    tags={"default": 1},
+                ),
+                "additional_kwargs": additional_kwargs,
+            }
+        )
+    return configs
+
+
+def ring_configs(num_nodes, nranks_per_node=8):
+    # Rings for large AllGather and ReduceScatter messages, with two rings in opposite directions.
+    world_size = num_nodes * nranks_per_node
+    configs = []
+    for collective, function in (
+        (AllGather(world_size, 2, True), def_algo.allgather_ring),
+        (ReduceScatter(world_size, 2, True), def_algo.reducescatter_ring),
+    ):
+        name = f"{collective.name}_ring_{num_nodes}nodes_1M_max"
+        configs.append(
+            {
+                "filename": f"{name}.json",
+                "function": function,
+                "spec": AlgoSpec(
+                    name=name,
+                    collective=collective,
+                    nranks_per_node=nranks_per_node,
+                    world_size=world_size,
+                    in_place=True,
+                    instances=1,
+                    protocol="Simple",
+                    auto_sync=False,
+                    num_threads_per_block=1024,
+                    reuse_resources=True,
+                    use_double_scratch_buffer=False,
+                    deduplicate_ranks=True,
+                    min_message_size=1 << 20,
+                    max_message_size=2**64 - 1,
+                    tags={"default": 1},
+                ),
+                "additional_kwargs": {"num_rings": 2},
+            }
+        )
+    return configs
+
+
+def alltoall_configs(num_nodes, nranks_per_node=8):
+    world_size = num_nodes * nranks_per_node
+    # Packets for small messages, sent pairwise within two nodes and aggregated through node leaders
+    # across more nodes, then the pairwise exchange, pipelined for the largest messages.
+    if num_nodes == 1:
+        ranges = [
+            ("1K_128K", def_algo.alltoall_pairwise, "LL", 1 << 10, 128 << 10),
+            ("128K_max", def_algo.alltoall_pairwise, "Simple", (128 << 10) + 1, 2**64 - 1),
+        ]
+    elif num_nodes == 2:
+        ranges = [
+            ("1K_32K", def_algo.alltoall_pairwise, "LL", 1 << 10, 32 << 10),
+            ("32K_64M", def_algo.alltoall_pairwise, "Simple", (32 << 10) + 1, 64 << 20),
+            ("64M_max", def_algo.alltoall_pipelined, "Simple", (64 << 20) + 1, 2**64 - 1),
+        ]
+    else:
+        ranges = [
+            ("1K_1M", def_algo.alltoall_hierarchical, "LL", 1 << 10, 1 << 20),
+            ("1M_64M", def_algo.alltoall_pairwise, "Simple", (1 << 20) + 1, 64 << 20),
+            ("64M_max", def_algo.alltoall_pipelined, "Simple", (64 << 20) + 1, 2**64 - 1),
+        ]
+    configs = []
+    for size_range, function, protocol, min_message_size, max_message_size in ranges:
+        name = f"alltoall_{num_nodes}nodes_{size_range}"
+        configs.append(
+            {
+                "filename": f"{name}.json",
+                "function": function,
+                "spec": AlgoSpec(
+                    name=name,
+                    collective=AllToAll(world_size, 1, True),
+                    nranks_per_node=nranks_per_node,
+                    world_size=world_size,
+                    in_place=True,
+                    instances=1,
+                    protocol=protocol,
+                    auto_sync=False,
+                    num_threads_per_block=1024,
+                    reuse_resources=True,
+                    use_double_scratch_buffer=protocol == "LL",
+                    deduplicate_ranks=protocol == "Simple",
+                    min_message_size=min_message_size,
+                    max_message_size=max_message_size,
+                    tags={"default": 1},
+                ),
+            }
+        )
+    return configs
+
+
+for num_nodes in (4, 8, 16, 32):
+    default_algo_configs.extend(allreduce_hierarchical_configs(num_nodes))
+for num_nodes in (2, 4, 8):
+    default_algo_configs.extend(ring_configs(num_nodes))
+for num_nodes in (1, 2, 4, 8, 16):
+    default_algo_configs.extend(alltoall_configs(num_nodes))
+
+# Number of nodes up to which ``--install`` writes the default plans.
+DEFAULT_MAX_NODES = 8
+
+default_tuning_configs = [
+    {
+        "function": def_algo.allreduce_2nodes,
+        "spec": AlgoSpec(
+            name="allreduce_2nodes",
+            collective=AllReduce(16, 1, True),
+            nranks_per_node=8,
+            world_size=16,
+            in_place=True,
+            instances=1,
+            protocol="LL",
+            auto_sync=False,
+            num_threads_per_block=1024,
+            reuse_resources=True,
+            use_double_scratch_buffer=True,
+            min_message_size=1 << 10,
+            max_message_size=2 << 20,
+            tags={"default": 1},
+        ),
+        "space": {
+            "instances": [1, 2],
+            "num_threads_per_block": [512, 768, 1024],
+            "thread_block_group_size": [1, 2, 4, 8],
+        },
+        "message_sizes": [1 << shift for shift in range(10, 22)],
+    },
+]
+
+
+def build_program(config: dict, **options):
+    """Build the program of an entry of ``default_algo_configs``.
+
+    Args:
+        config (dict): The entry, with the generator function, its AlgoSpec and additional arguments.
+        **options: AlgoSpec fields replacing those of the entry, e.g. ``instances=2``.
+
+    Returns:
+        CollectiveProgram: The program.
+    """
+    spec = replace(config["spec"], **options)
+    return config["function"](spec, **config.get("additional_kwargs", {}))
+
+
+def build_plan(config: dict, **options) -> dict:
+    """Build the JSON plan of an entry of ``default_algo_configs``, with a full section per GPU.
+
+    Args:
+        config (dict): The entry, see ``build_program``.
+        **options: AlgoSpec fields replacing those of the entry.
+
+    Returns:
+        dict: The plan, with rank templates expanded.
+    """
+    return expand_rank_templates(json.loads(build_program(config, **options).to_json()))
+
+
+def select_configs(pattern: str = None, max_world_size: int = None) -> list:
+    """Select the entries of ``default_algo_configs`` whose name matches a regular expression."""
+    return [
+        config
+        for config in default_algo_configs
+        if (pattern is None or re.search(pattern, config["spec"].name))
+        and (max_world_size is None or config["spec"].world_size <= max_world_size)
+    ]
+
+
+def parse_size(size: str) -> int:
+    """Parse a size in bytes with an optional K, M or G suffix, e.g. ``64K``."""
+    units = {"K": 2**10, "M": 2**20, "G": 2**30}
+    if size[-1].upper() in units:
+        return int(size[:-1]) * units[size[-1].upper()]
+    return int(size)
+
+
+def installed_configs(max_nodes: int = DEFAULT_MAX_NODES) -> list:
+    """Select the entries of ``default_algo_configs`` that ``--install`` writes, those of at most ``max_nodes`` nodes."""
+    return [
+        config
+        for config in default_algo_configs
+        if config["spec"].world_size <= max_nodes * config["spec"].nranks_per_node
+    ]
+
+
+def create_default_plans(max_nodes: int = DEFAULT_MAX_NODES):
+    """Write the plans of ``default_algo_configs`` and their manifest to the default plan directory.
+
+    Args:
+        max_nodes (int, optional): Skip the plans of more nodes, whose files take tens of MB each.
+            Defaults to DEFAULT_MAX_NODES.
+    """
     plan_dir = os.environ.get("MSCCLPP_EXECUTION_PLAN_DIR", Path.home() / ".cache/mscclpp_default")
     plan_path = Path(plan_dir)
     if plan_path.exists():
         shutil.rmtree(plan_path)
     plan_path.mkdir(parents=True)
 
-    for config in default_algo_configs:
+    manifest = []
+    for config in installed_configs(max_nodes):
         filename = config["filename"]
-        func = config["function"]
         spec = config["spec"]
-        additional_kwargs = config.get("additional_kwargs", {})
         plan_path = os.path.join(plan_dir, filename)
 
         try:
-            if additional_kwargs:
-                prog = func(spec, **additional_kwargs)
-            else:
-                prog = func(spec)
+            prog = build_program(config)
 
             with open(plan_path, "w", encoding="utf-8") as f:
-                f.write(prog.to_json())
-                f.flush()
+                prog.write_json(f)
 
+            manifest.append(
+                manifest_entry(plan_path, prog.plan_metadata(), spec.world_size, spec.nranks_per_node, spec.tags)
+            )
         except Exception as e:
             print(f"Error creating plan for {spec.name}: {e}")
             continue
 
+    write_manifest(plan_dir, manifest)
+
+
+def tune_default_plans(plan_dir, strategy, timings=None, candidates_only=False):
+    scorer = MeasuredScorer(timings) if timings is not None else CostModelScorer()
+    for config in default_tuning_configs:
+        tuner = Autotuner(config["function"], config["spec"], config["space"], config["message_sizes"], scorer)
+        if candidates_only:
+            entries = tuner.write_candidates(plan_dir)
+        else:
+            getattr(tuner, strategy)()
+            entries = tuner.write_family(plan_dir)
+        for entry in entries:
+            print(f"{entry['name']}: {entry['min_message_size']} - {entry['max_message_size']} bytes")
+
+
+def convert_plans(json_paths, output_dir=None):
+    for json_path in json_paths:
+        binary_path = None
+        if output_dir is not None:
+            os.makedirs(output_dir, exist_ok=True)
+            binary_path = os.path.join(output_dir, Path(json_path).with_suffix(".bin").name)
+        binary_path = convert_plan(json_path, binary_path)
+        print(f"{json_path} -> {binary_path} ({os.path.getsize(json_path)} -> {os.path.getsize(binary_path)} bytes)")
+
 
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("--install", action="store_true", help="flag to install default plans")
+    parser.add_argument(
+        "--max-nodes",
+        type=int,
+        default=DEFAULT_MAX_NODES,
+        help=f"install the default plans of at most this many nodes, defaults to {DEFAULT_MAX_NODES}",
+    )
+    parser.add_argument(
+        "--convert", nargs="+", metavar="PLAN", help="convert JSON execution plans to the binary plan format"
+    )
+    parser.add_argument(
+        "--output-dir",
+        help="directory of the converted or tuned plans, defaults to the directory of each JSON plan for converted "
+        "plans and to ~/.cache/mscclpp_tuned for tuned plans",
+    )
+    parser.add_argument("--tune", action="store_true", help="tune the default algorithms into plans per message size")
+    parser.add_argument(
+        "--strategy",
+        choices=["successive_halving", "coordinate_descent", "exhaustive"],
+        default="successive_halving",
+        help="search strategy of --tune",
+    )
+    parser.add_argument(
+        "--timings", help="JSON Lines file of measured times to tune with, instead of the estimates of the cost model"
+    )
+    parser.add_argument(
+        "--tune-candidates", action="store_true", help="write every candidate plan of --tune, to be benchmarked"
+    )
     args = parser.parse_args()
 
     if args.install:
-        create_default_plans()
+        create_default_plans(args.max_nodes)
+    if args.convert:
+        convert_plans(args.convert, args.output_dir)
+    if args.tune or args.tune_candidates:
+        plan_dir = args.output_dir if args.output_dir is not None else Path.home() / ".cache/mscclpp_tuned"
+        tune_default_plans(plan_dir, args.strategy, args.timings, args.tune_candidates)
 
 
 if __name__ == "__main__":
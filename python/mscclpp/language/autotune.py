@@ -0,0 +1,412 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+"""Offline tuning of DSL algorithms into families of plans partitioned by message size.
+
+An ``Autotuner`` sweeps parameters of an algorithm function, such as the ``instances``,
+``protocol`` and ``num_threads_per_block`` fields of its ``AlgoSpec`` or its own keyword
+arguments like ``thread_block_group_size``, scores each candidate at a grid of message sizes, and
+writes the best candidate of each range of sizes as a plan, together with the manifest read by
+``ExecutionPlanRegistry``.
+
+Candidates are scored by a scorer: ``CostModelScorer`` estimates their times with the cost model,
+without any GPU, and ``MeasuredScorer`` reads times measured by the benchmarks, as appended by
+``python/test/executor_test.py --results``. A typical measured workflow writes all candidates with
+``Autotuner.write_candidates``, benchmarks them at the grid sizes and tunes with the results.
+
+Example:
+    >>> tuner = Autotuner(
+    ...     allreduce_2nodes,
+    ...     spec,
+    ...     {"instances": [1, 2], "thread_block_group_size": [1, 2, 4]},
+    ...     [1 << 10, 1 << 14, 1 << 18, 1 << 21],
+    ...     CostModelScorer(),
+    ... )
+    >>> tuner.successive_halving()
+    >>> tuner.write_family(plan_dir)
+"""
+
+from mscclpp.language.cost_model import HardwareModel, estimate_time, load_plan
+from mscclpp.language.program import CollectiveProgram
+from mscclpp.language.utils import AlgoSpec
+from mscclpp.plan_manifest import manifest_entry, read_manifest, write_manifest
+from collections import defaultdict
+from dataclasses import dataclass, fields, replace
+from typing import Callable, Dict, List, Sequence, Tuple
+import itertools
+import json
+import math
+import os
+
+_SPEC_FIELDS = {spec_field.name for spec_field in fields(AlgoSpec)}
+
+
+@dataclass(frozen=True)
+class TuningCandidate:
+    """One assignment of the tuned parameters.
+
+    Attributes:
+        name (str): The plan name of the candidate, derived from its parameters.
+        parameters (Tuple[Tuple[str, object], ...]): The tuned parameters and their values.
+        spec (AlgoSpec): The spec of the candidate, covering the whole tuned size range.
+        kwargs (Dict[str, object]): The keyword arguments of the algorithm function.
+    """
+
+    name: str
+    parameters: Tuple[Tuple[str, object], ...]
+    spec: AlgoSpec
+    kwargs: Dict[str, object]
+
+
+@dataclass(frozen=True)
+class SizeRange:
+    """A range of message sizes, bounds included, and the candidate selected for it.
+
+    Attributes:
+        min_message_size (int): The smallest message size of the range.
+        max_message_size (int): The largest message size of the range.
+        candidate (TuningCandidate): The candidate run for the sizes of the range.
+    """
+
+    min_message_size: int
+    max_message_size: int
+    candidate: TuningCandidate
+
+
+class CostModelScorer:
+    """Score candidates with the times estimated by ``mscclpp.language.cost_model``.
+
+    Message sizes are those of the plan registry, the size of the output buffer for allgather
+    and of the input buffer otherwise.
+
+    Args:
+        hardware (HardwareModel, optional): The hardware to estimate for. Defaults to a
+            ``HardwareModel`` with the ``nranks_per_node`` of each candidate.
+    """
+
+    def __init__(self, hardware: HardwareModel = None):
+        self.hardware = hardware
+
+    def __call__(self, candidate: TuningCandidate, program: Callable[[], CollectiveProgram], message_sizes):
+        hardware = self.hardware
+        if hardware is None:
+            hardware = HardwareModel(gpus_per_node=candidate.spec.nranks_per_node)
+        plan = load_plan(program())
+        ranks_per_message = candidate.spec.world_size if candidate.spec.collective.name == "allgather" else 1
+        return {size: estimate_time(plan, size // ranks_per_message, hardware).time for size in message_sizes}
+
+
+class MeasuredScorer:
+    """Score candidates with measured times.
+
+    The times are read from a JSON Lines file with one measurement per line, with the plan name,
+    the message size in bytes and the time in microseconds::
+
+        {"plan": "allreduce_2nodes_LL_i1_t1024_tbg4", "message_size": 1048576, "time": 41.2}
+
+    Several measurements of the same plan and size are averaged. Sizes that were not measured
+    score as infinitely slow.
+
+    Args:
+        path (str): The JSON Lines file.
+    """
+
+    def __init__(self, path: str):
+        measurements = defaultdict(list)
+        with open(path) as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    measurements[(record["plan"], record["message_size"])].append(record["time"])
+        self.times = {key: sum(times) / len(times) for key, times in measurements.items()}
+
+    def __call__(self, candidate: TuningCandidate, program: Callable[[], CollectiveProgram], message_sizes):
+        return {size: self.times.get((candidate.name, size), math.inf) for size in message_sizes}
+
+
+def _format_size(size: int) -> str:
+    for unit, shift in (("G", 30), ("M", 20), ("K", 10)):
+        if size >= 1 << shift and size % (1 << shift) == 0:
+            return f"{size >> shift}{unit}"
+    return str(size)
+
+
+class Autotuner:
+    """Tune the parameters of an algorithm function per message size.
+
+    Args:
+        function (Callable[..., CollectiveProgram]): The algorithm, called as
+            ``function(spec, **kwargs)``.
+        spec (AlgoSpec): The base spec. Its ``min_message_size`` and ``max_message_size`` bound the
+            sizes covered by the family.
+        space (Dict[str, Sequence]): The values to try for each tuned parameter. Parameters named
+            after an ``AlgoSpec`` field replace that field, the others are passed to ``function``.
+        message_sizes (List[int]): The grid of message sizes candidates are scored at.
+        scorer (Callable): Called as ``scorer(candidate, program, message_sizes)``, where
+            ``program()`` builds the candidate, and returns the time of each size.
+            ``CostModelScorer`` and ``MeasuredScorer`` are provided.
+        kwargs (Dict[str, object], optional): Fixed keyword arguments of ``function``.
+
+    Raises:
+        ValueError: If the space is empty or the sizes are outside the range of ``spec``.
+    """
+
+    def __init__(
+        self,
+        function: Callable[..., CollectiveProgram],
+        spec: AlgoSpec,
+        space: Dict[str, Sequence],
+        message_sizes: List[int],
+        scorer: Callable,
+        kwargs: Dict[str, object] = None,
+    ):
+        if len(space) == 0 or any(len(values) == 0 for values in space.values()):
+            raise ValueError("Every tuned parameter needs at least one value")
+        self.message_sizes = sorted(set(message_sizes))
+        if len(self.message_sizes) == 0 or not (
+            spec.min_message_size <= self.message_sizes[0] and self.message_sizes[-1] <= spec.max_message_size
+        ):
+            raise ValueError(
+                f"Message sizes must lie within [{spec.min_message_size}, {spec.max_message_size}] of spec {spec.name}"
+            )
+        self.function = function
+        self.spec = spec
+        self.space = {name: list(values) for name, values in space.items()}
+        self.scorer = scorer
+        self.kwargs = dict(kwargs or {})
+        self.times: Dict[str, Dict[int, float]] = defaultdict(dict)
+        self.candidates: Dict[str, TuningCandidate] = {}
+
+    def candidate(self, parameters: Dict[str, object]) -> TuningCandidate:
+        """Return the candidate of an assignment of all tuned parameters."""
+        ordered = tuple((name, parameters[name]) for name in self.space)
+        suffix = "_".join(self._format_parameter(name, value) for name, value in ordered)
+        name = f"{self.spec.name}_{suffix}"
+        if name not in self.candidates:
+            spec_overrides = {key: value for key, value in ordered if key in _SPEC_FIELDS}
+            kwargs = {**self.kwargs, **{key: value for key, value in ordered if key not in _SPEC_FIELDS}}
+            self.candidates[name] = TuningCandidate(
+                name, ordered, replace(self.spec, name=name, **spec_overrides), kwargs
+            )
+        return self.candidates[name]
+
+    @staticmethod
+    def _format_parameter(name: str, value) -> str:
+        abbreviations = {"instances": "i", "num_threads_per_block": "t", "thread_block_group_size": "tbg"}
+        if name == "protocol":
+            return str(value)
+        return f"{abbreviations.get(name, name)}{value}"
+
+    def build(self, candidate: TuningCandidate, spec: AlgoSpec = None) -> CollectiveProgram:
+        """Build the program of ``candidate``, with ``spec`` in place of its own spec if given."""
+        return self.function(spec if spec is not None else candidate.spec, **candidate.kwargs)
+
+    def evaluate(self, candidate: TuningCandidate, message_sizes: List[int] = None) -> Dict[int, float]:
+        """Score ``candidate`` at the sizes it was not scored at yet and return all its times.
+
+        Candidates the algorithm cannot be built with score as infinitely slow.
+        """
+        message_sizes = self.message_sizes if message_sizes is None else message_sizes
+        missing = [size for size in message_sizes if size not in self.times[candidate.name]]
+        if missing:
+            try:
+                self.times[candidate.name].update(self.scorer(candidate, lambda: self.build(candidate), missing))
+            except Exception:
+                self.times[candidate.name].update({size: math.inf for size in missing})
+        return self.times[candidate.name]
+
+    def _all_candidates(self) -> List[TuningCandidate]:
+        names = list(self.space)
+        return [
+            self.candidate(dict(zip(names, values))) for values in itertools.product(*(self.space[n] for n in names))
+        ]
+
+    def _relative_scores(self, candidates: List[TuningCandidate], message_sizes: List[int]) -> Dict[str, float]:
+        # A candidate is as good as its best size relative to the fastest candidate at that size.
+        best = {size: min(self.times[c.name][size] for c in candidates) for size in message_sizes}
+        scores = {}
+        for candidate in candidates:
+            ratios = [
+                self.times[candidate.name][size] / best[size]
+                for size in message_sizes
+                if math.isfinite(best[size]) and best[size] > 0
+            ]
+            scores[candidate.name] = min(ratios, default=math.inf)
+        return scores
+
+    def exhaustive(self) -> List[TuningCandidate]:
+        """Score every candidate of the space at every size.
+
+        Returns:
+            List[TuningCandidate]: The candidates scored.
+        """
+        candidates = self._all_candidates()
+        for candidate in candidates:
+            self.evaluate(candidate)
+        return candidates
+
+    def successive_halving(self, reduction: int = 2) -> List[TuningCandidate]:
+        """Score the candidates of the space on a coarse size grid, keep the best, refine, repeat.
+
+        Each round scores the remaining candidates on a grid twice as dense as the previous one
+        and keeps the ``1 / reduction`` of them that come closest to the fastest candidate at some
+        size of the grid, so that candidates winning only a small range of sizes survive. The
+        last round scores the survivors on the full grid.
+
+        Args:
+            reduction (int, optional): The factor the candidates shrink by each round. Defaults to 2.
+
+        Returns:
+            List[TuningCandidate]: The candidates scored on the full grid.
+        """
+        candidates = self._all_candidates()
+        stride = 1 << max(0, math.ceil(math.log(max(len(candidates), 1), reduction)) - 1)
+        while True:
+            message_sizes = self.message_sizes[::stride]
+            if message_sizes[-1] != self.message_sizes[-1]:
+                message_sizes.append(self.message_sizes[-1])
+            for candidate in candidates:
+                self.evaluate(candidate, message_sizes)
+            if stride == 1:
+                break
+            scores = self._relative_scores(candidates, message_sizes)
+            candidates = [c for c in candidates if math.isfinite(scores[c.name])]
+            candidates.sort(key=lambda c: scores[c.name])
+            candidates = candidates[: max(1, math.ceil(len(candidates) / reduction))]
+            stride //= 2
+        return candidates
+
+    def coordinate_descent(self, max_rounds: int = 4) -> List[TuningCandidate]:
+        """Tune the parameters one at a time, separately for each size of the grid.
+
+        Starting from the values of the base spec, or the first value of each parameter, each
+        round tries all values of one parameter at a time with the others fixed and keeps the
+        fastest, until a round changes nothing. Candidates are scored at all sizes at once, so
+        the searches of different sizes share their evaluations.
+
+        Args:
+            max_rounds (int, optional): The maximum number of rounds per size. Defaults to 4.
+
+        Returns:
+            List[TuningCandidate]: The candidates scored.
+        """
+        start = {
+            name: getattr(self.spec, name) if getattr(self.spec, name, None) in values else values[0]
+            for name, values in self.space.items()
+        }
+        start.update({name: self.kwargs[name] for name in start if self.kwargs.get(name) in self.space[name]})
+        visited = {}
+        for size in self.message_sizes:
+            current = dict(start)
+            for _ in range(max_rounds):
+                changed = False
+                for name, values in self.space.items():
+                    best_value, best_time = current[name], math.inf
+                    for value in values:
+                        candidate = self.candidate({**current, name: value})
+                        visited[candidate.name] = candidate
+                        time = self.evaluate(candidate)[size]
+                        if time < best_time:
+                            best_value, best_time = value, time
+                    if best_value != current[name]:
+                        current[name] = best_value
+                        changed = True
+                if not changed:
+                    break
+        return list(visited.values())
+
+    def partition(self, tolerance: float = 0.02) -> List[SizeRange]:
+        """Split the size range of the base spec among the fastest candidates.
+
+        Each size of the grid selects the fastest candidate scored at all sizes, unless the
+        candidate of the previous size is within ``tolerance`` of it, which avoids plans for
+        differences within the accuracy of the scorer. Consecutive sizes with the same candidate
+        form one range, which extends up to the first size of the next range. The first range
+        starts at the ``min_message_size`` of the base spec and the last ends at its
+        ``max_message_size``, so the ranges cover it without overlapping.
+
+        Args:
+            tolerance (float, optional): The relative slowdown accepted to extend the previous
+                range. Defaults to 0.02.
+
+        Returns:
+            List[SizeRange]: The ranges, by increasing sizes.
+
+        Raises:
+            RuntimeError: If no candidate could be scored at some size.
+        """
+        scored = [
+            self.candidates[name]
+            for name, times in self.times.items()
+            if all(size in times for size in self.message_sizes)
+        ]
+        winners = []
+        for size in self.message_sizes:
+            best = min(scored, key=lambda candidate: self.times[candidate.name][size], default=None)
+            if best is None or not math.isfinite(self.times[best.name][size]):
+                raise RuntimeError(f"No candidate of {self.spec.name} could be scored at message size {size}")
+            if winners and self.times[winners[-1].name][size] <= self.times[best.name][size] * (1 + tolerance):
+                best = winners[-1]
+            winners.append(best)
+
+        ranges = []
+        for index, (size, winner) in enumerate(zip(self.message_sizes, winners)):
+            if index == 0:
+                ranges.append([self.spec.min_message_size, winner])
+            elif winner is not winners[index - 1]:
+                ranges.append([size, winner])
+        bounds = [start for start, _ in ranges[1:]] + [self.spec.max_message_size + 1]
+        return [SizeRange(start, end - 1, winner) for (start, winner), end in zip(ranges, bounds)]
+
+    def _write_plan(self, plan_dir: str, candidate: TuningCandidate, spec: AlgoSpec) -> dict:
+        program = self.build(candidate, spec)
+        plan_path = os.path.join(plan_dir, f"{spec.name}.json")
+        with open(plan_path, "w", encoding="utf-8") as f:
+            f.write(program.to_json())
+        return manifest_entry(plan_path, program.plan_metadata(), spec.world_size, spec.nranks_per_node, spec.tags)
+
+    def _update_manifest(self, plan_dir: str, entries: List[dict]):
+        filenames = {entry["filename"] for entry in entries}
+        existing = [entry for entry in read_manifest(plan_dir) if entry["filename"] not in filenames]
+        write_manifest(plan_dir, existing + entries)
+
+    def write_family(self, plan_dir: str) -> List[dict]:
+        """Write the plan of each range of ``partition`` and add them to the manifest of ``plan_dir``.
+
+        Plans are named after the base spec and their range, such as ``allreduce_1K_64K``, and
+        entries of the manifest for other files are kept.
+
+        Returns:
+            List[dict]: The manifest entries of the written plans.
+        """
+        os.makedirs(plan_dir, exist_ok=True)
+        entries = []
+        for size_range in self.partition():
+            end = "max" if size_range.max_message_size == 2**64 - 1 else _format_size(size_range.max_message_size)
+            spec = replace(
+                size_range.candidate.spec,
+                name=f"{self.spec.name}_{_format_size(size_range.min_message_size)}_{end}",
+                min_message_size=size_range.min_message_size,
+                max_message_size=size_range.max_message_size,
+            )
+            entries.append(self._write_plan(plan_dir, size_range.candidate, spec))
+        self._update_manifest(plan_dir, entries)
+        return entries
+
+    def write_candidates(self, plan_dir: str) -> List[dict]:
+        """Write the plan of every candidate of the space, to be benchmarked for ``MeasuredScorer``.
+
+        Candidates the algorithm cannot be built with are skipped.
+
+        Returns:
+            List[dict]: The manifest entries of the written plans.
+        """
+        os.makedirs(plan_dir, exist_ok=True)
+        entries = []
+        for candidate in self._all_candidates():
+            try:
+                entries.append(self._write_plan(plan_dir, candidate, candidate.spec))
+            except Exception as e:
+                print(f"Skipping candidate {candidate.name}: {e}")
+        self._update_manifest(plan_dir, entries)
+        return entries
@@ -0,0 +1,622 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+"""Analytical cost model estimating the execution time of execution plans without GPUs.
+
+The plan is simulated thread block by thread block on a model of the hardware: every operation
+takes a fixed overhead plus the time to move its bytes at the bandwidth of the memory or link it
+uses, waits start once the matching signal arrived, semaphore acquires once the matching release
+happened, barriers once all their thread blocks arrived, and packet reads once the packets were
+written. Signals are matched to waits across ranks the same way as the executor does, the k-th
+signal on a channel to the k-th wait on the peer channel.
+
+Example:
+    >>> estimate = estimate_time(program, 1 << 20, HardwareModel(gpus_per_node=8))
+    >>> estimate.time, [step.operation for step in estimate.critical_path]
+"""
+
+from mscclpp.language.internal.types import BufferType, ChannelType, Instruction
+from mscclpp.language.program import CollectiveProgram
+from mscclpp.plan_format import expand_instances, expand_rank_templates, is_binary_plan
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Dict, List, Union
+import heapq
+import json
+import os
+
+
+@dataclass(frozen=True)
+class LinkModel:
+    """Bandwidth and latency of a link or memory.
+
+    Attributes:
+        bandwidth (float): Bandwidth in GB/s.
+        latency (float): Latency in microseconds.
+    """
+
+    bandwidth: float
+    latency: float = 0.0
+
+    def transfer_time(self, num_bytes: float) -> float:
+        return num_bytes / (self.bandwidth * 1e3)
+
+
+def _default_operation_overheads() -> Dict[str, float]:
+    overheads = {instruction.value: 0.3 for instruction in Instruction}
+    overheads.update(
+        {
+            Instruction.nop.value: 0.02,
+            Instruction.barrier.value: 0.5,
+            Instruction.signal.value: 0.2,
+            Instruction.relaxed_signal.value: 0.1,
+            Instruction.wait.value: 0.2,
+            Instruction.relaxed_wait.value: 0.1,
+            Instruction.sem_acquire.value: 0.2,
+            Instruction.sem_release.value: 0.2,
+            Instruction.flush.value: 0.5,
+            Instruction.put_with_signal.value: 0.4,
+            Instruction.put_with_signal_and_flush.value: 0.5,
+        }
+    )
+    return overheads
+
+
+@dataclass
+class HardwareModel:
+    """Model of the GPUs and links a plan runs on.
+
+    The defaults roughly describe a node of eight H100 GPUs connected by NVSwitch, with one
+    400 Gb/s InfiniBand NIC per GPU.
+
+    Attributes:
+        gpus_per_node (int): Ranks per node. Ranks ``r`` and ``p`` share a node if
+            ``r // gpus_per_node == p // gpus_per_node``.
+        nvlink (LinkModel): Link between the GPUs of a node, used by memory channels and by port
+            channels within a node. The bandwidth is the total NVLink bandwidth of a GPU.
+        network (LinkModel): Link between nodes, used by port channels across nodes.
+        nvls (LinkModel): NVLink SHARP multimem operations of switch channels.
+        memory (LinkModel): Local memory of a GPU.
+        threadblock_bandwidth (float): Bandwidth in GB/s one thread block reaches on its own.
+            Thread blocks of a rank share the bandwidth of the links they use.
+        operation_overheads (Dict[str, float]): Fixed time in microseconds of each operation,
+            keyed by the operation name of the plan.
+        packet_efficiency (float): Fraction of the bytes of a packet that carry data, 0.5 for the
+            LL protocol where each 8 bytes of data come with 8 bytes of flags.
+        kernel_launch (float): Time in microseconds to launch the kernel, added once.
+    """
+
+    gpus_per_node: int = 8
+    nvlink: LinkModel = field(default_factory=lambda: LinkModel(bandwidth=360.0, latency=0.8))
+    network: LinkModel = field(default_factory=lambda: LinkModel(bandwidth=45.0, latency=4.0))
+    nvls: LinkModel = field(default_factory=lambda: LinkModel(bandwidth=360.0, latency=1.5))
+    memory: LinkModel = field(default_factory=lambda: LinkModel(bandwidth=2500.0))
+    threadblock_bandwidth: float = 60.0
+    operation_overheads: Dict[str, float] = field(default_factory=_default_operation_overheads)
+    packet_efficiency: float = 0.5
+    kernel_launch: float = 4.0
+
+
+@dataclass(frozen=True)
+class CostStep:
+    """One operation on the critical path of a plan.
+
+    Attributes:
+        rank (int): The rank running the operation.
+        threadblock (int): The thread block running the operation.
+        operation (str): The operation name, as in the plan.
+        start (float): Start time in microseconds, after the kernel launch.
+        end (float): End time in microseconds, after the kernel launch.
+    """
+
+    rank: int
+    threadblock: int
+    operation: str
+    start: float
+    end: float
+
+
+@dataclass
+class CostEstimate:
+    """Estimated execution of a plan for one message size.
+
+    Attributes:
+        message_size (int): The size of the input buffer of each rank, in bytes.
+        time (float): Estimated end-to-end time in microseconds, kernel launch included.
+        rank_times (List[float]): Time in microseconds at which each rank finishes.
+        critical_path (List[CostStep]): The chain of operations, across thread blocks and ranks,
+            that determines ``time``, in execution order.
+    """
+
+    message_size: int
+    time: float
+    rank_times: List[float]
+    critical_path: List[CostStep]
+
+
+_PACKET_READS = {
+    Instruction.unpack_packet.value: 0,
+    Instruction.read_put_packet.value: 0,
+    Instruction.reduce_packet.value: 1,
+    Instruction.reduce_copy_packet.value: 1,
+    Instruction.reduce_send_packet.value: 1,
+    Instruction.reduce_copy_send_packet.value: 1,
+}
+_PACKET_WRITES = {
+    Instruction.copy_packet.value,
+    Instruction.put_packet.value,
+    Instruction.read_put_packet.value,
+    Instruction.reduce_copy_packet.value,
+    Instruction.reduce_send_packet.value,
+    Instruction.reduce_copy_send_packet.value,
+}
+_SIGNALS = {Instruction.signal.value, Instruction.relaxed_signal.value}
+_WAITS = {Instruction.wait.value, Instruction.relaxed_wait.value}
+_PUTS_WITH_SIGNAL = {Instruction.put_with_signal.value, Instruction.put_with_signal_and_flush.value}
+
+
+def load_plan(plan: Union[CollectiveProgram, dict, str, os.PathLike]) -> dict:
+    """Return the whole-world JSON plan of ``plan`` with one section per GPU and thread block.
+
+    Args:
+        plan (Union[CollectiveProgram, dict, str, os.PathLike]): A program, a plan in the
+            structure of its JSON form, or the path of a JSON plan.
+
+    Returns:
+        dict: The plan, with compact instances and rank templates expanded.
+
+    Raises:
+        ValueError: If ``plan`` is a binary plan or a rank-scoped plan.
+    """
+    if isinstance(plan, CollectiveProgram):
+        plan = json.loads(plan.to_json(indent=None))
+    elif not isinstance(plan, dict):
+        if is_binary_plan(plan):
+            raise ValueError(f"Cannot estimate the binary plan {plan}, estimate its JSON plan instead")
+        with open(plan) as f:
+            plan = json.load(f)
+    if plan.get("rank_scope") is not None:
+        raise ValueError("Cannot estimate a rank-scoped plan, estimate the whole-world plan instead")
+    return expand_rank_templates(expand_instances(plan))
+
+
+def _chunk_bytes(plan: dict, gpu: dict, message_size: int) -> int:
+    alignment = plan.get("buffer_alignment", 16)
+    chunks = gpu["input_chunks"] or gpu["output_chunks"]
+    if chunks == 0:
+        return 0
+    return -(-(message_size // alignment) // chunks) * alignment
+
+
+def _buffers(operation: dict) -> List[dict]:
+    """Return the buffers an operation reads or writes, switch channel buffers included."""
+    buffers = operation.get("src_buff", []) + operation.get("dst_buff", [])
+    for name in ("src_chunk", "dst_chunk"):
+        if name in operation:
+            switch_buffer = {"switch_channel_id": operation["channel_ids"][0], "size": operation["size"]}
+            buffers = buffers + [operation[name], switch_buffer]
+    return buffers
+
+
+def _channel_type(operation: dict) -> str:
+    # The executor resolves remote buffers through the channel type of the operation.
+    if "channel_type" not in operation:
+        raise ValueError(f"Operation {operation['name']} accesses a remote buffer without a channel type.")
+    return operation["channel_type"]
+
+
+class _Event:
+    __slots__ = ("rank", "tb", "operation", "start", "end", "cause")
+
+    def __init__(self, rank: int, tb: int, operation: str, start: float, end: float, cause: "_Event"):
+        self.rank = rank
+        self.tb = tb
+        self.operation = operation
+        self.start = start
+        self.end = end
+        self.cause = cause
+
+
+class _ThreadBlock:
+    __slots__ = (
+        "rank",
+        "id",
+        "steps",
+        "position",
+        "time",
+        "last",
+        "channels",
+        "remote_buffers",
+        "blocked",
+        "skip_packets",
+    )
+
+    def __init__(self, rank: int, threadblock: dict, steps: list):
+        self.rank = rank
+        self.id = threadblock["id"]
+        self.steps = steps
+        self.position = 0
+        self.time = 0.0
+        self.last = None
+        self.channels = {channel["channel_type"]: channel["channel_ids"] for channel in threadblock["channels"]}
+        self.remote_buffers = {
+            refs["access_channel_type"]: refs["remote_buffer_ids"] for refs in threadblock["remote_buffer_refs"]
+        }
+        self.blocked = None
+        self.skip_packets = False
+
+
+def _steps(operations: List[dict], chunk_bytes: int) -> list:
+    """Flatten the operations of a thread block into ``(operation, bytes of chunk)`` steps.
+
+    Pipelines are unrolled: each iteration runs the pipelined operations on one unit of data.
+    """
+    steps = []
+    for operation in operations:
+        if operation["name"] == Instruction.pipeline.value:
+            unit_size = operation["iter_context"]["unit_size"]
+            total_size = operation["iter_context"]["num_chunks"] * chunk_bytes
+            for offset in range(0, total_size, max(unit_size, 1)):
+                for step_operation, _ in _steps(operation["ops"], chunk_bytes):
+                    steps.append((step_operation, (offset, unit_size)))
+        else:
+            steps.append((operation, None))
+    return steps
+
+
+class _Simulation:
+    def __init__(self, plan: dict, message_size: int, hardware: HardwareModel):
+        self.plan = plan
+        self.hardware = hardware
+        self.gpus = plan["gpus"]
+        self.chunk_bytes = [_chunk_bytes(plan, gpu, message_size) for gpu in self.gpus]
+        self.threadblocks = [
+            [
+                _ThreadBlock(gpu["id"], threadblock, _steps(threadblock["ops"], self.chunk_bytes[gpu["id"]]))
+                for threadblock in gpu["threadblocks"]
+            ]
+            for gpu in self.gpus
+        ]
+        self.channel_keys = [self._channel_keys(gpu) for gpu in self.gpus]
+        self.semaphore_values = [[semaphore["init_value"] for semaphore in gpu["semaphores"]] for gpu in self.gpus]
+        self.link_users = [self._link_users(rank) for rank in range(len(self.gpus))]
+
+        self.signals = defaultdict(list)
+        self.waits = defaultdict(int)
+        self.releases = defaultdict(list)
+        self.acquires = defaultdict(int)
+        self.barriers = defaultdict(dict)
+        self.barrier_counts = defaultdict(int)
+        self.packets = {}
+        self.pending_transfers = defaultdict(lambda: None)
+        self.nic_free = defaultdict(float)
+        self.waiters = defaultdict(list)
+        self.ready = []
+        self.sequence = 0
+
+    def _channel_keys(self, gpu: dict) -> Dict[str, List[tuple]]:
+        keys = {}
+        for channel in gpu["channels"]:
+            if channel["channel_type"] == ChannelType.switch.value:
+                continue
+            counts = defaultdict(int)
+            keys[channel["channel_type"]] = []
+            for peer in channel["connected_to"]:
+                keys[channel["channel_type"]].append((gpu["id"], peer, channel["channel_type"], counts[peer]))
+                counts[peer] += 1
+        return keys
+
+    def _link_users(self, rank: int) -> Dict[str, int]:
+        # The number of thread blocks of the rank moving data over each link, which share it.
+        users = defaultdict(int)
+        for tb in self.threadblocks[rank]:
+            links = set()
+            for operation, _ in tb.steps:
+                for buffer in _buffers(operation):
+                    links.add(self._buffer_link(tb, operation, buffer)[0])
+            for link in links:
+                users[link] += 1
+        return users
+
+    def _node(self, rank: int) -> int:
+        return rank // self.hardware.gpus_per_node
+
+    def _remote_rank(self, tb: _ThreadBlock, operation: dict, buffer: dict) -> int:
+        remote_buffer_id = tb.remote_buffers[_channel_type(operation)][buffer["buffer_id"]]
+        return self.gpus[tb.rank]["remote_buffers"][remote_buffer_id]["rank"]
+
+    def _buffer_link(self, tb: _ThreadBlock, operation: dict, buffer: dict):
+        """Return the name and model of the link an operation uses to access a buffer."""
+        if "switch_channel_id" in buffer:
+            return "nvls", self.hardware.nvls
+        if "buffer_id" not in buffer:
+            return "memory", self.hardware.memory
+        if _channel_type(operation) == ChannelType.port.value and self._node(
+            self._remote_rank(tb, operation, buffer)
+        ) != self._node(tb.rank):
+            return "network", self.hardware.network
+        return "nvlink", self.hardware.nvlink
+
+    def _link_latency(self, tb: _ThreadBlock, key: tuple) -> float:
+        if key[2] == ChannelType.port.value and self._node(key[0]) != self._node(key[1]):
+            return self.hardware.network.latency
+        return self.hardware.nvlink.latency
+
+    def _buffer_bytes(self, tb: _ThreadBlock, operation: dict, buffer: dict, unit) -> float:
+        num_bytes = buffer.get("size", 1) * self.chunk_bytes[tb.rank]
+        if unit is not None:
+            offset, unit_size = unit
+            num_bytes = max(min(num_bytes - offset, unit_size), 0)
+        if "tbg_info" in operation:
+            num_bytes /= operation["tbg_info"]["tbg_size"]
+        if operation["name"] in _PACKET_WRITES or operation["name"] in _PACKET_READS:
+            num_bytes /= self.hardware.packet_efficiency
+        return num_bytes
+
+    def _transfer_time(self, tb: _ThreadBlock, operation: dict, unit) -> float:
+        link_bytes = defaultdict(float)
+        links = {}
+        for buffer in _buffers(operation):
+            name, link = self._buffer_link(tb, operation, buffer)
+            links[name] = link
+            link_bytes[name] += self._buffer_bytes(tb, operation, buffer, unit)
+        time = 0.0
+        for name, num_bytes in link_bytes.items():
+            bandwidth = min(self.hardware.threadblock_bandwidth, links[name].bandwidth / self.link_users[tb.rank][name])
+            time = max(time, LinkModel(bandwidth).transfer_time(num_bytes))
+        return time
+
+    def _keys(self, tb: _ThreadBlock, operation: dict) -> List[tuple]:
+        channel_type = operation["channel_type"]
+        channel_ids = tb.channels.get(channel_type, [])
+        return [self.channel_keys[tb.rank][channel_type][channel_ids[id]] for id in operation["channel_ids"]]
+
+    def _packet_keys(self, tb: _ThreadBlock, operation: dict):
+        first = _PACKET_READS[operation["name"]]
+        for buffer in operation.get("src_buff", [])[first:]:
+            if buffer.get("type") == BufferType.scratch.value:
+                for index in range(buffer["index"], buffer["index"] + buffer.get("size", 1)):
+                    yield ("packet", tb.rank, index)
+
+    def _written_packets(self, tb: _ThreadBlock, operation: dict):
+        for buffer in operation.get("dst_buff", []):
+            if "buffer_id" in buffer:
+                rank = self._remote_rank(tb, operation, buffer)
+                remote_buffer_id = tb.remote_buffers[_channel_type(operation)][buffer["buffer_id"]]
+                if self.gpus[tb.rank]["remote_buffers"][remote_buffer_id]["type"] != BufferType.scratch.value:
+                    continue
+            elif buffer.get("type") == BufferType.scratch.value:
+                rank = tb.rank
+            else:
+                continue
+            for index in range(buffer["index"], buffer["index"] + buffer.get("size", 1)):
+                yield ("packet", rank, index), rank
+
+    def _schedule(self, tb: _ThreadBlock):
+        self.sequence += 1
+        heapq.heappush(self.ready, (tb.time, self.sequence, tb))
+
+    def _block(self, tb: _ThreadBlock, key):
+        tb.blocked = key
+        self.waiters[key].append(tb)
+
+    def _finish(self, tb: _ThreadBlock, operation: dict, start: float, end: float, cause: _Event) -> _Event:
+        event = _Event(tb.rank, tb.id, operation["name"], start, end, cause)
+        tb.time = end
+        tb.last = event
+        tb.position += 1
+        self._schedule(tb)
+        return event
+
+    def _after(self, tb: _ThreadBlock, dependencies) -> tuple:
+        """Return the start time of an operation and the event it waited for last."""
+        start, cause = tb.time, tb.last
+        for time, event in dependencies:
+            if time > start:
+                start, cause = time, event
+        return start, cause
+
+    def _step(self, tb: _ThreadBlock):
+        operation, unit = tb.steps[tb.position]
+        name = operation["name"]
+        overhead = self.hardware.operation_overheads.get(name, 0.0)
+
+        if name in _WAITS:
+            dependencies = []
+            for key in self._keys(tb, operation):
+                peer_key = (key[1], key[0], key[2], key[3])
+                if len(self.signals[peer_key]) <= self.waits[key]:
+                    self._block(tb, ("signal", peer_key))
+                    return
+                dependencies.append(self.signals[peer_key][self.waits[key]])
+            for key in self._keys(tb, operation):
+                self.waits[key] += 1
+            start, cause = self._after(tb, dependencies)
+            self._finish(tb, operation, start, start + overhead, cause)
+        elif name == Instruction.sem_acquire.value:
+            dependencies = []
+            for semaphore_id in operation["semaphore_ids"]:
+                key = (tb.rank, semaphore_id)
+                needed = self.acquires[key] - self.semaphore_values[tb.rank][semaphore_id]
+                if needed >= 0:
+                    if len(self.releases[key]) <= needed:
+                        self._block(tb, ("release", key))
+                        return
+                    dependencies.append(self.releases[key][needed])
+            for semaphore_id in operation["semaphore_ids"]:
+                self.acquires[(tb.rank, semaphore_id)] += 1
+            start, cause = self._after(tb, dependencies)
+            self._finish(tb, operation, start, start + overhead, cause)
+        elif name == Instruction.barrier.value:
+            key = (tb.rank, operation["barrier_id"])
+            occurrence = (key, self.barrier_counts[(key, tb.id)])
+            self.barriers[occurrence].setdefault(tb.id, (tb.time, tb.last))
+            if len(self.barriers[occurrence]) < operation["num_threadblocks"]:
+                self._block(tb, ("barrier", occurrence))
+                return
+            self.barrier_counts[(key, tb.id)] += 1
+            start, cause = self._after(tb, self.barriers[occurrence].values())
+            self._finish(tb, operation, start, start + overhead, cause)
+            for waiter in self.waiters.pop(("barrier", occurrence), []):
+                waiter.blocked = None
+                self._schedule(waiter)
+        elif name in _PACKET_READS and not tb.skip_packets:
+            dependencies = []
+            for key in self._packet_keys(tb, operation):
+                if key not in self.packets:
+                    self._block(tb, key)
+                    return
+                dependencies.append(self.packets[key])
+            self._run(tb, operation, unit, overhead, dependencies)
+        else:
+            self._run(tb, operation, unit, overhead, [])
+
+    def _run(self, tb: _ThreadBlock, operation: dict, unit, overhead: float, dependencies):
+        name = operation["name"]
+        tb.skip_packets = False
+        start, cause = self._after(tb, dependencies)
+        channel_type = operation.get("channel_type")
+
+        if name == Instruction.flush.value:
+            pending = [self.pending_transfers[key] for key in self._keys(tb, operation)]
+            start, cause = self._after(tb, [transfer for transfer in pending if transfer is not None] + dependencies)
+            self._finish(tb, operation, start, start + overhead, cause)
+            return
+        if name in _SIGNALS or name == Instruction.sem_release.value:
+            event = self._finish(tb, operation, start, start + overhead, cause)
+            if name == Instruction.sem_release.value:
+                for semaphore_id in operation["semaphore_ids"]:
+                    key = (tb.rank, semaphore_id)
+                    self.releases[key].append((event.end, event))
+                    self._wake(("release", key))
+                return
+            for key in self._keys(tb, operation):
+                arrival = event.end
+                if channel_type == ChannelType.port.value and self.pending_transfers[key] is not None:
+                    # Port signals are delivered after the transfers queued before them.
+                    arrival = max(arrival, self.pending_transfers[key][0])
+                self.signals[key].append((arrival + self._link_latency(tb, key), event))
+                self._wake(("signal", key))
+            return
+
+        transfer_time = self._transfer_time(tb, operation, unit)
+        if channel_type == ChannelType.port.value and name not in _PACKET_READS:
+            # Port transfers are run by the proxy and serialized on the link of the rank.
+            keys = self._keys(tb, operation)
+            link = "network" if any(self._node(key[1]) != self._node(tb.rank) for key in keys) else "nvlink"
+            transfer_start = max(start + overhead, self.nic_free[(tb.rank, link)])
+            transfer_end = transfer_start + transfer_time
+            self.nic_free[(tb.rank, link)] = transfer_end
+            end = start + overhead
+            if name == Instruction.put_with_signal_and_flush.value:
+                end = transfer_end
+            event = self._finish(tb, operation, start, end, cause)
+            for key in keys:
+                self.pending_transfers[key] = (transfer_end, event)
+                if name in _PUTS_WITH_SIGNAL:
+                    self.signals[key].append((transfer_end + self._link_latency(tb, key), event))
+                    self._wake(("signal", key))
+            if name in _PACKET_WRITES:
+                for key, rank in self._written_packets(tb, operation):
+                    self.packets[key] = (transfer_end + self._link_latency(tb, keys[0]), event)
+                    self._wake(key)
+            return
+
+        event = self._finish(tb, operation, start, start + overhead + transfer_time, cause)
+        if name in _PACKET_WRITES:
+            for key, rank in self._written_packets(tb, operation):
+                latency = 0.0 if rank == tb.rank else self.hardware.nvlink.latency
+                self.packets[key] = (event.end + latency, event)
+                self._wake(key)
+
+    def _wake(self, key):
+        for tb in self.waiters.pop(key, []):
+            tb.blocked = None
+            self._schedule(tb)
+
+    def run(self) -> List[_Event]:
+        for rank_threadblocks in self.threadblocks:
+            for tb in rank_threadblocks:
+                self._schedule(tb)
+        while True:
+            while self.ready:
+                _, _, tb = heapq.heappop(self.ready)
+                if tb.blocked is None and tb.position < len(tb.steps):
+                    self._step(tb)
+            blocked = [tb for tbs in self.threadblocks for tb in tbs if tb.position < len(tb.steps)]
+            if len(blocked) == 0:
+                break
+            packet_readers = [tb for tb in blocked if tb.blocked[0] == "packet"]
+            if len(packet_readers) == 0:
+                tb = blocked[0]
+                raise RuntimeError(
+                    f"Operation {tb.steps[tb.position][0]['name']} of thread block {tb.id} on rank {tb.rank} "
+                    f"never completes, the plan deadlocks"
+                )
+            # Packets never written in this execution were written by an earlier one.
+            for tb in packet_readers:
+                self.waiters[tb.blocked].remove(tb)
+                tb.blocked = None
+                tb.skip_packets = True
+                self._schedule(tb)
+        return [tb.last for tbs in self.threadblocks for tb in tbs]
+
+
+def estimate_time(
+    plan: Union[CollectiveProgram, dict, str, os.PathLike], message_size: int, hardware: HardwareModel = None
+) -> CostEstimate:
+    """Estimate the execution time of a plan for one message size.
+
+    Args:
+        plan (Union[CollectiveProgram, dict, str, os.PathLike]): The plan, see ``load_plan``.
+        message_size (int): The size of the input buffer of each rank in bytes, or of the output
+            buffer for plans without input chunks, as passed to the executor.
+        hardware (HardwareModel, optional): The hardware to estimate for. Defaults to
+            ``HardwareModel()``.
+
+    Returns:
+        CostEstimate: The estimated time and its critical path.
+
+    Raises:
+        RuntimeError: If a wait, acquire or barrier of the plan can never complete.
+        ValueError: If an operation accesses a remote buffer without a channel type, which the
+            executor cannot load.
+    """
+    hardware = hardware if hardware is not None else HardwareModel()
+    simulation = _Simulation(load_plan(plan), message_size, hardware)
+    last_events = simulation.run()
+
+    rank_times = [0.0] * len(simulation.gpus)
+    for event in last_events:
+        if event is not None:
+            rank_times[event.rank] = max(rank_times[event.rank], event.end)
+    critical_path = []
+    event = max((event for event in last_events if event is not None), key=lambda event: event.end, default=None)
+    while event is not None:
+        critical_path.append(CostStep(event.rank, event.tb, event.operation, event.start, event.end))
+        event = event.cause
+    critical_path.reverse()
+    return CostEstimate(
+        message_size=message_size,
+        time=hardware.kernel_launch + max(rank_times, default=0.0),
+        rank_times=rank_times,
+        critical_path=critical_path,
+    )
+
+
+def estimate_times(
+    plan: Union[CollectiveProgram, dict, str, os.PathLike], message_sizes: List[int], hardware: HardwareModel = None
+) -> Dict[int, float]:
+    """Estimate the execution time of a plan for several message sizes.
+
+    Args:
+        plan (Union[CollectiveProgram, dict, str, os.PathLike]): The plan, see ``load_plan``.
+        message_sizes (List[int]): The message sizes in bytes, see ``estimate_time``.
+        hardware (HardwareModel, optional): The hardware to estimate for. Defaults to
+            ``HardwareModel()``.
+
+    Returns:
+        Dict[int, float]: The estimated time in microseconds of each message size.
+    """
+    plan = load_plan(plan)
+    return {size: estimate_time(plan, size, hardware).time for size in message_sizes}
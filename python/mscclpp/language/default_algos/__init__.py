@@ -2,5 +2,20 @@
 # Licensed under the MIT License.
 
 from mscclpp.language.default_algos.allreduce_2nodes import allreduce_2nodes
+from mscclpp.language.default_algos.allreduce_hierarchical import allreduce_hierarchical
+from mscclpp.language.default_algos.alltoall import alltoall_hierarchical, alltoall_pairwise, alltoall_pipelined
+from mscclpp.language.default_algos.ring import allgather_ring, allreduce_ring, reducescatter_ring
+from mscclpp.language.default_algos.tree import allreduce_binary_tree, allreduce_double_binary_tree
 
-__all__ = ["allreduce_2nodes"]
+__all__ = [
+    "allgather_ring",
+    "allreduce_2nodes",
+    "allreduce_binary_tree",
+    "allreduce_double_binary_tree",
+    "allreduce_hierarchical",
+    "allreduce_ring",
+    "alltoall_hierarchical",
+    "alltoall_pairwise",
+    "alltoall_pipelined",
+    "reducescatter_ring",
+]
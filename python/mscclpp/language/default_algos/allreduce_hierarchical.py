@@ -0,0 +1,461 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+"""
+Hierarchical AllReduce for any number of nodes and ranks per node.
+The input is reduce-scattered within each node, the slice of each rank is
+allreduced with the ranks of the same local index on the other nodes, and
+the reduced slices are allgathered within each node again.
+"""
+
+from mscclpp.language.utils import AlgoSpec
+from mscclpp.language.channel import *
+from mscclpp.language.rank import *
+from mscclpp.language.general import *
+from mscclpp.language.program import *
+from mscclpp.language.collectives import *
+from mscclpp.language.internal.operations import MAX_BUFFER_PER_OPERATION
+
+# Fused operations of the executor drive at most 8 channels, so each thread block drives the
+# port channels of at most 8 peer nodes.
+_PORT_PEERS_PER_TB = 8
+
+
+def allreduce_hierarchical(
+    spec: AlgoSpec, thread_block_group_size: int = 1, use_nvls: bool = False
+) -> CollectiveProgram:
+    """
+    Implements a multi-node AllReduce in three steps:
+    1. Intra-node reduce-scatter over memory channels, or NVLS with ``use_nvls``:
+       local rank g reduces slice g of the input, made of one part per node
+    2. Inter-node allreduce of each slice over port channels: the rank on node n
+       reduces part n of its slice with the ranks of the same local index on the
+       other nodes, and sends the result back to them
+    3. Intra-node allgather of the reduced slices
+
+    With the LL protocol all data is exchanged as packets, which synchronize by
+    themselves. With the Simple protocol data is read and written in place, and
+    the steps are ordered with signals, waits and barriers.
+
+    Args:
+        spec (AlgoSpec): The spec of the program. ``world_size`` must be a multiple of
+            ``nranks_per_node`` and the collective an AllReduce over ``world_size`` ranks.
+        thread_block_group_size (int, optional): Thread blocks moving the data of each
+            intra-node peer. Defaults to 1.
+        use_nvls (bool, optional): Reduce and broadcast within nodes through NVLS, only
+            with the Simple protocol. Defaults to False.
+
+    Raises:
+        RuntimeError: If the spec does not describe an AllReduce over whole nodes, or if
+            NVLS is requested with the LL protocol.
+    """
+    gpus_per_node = spec.nranks_per_node
+    total_gpus = spec.world_size
+    if total_gpus % gpus_per_node != 0:
+        raise RuntimeError(f"World size {total_gpus} is not a multiple of the {gpus_per_node} ranks per node.")
+    if spec.collective.name != "allreduce" or spec.collective.num_ranks != total_gpus:
+        raise RuntimeError(f"Expected an AllReduce over {total_gpus} ranks.")
+    if spec.protocol not in ("LL", "Simple"):
+        raise RuntimeError(f"Unsupported protocol {spec.protocol}.")
+    if use_nvls and spec.protocol == "LL":
+        raise RuntimeError("NVLS is only supported with the Simple protocol.")
+    num_nodes = total_gpus // gpus_per_node
+    # Part m of slice g holds the chunks local rank g reduces with node m.
+    part_size = spec.collective.chunk_factor
+    slice_size = num_nodes * part_size
+
+    with CollectiveProgram.from_spec(spec) as prog:
+        # The first thread blocks drive the port channels and handshakes, the others move the data.
+        num_port_tbs = max((num_nodes - 2) // _PORT_PEERS_PER_TB + 1, 1)
+        num_peer_groups = max(gpus_per_node - 1, 1)
+        data_tbs = [num_port_tbs + i for i in range(num_peer_groups * thread_block_group_size)]
+        all_tbs = list(range(num_port_tbs)) + data_tbs
+        global_tbg = ThreadBlockGroup(tb_list=data_tbs)
+        peer_tbgs = [
+            ThreadBlockGroup(tb_list=data_tbs[i * thread_block_group_size : (i + 1) * thread_block_group_size])
+            for i in range(num_peer_groups)
+        ]
+
+        def rank_id(node, local_gpu):
+            return local_gpu + gpus_per_node * node
+
+        def peer_tbg(local_gpu, peer_gpu):
+            return peer_tbgs[peer_gpu if peer_gpu < local_gpu else peer_gpu - 1]
+
+        def port_tb(node, peer_node):
+            return (peer_node if peer_node < node else peer_node - 1) // _PORT_PEERS_PER_TB
+
+        memory_channels = {}
+        port_channels = {}
+        switch_channels = {}
+        for node in range(num_nodes):
+            if use_nvls:
+                switch_channels[node] = SwitchChannel(
+                    rank_list=[rank_id(node, gpu) for gpu in range(gpus_per_node)], buffer_type=BufferType.input
+                )
+            for local_gpu in range(gpus_per_node):
+                current_rank_id = rank_id(node, local_gpu)
+                for peer_gpu in range(gpus_per_node):
+                    if peer_gpu != local_gpu:
+                        peer_rank_id = rank_id(node, peer_gpu)
+                        memory_channels[(peer_rank_id, current_rank_id)] = MemoryChannel(peer_rank_id, current_rank_id)
+                for peer_node in range(num_nodes):
+                    if peer_node != node:
+                        peer_rank_id = rank_id(peer_node, local_gpu)
+                        port_channels[(peer_rank_id, current_rank_id)] = PortChannel(peer_rank_id, current_rank_id)
+
+        if spec.protocol == "LL":
+            _allreduce_packets(
+                num_nodes,
+                gpus_per_node,
+                part_size,
+                slice_size,
+                rank_id,
+                memory_channels,
+                port_channels,
+                global_tbg,
+                peer_tbg,
+                port_tb,
+                all_tbs,
+            )
+        else:
+            _allreduce_simple(
+                num_nodes,
+                gpus_per_node,
+                part_size,
+                slice_size,
+                rank_id,
+                memory_channels,
+                port_channels,
+                switch_channels,
+                global_tbg,
+                data_tbs,
+                port_tb,
+                all_tbs,
+            )
+
+    return prog
+
+
+def _reduce_parts(rank, chunk, parts, **kwargs):
+    # The executor loads at most MAX_BUFFER_PER_OPERATION sources per operation and a reduction
+    # also reads the chunk it reduces into, so the parts of many nodes are reduced in groups.
+    max_parts = MAX_BUFFER_PER_OPERATION - 1
+    for first_part in range(0, len(parts), max_parts):
+        rank.reduce(chunk, parts[first_part : first_part + max_parts], **kwargs)
+
+
+def _allreduce_packets(
+    num_nodes,
+    gpus_per_node,
+    part_size,
+    slice_size,
+    rank_id,
+    memory_channels,
+    port_channels,
+    global_tbg,
+    peer_tbg,
+    port_tb,
+    all_tbs,
+):
+    # Scratch layout, each region written once per execution:
+    # - reduce_scatter_offset: slice of the rank sent by each local peer
+    # - local_slice_offset: the slice reduced within the node, as packets for the port channels
+    # - inter_node_offset: part of the slice sent by each other node
+    # - allgather_offset: the reduced slice, each part sent by the node reducing it
+    # - broadcast_offset: reduced slice of each local peer
+    reduce_scatter_offset = 0
+    local_slice_offset = reduce_scatter_offset + gpus_per_node * slice_size
+    inter_node_offset = local_slice_offset + slice_size
+    allgather_offset = inter_node_offset + num_nodes * part_size
+    broadcast_offset = allgather_offset + slice_size
+    scratch_buffer_size = broadcast_offset + gpus_per_node * slice_size
+    scratch_buffers = [Buffer(rank, scratch_buffer_size) for rank in range(num_nodes * gpus_per_node)]
+
+    for node in range(num_nodes):
+        for local_gpu in range(gpus_per_node):
+            current_rank_id = rank_id(node, local_gpu)
+            current_rank = Rank(current_rank_id)
+            input_buffer = current_rank.get_input_buffer()
+            scratch_buffer = scratch_buffers[current_rank_id]
+            local_slice = input_buffer[local_gpu * slice_size : (local_gpu + 1) * slice_size]
+            local_part_index = local_gpu * slice_size + node * part_size
+            local_part = input_buffer[local_part_index : local_part_index + part_size]
+            reduced_part = scratch_buffer[
+                allgather_offset + node * part_size : allgather_offset + (node + 1) * part_size
+            ]
+
+            # Intra Node Reduce Scatter
+            for peer_gpu in range(gpus_per_node):
+                if peer_gpu != local_gpu:
+                    peer_rank_id = rank_id(node, peer_gpu)
+                    memory_channels[(peer_rank_id, current_rank_id)].put_packets(
+                        scratch_buffers[peer_rank_id][
+                            reduce_scatter_offset
+                            + local_gpu * slice_size : reduce_scatter_offset
+                            + (local_gpu + 1) * slice_size
+                        ],
+                        input_buffer[peer_gpu * slice_size : (peer_gpu + 1) * slice_size],
+                        tb_group=peer_tbg(local_gpu, peer_gpu),
+                    )
+            if gpus_per_node > 1:
+                current_rank.reduce(
+                    local_slice,
+                    [
+                        scratch_buffer[
+                            reduce_scatter_offset
+                            + peer_gpu * slice_size : reduce_scatter_offset
+                            + (peer_gpu + 1) * slice_size
+                        ]
+                        for peer_gpu in range(gpus_per_node)
+                        if peer_gpu != local_gpu
+                    ],
+                    tb_group=global_tbg,
+                    packet=True,
+                )
+
+            # Inter Node AllReduce of the Slice
+            if num_nodes > 1:
+                current_rank.copy_packets(
+                    scratch_buffer[local_slice_offset : local_slice_offset + slice_size],
+                    local_slice,
+                    tb_group=global_tbg,
+                )
+                current_rank.barrier(tb_list=all_tbs)
+                for peer_node in range(num_nodes):
+                    if peer_node != node:
+                        peer_rank_id = rank_id(peer_node, local_gpu)
+                        port_channels[(peer_rank_id, current_rank_id)].put_packets(
+                            scratch_buffers[peer_rank_id][
+                                inter_node_offset + node * part_size : inter_node_offset + (node + 1) * part_size
+                            ],
+                            scratch_buffer[
+                                local_slice_offset
+                                + peer_node * part_size : local_slice_offset
+                                + (peer_node + 1) * part_size
+                            ],
+                            tb=port_tb(node, peer_node),
+                        )
+                _reduce_parts(
+                    current_rank,
+                    local_part,
+                    [
+                        scratch_buffer[
+                            inter_node_offset + peer_node * part_size : inter_node_offset + (peer_node + 1) * part_size
+                        ]
+                        for peer_node in range(num_nodes)
+                        if peer_node != node
+                    ],
+                    tb_group=global_tbg,
+                    packet=True,
+                )
+                current_rank.copy_packets(reduced_part, local_part, tb_group=global_tbg)
+                current_rank.barrier(tb_list=all_tbs)
+                for peer_node in range(num_nodes):
+                    if peer_node != node:
+                        peer_rank_id = rank_id(peer_node, local_gpu)
+                        port_channels[(peer_rank_id, current_rank_id)].put_packets(
+                            scratch_buffers[peer_rank_id][
+                                allgather_offset + node * part_size : allgather_offset + (node + 1) * part_size
+                            ],
+                            reduced_part,
+                            tb=port_tb(node, peer_node),
+                        )
+                for peer_node in range(num_nodes):
+                    if peer_node != node:
+                        peer_part_index = local_gpu * slice_size + peer_node * part_size
+                        current_rank.unpack_packets(
+                            input_buffer[peer_part_index : peer_part_index + part_size],
+                            scratch_buffer[
+                                allgather_offset
+                                + peer_node * part_size : allgather_offset
+                                + (peer_node + 1) * part_size
+                            ],
+                            tb_group=global_tbg,
+                        )
+            else:
+                current_rank.copy_packets(
+                    scratch_buffer[allgather_offset : allgather_offset + slice_size], local_slice, tb_group=global_tbg
+                )
+
+            # Intra Node AllGather, forwarding the packets of the reduced slice as they arrive
+            for peer_gpu in range(gpus_per_node):
+                if peer_gpu != local_gpu:
+                    peer_rank_id = rank_id(node, peer_gpu)
+                    memory_channels[(peer_rank_id, current_rank_id)].read_put_packets(
+                        scratch_buffers[peer_rank_id][
+                            broadcast_offset + local_gpu * slice_size : broadcast_offset + (local_gpu + 1) * slice_size
+                        ],
+                        scratch_buffer[allgather_offset : allgather_offset + slice_size],
+                        tb_group=peer_tbg(local_gpu, peer_gpu),
+                    )
+            for peer_gpu in range(gpus_per_node):
+                if peer_gpu != local_gpu:
+                    current_rank.unpack_packets(
+                        input_buffer[peer_gpu * slice_size : (peer_gpu + 1) * slice_size],
+                        scratch_buffer[
+                            broadcast_offset + peer_gpu * slice_size : broadcast_offset + (peer_gpu + 1) * slice_size
+                        ],
+                        tb_group=peer_tbg(local_gpu, peer_gpu),
+                    )
+
+
+def _allreduce_simple(
+    num_nodes,
+    gpus_per_node,
+    part_size,
+    slice_size,
+    rank_id,
+    memory_channels,
+    port_channels,
+    switch_channels,
+    global_tbg,
+    data_tbs,
+    port_tb,
+    all_tbs,
+):
+    # Parts sent by the other nodes are reduced from the scratch buffer.
+    scratch_buffers = [Buffer(rank, num_nodes * part_size) for rank in range(num_nodes * gpus_per_node)]
+
+    def for_each_rank(body):
+        for node in range(num_nodes):
+            for local_gpu in range(gpus_per_node):
+                body(node, local_gpu, rank_id(node, local_gpu))
+
+    def peers(node, local_gpu):
+        return [rank_id(node, peer_gpu) for peer_gpu in range(gpus_per_node) if peer_gpu != local_gpu]
+
+    def remote_nodes(node, local_gpu):
+        return [
+            (rank_id(peer_node, local_gpu), port_tb(node, peer_node))
+            for peer_node in range(num_nodes)
+            if peer_node != node
+        ]
+
+    # Ensuring the buffers of all the peers are ready
+    def handshake(node, local_gpu, current_rank_id):
+        for peer_rank_id in peers(node, local_gpu):
+            memory_channels[(peer_rank_id, current_rank_id)].signal(tb=0, relaxed=True)
+        for peer_rank_id, tb in remote_nodes(node, local_gpu):
+            port_channels[(peer_rank_id, current_rank_id)].signal(tb=tb)
+        for peer_rank_id in peers(node, local_gpu):
+            memory_channels[(peer_rank_id, current_rank_id)].wait(tb=0, data_sync=SyncType.after, relaxed=True)
+        for peer_rank_id, tb in remote_nodes(node, local_gpu):
+            port_channels[(peer_rank_id, current_rank_id)].wait(tb=tb, data_sync=SyncType.after)
+        Rank(current_rank_id).barrier(tb_list=all_tbs)
+
+    for_each_rank(handshake)
+
+    # Intra Node Reduce Scatter
+    def reduce_scatter(node, local_gpu, current_rank_id):
+        input_buffer = Rank(current_rank_id).get_input_buffer()
+        slice_index = local_gpu * slice_size
+        if node in switch_channels:
+            for part_node in range(num_nodes):
+                part_index = slice_index + part_node * part_size
+                switch_channels[node].at_rank(current_rank_id).reduce(
+                    buffer_offset=part_index,
+                    size=part_size,
+                    dst_chunk=input_buffer[part_index : part_index + part_size],
+                    tb=data_tbs[part_node % len(data_tbs)],
+                )
+            return
+        for peer_rank_id in peers(node, local_gpu):
+            peer_input_buffer = Rank(peer_rank_id).get_input_buffer()
+            memory_channels[(peer_rank_id, current_rank_id)].reduce(
+                input_buffer[slice_index : slice_index + slice_size],
+                [peer_input_buffer[slice_index : slice_index + slice_size]],
+                tb_group=global_tbg,
+            )
+
+    if gpus_per_node > 1:
+        for_each_rank(reduce_scatter)
+
+    # Inter Node AllReduce of the Slice
+    def inter_node_reduce_scatter(node, local_gpu, current_rank_id):
+        current_rank = Rank(current_rank_id)
+        input_buffer = current_rank.get_input_buffer()
+        scratch_buffer = scratch_buffers[current_rank_id]
+        current_rank.barrier(tb_list=all_tbs)
+        for peer_node in range(num_nodes):
+            if peer_node != node:
+                peer_rank_id = rank_id(peer_node, local_gpu)
+                part_index = local_gpu * slice_size + peer_node * part_size
+                port_channels[(peer_rank_id, current_rank_id)].put_with_signal(
+                    scratch_buffers[peer_rank_id][node * part_size : (node + 1) * part_size],
+                    input_buffer[part_index : part_index + part_size],
+                    tb=port_tb(node, peer_node),
+                )
+        for peer_rank_id, tb in remote_nodes(node, local_gpu):
+            port_channels[(peer_rank_id, current_rank_id)].wait(tb=tb, data_sync=SyncType.after)
+        current_rank.barrier(tb_list=all_tbs)
+        part_index = local_gpu * slice_size + node * part_size
+        _reduce_parts(
+            current_rank,
+            input_buffer[part_index : part_index + part_size],
+            [
+                scratch_buffer[peer_node * part_size : (peer_node + 1) * part_size]
+                for peer_node in range(num_nodes)
+                if peer_node != node
+            ],
+            tb_group=global_tbg,
+        )
+
+    def inter_node_allgather(node, local_gpu, current_rank_id):
+        current_rank = Rank(current_rank_id)
+        input_buffer = current_rank.get_input_buffer()
+        part_index = local_gpu * slice_size + node * part_size
+        current_rank.barrier(tb_list=all_tbs)
+        for peer_node in range(num_nodes):
+            if peer_node != node:
+                peer_rank_id = rank_id(peer_node, local_gpu)
+                peer_input_buffer = Rank(peer_rank_id).get_input_buffer()
+                port_channels[(peer_rank_id, current_rank_id)].put_with_signal(
+                    peer_input_buffer[part_index : part_index + part_size],
+                    input_buffer[part_index : part_index + part_size],
+                    tb=port_tb(node, peer_node),
+                )
+        for peer_rank_id, tb in remote_nodes(node, local_gpu):
+            port_channels[(peer_rank_id, current_rank_id)].wait(tb=tb, data_sync=SyncType.after)
+        for peer_rank_id, tb in remote_nodes(node, local_gpu):
+            port_channels[(peer_rank_id, current_rank_id)].flush(tb=tb)
+        current_rank.barrier(tb_list=all_tbs)
+
+    if num_nodes > 1:
+        for_each_rank(inter_node_reduce_scatter)
+        for_each_rank(inter_node_allgather)
+
+    # Intra Node AllGather
+    def allgather(node, local_gpu, current_rank_id):
+        current_rank = Rank(current_rank_id)
+        input_buffer = current_rank.get_input_buffer()
+        slice_index = local_gpu * slice_size
+        if node in switch_channels:
+            for part_node in range(num_nodes):
+                part_index = slice_index + part_node * part_size
+                switch_channels[node].at_rank(current_rank_id).broadcast(
+                    src_chunk=input_buffer[part_index : part_index + part_size],
+                    buffer_offset=part_index,
+                    size=part_size,
+                    tb=data_tbs[part_node % len(data_tbs)],
+                )
+        else:
+            for peer_rank_id in peers(node, local_gpu):
+                peer_input_buffer = Rank(peer_rank_id).get_input_buffer()
+                memory_channels[(peer_rank_id, current_rank_id)].put(
+                    peer_input_buffer[slice_index : slice_index + slice_size],
+                    input_buffer[slice_index : slice_index + slice_size],
+                    tb_group=global_tbg,
+                )
+        current_rank.barrier(tb_list=all_tbs)
+
+    for_each_rank(allgather)
+
+    # Ensuring all the intranode peers finished the algo
+    def finish(node, local_gpu, current_rank_id):
+        for peer_rank_id in peers(node, local_gpu):
+            memory_channels[(peer_rank_id, current_rank_id)].signal(tb=0, data_sync=SyncType.before, relaxed=True)
+        for peer_rank_id in peers(node, local_gpu):
+            memory_channels[(peer_rank_id, current_rank_id)].wait(tb=0, relaxed=True)
+
+    for_each_rank(finish)
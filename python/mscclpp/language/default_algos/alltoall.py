@@ -0,0 +1,326 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+"""
+AllToAll for any number of ranks, the exchange of the expert layers of mixture
+of experts models. Rank r sends block q of its input, made of ``chunk_factor``
+chunks, to rank q, which stores it as block r of its output, or of its input
+for in-place collectives.
+
+The pairwise exchange pairs up the ranks in each step, so that no rank receives
+from several peers at once. Across nodes, small blocks are aggregated through a
+leader on each node, so that each pair of nodes exchanges one message per
+direction instead of one per pair of ranks.
+"""
+
+from mscclpp.language.utils import AlgoSpec
+from mscclpp.language.channel import *
+from mscclpp.language.rank import *
+from mscclpp.language.general import *
+from mscclpp.language.program import *
+from mscclpp.language.collectives import *
+from mscclpp.language.loop import *
+from mscclpp.language.default_algos.common import check_spec, connect, flush, handshake, send, wait
+
+# Steps of the pairwise exchange run by each thread block, each step taking up to twelve operations.
+_STEPS_PER_TB = 5
+_MAX_THREAD_BLOCKS = 32
+# Nodes each rank gathers blocks for in the hierarchical exchange, each taking about a dozen operations.
+_MAX_PAIRED_NODES = 4
+
+
+def alltoall_pairwise(spec: AlgoSpec, num_thread_blocks: int = None) -> CollectiveProgram:
+    """
+    Implements an AllToAll as a pairwise exchange: in step s rank r exchanges blocks with rank
+    (s - r) mod n. Every step pairs up the ranks, and the steps are spread over thread blocks
+    running at the same time, with the same thread block on both ranks of a pair.
+
+    With the LL protocol the blocks are sent as packets to the scratch buffer of the peer. With
+    the Simple protocol they are written to the output of the peer once it is ready, or to its
+    scratch buffer for in-place collectives.
+
+    Args:
+        spec (AlgoSpec): The spec of the program. The collective must be an AllToAll over
+            ``world_size`` ranks, with the LL or Simple protocol.
+        num_thread_blocks (int, optional): Thread blocks running the steps. Defaults to one per
+            step up to 32, or more if the steps of each thread block would not fit the executor.
+
+    Raises:
+        RuntimeError: If the spec does not describe such an AllToAll, or if the steps do not fit
+            in ``num_thread_blocks`` thread blocks.
+    """
+    check_spec(spec, "alltoall", protocols=("LL", "Simple"))
+    return _pairwise(spec, num_thread_blocks, pipeline_unit_size=None)
+
+
+def alltoall_pipelined(
+    spec: AlgoSpec, pipeline_unit_size: int = 1 << 20, num_thread_blocks: int = None
+) -> CollectiveProgram:
+    """
+    Implements a pairwise AllToAll for large messages, moving each block in units of
+    ``pipeline_unit_size`` bytes with a ``LoopIterationContext``. Each unit is signaled once
+    written, so that for in-place collectives the peer copies it out of its scratch buffer
+    while the next unit is in flight.
+
+    Args:
+        spec (AlgoSpec): The spec of the program. The collective must be an AllToAll over
+            ``world_size`` ranks, with the Simple protocol.
+        pipeline_unit_size (int, optional): Bytes of each block moved per pipeline iteration.
+            Defaults to 1MB.
+        num_thread_blocks (int, optional): Thread blocks running the steps, as for
+            :func:`alltoall_pairwise`.
+
+    Raises:
+        RuntimeError: If the spec does not describe such an AllToAll, or if the steps do not fit
+            in ``num_thread_blocks`` thread blocks.
+    """
+    check_spec(spec, "alltoall")
+    return _pairwise(spec, num_thread_blocks, pipeline_unit_size)
+
+
+def alltoall_hierarchical(spec: AlgoSpec) -> CollectiveProgram:
+    """
+    Implements a multi-node AllToAll for small messages, with the LL protocol:
+    1. Blocks within a node are sent directly over memory channels. Blocks for node m are
+       gathered on local rank m % nranks_per_node, the leader of node m on this node
+    2. Each leader sends the blocks gathered for a node in one message over a port channel,
+       to the local rank of the other node with the index of the sending node
+    3. The receiving rank forwards the blocks to their destinations on its node
+
+    Args:
+        spec (AlgoSpec): The spec of the program. ``world_size`` must be a multiple of
+            ``nranks_per_node`` and the collective an AllToAll over ``world_size`` ranks,
+            with the LL protocol, and each local rank leads at most 4 other nodes.
+
+    Raises:
+        RuntimeError: If the spec does not describe such an AllToAll, or if the nodes are too
+            many for the ranks per node.
+    """
+    check_spec(spec, "alltoall", protocols=("LL",))
+    gpus_per_node = spec.nranks_per_node
+    num_nodes = spec.world_size // gpus_per_node
+    block_size = spec.collective.chunk_factor
+    in_place = spec.collective.inplace
+
+    def rank_id(node, local_gpu):
+        return local_gpu + gpus_per_node * node
+
+    def paired_nodes(node, local_gpu):
+        # Nodes whose blocks local_gpu gathers on node, which are also the nodes it receives blocks from
+        return [
+            peer_node for peer_node in range(num_nodes) if peer_node != node and peer_node % gpus_per_node == local_gpu
+        ]
+
+    # Scratch layout, in blocks, each region written once per execution:
+    # - direct_offset: block sent by each local peer
+    # - gather_offset: for each paired node, the blocks of the node for each local rank of that node
+    #   from each local peer, ordered by destination then source
+    # - staging_offset: the gathered blocks, unpacked
+    # - send_offset: the gathered blocks packed again for the port channels, which only send packets in scratch
+    # - recv_offset: for each paired node, the blocks of that node, ordered as the gathered blocks
+    # - remote_offset: blocks of each rank of the other nodes
+    max_paired_nodes = max(
+        len(paired_nodes(node, local_gpu)) for node in range(num_nodes) for local_gpu in range(gpus_per_node)
+    )
+    if max_paired_nodes > _MAX_PAIRED_NODES:
+        raise RuntimeError(
+            f"Too many nodes ({num_nodes}) for {gpus_per_node} ranks per node, use the pairwise AllToAll."
+        )
+    group_size = gpus_per_node * gpus_per_node
+    direct_offset = 0
+    gather_offset = direct_offset + gpus_per_node
+    staging_offset = gather_offset + max_paired_nodes * group_size
+    send_offset = staging_offset + max_paired_nodes * group_size
+    recv_offset = send_offset + max_paired_nodes * group_size
+    remote_offset = recv_offset + max_paired_nodes * group_size
+    scratch_buffer_size = remote_offset + num_nodes * gpus_per_node
+
+    with CollectiveProgram.from_spec(spec) as prog:
+        memory_channels = {}
+        port_channels = {}
+        for node in range(num_nodes):
+            for local_gpu in range(gpus_per_node):
+                current_rank_id = rank_id(node, local_gpu)
+                for peer_gpu in range(gpus_per_node):
+                    if peer_gpu != local_gpu:
+                        peer_rank_id = rank_id(node, peer_gpu)
+                        memory_channels[(peer_rank_id, current_rank_id)] = MemoryChannel(peer_rank_id, current_rank_id)
+                for peer_node in paired_nodes(node, local_gpu):
+                    peer_rank_id = rank_id(peer_node, node % gpus_per_node)
+                    port_channels[(peer_rank_id, current_rank_id)] = PortChannel(peer_rank_id, current_rank_id)
+        scratch_buffers = [Buffer(rank, scratch_buffer_size * block_size) for rank in range(spec.world_size)]
+
+        def blocks(buffer, index, count=1):
+            return buffer[index * block_size : (index + count) * block_size]
+
+        for node in range(num_nodes):
+            for local_gpu in range(gpus_per_node):
+                current_rank_id = rank_id(node, local_gpu)
+                current_rank = Rank(current_rank_id)
+                input_buffer = current_rank.get_input_buffer()
+                result_buffer = input_buffer if in_place else current_rank.get_output_buffer()
+                scratch_buffer = scratch_buffers[current_rank_id]
+
+                # Sending the blocks of the node and gathering the blocks of the other nodes, thread block
+                # peer_gpu driving the channel to peer_gpu
+                for peer_gpu in range(gpus_per_node):
+                    peer_rank_id = rank_id(node, peer_gpu)
+                    if peer_gpu == local_gpu:
+                        if not in_place:
+                            current_rank.copy(
+                                blocks(result_buffer, peer_rank_id), blocks(input_buffer, peer_rank_id), tb=peer_gpu
+                            )
+                    else:
+                        memory_channels[(peer_rank_id, current_rank_id)].put_packets(
+                            blocks(scratch_buffers[peer_rank_id], direct_offset + local_gpu),
+                            blocks(input_buffer, peer_rank_id),
+                            tb=peer_gpu,
+                        )
+                    for index, peer_node in enumerate(paired_nodes(node, peer_gpu)):
+                        for dst_gpu in range(gpus_per_node):
+                            gather_index = gather_offset + index * group_size + dst_gpu * gpus_per_node + local_gpu
+                            src_chunk = blocks(input_buffer, rank_id(peer_node, dst_gpu))
+                            if peer_gpu == local_gpu:
+                                current_rank.copy_packets(blocks(scratch_buffer, gather_index), src_chunk, tb=peer_gpu)
+                            else:
+                                memory_channels[(peer_rank_id, current_rank_id)].put_packets(
+                                    blocks(scratch_buffers[peer_rank_id], gather_index), src_chunk, tb=peer_gpu
+                                )
+
+                # The blocks of the input are overwritten once all of them are sent
+                if in_place:
+                    current_rank.barrier(tb_list=list(range(gpus_per_node)))
+
+                # Sending the gathered blocks to the other nodes
+                for index, peer_node in enumerate(paired_nodes(node, local_gpu)):
+                    peer_rank_id = rank_id(peer_node, node % gpus_per_node)
+                    recv_index = recv_offset + paired_nodes(peer_node, node % gpus_per_node).index(node) * group_size
+                    current_rank.unpack_packets(
+                        blocks(scratch_buffer, staging_offset + index * group_size, group_size),
+                        blocks(scratch_buffer, gather_offset + index * group_size, group_size),
+                        tb=local_gpu,
+                    )
+                    current_rank.copy_packets(
+                        blocks(scratch_buffer, send_offset + index * group_size, group_size),
+                        blocks(scratch_buffer, staging_offset + index * group_size, group_size),
+                        tb=local_gpu,
+                    )
+                    port_channels[(peer_rank_id, current_rank_id)].put_packets(
+                        blocks(scratch_buffers[peer_rank_id], recv_index, group_size),
+                        blocks(scratch_buffer, send_offset + index * group_size, group_size),
+                        tb=local_gpu,
+                    )
+
+                # Forwarding the blocks of the other nodes to their destination as they arrive
+                for index, peer_node in enumerate(paired_nodes(node, local_gpu)):
+                    for dst_gpu in range(gpus_per_node):
+                        recv_index = recv_offset + index * group_size + dst_gpu * gpus_per_node
+                        if dst_gpu == local_gpu:
+                            current_rank.unpack_packets(
+                                blocks(result_buffer, rank_id(peer_node, 0), gpus_per_node),
+                                blocks(scratch_buffer, recv_index, gpus_per_node),
+                                tb=dst_gpu,
+                            )
+                        else:
+                            dst_rank_id = rank_id(node, dst_gpu)
+                            memory_channels[(dst_rank_id, current_rank_id)].read_put_packets(
+                                blocks(
+                                    scratch_buffers[dst_rank_id],
+                                    remote_offset + peer_node * gpus_per_node,
+                                    gpus_per_node,
+                                ),
+                                blocks(scratch_buffer, recv_index, gpus_per_node),
+                                tb=dst_gpu,
+                            )
+
+                # Unpacking the blocks received from the other ranks
+                for peer_gpu in range(gpus_per_node):
+                    if peer_gpu != local_gpu:
+                        current_rank.unpack_packets(
+                            blocks(result_buffer, rank_id(node, peer_gpu)),
+                            blocks(scratch_buffer, direct_offset + peer_gpu),
+                            tb=peer_gpu,
+                        )
+                for peer_node in range(num_nodes):
+                    if peer_node != node and peer_node % gpus_per_node != local_gpu:
+                        current_rank.unpack_packets(
+                            blocks(result_buffer, rank_id(peer_node, 0), gpus_per_node),
+                            blocks(scratch_buffer, remote_offset + peer_node * gpus_per_node, gpus_per_node),
+                            tb=peer_node % gpus_per_node,
+                        )
+
+    return prog
+
+
+def _pairwise(spec, num_thread_blocks, pipeline_unit_size):
+    num_ranks = spec.world_size
+    block_size = spec.collective.chunk_factor
+    in_place = spec.collective.inplace
+    packets = spec.protocol == "LL"
+    if num_thread_blocks is None:
+        num_thread_blocks = max(min(num_ranks, _MAX_THREAD_BLOCKS), (num_ranks + _STEPS_PER_TB - 1) // _STEPS_PER_TB)
+    if num_thread_blocks < 1 or (num_ranks + num_thread_blocks - 1) // num_thread_blocks > _STEPS_PER_TB:
+        raise RuntimeError(f"Cannot run the {num_ranks} steps on {num_thread_blocks} thread blocks.")
+
+    with CollectiveProgram.from_spec(spec) as prog:
+        channels = {}
+        for rank in range(num_ranks):
+            for peer in range(num_ranks):
+                if peer != rank:
+                    channels[(peer, rank)] = connect(peer, rank, spec.nranks_per_node)
+        # Slot q of the scratch buffer receives the block of rank q. With the LL protocol, slot n + q holds
+        # the block sent to rank q over a port channel, which only sends packets already in scratch.
+        if packets or in_place:
+            num_slots = 2 * num_ranks if packets else num_ranks
+            scratch_buffers = [Buffer(rank, num_slots * block_size) for rank in range(num_ranks)]
+
+        def block(buffer, index):
+            return buffer[index * block_size : (index + 1) * block_size]
+
+        def slot(rank, index):
+            return block(scratch_buffers[rank], index)
+
+        for rank in range(num_ranks):
+            current_rank = Rank(rank)
+            input_buffer = current_rank.get_input_buffer()
+            result_buffer = input_buffer if in_place else current_rank.get_output_buffer()
+            for step in range(num_ranks):
+                peer = (step - rank) % num_ranks
+                tb = step % num_thread_blocks
+                if peer == rank:
+                    if not in_place:
+                        current_rank.copy(block(result_buffer, rank), block(input_buffer, rank), tb=tb)
+                    continue
+                channel = channels[(peer, rank)]
+                if packets:
+                    if isinstance(channel, PortChannel):
+                        current_rank.copy_packets(slot(rank, num_ranks + peer), block(input_buffer, peer), tb=tb)
+                        channel.put_packets(slot(peer, rank), slot(rank, num_ranks + peer), tb=tb)
+                    else:
+                        channel.put_packets(slot(peer, rank), block(input_buffer, peer), tb=tb)
+                    current_rank.unpack_packets(block(result_buffer, peer), slot(rank, peer), tb=tb)
+                else:
+                    handshake(channel, channel, tb)
+                    if pipeline_unit_size is None:
+                        _exchange(current_rank, peer, channel, tb, block, slot, in_place)
+                    else:
+                        with LoopIterationContext(unit=pipeline_unit_size, num_chunks=block_size):
+                            _exchange(current_rank, peer, channel, tb, block, slot, in_place)
+                    if not in_place:
+                        flush(channel, tb)
+
+    return prog
+
+
+def _exchange(current_rank, peer, channel, tb, block, slot, in_place):
+    rank = current_rank.rank
+    input_buffer = current_rank.get_input_buffer()
+    if not in_place:
+        send(channel, block(Rank(peer).get_output_buffer(), rank), block(input_buffer, peer), tb)
+        wait(channel, tb)
+        return
+    send(channel, slot(peer, rank), block(input_buffer, peer), tb)
+    wait(channel, tb)
+    # The block sent to the peer is overwritten by the block received from it
+    flush(channel, tb)
+    current_rank.copy(block(input_buffer, peer), slot(rank, peer), tb=tb)
@@ -0,0 +1,81 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+"""
+Helpers shared by the default algorithms.
+"""
+
+from mscclpp.language.utils import AlgoSpec
+from mscclpp.language.channel import *
+from mscclpp.language.rank import *
+
+
+def check_spec(spec: AlgoSpec, collective_name: str, protocols=("Simple",)):
+    """
+    Checks that a spec describes the given collective over all ranks of whole nodes.
+
+    Args:
+        spec (AlgoSpec): The spec of the program.
+        collective_name (str): Expected name of the collective, e.g. ``"allreduce"``.
+        protocols (tuple, optional): Protocols the algorithm supports. Defaults to ``("Simple",)``.
+
+    Raises:
+        RuntimeError: If the spec does not match.
+    """
+    if spec.world_size % spec.nranks_per_node != 0:
+        raise RuntimeError(
+            f"World size {spec.world_size} is not a multiple of the {spec.nranks_per_node} ranks per node."
+        )
+    if spec.collective.name != collective_name or spec.collective.num_ranks != spec.world_size:
+        raise RuntimeError(f"Expected a {collective_name} over {spec.world_size} ranks.")
+    if spec.world_size < 2:
+        raise RuntimeError("Expected at least 2 ranks.")
+    if spec.protocol not in protocols:
+        raise RuntimeError(f"Unsupported protocol {spec.protocol}, expected one of {', '.join(protocols)}.")
+
+
+def connect(dst_rank: int, src_rank: int, nranks_per_node: int):
+    """
+    Creates a channel from ``src_rank`` to ``dst_rank``: a memory channel within a node and a
+    port channel across nodes.
+    """
+    if dst_rank // nranks_per_node == src_rank // nranks_per_node:
+        return MemoryChannel(dst_rank, src_rank)
+    return PortChannel(dst_rank, src_rank)
+
+
+def send(channel, dst_chunk: Chunk, src_chunk: Chunk, tb: int):
+    """
+    Writes ``src_chunk`` to the peer of ``channel`` and signals it once the data is written.
+    """
+    if isinstance(channel, PortChannel):
+        channel.put_with_signal(dst_chunk, src_chunk, tb=tb)
+    else:
+        channel.put(dst_chunk, src_chunk, tb=tb)
+        channel.signal(tb=tb, data_sync=SyncType.before)
+
+
+def flush(channel, tb: int):
+    """Waits for the transfers of a port channel to complete. Memory channel transfers are synchronous."""
+    if isinstance(channel, PortChannel):
+        channel.flush(tb=tb)
+
+
+def wait(channel, tb: int):
+    """Waits for a signal of the peer of ``channel``, then synchronizes the thread block with the data."""
+    channel.wait(tb=tb, data_sync=SyncType.after)
+
+
+def handshake(send_channel, recv_channel, tb: int):
+    """
+    Tells the rank sending on ``recv_channel`` that this rank is ready to receive, and waits until the
+    peer of ``send_channel`` is ready too.
+    """
+    if isinstance(recv_channel, PortChannel):
+        recv_channel.signal(tb=tb)
+    else:
+        recv_channel.signal(tb=tb, relaxed=True)
+    if isinstance(send_channel, PortChannel):
+        send_channel.wait(tb=tb, data_sync=SyncType.after)
+    else:
+        send_channel.wait(tb=tb, data_sync=SyncType.after, relaxed=True)
@@ -0,0 +1,188 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+"""
+Ring AllGather, ReduceScatter and AllReduce for any number of ranks.
+Each rank only exchanges data with its neighbours, so every link carries
+(n - 1) / n of the data once in each phase, which makes rings the choice for
+large messages. The data is striped over several rings, which run on their
+own thread blocks and channels and alternate their direction, so that both
+directions of each link are used. The steps of a ring are split over several
+thread blocks, which hand over to each other with semaphores, so that each
+thread block stays within the operations the executor supports.
+"""
+
+from mscclpp.language.utils import AlgoSpec
+from mscclpp.language.channel import *
+from mscclpp.language.rank import *
+from mscclpp.language.general import *
+from mscclpp.language.program import *
+from mscclpp.language.collectives import *
+from mscclpp.language.default_algos.common import check_spec, connect, flush, handshake, send, wait
+
+# Steps of a ring run by each thread block, each step taking about five operations.
+_STEPS_PER_TB = 8
+
+
+def allgather_ring(spec: AlgoSpec, num_rings: int = 1) -> CollectiveProgram:
+    """
+    Implements a ring AllGather: in each of the n - 1 steps every rank forwards to its
+    next neighbour the chunk it received in the previous step.
+
+    Args:
+        spec (AlgoSpec): The spec of the program. The collective must be an AllGather over
+            ``world_size`` ranks, with the Simple protocol.
+        num_rings (int, optional): Rings the data of each rank is striped over. Must divide
+            the chunk factor of the collective. Defaults to 1.
+
+    Raises:
+        RuntimeError: If the spec does not describe such an AllGather.
+    """
+    check_spec(spec, "allgather")
+    return _ring(spec, num_rings, reduce_scatter=False, all_gather=True)
+
+
+def reducescatter_ring(spec: AlgoSpec, num_rings: int = 1) -> CollectiveProgram:
+    """
+    Implements a ring ReduceScatter: in each of the n - 1 steps every rank adds its input
+    to the partial sum it received in the previous step and sends it to its next neighbour,
+    until the sum reaches the rank owning the chunk.
+
+    Args:
+        spec (AlgoSpec): The spec of the program. The collective must be a ReduceScatter over
+            ``world_size`` ranks, with the Simple protocol.
+        num_rings (int, optional): Rings the data of each rank is striped over. Must divide
+            the chunk factor of the collective. Defaults to 1.
+
+    Raises:
+        RuntimeError: If the spec does not describe such a ReduceScatter.
+    """
+    check_spec(spec, "reducescatter")
+    return _ring(spec, num_rings, reduce_scatter=True, all_gather=False)
+
+
+def allreduce_ring(spec: AlgoSpec, num_rings: int = 1) -> CollectiveProgram:
+    """
+    Implements a ring AllReduce as a ring ReduceScatter followed by a ring AllGather of the
+    reduced chunks.
+
+    Args:
+        spec (AlgoSpec): The spec of the program. The collective must be an AllReduce over
+            ``world_size`` ranks, with the Simple protocol.
+        num_rings (int, optional): Rings the data of each rank is striped over. Must divide
+            the chunk factor of the collective. Defaults to 1.
+
+    Raises:
+        RuntimeError: If the spec does not describe such an AllReduce.
+    """
+    check_spec(spec, "allreduce")
+    return _ring(spec, num_rings, reduce_scatter=True, all_gather=True)
+
+
+def _ring(spec, num_rings, reduce_scatter, all_gather):
+    num_ranks = spec.world_size
+    chunk_factor = spec.collective.chunk_factor
+    if num_rings < 1 or chunk_factor % num_rings != 0:
+        raise RuntimeError(f"The chunk factor {chunk_factor} is not a multiple of the {num_rings} rings.")
+    # Each rank owns chunk_factor chunks, ring k moves the stripe [k * width, (k + 1) * width) of them.
+    width = chunk_factor // num_rings
+    in_place = spec.collective.inplace
+    num_steps = (num_ranks - 1) * (int(reduce_scatter) + int(all_gather))
+    num_segments = (num_steps - 1) // _STEPS_PER_TB + 1
+
+    with CollectiveProgram.from_spec(spec) as prog:
+        # Even rings go through the ranks in increasing order, odd rings in decreasing order.
+        # Consecutive ranks share a node, so each ring crosses every node boundary once.
+        orders = [
+            list(range(num_ranks)) if ring % 2 == 0 else list(reversed(range(num_ranks))) for ring in range(num_rings)
+        ]
+        send_channels = {}
+        recv_channels = {}
+        for ring, order in enumerate(orders):
+            # Both ends of an edge are created together, so that they are paired even when the
+            # previous and next rank are the same.
+            for position, rank in enumerate(order):
+                next_rank = order[(position + 1) % num_ranks]
+                send_channels[(ring, rank)] = connect(next_rank, rank, spec.nranks_per_node)
+                recv_channels[(ring, next_rank)] = connect(rank, next_rank, spec.nranks_per_node)
+
+        # Partial sums received in each step of the ReduceScatter
+        if reduce_scatter:
+            scratch_buffers = [Buffer(rank, num_rings * (num_ranks - 1) * width) for rank in range(num_ranks)]
+
+        def stripe(buffer, block, ring):
+            index = block * chunk_factor + ring * width
+            return buffer[index : index + width]
+
+        def slot(rank, ring, step):
+            index = (ring * (num_ranks - 1) + step) * width
+            return scratch_buffers[rank][index : index + width]
+
+        def result_buffer(rank):
+            if spec.collective.name == "allgather" or not in_place:
+                return Rank(rank).get_output_buffer()
+            return Rank(rank).get_input_buffer()
+
+        for ring, order in enumerate(orders):
+            for position, rank in enumerate(order):
+                next_rank = order[(position + 1) % num_ranks]
+                send_channel = send_channels[(ring, rank)]
+                recv_channel = recv_channels[(ring, rank)]
+                current_rank = Rank(rank)
+                input_buffer = current_rank.get_input_buffer()
+                steps = iter(range(num_steps))
+
+                def next_step_tb():
+                    # Thread block of the next step, taking over from the previous one at segment boundaries
+                    index = next(steps)
+                    tb = ring * num_segments + index // _STEPS_PER_TB
+                    if index > 0 and index % _STEPS_PER_TB == 0:
+                        semaphore = Semaphore(rank, initial_value=0)
+                        semaphore.release(tb=tb - 1, data_sync=SyncType.before)
+                        semaphore.acquire(tb=tb, data_sync=SyncType.after)
+                    return tb
+
+                tb = ring * num_segments
+                handshake(send_channel, recv_channel, tb)
+
+                # ReduceScatter: the partial sum of block order[position - step - 1] is sent in step step
+                if reduce_scatter:
+                    for step in range(num_ranks - 1):
+                        tb = next_step_tb()
+                        block = order[(position - step - 1) % num_ranks]
+                        if step == 0:
+                            partial_sum = stripe(input_buffer, block, ring)
+                        else:
+                            wait(recv_channel, tb)
+                            partial_sum = slot(rank, ring, step - 1)
+                            current_rank.reduce(partial_sum, [stripe(input_buffer, block, ring)], tb=tb)
+                        send(send_channel, slot(next_rank, ring, step), partial_sum, tb)
+                    wait(recv_channel, tb)
+                    if spec.collective.name == "reducescatter" and not in_place:
+                        reduced = current_rank.get_output_buffer()[ring * width : (ring + 1) * width]
+                    else:
+                        reduced = stripe(result_buffer(rank), rank, ring)
+                    current_rank.reduce(
+                        stripe(input_buffer, rank, ring),
+                        [slot(rank, ring, num_ranks - 2)],
+                        tb=tb,
+                        dst_chunk=reduced,
+                    )
+
+                # AllGather: block order[position - step] is forwarded in step step
+                if all_gather:
+                    for step in range(num_ranks - 1):
+                        tb = next_step_tb()
+                        block = order[(position - step) % num_ranks]
+                        source = stripe(result_buffer(rank), block, ring)
+                        if step == 0 and spec.collective.name == "allgather" and not in_place:
+                            own_data = input_buffer[ring * width : (ring + 1) * width]
+                            current_rank.copy(source, own_data, tb=tb)
+                            source = own_data
+                        elif step > 0:
+                            wait(recv_channel, tb)
+                        send(send_channel, stripe(result_buffer(next_rank), block, ring), source, tb)
+                    wait(recv_channel, tb)
+                flush(send_channel, tb)
+
+    return prog
@@ -0,0 +1,231 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+"""
+Binary tree and double binary tree AllReduce for any number of ranks.
+The data is reduced up a tree of depth log2(n) and the result broadcast back
+down, so the latency grows with log2(n) instead of n as for rings, which makes
+trees the choice for small messages across many ranks. Subtrees hold
+consecutive ranks, so a tree crosses each node boundary about once.
+
+With the Simple protocol the data is pipelined through the tree in units of
+``pipeline_unit_size`` bytes with a ``LoopIterationContext``, so that the
+levels of the tree work on different units at the same time. With the LL
+protocol the data is exchanged as packets, which synchronize by themselves.
+"""
+
+from mscclpp.language.utils import AlgoSpec
+from mscclpp.language.channel import *
+from mscclpp.language.rank import *
+from mscclpp.language.general import *
+from mscclpp.language.program import *
+from mscclpp.language.collectives import *
+from mscclpp.language.loop import *
+from mscclpp.language.default_algos.common import check_spec, connect, flush, send, wait
+
+
+def allreduce_binary_tree(spec: AlgoSpec, pipeline_unit_size: int = 1 << 18) -> CollectiveProgram:
+    """
+    Implements an AllReduce over a binary tree: every rank waits for the partial sums of its
+    children, adds its input and sends the sum to its parent. The root then sends the result
+    down the tree.
+
+    Args:
+        spec (AlgoSpec): The spec of the program. The collective must be an AllReduce over
+            ``world_size`` ranks, with the LL or Simple protocol.
+        pipeline_unit_size (int, optional): Bytes of each chunk moved per pipeline iteration
+            with the Simple protocol. Defaults to 256KB.
+
+    Raises:
+        RuntimeError: If the spec does not describe such an AllReduce.
+    """
+    check_spec(spec, "allreduce", protocols=("LL", "Simple"))
+    num_ranks = spec.world_size
+    trees = [[_binary_tree(num_ranks, rank) for rank in range(num_ranks)]]
+    return _allreduce_trees(spec, trees, pipeline_unit_size)
+
+
+def allreduce_double_binary_tree(spec: AlgoSpec, pipeline_unit_size: int = 1 << 18) -> CollectiveProgram:
+    """
+    Implements an AllReduce over two binary trees, each reducing half of the data. The
+    second tree is the first one mirrored, or shifted by one rank for an odd number of
+    ranks, so that the leaves of one tree are inner ranks of the other. Every rank then
+    sends and receives about as much data as in a ring, while the depth stays log2(n).
+
+    Args:
+        spec (AlgoSpec): The spec of the program. The collective must be an AllReduce over
+            ``world_size`` ranks, with the LL or Simple protocol, and an even number of chunks.
+        pipeline_unit_size (int, optional): Bytes of each chunk moved per pipeline iteration
+            with the Simple protocol. Defaults to 256KB.
+
+    Raises:
+        RuntimeError: If the spec does not describe such an AllReduce.
+    """
+    check_spec(spec, "allreduce", protocols=("LL", "Simple"))
+    num_ranks = spec.world_size
+    if (num_ranks * spec.collective.chunk_factor) % 2 != 0:
+        raise RuntimeError(f"Cannot split the {num_ranks * spec.collective.chunk_factor} chunks over two trees.")
+    first_tree = [_binary_tree(num_ranks, rank) for rank in range(num_ranks)]
+    if num_ranks % 2 == 1:
+
+        def relabel(rank):
+            return (rank + 1) % num_ranks
+
+        second_tree = [first_tree[(rank - 1) % num_ranks] for rank in range(num_ranks)]
+    else:
+
+        def relabel(rank):
+            return num_ranks - 1 - rank
+
+        second_tree = [first_tree[num_ranks - 1 - rank] for rank in range(num_ranks)]
+    second_tree = [
+        (None if parent is None else relabel(parent), [relabel(child) for child in children])
+        for parent, children in second_tree
+    ]
+    return _allreduce_trees(spec, [first_tree, second_tree], pipeline_unit_size)
+
+
+def _binary_tree(num_ranks, rank):
+    """
+    Returns the parent, or None for the root, and the children of ``rank`` in a binary tree whose
+    subtrees are ranges of consecutive ranks. Rank 0 is the root and has a single child.
+    """
+    bit = 1
+    while bit < num_ranks and not bit & rank:
+        bit <<= 1
+    if rank == 0:
+        return None, [bit >> 1] if num_ranks > 1 else []
+    parent = (rank ^ bit) | (bit << 1)
+    if parent >= num_ranks:
+        parent = rank ^ bit
+    children = []
+    low_bit = bit >> 1
+    if low_bit > 0:
+        children.append(rank - low_bit)
+        while rank + low_bit >= num_ranks:
+            low_bit >>= 1
+        if low_bit > 0:
+            children.append(rank + low_bit)
+    return parent, children
+
+
+def _allreduce_trees(spec, trees, pipeline_unit_size):
+    num_ranks = spec.world_size
+    # Tree t reduces the chunks [t * size, (t + 1) * size) of the input.
+    size = num_ranks * spec.collective.chunk_factor // len(trees)
+    packets = spec.protocol == "LL"
+    # Scratch layout of each tree:
+    # - child slots: partial sum of each child
+    # - down slot, LL only: result sent by the parent
+    # - send slot, LL only: data sent over port channels, which only send packets already in scratch
+    # - forward slot, LL only: result forwarded to children over port channels
+    num_slots = 5 if packets else 2
+
+    with CollectiveProgram.from_spec(spec) as prog:
+        up_channels = {}
+        down_channels = {}
+        for tree_id, tree in enumerate(trees):
+            for rank, (parent, _) in enumerate(tree):
+                if parent is not None:
+                    up_channels[(tree_id, rank)] = connect(parent, rank, spec.nranks_per_node)
+                    down_channels[(tree_id, parent, rank)] = connect(rank, parent, spec.nranks_per_node)
+        scratch_buffers = [Buffer(rank, len(trees) * num_slots * size) for rank in range(num_ranks)]
+
+        def slot(rank, tree_id, index):
+            offset = (tree_id * num_slots + index) * size
+            return scratch_buffers[rank][offset : offset + size]
+
+        def data(buffer, tree_id):
+            return buffer[tree_id * size : (tree_id + 1) * size]
+
+        def result_buffer(rank):
+            if spec.collective.inplace:
+                return Rank(rank).get_input_buffer()
+            return Rank(rank).get_output_buffer()
+
+        for tree_id, tree in enumerate(trees):
+            tb = tree_id
+            for rank, (parent, children) in enumerate(tree):
+                args = (rank, tree, tree_id, tb, data, slot, result_buffer, up_channels, down_channels)
+                if packets:
+                    _tree_packets(*args)
+                else:
+                    with LoopIterationContext(unit=pipeline_unit_size, num_chunks=size):
+                        _tree_simple(*args)
+                    if parent is not None:
+                        flush(up_channels[(tree_id, rank)], tb)
+                    for child in children:
+                        flush(down_channels[(tree_id, rank, child)], tb)
+
+    return prog
+
+
+def _tree_simple(rank, tree, tree_id, tb, data, slot, result_buffer, up_channels, down_channels):
+    parent, children = tree[rank]
+    current_rank = Rank(rank)
+    input_data = data(current_rank.get_input_buffer(), tree_id)
+    result = data(result_buffer(rank), tree_id)
+
+    partial_sum = input_data
+    for child in children:
+        wait(down_channels[(tree_id, rank, child)], tb)
+    if children:
+        current_rank.reduce(
+            input_data, [slot(rank, tree_id, index) for index in range(len(children))], tb=tb, dst_chunk=result
+        )
+        partial_sum = result
+    if parent is not None:
+        up_channel = up_channels[(tree_id, rank)]
+        send(up_channel, slot(parent, tree_id, tree[parent][1].index(rank)), partial_sum, tb)
+        # The parent writes the result to this rank once the whole tree is reduced
+        wait(up_channel, tb)
+    for child in children:
+        send(down_channels[(tree_id, rank, child)], data(result_buffer(child), tree_id), result, tb)
+
+
+def _tree_packets(rank, tree, tree_id, tb, data, slot, result_buffer, up_channels, down_channels):
+    parent, children = tree[rank]
+    current_rank = Rank(rank)
+    input_data = data(current_rank.get_input_buffer(), tree_id)
+    result = data(result_buffer(rank), tree_id)
+    down_slot, send_slot, forward_slot = slot(rank, tree_id, 2), slot(rank, tree_id, 3), slot(rank, tree_id, 4)
+
+    partial_sum = input_data
+    if children:
+        current_rank.reduce(
+            input_data,
+            [slot(rank, tree_id, index) for index in range(len(children))],
+            tb=tb,
+            dst_chunk=result,
+            packet=True,
+        )
+        partial_sum = result
+    child_channels = [(child, down_channels[(tree_id, rank, child)]) for child in children]
+    port_children = [(child, channel) for child, channel in child_channels if isinstance(channel, PortChannel)]
+    if parent is None:
+        if port_children:
+            current_rank.copy_packets(send_slot, result, tb=tb)
+        for child, channel in child_channels:
+            if isinstance(channel, PortChannel):
+                channel.put_packets(slot(child, tree_id, 2), send_slot, tb=tb)
+            else:
+                channel.put_packets(slot(child, tree_id, 2), result, tb=tb)
+        return
+
+    up_channel = up_channels[(tree_id, rank)]
+    parent_slot = slot(parent, tree_id, tree[parent][1].index(rank))
+    if isinstance(up_channel, PortChannel):
+        current_rank.copy_packets(send_slot, partial_sum, tb=tb)
+        up_channel.put_packets(parent_slot, send_slot, tb=tb)
+    else:
+        up_channel.put_packets(parent_slot, partial_sum, tb=tb)
+    # Packets received from the parent are forwarded as they arrive over memory channels. Port
+    # channels copy the packets as they are in memory, so they send the unpacked result packed again.
+    for child, channel in child_channels:
+        if not isinstance(channel, PortChannel):
+            channel.read_put_packets(slot(child, tree_id, 2), down_slot, tb=tb)
+    current_rank.unpack_packets(result, down_slot, tb=tb)
+    if port_children:
+        current_rank.copy_packets(forward_slot, result, tb=tb)
+    for child, channel in port_children:
+        channel.put_packets(slot(child, tree_id, 2), forward_slot, tb=tb)
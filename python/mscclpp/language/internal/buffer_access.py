@@ -1,19 +1,74 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT License.
 
-from sortedcontainers import SortedDict
+from sortedcontainers import SortedList
 from typing import List
 from mscclpp.language.internal.types import BufferType, DataAccessType
 from mscclpp.language.internal.operations import *
 from enum import Enum
 
 
+class IntervalMap:
+    """Disjoint intervals of one buffer, each tagged with the operation and type of its last access.
+
+    The ``(start, end)`` keys are kept in a ``SortedList``, whose sorted sublists make lookups
+    binary searches and inserts cheap even with millions of intervals, and the overlapping
+    intervals of an access are found and replaced in one batch.
+    """
+
+    __slots__ = ("keys", "accesses")
+
+    def __init__(self):
+        self.keys = SortedList()
+        self.accesses = {}
+
+    def __len__(self):
+        return len(self.keys)
+
+    def overlapping(self, start: int, end: int) -> List[tuple]:
+        """Return the keys of the intervals overlapping ``[start, end]``, in order."""
+        position = self.keys.bisect_right((start, float("inf"))) - 1
+        if position < 0 or self.keys[position][1] < start:
+            position += 1
+        overlapping_keys = []
+        for key in self.keys.islice(position):
+            if key[0] > end:
+                break
+            overlapping_keys.append(key)
+        return overlapping_keys
+
+    def replace(self, overlapping_keys: List[tuple], data_access: DataAccess):
+        """Replace the intervals of ``overlapping_keys`` by ``data_access``.
+
+        The parts of the first and last replaced intervals outside of ``data_access`` are kept.
+        """
+        new_accesses = {(data_access.start, data_access.end): (data_access.operation_id, data_access.data_access_type)}
+        if len(overlapping_keys) > 0:
+            first_start = overlapping_keys[0][0]
+            last_end = overlapping_keys[-1][1]
+            if first_start < data_access.start:
+                new_accesses[(first_start, data_access.start - 1)] = self.accesses[overlapping_keys[0]]
+            if last_end > data_access.end:
+                new_accesses[(data_access.end + 1, last_end)] = self.accesses[overlapping_keys[-1]]
+            position = self.keys.bisect_left(overlapping_keys[0])
+            del self.keys[position : position + len(overlapping_keys)]
+            for key in overlapping_keys:
+                del self.accesses[key]
+        for key, access in new_accesses.items():
+            self.keys.add(key)
+            self.accesses[key] = access
+
+    def clear(self):
+        self.keys.clear()
+        self.accesses.clear()
+
+
 class BuffersAccess:
     def __init__(self):
         self.intervals = {
-            BufferType.input: SortedDict(),
-            BufferType.output: SortedDict(),
-            BufferType.scratch: SortedDict(),
+            BufferType.input: IntervalMap(),
+            BufferType.output: IntervalMap(),
+            BufferType.scratch: IntervalMap(),
         }
 
     def process_operations(self, operations):
@@ -38,58 +93,21 @@ class BuffersAccess:
         return result_operations
 
     def compute_data_access(self, data_access: DataAccess) -> bool:
-        keys = self.intervals[data_access.buffer_type].keys()
-        idx = self.lower_bound(0, len(keys) - 1, keys, data_access)
-        conflict = False
-
-        while len(keys) > 0 and data_access.overlaps(keys[idx]):
-            conflict_data_access = keys[idx]
-            conflict_operation_type = self.intervals[data_access.buffer_type][conflict_data_access]
-            if data_access.check_conflict(conflict_data_access):
+        intervals = self.intervals[data_access.buffer_type]
+        overlapping_keys = intervals.overlapping(data_access.start, data_access.end)
+        for key in overlapping_keys:
+            operation_id, access_type = intervals.accesses[key]
+            if operation_id != data_access.operation_id and (
+                access_type != DataAccessType.read or data_access.data_access_type != DataAccessType.read
+            ):
                 self.clear_data_access()
-                conflict = True
-                break
+                intervals.replace([], data_access)
+                return True
 
-            self.intervals[data_access.buffer_type].pop(conflict_data_access)
-            if conflict_data_access.end > data_access.end:
-                self.intervals[data_access.buffer_type][
-                    DataAccess(
-                        conflict_data_access.operation_id,
-                        data_access.end + 1,
-                        conflict_data_access.end,
-                        conflict_data_access.buffer_type,
-                        conflict_operation_type,
-                    )
-                ] = conflict_operation_type
-            if conflict_data_access.start < data_access.start:
-                self.intervals[data_access.buffer_type][
-                    DataAccess(
-                        conflict_data_access.operation_id,
-                        conflict_data_access.start,
-                        data_access.start - 1,
-                        conflict_data_access.buffer_type,
-                        conflict_operation_type,
-                    )
-                ] = conflict_operation_type
-
-            keys = self.intervals[data_access.buffer_type].keys()
-            idx = self.lower_bound(0, len(keys) - 1, keys, data_access)
-
-        self.intervals[data_access.buffer_type][data_access] = data_access.data_access_type
-        return conflict
+        intervals.replace(overlapping_keys, data_access)
+        return False
 
     def clear_data_access(self):
         self.intervals[BufferType.input].clear()
         self.intervals[BufferType.output].clear()
         self.intervals[BufferType.scratch].clear()
-
-    def lower_bound(self, init_pos, final_pos, data_access_list, data_access):
-        if init_pos >= final_pos:
-            return init_pos
-
-        mid_pos = (init_pos + final_pos) // 2
-        if data_access.start <= data_access_list[mid_pos].end:
-            final_pos = mid_pos
-        else:
-            init_pos = mid_pos + 1
-        return self.lower_bound(init_pos, final_pos, data_access_list, data_access)
@@ -0,0 +1,245 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+from mscclpp.language.internal.happens_before import ProgramGraph, nested_operations
+from mscclpp.language.internal.operations import *
+from mscclpp.language.internal.types import ChannelType, Instruction
+from collections import defaultdict
+from typing import Dict, List
+
+
+class ResourceSharing:
+    """New numbering of the channels and semaphores of one rank.
+
+    Attributes:
+        channels (Dict[ChannelType, List[int]]): For each channel type, the new id of each
+            original channel of the rank. Channels sharing an id are merged.
+        semaphores (List[int]): The new id of each original semaphore of the rank.
+    """
+
+    __slots__ = ("channels", "semaphores")
+
+    def __init__(self, channels: Dict[ChannelType, List[int]], semaphores: List[int]):
+        self.channels = channels
+        self.semaphores = semaphores
+
+
+class _Slot:
+    """Resources merged into one, each used only after the previous ones are done."""
+
+    __slots__ = ("nodes", "masks", "balanced")
+
+    def __init__(self, num_classes: int):
+        self.nodes = [[] for _ in range(num_classes)]
+        self.masks = [0] * num_classes
+        self.balanced = True
+
+
+def _precedes(masks, classes, graph: ProgramGraph, before) -> bool:
+    return all(
+        masks[position] & ~before[graph.starts[node]] == 0 for position, nodes in enumerate(classes) for node in nodes
+    )
+
+
+def _share(resources, classes, balanced, bits, graph: ProgramGraph, before) -> List[int]:
+    """Greedily merge ``resources`` into slots, returning the slot of each resource.
+
+    The operations of each resource are split into classes that update the same counter, such
+    as the signals of one direction of a channel or the waits of that direction. Only resources
+    that leave their counters as they found them (``balanced``) are merged. A resource joins a
+    slot if, in each class, the operations of the slot all complete before any operation of the
+    resource starts, or the other way around.
+    """
+    slots = []
+    slot_of = []
+    for resource in resources:
+        masks = [sum(bits[node] for node in nodes) for nodes in classes[resource]]
+        for index, slot in enumerate(slots):
+            if (
+                balanced[resource]
+                and slot.balanced
+                and (
+                    _precedes(slot.masks, classes[resource], graph, before)
+                    or _precedes(masks, slot.nodes, graph, before)
+                )
+            ):
+                break
+        else:
+            index, slot = len(slots), _Slot(len(classes[resource]))
+            slots.append(slot)
+        for position, nodes in enumerate(classes[resource]):
+            slot.nodes[position] += nodes
+            slot.masks[position] |= masks[position]
+        slot.balanced = slot.balanced and bool(balanced[resource])
+        slot_of.append(index)
+    return slot_of
+
+
+def plan_channel_sharing(gpus) -> Dict[int, ResourceSharing]:
+    """Compute which channels and semaphores of each rank can be merged.
+
+    A channel holds the semaphores counting the signals between two ranks, the k-th channel of a
+    type from rank r to rank p being paired with the k-th channel from p to r. A wait takes the
+    next value of its counter and returns once as many signals arrived, so two such links between
+    the same ranks can be merged if the first one is balanced, with as many signals as waits in
+    each direction, and if on each rank its signals, and its waits, complete before those of the
+    second link start. The waits of the second link then take values above those of the first
+    and can only be satisfied by its own signals. Semaphores of a rank with the same initial
+    value are merged the same way, ordering releases and acquires separately. Links and
+    semaphores used inside pipelines, whose operations run an unknown number of times, are kept
+    as they are.
+
+    Args:
+        gpus (List[Gpu]): The Gpu objects of the program, before any other pass ran.
+
+    Returns:
+        Dict[int, ResourceSharing]: The new numbering of each rank whose channels or semaphores
+            shrink.
+    """
+    graph = ProgramGraph(gpus)
+
+    links = defaultdict(set)
+    for gpu in gpus:
+        for channel_type, channel in gpu._channels.items():
+            counts = defaultdict(int)
+            for peer in channel.connected_to:
+                links[(min(gpu.id, peer), max(gpu.id, peer), channel_type)].add(counts[peer])
+                counts[peer] += 1
+    links = {key: [key + (ordinal,) for ordinal in sorted(ordinals)] for key, ordinals in links.items()}
+
+    link_classes, link_balanced = {}, {}
+    for link_group in links.values():
+        for link in link_group:
+            first, second, channel_type, ordinal = link
+            forward = (first, second, channel_type, ordinal)
+            backward = (second, first, channel_type, ordinal)
+            link_classes[link] = [
+                [node for _, node in source[key]]
+                for key in (forward, backward)
+                for source in (graph.signals, graph.waits)
+            ]
+            if forward in graph.unpaired or backward in graph.unpaired:
+                link_balanced[link] = None
+            else:
+                link_balanced[link] = len(graph.signals[forward]) == len(graph.waits[backward]) and len(
+                    graph.signals[backward]
+                ) == len(graph.waits[forward])
+
+    semaphore_classes, semaphore_balanced = {}, {}
+    for gpu in gpus:
+        for semaphore_id in range(len(gpu.semaphores)):
+            key = (gpu.id, semaphore_id)
+            semaphore_classes[key] = [[node for _, node in source[key]] for source in (graph.releases, graph.acquires)]
+            if key in graph.unpaired:
+                semaphore_balanced[key] = None
+            else:
+                semaphore_balanced[key] = len(graph.releases[key]) == len(graph.acquires[key])
+
+    bits = {}
+    for classes in list(link_classes.values()) + list(semaphore_classes.values()):
+        for nodes in classes:
+            for node in nodes:
+                bits.setdefault(node, 1 << len(bits))
+    before = graph.completed_before(bits)
+    if before is None:
+        return {}
+
+    link_slots = {}
+    for link_group in links.values():
+        for link, slot in zip(link_group, _share(link_group, link_classes, link_balanced, bits, graph, before)):
+            link_slots[link] = slot
+
+    sharings = {}
+    for gpu in gpus:
+        channels = {}
+        for channel_type, channel in gpu._channels.items():
+            new_ids, slot_ids = [], {}
+            counts = defaultdict(int)
+            for peer in channel.connected_to:
+                link = (min(gpu.id, peer), max(gpu.id, peer), channel_type, counts[peer])
+                counts[peer] += 1
+                new_ids.append(slot_ids.setdefault((peer, link_slots[link]), len(slot_ids)))
+            channels[channel_type] = new_ids
+
+        semaphores = []
+        for init_value in sorted({semaphore.init_value for semaphore in gpu.semaphores}):
+            keys = [
+                (gpu.id, semaphore_id)
+                for semaphore_id, semaphore in enumerate(gpu.semaphores)
+                if semaphore.init_value == init_value
+            ]
+            semaphores += list(zip(keys, _share(keys, semaphore_classes, semaphore_balanced, bits, graph, before)))
+        slot_ids = {}
+        new_semaphores = [0] * len(gpu.semaphores)
+        for (_, semaphore_id), slot in sorted(semaphores, key=lambda entry: entry[0]):
+            new_semaphores[semaphore_id] = slot_ids.setdefault(
+                (gpu.semaphores[semaphore_id].init_value, slot), len(slot_ids)
+            )
+
+        if any(len(set(new_ids)) < len(new_ids) for new_ids in channels.values()) or len(slot_ids) < len(
+            gpu.semaphores
+        ):
+            sharings[gpu.id] = ResourceSharing(channels, new_semaphores)
+    return sharings
+
+
+def apply_channel_sharing(gpu, sharings: Dict[int, ResourceSharing]):
+    """Merge the channels and semaphores of ``gpu`` as planned by ``plan_channel_sharing``.
+
+    Args:
+        gpu (Gpu): The rank whose channels, semaphores and operations are updated.
+        sharings (Dict[int, ResourceSharing]): The numbering computed by ``plan_channel_sharing``.
+    """
+    if gpu.id not in sharings:
+        return
+    sharing = sharings[gpu.id]
+
+    for channel_type, new_ids in sharing.channels.items():
+        connected_to = [None] * (max(new_ids, default=-1) + 1)
+        for channel_id, peer in enumerate(gpu._channels[channel_type].connected_to):
+            connected_to[new_ids[channel_id]] = peer
+        gpu._channels[channel_type].connected_to = connected_to
+
+    semaphores = [None] * (max(sharing.semaphores, default=-1) + 1)
+    for semaphore_id, semaphore in enumerate(gpu.semaphores):
+        semaphores[sharing.semaphores[semaphore_id]] = semaphore
+    gpu.semaphores = semaphores
+
+    for tb in gpu.threadblocks:
+        local_ids = {}
+        for channel_type, channel in tb._channels.items():
+            if channel_type not in sharing.channels:
+                continue
+            new_ids = sharing.channels[channel_type]
+            channel_ids, intra_channel_ids = [], {}
+            for channel_id in channel.channel_ids:
+                intra_channel_ids.setdefault(new_ids[channel_id], len(channel_ids))
+                if len(channel_ids) < len(intra_channel_ids):
+                    channel_ids.append(new_ids[channel_id])
+            local_ids[channel_type] = [intra_channel_ids[new_ids[channel_id]] for channel_id in channel.channel_ids]
+            channel.channel_ids = channel_ids
+            tb._intra_channel_ids[channel_type] = intra_channel_ids
+
+        for operation in tb.ops:
+            for inner_operation in nested_operations(operation):
+                if inner_operation.name in (Instruction.sem_acquire, Instruction.sem_release):
+                    inner_operation.semaphore_ids = [
+                        sharing.semaphores[semaphore_id] for semaphore_id in inner_operation.semaphore_ids
+                    ]
+                channel_type = getattr(inner_operation, "channel_type", None)
+                if channel_type not in local_ids:
+                    continue
+                for attribute in ("channel_ids", "put_channel_ids"):
+                    channel_ids = getattr(inner_operation, attribute, None)
+                    if isinstance(channel_ids, set):
+                        setattr(
+                            inner_operation,
+                            attribute,
+                            {local_ids[channel_type][channel_id] for channel_id in channel_ids},
+                        )
+                    elif isinstance(channel_ids, list):
+                        setattr(
+                            inner_operation,
+                            attribute,
+                            [local_ids[channel_type][channel_id] for channel_id in channel_ids],
+                        )
@@ -7,7 +7,6 @@ from mscclpp.language.internal.operations import BaseOperation
 from dataclasses import dataclass, field
 from collections import *
 from typing import List
-import copy
 
 
 @dataclass
@@ -61,10 +60,18 @@ class Gpu:
 
         self.threadblocks[tb].add_operation(operation)
 
+    def schedule_operations(self):
+        for tb in self.threadblocks:
+            tb.schedule_operations()
+
     def optimize_operations(self):
         for tb in self.threadblocks:
             tb.optimize_operations()
 
+    def coalesce_operations(self):
+        for tb in self.threadblocks:
+            tb.coalesce_operations()
+
     def adding_data_sync(self):
         for tb in self.threadblocks:
             tb.adding_data_sync()
@@ -73,9 +80,15 @@ class Gpu:
         for tb in self.threadblocks:
             tb.resolve_data_dependency()
 
+    def remove_redundant_syncs(self):
+        for tb in self.threadblocks:
+            tb.remove_redundant_syncs()
+
     def replicate_instances(self, instances, default_replication_function, buffer_replication_function):
-        threadblocks = []
+        self.replicate_resources(instances)
+        self.replicate_threadblocks(instances, default_replication_function, buffer_replication_function)
 
+    def replicate_resources(self, instances):
         self.input_chunks *= instances
         self.output_chunks *= instances
         self.scratch_chunks *= instances
@@ -103,9 +116,16 @@ class Gpu:
                 new_semaphores.append(sempahore)
         self.semaphores = new_semaphores
 
+    def replicate_threadblocks(self, instances, default_replication_function, buffer_replication_function):
+        self.threadblocks = self.replicated_threadblocks(
+            instances, default_replication_function, buffer_replication_function
+        )
+
+    def replicated_threadblocks(self, instances, default_replication_function, buffer_replication_function):
+        threadblocks = []
         for threadblock in self.threadblocks:
             for instance in range(instances):
-                tb = copy.deepcopy(threadblock)
+                tb = threadblock.clone()
                 tb.id = default_replication_function(threadblock.id, instance, instances)
 
                 tb.shift_channels(instance, instances, default_replication_function)
@@ -114,7 +134,7 @@ class Gpu:
 
                 threadblocks.append(tb)
 
-        self.threadblocks = threadblocks
+        return threadblocks
 
     def to_dict(self) -> dict:
         return {
@@ -128,6 +148,38 @@ class Gpu:
             "semaphores": [sm.to_dict() for sm in self.semaphores],
         }
 
+    def write_json(self, fp, encode):
+        """Write the compact JSON form of ``to_dict()`` to ``fp``, one threadblock at a time.
+
+        Args:
+            fp: A text file object to write to.
+            encode (Callable): Encoder turning a JSON-compatible object into a compact string.
+        """
+        header = {
+            "id": self.id,
+            "input_chunks": self.input_chunks,
+            "output_chunks": self.output_chunks,
+            "scratch_chunks": self.scratch_chunks,
+        }
+        fp.write(encode(header)[:-1] + ',"threadblocks":[')
+        for i, tb in enumerate(self.threadblocks):
+            if i > 0:
+                fp.write(",")
+            fp.write(encode(tb.to_dict()))
+        trailer = {
+            "channels": [ch.to_dict() for ch in self._channels.values()] + [ch.to_dict() for ch in self._nvls_channels],
+            "remote_buffers": [rb[1].to_dict() for rb in self.remote_buffers.values()],
+            "semaphores": [sm.to_dict() for sm in self.semaphores],
+        }
+        fp.write("]," + encode(trailer)[1:])
+
+    def to_metadata_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "channels": [ch.to_dict() for ch in self._channels.values()] + [ch.to_dict() for ch in self._nvls_channels],
+            "remote_buffers": [rb[1].to_dict() for rb in self.remote_buffers.values()],
+        }
+
     @dataclass
     class Channel:
         channel_type: ChannelType
@@ -0,0 +1,234 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+from mscclpp.language.internal.operations import *
+from mscclpp.language.internal.types import ChannelType, Instruction, SyncType
+from collections import defaultdict, deque
+from typing import Dict, List
+
+SIGNAL_INSTRUCTIONS = {
+    Instruction.signal,
+    Instruction.relaxed_signal,
+    Instruction.put_with_signal,
+    Instruction.put_with_signal_and_flush,
+}
+WAIT_INSTRUCTIONS = {Instruction.wait, Instruction.relaxed_wait}
+
+
+def operation_chunks(operation):
+    """Yield the local and remote chunks listed by ``operation``.
+
+    The operations of switch channels address buffers by offset and through single chunks, which
+    are not yielded.
+    """
+    for attribute in operation._attributes:
+        value = getattr(operation, attribute, None)
+        if isinstance(value, list):
+            for chunk in value:
+                if isinstance(chunk, LocalChunk):
+                    yield chunk
+
+
+def nested_operations(operation):
+    if operation.name == Instruction.pipeline:
+        for inner_operation in operation.operations:
+            yield from nested_operations(inner_operation)
+    else:
+        yield operation
+
+
+def _data_sync(operation) -> SyncType:
+    if operation.name == Instruction.pipeline:
+        return operation.get_data_sync()
+    return getattr(operation, "data_sync", SyncType.none)
+
+
+def _syncs_before(operation) -> bool:
+    return operation.name == Instruction.barrier or _data_sync(operation) in (SyncType.before, SyncType.both)
+
+
+def _syncs_after(operation) -> bool:
+    return operation.name == Instruction.barrier or _data_sync(operation) in (SyncType.after, SyncType.both)
+
+
+def _completes_at_sync(operation) -> bool:
+    """Whether all accesses of ``operation`` are done once the threads of its thread block sync.
+
+    Port channel transfers are executed by the proxy and only complete with a later flush, or
+    remotely before a later signal on the same channel.
+    """
+    return not any(
+        getattr(inner_operation, "channel_type", None) == ChannelType.port
+        and inner_operation.name != Instruction.put_with_signal_and_flush
+        and any(True for _ in operation_chunks(inner_operation))
+        for inner_operation in nested_operations(operation)
+    )
+
+
+class ProgramGraph:
+    """Happens-before graph of the operations of all ranks.
+
+    An edge ``u -> v`` means that ``u`` is complete when ``v`` completes, and when ``v`` starts
+    if ``v`` accesses data. Inside a thread block, the operations before a thread sync (an
+    operation with ``data_sync``, or a barrier) complete before the operations after it start.
+    Across thread blocks and ranks, the k-th signal of a channel completes before the k-th wait
+    on the peer channel and semaphore releases complete before the acquires they enable, if
+    the signals, waits, releases and acquires each come from a single thread block. Anything
+    else, such as signals inside pipelines, adds no edge, which only makes the analysis more
+    conservative.
+
+    ``starts`` holds, for the node of each operation, the thread sync or barrier node it starts
+    after: the nodes completed before that node are complete when the operation starts.
+    """
+
+    def __init__(self, gpus):
+        self.gpus = gpus
+        self.successors = []
+        self.operations = []
+        self.ranks = []
+        self.threadblocks = []
+        self.starts = []
+        self.signals = defaultdict(list)
+        self.waits = defaultdict(list)
+        self.releases = defaultdict(list)
+        self.acquires = defaultdict(list)
+        self.barriers = {}
+        self.unpaired = set()
+        self.remote_buffers = [
+            {remote_buffer_id: remote_buffer for remote_buffer_id, remote_buffer in gpu.remote_buffers.values()}
+            for gpu in gpus
+        ]
+        for gpu in gpus:
+            for tb in gpu.threadblocks:
+                self._add_threadblock(gpu, tb)
+        self._pair(self.signals, self.waits, lambda key: (key[1], key[0], key[2], key[3]), 0)
+        for key in self.releases:
+            rank, semaphore_id = key
+            self._pair(
+                {key: self.releases[key]},
+                self.acquires,
+                lambda key: key,
+                gpus[rank].semaphores[semaphore_id].init_value,
+            )
+
+    def _add_node(self, rank: int = None, tb=None, operation=None, start: int = None) -> int:
+        self.successors.append([])
+        self.operations.append(operation)
+        self.ranks.append(rank)
+        self.threadblocks.append(tb)
+        self.starts.append(start)
+        return len(self.successors) - 1
+
+    def _channel_keys(self, gpu, tb, operation):
+        keys = []
+        for channel_id in operation.channel_ids:
+            gpu_channel_id = tb._channels[operation.channel_type].channel_ids[channel_id]
+            connected_to = gpu._channels[operation.channel_type].connected_to
+            peer = connected_to[gpu_channel_id]
+            keys.append((gpu.id, peer, operation.channel_type, connected_to[:gpu_channel_id].count(peer)))
+        return keys
+
+    def _add_threadblock(self, gpu, tb):
+        gap = self._add_node()
+        segment = []
+        barrier_counts = defaultdict(int)
+        pending_transfers = defaultdict(list)
+        for index, operation in enumerate(tb.ops):
+            if index > 0 and (_syncs_after(tb.ops[index - 1]) or _syncs_before(operation)):
+                next_gap = self._add_node()
+                self.successors[gap].append(next_gap)
+                for node in segment:
+                    self.successors[node].append(next_gap)
+                for transfers in pending_transfers.values():
+                    for transfer in transfers:
+                        transfer[1] = True
+                gap, segment = next_gap, []
+
+            if operation.name == Instruction.barrier:
+                key = (gpu.id, operation.barrier_id, barrier_counts[operation.barrier_id])
+                barrier_counts[operation.barrier_id] += 1
+                if key not in self.barriers:
+                    self.barriers[key] = self._add_node()
+                self.successors[gap].append(self.barriers[key])
+                gap = self.barriers[key]
+                continue
+
+            node = self._add_node(gpu.id, tb, operation, gap)
+            self.successors[gap].append(node)
+            if _completes_at_sync(operation):
+                segment.append(node)
+
+            if operation.name == Instruction.pipeline:
+                for inner_operation in nested_operations(operation):
+                    if inner_operation.name in SIGNAL_INSTRUCTIONS or inner_operation.name in WAIT_INSTRUCTIONS:
+                        self.unpaired.update(self._channel_keys(gpu, tb, inner_operation))
+                    elif (
+                        inner_operation.name == Instruction.sem_release
+                        or inner_operation.name == Instruction.sem_acquire
+                    ):
+                        for semaphore_id in inner_operation.semaphore_ids:
+                            self.unpaired.add((gpu.id, semaphore_id))
+                continue
+
+            if operation.name in SIGNAL_INSTRUCTIONS or operation.name == Instruction.flush:
+                for key in self._channel_keys(gpu, tb, operation):
+                    # A signal is delivered after the transfers queued before it on its channel,
+                    # but a put with signal may start its own transfer before they complete.
+                    for transfer, after_sync in pending_transfers[key]:
+                        if after_sync and operation.name in (
+                            Instruction.signal,
+                            Instruction.relaxed_signal,
+                            Instruction.flush,
+                        ):
+                            self.successors[transfer].append(node)
+                    if operation.name != Instruction.flush:
+                        self.signals[key].append((tb.id, node))
+            elif operation.name in WAIT_INSTRUCTIONS:
+                for key in self._channel_keys(gpu, tb, operation):
+                    self.waits[key].append((tb.id, node))
+            elif operation.name == Instruction.sem_release:
+                for semaphore_id in operation.semaphore_ids:
+                    self.releases[(gpu.id, semaphore_id)].append((tb.id, node))
+            elif operation.name == Instruction.sem_acquire:
+                for semaphore_id in operation.semaphore_ids:
+                    self.acquires[(gpu.id, semaphore_id)].append((tb.id, node))
+
+            if not _completes_at_sync(operation) and getattr(operation, "channel_ids", None) is not None:
+                for key in self._channel_keys(gpu, tb, operation):
+                    pending_transfers[key].append([node, False])
+
+    def _pair(self, sources, targets, target_key, initial_count: int):
+        for key, source_nodes in sources.items():
+            target_nodes = targets.get(target_key(key), [])
+            if key in self.unpaired or target_key(key) in self.unpaired:
+                continue
+            if len({tb for tb, _ in source_nodes}) > 1 or len({tb for tb, _ in target_nodes}) > 1:
+                continue
+            for index, (_, target) in enumerate(target_nodes):
+                source_index = index - initial_count
+                if 0 <= source_index < len(source_nodes):
+                    self.successors[source_nodes[source_index][1]].append(target)
+
+    def completed_before(self, bits: Dict[int, int]) -> List[int]:
+        """For each node, the bits of the nodes of ``bits`` complete before it, or None on a cycle."""
+        in_degrees = [0] * len(self.successors)
+        for successors in self.successors:
+            for successor in successors:
+                in_degrees[successor] += 1
+        before = [0] * len(self.successors)
+        ready = deque(node for node, in_degree in enumerate(in_degrees) if in_degree == 0)
+        visited = 0
+        while ready:
+            node = ready.popleft()
+            visited += 1
+            completed = before[node] | bits.get(node, 0)
+            for successor in self.successors[node]:
+                before[successor] |= completed
+                in_degrees[successor] -= 1
+                if in_degrees[successor] == 0:
+                    ready.append(successor)
+        return before if visited == len(self.successors) else None
+
+    def remote_rank(self, rank: int, tb, operation, chunk) -> int:
+        remote_buffer_ids = tb._remote_buffers[operation.channel_type].remote_buffer_ids
+        return self.remote_buffers[rank][remote_buffer_ids[chunk.buffer_id]].remote_rank
@@ -12,12 +12,19 @@ from mscclpp.language.internal.types import (
     DataAccessType,
 )
 from abc import ABC, abstractmethod
-from dataclasses import dataclass, field
 from typing import List
-import uuid
+import copy
+import itertools
+
+_operation_ids = itertools.count()
+
+# Per operation limits of the executor, see src/include/execution_common.hpp. An operation holds
+# MAX_LOCAL_BUFFER_PER_OPERATION (2) + MAX_CHANNEL_PER_OPERATION source and destination buffers.
+MAX_CHANNEL_PER_OPERATION = 8
+MAX_BUFFER_PER_OPERATION = 10
+MAX_DEVICE_SEMAPHORES = 16
 
 
-@dataclass
 class BaseOperation(ABC):
     """Abstract base class for all MSCCLPP operations.
 
@@ -25,14 +32,27 @@ class BaseOperation(ABC):
     in MSCCLPP programs, including communication operations, synchronization
     operations, and data manipulation operations.
 
+    Operations use ``__slots__`` to keep programs with many operations compact. Subclasses
+    must declare the attributes they set in their own ``__slots__``.
+
     Attributes:
-        id (uuid.UUID): Unique identifier for this operation instance, automatically
-            generated using UUID4.
+        id (int): Unique identifier for this operation instance, taken from a process-wide
+            counter.
         name (str): The name/type of the operation, typically from the Instruction enum.
     """
 
-    id: uuid.UUID = field(default_factory=uuid.uuid4, init=False)
-    name: str
+    __slots__ = ("id", "name")
+    _attributes = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._attributes = tuple(
+            attribute for klass in reversed(cls.__mro__) for attribute in klass.__dict__.get("__slots__", ())
+        )
+
+    def __init__(self, name: Instruction):
+        self.id = next(_operation_ids)
+        self.name = name
 
     def local_data_access(self, sync_purpose=True):
         """Get list of local data accesses performed by this operation.
@@ -81,6 +101,21 @@ class BaseOperation(ABC):
         """
         return
 
+    def clone(self):
+        """Create a copy of this operation for another instance.
+
+        Used by instance replication instead of ``copy.deepcopy``. Only the state that
+        ``shift_buffers`` and ``shift_ids`` modify is copied; everything else (channel ids,
+        thread block group info, barrier info, ...) is shared with the original operation.
+
+        Returns:
+            BaseOperation: The copied operation.
+        """
+        operation = object.__new__(type(self))
+        for attribute in self._attributes:
+            setattr(operation, attribute, getattr(self, attribute))
+        return operation
+
     def __add__(self, other):
         """Attempt to fuse this operation with another operation.
 
@@ -93,35 +128,99 @@ class BaseOperation(ABC):
         """
         return None
 
+    def coalesce(self, other=None):
+        """Attempt to merge the transfers of contiguous chunks into fewer, larger transfers.
+
+        Unlike fusion, which lists the buffers of both operations in one operation, coalescing
+        replaces two transfers whose source and destination chunks are adjacent, and which use
+        the same channel, by a single transfer of the combined chunks.
+
+        Args:
+            other (BaseOperation, optional): The operation following this one. If None, the
+                transfers of this operation itself are coalesced.
+
+        Returns:
+            BaseOperation: The coalesced operation, or None if no transfer could be merged.
+        """
+        return None
+
 
-@dataclass
 class LocalChunk:
-    type: BufferType
-    index: int
-    size: int
+    __slots__ = ("type", "index", "size")
+
+    def __init__(self, type: BufferType, index: int, size: int):
+        self.type = type
+        self.index = index
+        self.size = size
+
+    def __eq__(self, other):
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return self.type == other.type and self.index == other.index and self.size == other.size
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"{type(self).__name__}(type={self.type!r}, index={self.index!r}, size={self.size!r})"
+
+    def clone(self):
+        return LocalChunk(self.type, self.index, self.size)
 
     def to_dict(self):
         return {"type": self.type.value, "index": self.index, "size": self.size}
 
 
-@dataclass
 class RemoteChunk(LocalChunk):
-    buffer_id: int
+    __slots__ = ("buffer_id",)
+
+    def __init__(self, type: BufferType, index: int, size: int, buffer_id: int):
+        super().__init__(type, index, size)
+        self.buffer_id = buffer_id
+
+    def __eq__(self, other):
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return super().__eq__(other) and self.buffer_id == other.buffer_id
+
+    __hash__ = None
+
+    def __repr__(self):
+        return (
+            f"{type(self).__name__}(type={self.type!r}, index={self.index!r}, size={self.size!r}, "
+            f"buffer_id={self.buffer_id!r})"
+        )
+
+    def clone(self):
+        return RemoteChunk(self.type, self.index, self.size, self.buffer_id)
 
     def to_dict(self):
         return {"buffer_id": self.buffer_id, "index": self.index, "size": self.size}
 
 
-@dataclass
 class ThreadBlockGroupInfo:
-    tb_id: int
-    tbg_size: int
+    __slots__ = ("tb_id", "tbg_size")
+
+    def __init__(self, tb_id: int, tbg_size: int):
+        self.tb_id = tb_id
+        self.tbg_size = tbg_size
+
+    def __eq__(self, other):
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return self.tb_id == other.tb_id and self.tbg_size == other.tbg_size
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"ThreadBlockGroupInfo(tb_id={self.tb_id!r}, tbg_size={self.tbg_size!r})"
 
     def to_dict(self):
         return {"tb_id": self.tb_id, "tbg_size": self.tbg_size}
 
 
 class SyncOperation(BaseOperation):
+    __slots__ = ()
+
     def __init__(self):
         super().__init__(Instruction.nop)
 
@@ -144,6 +243,8 @@ class SyncOperation(BaseOperation):
 
 
 class CopyOperation(BaseOperation):
+    __slots__ = ("src_buff", "dst_buff", "tbg_info")
+
     def __init__(
         self,
         src_buff: List[LocalChunk],
@@ -185,6 +286,27 @@ class CopyOperation(BaseOperation):
         for chunk in self.dst_buff:
             chunk.index = replication_function(chunk.index, chunk.size, instance, num_instances)
 
+    def clone(self):
+        operation = super().clone()
+        operation.src_buff = [chunk.clone() for chunk in self.src_buff]
+        operation.dst_buff = [chunk.clone() for chunk in self.dst_buff]
+        return operation
+
+    def coalesce(self, other=None):
+        coalesced_operation = None
+        if (
+            isinstance(other, CopyOperation)
+            and self.name == Instruction.copy
+            and other.name == Instruction.copy
+            and self.tbg_info is None
+            and other.tbg_info is None
+        ):
+            src_buff, dst_buff, _ = coalesce_transfers(self.src_buff + other.src_buff, self.dst_buff + other.dst_buff)
+            if len(src_buff) == 1:
+                coalesced_operation = CopyOperation(src_buff=src_buff, dst_buff=dst_buff)
+
+        return coalesced_operation
+
     def to_dict(self):
         result = {"name": self.name.value}
         result["src_buff"] = []
@@ -199,6 +321,8 @@ class CopyOperation(BaseOperation):
 
 
 class SemaphoreAcquireOperation(BaseOperation):
+    __slots__ = ("semaphore_ids", "data_sync")
+
     def __init__(self, semaphore_ids: List[int], data_sync: SyncType = SyncType.none):
         super().__init__(Instruction.sem_acquire)
         self.semaphore_ids = semaphore_ids
@@ -208,6 +332,11 @@ class SemaphoreAcquireOperation(BaseOperation):
         for i in range(len(self.semaphore_ids)):
             self.semaphore_ids[i] = replication_function(self.semaphore_ids[i], instance, num_instances)
 
+    def clone(self):
+        operation = super().clone()
+        operation.semaphore_ids = list(self.semaphore_ids)
+        return operation
+
     def __add__(self, other):
         fused_operation = None
         if isinstance(other, SemaphoreAcquireOperation):
@@ -232,6 +361,8 @@ class SemaphoreAcquireOperation(BaseOperation):
 
 
 class SemaphoreReleaseOperation(BaseOperation):
+    __slots__ = ("semaphore_ids", "data_sync")
+
     def __init__(self, semaphore_ids: List[int], data_sync: SyncType = SyncType.none):
         super().__init__(Instruction.sem_release)
         self.semaphore_ids = semaphore_ids
@@ -241,6 +372,11 @@ class SemaphoreReleaseOperation(BaseOperation):
         for i in range(len(self.semaphore_ids)):
             self.semaphore_ids[i] = replication_function(self.semaphore_ids[i], instance, num_instances)
 
+    def clone(self):
+        operation = super().clone()
+        operation.semaphore_ids = list(self.semaphore_ids)
+        return operation
+
     def __add__(self, other):
         fused_operation = None
         if isinstance(other, SemaphoreReleaseOperation):
@@ -265,6 +401,8 @@ class SemaphoreReleaseOperation(BaseOperation):
 
 
 class SignalOperation(BaseOperation):
+    __slots__ = ("channel_ids", "channel_type", "data_sync")
+
     def __init__(
         self,
         channels_ids: List[int],
@@ -312,6 +450,8 @@ class SignalOperation(BaseOperation):
 
 
 class WaitOperation(BaseOperation):
+    __slots__ = ("channel_ids", "channel_type", "data_sync")
+
     def __init__(
         self,
         channels_ids: List[int],
@@ -359,6 +499,8 @@ class WaitOperation(BaseOperation):
 
 
 class BarrierOperation(BaseOperation):
+    __slots__ = ("barrier_id", "barrier_info")
+
     __current_barriers = []
 
     def __init__(self, rank: int, tb_list: List[int]):
@@ -395,6 +537,8 @@ class BarrierOperation(BaseOperation):
         return result
 
     class BarrierInfo:
+        __slots__ = ("tb_list",)
+
         def __init__(self, tb_list):
             self.tb_list = tb_list
 
@@ -406,6 +550,8 @@ class BarrierOperation(BaseOperation):
 
 
 class FlushOperation(BaseOperation):
+    __slots__ = ("channel_ids", "channel_type", "data_sync")
+
     def __init__(self, channels_ids: List[int], channel_type: ChannelType, data_sync: SyncType = SyncType.none):
         super().__init__(Instruction.flush)
         self.channel_ids = set(channels_ids)
@@ -438,6 +584,8 @@ class FlushOperation(BaseOperation):
 
 
 class GetOperation(BaseOperation):
+    __slots__ = ("src_buff", "dst_buff", "channel_ids", "channel_type", "tbg_info")
+
     def __init__(
         self,
         src_buff: List[RemoteChunk],
@@ -467,6 +615,12 @@ class GetOperation(BaseOperation):
         for chunk in self.dst_buff:
             chunk.index = replication_function(chunk.index, chunk.size, instance, num_instances)
 
+    def clone(self):
+        operation = super().clone()
+        operation.src_buff = [chunk.clone() for chunk in self.src_buff]
+        operation.dst_buff = [chunk.clone() for chunk in self.dst_buff]
+        return operation
+
     def __add__(self, other):
         fused_operation = None
         if (
@@ -485,6 +639,29 @@ class GetOperation(BaseOperation):
 
         return fused_operation
 
+    def coalesce(self, other=None):
+        coalesced_operation = None
+        if self.tbg_info is None and (
+            other is None
+            or (isinstance(other, GetOperation) and self.channel_type == other.channel_type and other.tbg_info is None)
+        ):
+            operations = [self] if other is None else [self, other]
+            src_buff, dst_buff, channel_ids = coalesce_transfers(
+                [chunk for operation in operations for chunk in operation.src_buff],
+                [chunk for operation in operations for chunk in operation.dst_buff],
+                [channel_id for operation in operations for channel_id in operation.channel_ids],
+            )
+            # Coalescing must merge at least one transfer and never grow this operation
+            if len(src_buff) < len(self.src_buff) or (other is not None and len(src_buff) == len(self.src_buff)):
+                coalesced_operation = GetOperation(
+                    src_buff=src_buff,
+                    dst_buff=dst_buff,
+                    channel_ids=channel_ids,
+                    channel_type=self.channel_type,
+                )
+
+        return coalesced_operation
+
     def to_dict(self):
         result = {"name": self.name.value}
         result["src_buff"] = []
@@ -501,6 +678,17 @@ class GetOperation(BaseOperation):
 
 
 class PutOperation(BaseOperation):
+    __slots__ = (
+        "src_buff",
+        "dst_buff",
+        "channel_ids",
+        "channel_type",
+        "to_packet",
+        "with_signal",
+        "with_signal_and_flush",
+        "tbg_info",
+    )
+
     def __init__(
         self,
         src_buff: List[LocalChunk],
@@ -554,6 +742,12 @@ class PutOperation(BaseOperation):
         for chunk in self.dst_buff:
             chunk.index = replication_function(chunk.index, chunk.size, instance, num_instances)
 
+    def clone(self):
+        operation = super().clone()
+        operation.src_buff = [chunk.clone() for chunk in self.src_buff]
+        operation.dst_buff = [chunk.clone() for chunk in self.dst_buff]
+        return operation
+
     def __add__(self, other):
         fused_operation = None
         if (
@@ -582,6 +776,38 @@ class PutOperation(BaseOperation):
 
         return fused_operation
 
+    def coalesce(self, other=None):
+        coalesced_operation = None
+        if (
+            self.name == Instruction.put
+            and self.tbg_info is None
+            and (
+                other is None
+                or (
+                    isinstance(other, PutOperation)
+                    and other.name == Instruction.put
+                    and self.channel_type == other.channel_type
+                    and other.tbg_info is None
+                )
+            )
+        ):
+            operations = [self] if other is None else [self, other]
+            src_buff, dst_buff, channel_ids = coalesce_transfers(
+                [chunk for operation in operations for chunk in operation.src_buff],
+                [chunk for operation in operations for chunk in operation.dst_buff],
+                [channel_id for operation in operations for channel_id in operation.channel_ids],
+            )
+            # Coalescing must merge at least one transfer and never grow this operation
+            if len(src_buff) < len(self.src_buff) or (other is not None and len(src_buff) == len(self.src_buff)):
+                coalesced_operation = PutOperation(
+                    src_buff=src_buff,
+                    dst_buff=dst_buff,
+                    channel_ids=channel_ids,
+                    channel_type=self.channel_type,
+                )
+
+        return coalesced_operation
+
     def to_dict(self):
         result = {"name": self.name.value}
         result["src_buff"] = []
@@ -598,8 +824,21 @@ class PutOperation(BaseOperation):
         return result
 
 
-@dataclass
 class ReduceOperation(BaseOperation):
+    __slots__ = (
+        "local_src_buff",
+        "local_dst_buff",
+        "local_pkt_dst_buff",
+        "remote_src_buff",
+        "remote_dst_buff",
+        "channel_ids",
+        "put_channel_ids",
+        "channel_type",
+        "reduce_operation",
+        "tbg_info",
+        "packet",
+    )
+
     def __init__(
         self,
         local_src_buff: List[LocalChunk],
@@ -667,6 +906,11 @@ class ReduceOperation(BaseOperation):
             data_access.append(
                 DataAccess(self.id, chunk.index, chunk.index + chunk.size - 1, chunk.type, DataAccessType.write)
             )
+        if not sync_purpose:
+            for chunk in self.local_pkt_dst_buff:
+                data_access.append(
+                    DataAccess(self.id, chunk.index, chunk.index + chunk.size - 1, chunk.type, DataAccessType.write)
+                )
         return data_access
 
     def shift_buffers(self, instance, num_instances, replication_function):
@@ -679,6 +923,15 @@ class ReduceOperation(BaseOperation):
         for chunk in self.remote_dst_buff:
             chunk.index = replication_function(chunk.index, chunk.size, instance, num_instances)
 
+    def clone(self):
+        operation = super().clone()
+        operation.local_src_buff = [chunk.clone() for chunk in self.local_src_buff]
+        operation.local_dst_buff = [chunk.clone() for chunk in self.local_dst_buff]
+        operation.local_pkt_dst_buff = [chunk.clone() for chunk in self.local_pkt_dst_buff]
+        operation.remote_src_buff = [chunk.clone() for chunk in self.remote_src_buff]
+        operation.remote_dst_buff = [chunk.clone() for chunk in self.remote_dst_buff]
+        return operation
+
     def __add__(self, other):
         fused_operation = None
         if (
@@ -725,7 +978,7 @@ class ReduceOperation(BaseOperation):
                 remote_dst_buff=self.remote_dst_buff + other.dst_buff,
                 channel_ids=self.channel_ids,
                 put_channel_ids=self.put_channel_ids + other.channel_ids,
-                channel_type=self.channel_type,
+                channel_type=other.channel_type,
                 reduce_operation=self.reduce_operation,
                 tbg_info=self.tbg_info,
                 packet=self.packet,
@@ -822,8 +1075,9 @@ class ReduceOperation(BaseOperation):
         return result
 
 
-@dataclass
 class GroupLoadReduce(BaseOperation):
+    __slots__ = ("buffer_type", "buffer_offset", "size", "dst_chunk", "channel_ids", "channel_type", "reduce_operation")
+
     def __init__(
         self,
         buffer_type: BufferType,
@@ -847,6 +1101,11 @@ class GroupLoadReduce(BaseOperation):
         self.buffer_offset = replication_function(self.buffer_offset, self.size, instance, num_instances)
         self.dst_chunk.index = replication_function(self.dst_chunk.index, self.size, instance, num_instances)
 
+    def clone(self):
+        operation = super().clone()
+        operation.dst_chunk = copy.copy(self.dst_chunk)
+        return operation
+
     def __add__(self, other):
         fused_operation = None
         if (
@@ -881,8 +1140,9 @@ class GroupLoadReduce(BaseOperation):
         return result
 
 
-@dataclass
 class GroupStore(BaseOperation):
+    __slots__ = ("src_chunk", "buffer_type", "buffer_offset", "size", "channel_ids", "channel_type")
+
     def __init__(
         self,
         src_chunk: Chunk,
@@ -904,6 +1164,11 @@ class GroupStore(BaseOperation):
         self.buffer_offset = replication_function(self.buffer_offset, self.size, instance, num_instances)
         self.src_chunk.index = replication_function(self.src_chunk.index, self.size, instance, num_instances)
 
+    def clone(self):
+        operation = super().clone()
+        operation.src_chunk = copy.copy(self.src_chunk)
+        return operation
+
     def to_dict(self):
         result = {"name": self.name.value}
         result["src_chunk"] = self.src_chunk.to_dict()
@@ -915,8 +1180,9 @@ class GroupStore(BaseOperation):
         return result
 
 
-@dataclass
 class GroupLoadReduceStore(BaseOperation):
+    __slots__ = ("buffer_type", "size", "src_index", "dst_index", "channel_ids", "channel_type", "reduce_operation")
+
     def __init__(
         self,
         buffer_type: BufferType,
@@ -942,6 +1208,12 @@ class GroupLoadReduceStore(BaseOperation):
         for i in range(len(self.dst_index)):
             self.dst_index[i] = replication_function(self.dst_index[i], self.size, instance, num_instances)
 
+    def clone(self):
+        operation = super().clone()
+        operation.src_index = list(self.src_index)
+        operation.dst_index = list(self.dst_index)
+        return operation
+
     def to_dict(self):
         result = {"name": self.name.value}
         result["src_buff"] = []
@@ -959,8 +1231,9 @@ class GroupLoadReduceStore(BaseOperation):
         return result
 
 
-@dataclass
 class PipelineOperation(BaseOperation):
+    __slots__ = ("unit_size", "num_chunks", "operations")
+
     def __init__(self, unit_size: int, num_chunks: int, operations=None):
         super().__init__(Instruction.pipeline)
         self.unit_size = unit_size
@@ -1004,6 +1277,11 @@ class PipelineOperation(BaseOperation):
         for operation in self.operations:
             operation.shift_ids(instance, num_instances, replication_function)
 
+    def clone(self):
+        operation = super().clone()
+        operation.operations = [op.clone() for op in self.operations]
+        return operation
+
     def __add__(self, other):
         fused_operation = None
         if (self.get_data_sync() & SyncType.after) == SyncType.after and check_data_sync_op(other):
@@ -1022,6 +1300,88 @@ class PipelineOperation(BaseOperation):
         return result
 
 
+def _continues(first: LocalChunk, second: LocalChunk) -> bool:
+    return (
+        first.__class__ is second.__class__
+        and first.type == second.type
+        and getattr(first, "buffer_id", None) == getattr(second, "buffer_id", None)
+        and first.index + first.size == second.index
+    )
+
+
+def coalesce_transfers(src_buff: List[LocalChunk], dst_buff: List[LocalChunk], channel_ids: List[int] = None):
+    """Merge the transfers of an operation whose chunks continue each other.
+
+    Transfer ``i`` moves ``src_buff[i]`` to ``dst_buff[i]``, over ``channel_ids[i]`` if given. Two
+    transfers over the same channel are merged when both the source and the destination chunk of
+    one start where the chunks of the other end. All transfers of an operation run before the
+    next operation starts, so their order within the operation does not matter.
+
+    Args:
+        src_buff (List[LocalChunk]): The source chunks of the transfers.
+        dst_buff (List[LocalChunk]): The destination chunks of the transfers.
+        channel_ids (List[int], optional): The channel of each transfer.
+
+    Returns:
+        tuple: The source chunks, destination chunks and channel ids (None if not given) of the
+            merged transfers. The chunks are copies, the given chunks are left unchanged.
+    """
+    transfers = []
+    for i in range(len(src_buff)):
+        channel_id = channel_ids[i] if channel_ids is not None else None
+        transfer = (src_buff[i].clone(), dst_buff[i].clone(), channel_id)
+        merged = True
+        while merged:
+            merged = False
+            for j, (src, dst, other_channel_id) in enumerate(transfers):
+                if other_channel_id != transfer[2]:
+                    continue
+                if _continues(src, transfer[0]) and _continues(dst, transfer[1]):
+                    first, second = (src, dst), transfer
+                elif _continues(transfer[0], src) and _continues(transfer[1], dst):
+                    first, second = transfer, (src, dst)
+                else:
+                    continue
+                first[0].size += second[0].size
+                first[1].size += second[1].size
+                transfer = (first[0], first[1], channel_id)
+                del transfers[j]
+                merged = True
+                break
+        transfers.append(transfer)
+
+    return (
+        [transfer[0] for transfer in transfers],
+        [transfer[1] for transfer in transfers],
+        [transfer[2] for transfer in transfers] if channel_ids is not None else None,
+    )
+
+
+def operation_limit_violations(operation) -> List[str]:
+    """Return how ``operation`` exceeds the per operation limits of the executor.
+
+    The operation is counted in its serialized form, which the executor loads into fixed size
+    arrays of channels, source and destination buffers and semaphores.
+
+    Args:
+        operation (BaseOperation): The operation to check.
+
+    Returns:
+        List[str]: One description per exceeded limit, empty if the executor can load the operation.
+    """
+    result = operation.to_dict()
+    violations = []
+    for key, limit in (
+        ("channel_ids", MAX_CHANNEL_PER_OPERATION),
+        ("src_buff", MAX_BUFFER_PER_OPERATION),
+        ("dst_buff", MAX_BUFFER_PER_OPERATION),
+        ("semaphore_ids", MAX_DEVICE_SEMAPHORES),
+    ):
+        if len(result.get(key, [])) > limit:
+            violations.append(f"{len(result[key])} {key} (at most {limit})")
+    return violations
+
+
 def check_data_sync_op(operation):
     return (
         isinstance(operation, SemaphoreAcquireOperation)
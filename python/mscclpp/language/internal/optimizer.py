@@ -1,6 +1,8 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT License.
 
+import bisect
+
 from mscclpp.language.internal.operations import *
 from mscclpp.language.internal.types import SyncType
 
@@ -20,7 +22,8 @@ def fuse_operations(operations):
         while next_operation_index < len(operations):
             next_operation = operations[next_operation_index]
             fused_operation = current_operation + next_operation
-            if fused_operation is None:
+            # Fusing stops before the fused operation outgrows what the executor can load
+            if fused_operation is None or operation_limit_violations(fused_operation):
                 break
             current_operation = fused_operation
             next_operation_index += 1
@@ -29,3 +32,282 @@ def fuse_operations(operations):
         operation_index = next_operation_index
 
     return fused_operations
+
+
+def coalesce_operations(operations):
+    """Merge transfers of contiguous chunks into single transfers of the combined chunks.
+
+    Consecutive copies, puts or gets whose source and destination chunks continue each other on
+    the same channel are replaced by one operation moving the combined chunks, and so are such
+    transfers within one fused operation. Consecutive operations are only merged if they do not
+    access the same local data, since the parts of the merged transfer run unordered. Operations
+    of thread block groups are left as is, since their members split each chunk among themselves,
+    and so are pipeline bodies, whose chunks are iterated in units.
+
+    Args:
+        operations (List[BaseOperation]): The operations of a thread block.
+
+    Returns:
+        List[BaseOperation]: The operations with contiguous transfers coalesced.
+    """
+    coalesced_operations = []
+    for operation in operations:
+        coalesced_operation = operation.coalesce()
+        if coalesced_operation is not None:
+            operation = coalesced_operation
+        if len(coalesced_operations) > 0 and not _access_conflict(
+            coalesced_operations[-1].local_data_access(), operation.local_data_access()
+        ):
+            coalesced_operation = coalesced_operations[-1].coalesce(operation)
+            if coalesced_operation is not None:
+                coalesced_operations[-1] = coalesced_operation
+                continue
+        coalesced_operations.append(operation)
+
+    return coalesced_operations
+
+
+# Scheduling classes of operations. Local operations only touch buffers of their own rank, remote
+# operations move data to or from peers without blocking, signals notify peers or other thread
+# blocks without blocking, and waiting operations block until a peer or another thread block made
+# progress. Any other operation keeps its position relative to all others.
+_LOCAL = "local"
+_REMOTE = "remote"
+_SIGNAL = "signal"
+_WAITING = "waiting"
+_ORDERED = "ordered"
+
+_LOCAL_INSTRUCTIONS = {Instruction.copy, Instruction.copy_packet, Instruction.reduce}
+_REMOTE_INSTRUCTIONS = {
+    Instruction.put,
+    Instruction.put_packet,
+    Instruction.put_with_signal,
+    Instruction.put_with_signal_and_flush,
+    Instruction.get,
+    Instruction.read_reduce,
+    Instruction.read_reduce_send,
+    Instruction.reduce_send,
+}
+_SIGNAL_INSTRUCTIONS = {Instruction.signal, Instruction.relaxed_signal, Instruction.sem_release}
+_WAITING_INSTRUCTIONS = {
+    Instruction.wait,
+    Instruction.relaxed_wait,
+    Instruction.sem_acquire,
+    Instruction.flush,
+    Instruction.unpack_packet,
+    Instruction.reduce_packet,
+    Instruction.reduce_copy_packet,
+}
+
+# Pairs (earlier, later) of classes whose operations may swap when they do not access the same
+# local data. Work, including other signals, may move ahead of a signal, which then announces it
+# sooner, but never behind one, which could announce its result before it is done. Local work
+# never blocks, so it may also move ahead of remote operations and behind waits, but never ahead
+# of a wait, which could guard its inputs. Remote operations and waits keep their order.
+_COMMUTING_CLASSES = {
+    (_LOCAL, _LOCAL),
+    (_REMOTE, _LOCAL),
+    (_SIGNAL, _LOCAL),
+    (_SIGNAL, _REMOTE),
+    (_SIGNAL, _SIGNAL),
+    (_LOCAL, _WAITING),
+}
+
+# When no ready operation fuses with the previous one, local work is scheduled first, since it may
+# be moved ahead of sends, and signals last, since they may be delayed behind everything but waits.
+_SCHEDULING_PRIORITY = {_LOCAL: 0, _REMOTE: 1, _WAITING: 1, _ORDERED: 1, _SIGNAL: 2}
+
+
+def _scheduling_class(operation):
+    if operation.name in _LOCAL_INSTRUCTIONS:
+        return _LOCAL
+    if operation.name in _REMOTE_INSTRUCTIONS:
+        return _REMOTE
+    if operation.name in _SIGNAL_INSTRUCTIONS:
+        return _SIGNAL
+    if operation.name in _WAITING_INSTRUCTIONS:
+        return _WAITING
+    return _ORDERED
+
+
+def _access_conflict(first_accesses, second_accesses):
+    for first in first_accesses:
+        for second in second_accesses:
+            if first.buffer_type == second.buffer_type and first.check_conflict(second):
+                return True
+    return False
+
+
+def _fused_length(operations):
+    return len(fuse_operations([operation.clone() for operation in operations]))
+
+
+def schedule_operations(operations):
+    """Reorder independent operations of a thread block so that fusable operations become adjacent.
+
+    A dependency graph is built from the local data accesses of the operations and from the
+    ordering constraints of their scheduling classes, see ``_COMMUTING_CLASSES``: waits, barriers
+    and operations of unknown kinds never move relative to each other, and nothing moves behind
+    a signal or ahead of a wait. The operations are then list scheduled, preferring at each step
+    the earliest ready operation that fuses with the previous one, then local operations and
+    signals last, so that sends and signals gather in front of the next operation that needs
+    them. The original order is kept unless the new one fuses into fewer operations. The
+    operations of pipelines are scheduled independently.
+
+    Args:
+        operations (List[BaseOperation]): The operations of a thread block, in program order.
+
+    Returns:
+        List[BaseOperation]: The same operations in the new order, not yet fused.
+    """
+    for operation in operations:
+        if operation.name == Instruction.pipeline:
+            operation.operations = schedule_operations(operation.operations)
+
+    classes = [_scheduling_class(operation) for operation in operations]
+    accesses = [operation.local_data_access(sync_purpose=False) for operation in operations]
+    successors = [[] for _ in operations]
+    pending = [0] * len(operations)
+    for second in range(len(operations)):
+        for first in range(second):
+            if (classes[first], classes[second]) not in _COMMUTING_CLASSES or _access_conflict(
+                accesses[first], accesses[second]
+            ):
+                successors[first].append(second)
+                pending[second] += 1
+
+    ready = [index for index in range(len(operations)) if pending[index] == 0]
+    scheduled = []
+    current = None
+    while len(ready) > 0:
+        choice, fused = None, None
+        if current is not None:
+            for position, index in enumerate(ready):
+                # __add__ may update the synchronization flags of its operands, so probe on clones.
+                fused = current.clone() + operations[index].clone()
+                if fused is not None:
+                    choice = position
+                    break
+        if choice is None:
+            choice = min(range(len(ready)), key=lambda position: _SCHEDULING_PRIORITY[classes[ready[position]]])
+        index = ready.pop(choice)
+        scheduled.append(operations[index])
+        current = fused if fused is not None else operations[index].clone()
+        for successor in successors[index]:
+            pending[successor] -= 1
+            if pending[successor] == 0:
+                bisect.insort(ready, successor)
+
+    if _fused_length(scheduled) >= _fused_length(operations):
+        return operations
+    return scheduled
+
+
+# Roles of operations for thread synchronization. Waiting operations are only observed by the
+# threads that executed them, announcing operations tell peers or other thread blocks that the
+# preceding work is complete, and data operations access memory as described by
+# local_data_access. Operations without roles, such as pipelines, always need their syncs.
+_DATA = "data"
+_ANNOUNCES = "announces"
+_BLOCKS = "blocks"
+_FLUSHES = "flushes"
+
+_SYNC_ROLES = {
+    Instruction.copy: {_DATA},
+    Instruction.copy_packet: {_DATA},
+    Instruction.unpack_packet: {_DATA},
+    Instruction.reduce: {_DATA},
+    Instruction.reduce_packet: {_DATA},
+    Instruction.reduce_copy_packet: {_DATA},
+    Instruction.reduce_send: {_DATA},
+    Instruction.reduce_send_packet: {_DATA},
+    Instruction.reduce_copy_send_packet: {_DATA},
+    Instruction.read_reduce: {_DATA},
+    Instruction.read_reduce_send: {_DATA},
+    Instruction.get: {_DATA},
+    Instruction.put: {_DATA},
+    Instruction.put_packet: {_DATA},
+    Instruction.read_put_packet: {_DATA},
+    Instruction.put_with_signal: {_DATA, _ANNOUNCES},
+    Instruction.put_with_signal_and_flush: {_DATA, _ANNOUNCES, _BLOCKS},
+    Instruction.signal: {_ANNOUNCES},
+    Instruction.relaxed_signal: {_ANNOUNCES},
+    Instruction.sem_release: {_ANNOUNCES},
+    Instruction.wait: {_BLOCKS},
+    Instruction.relaxed_wait: {_BLOCKS},
+    Instruction.sem_acquire: {_BLOCKS},
+    Instruction.flush: {_BLOCKS, _FLUSHES},
+}
+
+# Whether data operations that access peer memory write to it.
+_REMOTE_WRITES = {
+    Instruction.put: True,
+    Instruction.put_packet: True,
+    Instruction.read_put_packet: True,
+    Instruction.put_with_signal: True,
+    Instruction.put_with_signal_and_flush: True,
+    Instruction.reduce_send: True,
+    Instruction.reduce_send_packet: True,
+    Instruction.reduce_copy_send_packet: True,
+    Instruction.read_reduce_send: True,
+    Instruction.read_reduce: False,
+    Instruction.get: False,
+}
+
+
+def _needs_sync(first, second):
+    first_roles = _SYNC_ROLES.get(first.name)
+    second_roles = _SYNC_ROLES.get(second.name)
+    if first_roles is None or second_roles is None:
+        return True
+    if _BLOCKS in first_roles and (_DATA in second_roles or _ANNOUNCES in second_roles):
+        return True
+    if _ANNOUNCES in second_roles and (_DATA in first_roles or _BLOCKS in first_roles):
+        return True
+    if _FLUSHES in second_roles and _DATA in first_roles:
+        return True
+    if _DATA in first_roles and _DATA in second_roles:
+        if first.name in _REMOTE_WRITES and second.name in _REMOTE_WRITES:
+            if _REMOTE_WRITES[first.name] or _REMOTE_WRITES[second.name]:
+                return True
+        return _access_conflict(first.local_data_access(), second.local_data_access())
+    return False
+
+
+def remove_redundant_syncs(operations):
+    """Remove the syncs of a thread block that do not order anything.
+
+    A sync (``nop``) is kept only if an operation executed since the previous kept sync, barrier
+    or the start of the thread block must complete on all threads before an operation that runs
+    until the next sync, barrier or the end of the thread block: data operations with conflicting
+    local accesses or accessing peer memory, waits followed by data operations or signals, data
+    operations or waits followed by signals, and data operations followed by flushes. Syncs next
+    to operations of other kinds, such as pipelines, are always kept. Barriers synchronize the
+    threads of the thread block themselves and are never removed. Pipeline bodies are left as is.
+
+    Args:
+        operations (List[BaseOperation]): The operations of a thread block, with syncs inserted.
+
+    Returns:
+        List[BaseOperation]: The operations without the redundant syncs.
+    """
+    result_operations = []
+    previous_operations = []
+    for index, operation in enumerate(operations):
+        if operation.name == Instruction.nop:
+            next_operations = []
+            for next_operation in operations[index + 1 :]:
+                if next_operation.name == Instruction.nop or next_operation.name == Instruction.barrier:
+                    break
+                next_operations.append(next_operation)
+            if any(_needs_sync(first, second) for first in previous_operations for second in next_operations):
+                result_operations.append(operation)
+                previous_operations = []
+        elif operation.name == Instruction.barrier:
+            result_operations.append(operation)
+            previous_operations = []
+        else:
+            result_operations.append(operation)
+            previous_operations.append(operation)
+
+    return result_operations
@@ -0,0 +1,156 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Set
+import os
+import sys
+import time
+
+_pass_hook = None
+
+
+def set_pass_hook(hook: Optional[Callable[["PassRecord"], None]]):
+    """Install a callback invoked with a PassRecord after each compiler pass.
+
+    Setting the ``MSCCLPP_DSL_PASS_PROFILE`` environment variable to a non-empty value
+    other than ``0`` prints the records to stderr when no hook is installed.
+
+    Args:
+        hook (Callable, optional): The callback, or None to remove the current hook.
+    """
+    global _pass_hook
+    _pass_hook = hook
+
+
+def get_pass_hook() -> Optional[Callable[["PassRecord"], None]]:
+    if _pass_hook is not None:
+        return _pass_hook
+    if os.environ.get("MSCCLPP_DSL_PASS_PROFILE", "0") not in ("", "0"):
+        return _print_pass_record
+    return None
+
+
+def _print_pass_record(record: "PassRecord"):
+    print(
+        f"[mscclpp.language] pass {record.name}: {record.elapsed * 1e3:.3f} ms, ranks {record.num_ranks}, "
+        f"ops {record.ops_before} -> {record.ops_after}",
+        file=sys.stderr,
+    )
+
+
+def count_operations(gpu) -> int:
+    return sum(len(tb.ops) for tb in gpu.threadblocks)
+
+
+@dataclass
+class PassRecord:
+    """Profiling information of one pass run over a set of ranks.
+
+    Attributes:
+        name (str): The name of the pass.
+        num_ranks (int): The number of ranks the pass ran on.
+        elapsed (float): Wall time in seconds.
+        ops_before (int): Number of operations before the pass, summed over ranks.
+        ops_after (int): Number of operations after the pass, summed over ranks.
+    """
+
+    name: str
+    num_ranks: int
+    elapsed: float
+    ops_before: int
+    ops_after: int
+
+
+@dataclass
+class CompilerPass:
+    """A compiler pass applied to the Gpu objects of a CollectiveProgram.
+
+    Attributes:
+        name (str): Unique name of the pass.
+        run (Callable): Function applying the pass to a single Gpu in place.
+        idempotent (bool): Whether running the pass again on its own output is a no-op.
+            Non-idempotent passes run at most once per rank.
+        lowered_only (bool): If True, the pass only runs on ranks whose operations are lowered.
+            Otherwise it runs on every rank, which is needed for cross-rank metadata such as
+            channels and semaphores.
+    """
+
+    name: str
+    run: Callable
+    idempotent: bool = False
+    lowered_only: bool = True
+
+
+@dataclass
+class PassManager:
+    """Runs an ordered pipeline of compiler passes and records which passes have run.
+
+    Passes are applied pass-major: each pass runs over all selected ranks before the next
+    pass starts. A non-idempotent pass that already ran on a rank is skipped for that rank,
+    so post-processing a program several times never fuses, synchronizes or replicates twice.
+
+    Attributes:
+        passes (List[CompilerPass]): The pipeline, in execution order.
+    """
+
+    passes: List[CompilerPass] = field(default_factory=list)
+    _completed: Dict[int, Set[str]] = field(default_factory=dict, init=False)
+
+    def add_pass(self, compiler_pass: CompilerPass, before: str = None):
+        """Add a pass to the pipeline.
+
+        Args:
+            compiler_pass (CompilerPass): The pass to add.
+            before (str, optional): Insert before the pass with this name instead of appending.
+
+        Raises:
+            ValueError: If a pass with the same name exists or ``before`` is unknown.
+        """
+        names = [p.name for p in self.passes]
+        if compiler_pass.name in names:
+            raise ValueError(f"Compiler pass {compiler_pass.name} is already registered")
+        if before is None:
+            self.passes.append(compiler_pass)
+        elif before in names:
+            self.passes.insert(names.index(before), compiler_pass)
+        else:
+            raise ValueError(f"Unknown compiler pass {before}")
+
+    def has_run(self, name: str, rank: int) -> bool:
+        return name in self._completed.get(rank, ())
+
+    def run(self, gpus: list, rank: int = None):
+        """Run the pipeline.
+
+        Args:
+            gpus (list): The Gpu objects of the program.
+            rank (int, optional): Only lower this rank; the other ranks only run passes with
+                ``lowered_only=False``. Defaults to None (lower every rank).
+        """
+        hook = get_pass_hook()
+        for compiler_pass in self.passes:
+            targets = [
+                gpu
+                for gpu in gpus
+                if (rank is None or gpu.id == rank or not compiler_pass.lowered_only)
+                and (compiler_pass.idempotent or not self.has_run(compiler_pass.name, gpu.id))
+            ]
+            if len(targets) == 0:
+                continue
+            ops_before = sum(count_operations(gpu) for gpu in targets) if hook is not None else 0
+            start = time.perf_counter()
+            for gpu in targets:
+                compiler_pass.run(gpu)
+                self._completed.setdefault(gpu.id, set()).add(compiler_pass.name)
+            elapsed = time.perf_counter() - start
+            if hook is not None:
+                ops_after = sum(count_operations(gpu) for gpu in targets)
+                hook(PassRecord(compiler_pass.name, len(targets), elapsed, ops_before, ops_after))
+
+    def record(self, name: str, gpus: list, elapsed: float):
+        """Report a step that runs outside the pipeline, such as serialization, to the pass hook."""
+        hook = get_pass_hook()
+        if hook is not None:
+            ops = sum(count_operations(gpu) for gpu in gpus)
+            hook(PassRecord(name, len(gpus), elapsed, ops, ops))
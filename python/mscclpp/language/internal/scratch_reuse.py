@@ -0,0 +1,165 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+from mscclpp.language.internal.happens_before import ProgramGraph, nested_operations, operation_chunks
+from mscclpp.language.internal.operations import *
+from mscclpp.language.internal.types import BufferType, Instruction
+from collections import defaultdict
+from typing import Dict, List
+import bisect
+
+_PACKET_INSTRUCTIONS = {
+    Instruction.copy_packet,
+    Instruction.unpack_packet,
+    Instruction.reduce_packet,
+    Instruction.reduce_copy_packet,
+    Instruction.put_packet,
+    Instruction.read_put_packet,
+    Instruction.reduce_send_packet,
+    Instruction.reduce_copy_send_packet,
+}
+
+
+class ScratchLayout:
+    """New placement of the scratch chunks of one rank.
+
+    The accessed scratch chunks are split into groups, maximal ranges of chunks covered by
+    overlapping accesses, and each group is moved as a whole.
+
+    Attributes:
+        starts (List[int]): Original first chunk of each group, in increasing order.
+        ends (List[int]): Original end (exclusive) of each group.
+        offsets (List[int]): New first chunk of each group.
+        original_chunks (int): Number of scratch chunks before reuse.
+        scratch_chunks (int): Number of scratch chunks after reuse.
+    """
+
+    __slots__ = ("starts", "ends", "offsets", "original_chunks", "scratch_chunks")
+
+    def __init__(self, starts: List[int], ends: List[int], offsets: List[int], original_chunks: int):
+        self.starts = starts
+        self.ends = ends
+        self.offsets = offsets
+        self.original_chunks = original_chunks
+        self.scratch_chunks = max(
+            (offset + end - start for start, end, offset in zip(starts, ends, offsets)), default=0
+        )
+
+    def relocate(self, index: int) -> int:
+        group = bisect.bisect_right(self.starts, index) - 1
+        return index - self.starts[group] + self.offsets[group]
+
+
+def _scratch_accesses(graph: ProgramGraph, gpu, tb, operation):
+    for inner_operation in nested_operations(operation):
+        for chunk in operation_chunks(inner_operation):
+            if chunk.type != BufferType.scratch:
+                continue
+            if isinstance(chunk, RemoteChunk):
+                rank = graph.remote_rank(gpu.id, tb, inner_operation, chunk)
+            else:
+                rank = gpu.id
+            yield rank, chunk, inner_operation.name in _PACKET_INSTRUCTIONS
+
+
+def plan_scratch_reuse(gpus) -> Dict[int, ScratchLayout]:
+    """Compute a placement of the scratch chunks of each rank that reuses dead chunks.
+
+    Groups of scratch chunks whose accesses, on their own rank and by remote operations of its
+    peers, all complete before the accesses of another group start are placed at overlapping
+    offsets. Groups accessed in packet format are never shared, since a reader polling a reused
+    packet could take an older packet of the same execution for its own. Ranks with switch
+    channels keep their layout: the group operations of a switch channel address its buffer by
+    offset, which must match across the ranks of the group, and their local chunks are not part
+    of the accesses tracked here.
+
+    Args:
+        gpus (List[Gpu]): The Gpu objects of the program, before any other pass ran.
+
+    Returns:
+        Dict[int, ScratchLayout]: The new layout of each rank whose scratch shrinks.
+    """
+    graph = ProgramGraph(gpus)
+    accesses = defaultdict(list)
+    for node, operation in enumerate(graph.operations):
+        if operation is None:
+            continue
+        gpu = gpus[graph.ranks[node]]
+        for rank, chunk, packet in _scratch_accesses(graph, gpu, graph.threadblocks[node], operation):
+            accesses[rank].append((chunk.index, chunk.index + chunk.size, node, packet))
+
+    bits = {}
+    for rank_accesses in accesses.values():
+        for _, _, node, _ in rank_accesses:
+            bits.setdefault(node, 1 << len(bits))
+    before = graph.completed_before(bits)
+    if before is None:
+        return {}
+
+    layouts = {}
+    for rank, rank_accesses in accesses.items():
+        gpu = gpus[rank]
+        if len(gpu._nvls_channels) > 0:
+            continue
+        starts, ends, nodes, exclusive = [], [], [], []
+        for start, end, node, packet in sorted(rank_accesses, key=lambda access: access[:2]):
+            if len(starts) == 0 or start >= ends[-1]:
+                starts.append(start)
+                ends.append(end)
+                nodes.append(set())
+                exclusive.append(False)
+            ends[-1] = max(ends[-1], end)
+            nodes[-1].add(node)
+            exclusive[-1] = exclusive[-1] or packet
+        masks = [sum(bits[node] for node in group_nodes) for group_nodes in nodes]
+
+        def ordered(first: int, second: int) -> bool:
+            return all(masks[first] & ~before[node] == 0 for node in nodes[second])
+
+        offsets = []
+        for group in range(len(starts)):
+            size = ends[group] - starts[group]
+            conflicts = [
+                (offsets[other], offsets[other] + ends[other] - starts[other])
+                for other in range(group)
+                if exclusive[group] or exclusive[other] or not (ordered(other, group) or ordered(group, other))
+            ]
+            offset = min(
+                candidate
+                for candidate in [0] + [end for _, end in conflicts]
+                if all(candidate + size <= start or candidate >= end for start, end in conflicts)
+            )
+            offsets.append(offset)
+
+        layout = ScratchLayout(starts, ends, offsets, gpu.scratch_chunks)
+        if layout.scratch_chunks < gpu.scratch_chunks:
+            layouts[rank] = layout
+    return layouts
+
+
+def apply_scratch_layouts(gpu, layouts: Dict[int, ScratchLayout]):
+    """Move the scratch chunks accessed by the operations of ``gpu`` to their new offsets.
+
+    Args:
+        gpu (Gpu): The rank whose operations are updated, both its own scratch accesses and its
+            remote accesses to the scratch of its peers.
+        layouts (Dict[int, ScratchLayout]): The layouts computed by ``plan_scratch_reuse``.
+    """
+    remote_buffers = {
+        remote_buffer_id: remote_buffer for remote_buffer_id, remote_buffer in gpu.remote_buffers.values()
+    }
+    for tb in gpu.threadblocks:
+        for operation in tb.ops:
+            for inner_operation in nested_operations(operation):
+                for chunk in operation_chunks(inner_operation):
+                    if chunk.type != BufferType.scratch:
+                        continue
+                    if isinstance(chunk, RemoteChunk):
+                        remote_buffer_ids = tb._remote_buffers[inner_operation.channel_type].remote_buffer_ids
+                        rank = remote_buffers[remote_buffer_ids[chunk.buffer_id]].remote_rank
+                    else:
+                        rank = gpu.id
+                    if rank in layouts:
+                        chunk.index = layouts[rank].relocate(chunk.index)
+    if gpu.id in layouts:
+        gpu.scratch_chunks = layouts[gpu.id].scratch_chunks
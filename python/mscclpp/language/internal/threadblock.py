@@ -53,9 +53,15 @@ class ThreadBlock:
     def add_operation(self, op):
         self.ops.append(op)
 
+    def schedule_operations(self):
+        self.ops = schedule_operations(self.ops)
+
     def optimize_operations(self):
         self.ops = fuse_operations(self.ops)
 
+    def coalesce_operations(self):
+        self.ops = coalesce_operations(self.ops)
+
     def adding_data_sync(self):
         self.ops = add_data_sync(self.ops)
 
@@ -63,6 +69,9 @@ class ThreadBlock:
         interval_map = BuffersAccess()
         self.ops = interval_map.process_operations(self.ops)
 
+    def remove_redundant_syncs(self):
+        self.ops = remove_redundant_syncs(self.ops)
+
     def shift_channels(self, instance, num_instances, replication_function):
         for channel in self._channels.values():
             for i in range(len(channel.channel_ids)):
@@ -76,6 +85,27 @@ class ThreadBlock:
         for op in self.ops:
             op.shift_ids(instance, num_instances, replication_function)
 
+    def clone(self):
+        """Create a copy of this thread block for another instance.
+
+        Channel and remote buffer id lists are copied and operations are cloned with
+        ``BaseOperation.clone``, which is much cheaper than ``copy.deepcopy``.
+
+        Returns:
+            ThreadBlock: The copied thread block.
+        """
+        tb = ThreadBlock(self.rank, self.id)
+        tb.ops = [op.clone() for op in self.ops]
+        for channel_type, remote_buffer in self._remote_buffers.items():
+            tb._remote_buffers[channel_type] = ThreadBlock.RemoteBuffer(
+                remote_buffer.access_channel_type, list(remote_buffer.remote_buffer_ids)
+            )
+        for channel_type, channel in self._channels.items():
+            tb._channels[channel_type] = ThreadBlock.Channel(channel.channel_type, list(channel.channel_ids))
+        tb._intra_remote_buffer_ids = {key: dict(value) for key, value in self._intra_remote_buffer_ids.items()}
+        tb._intra_channel_ids = {key: dict(value) for key, value in self._intra_channel_ids.items()}
+        return tb
+
     def to_dict(self) -> dict:
         return {
             "id": self.id,
@@ -18,23 +18,23 @@ class SyncType(Enum):
     def __or__(self, other):
         if not isinstance(other, SyncType):
             return NotImplemented
-
-        map_num = {SyncType.none: 0, SyncType.before: 1, SyncType.after: 2, SyncType.both: 3}
-        return list(map_num.keys())[map_num[self] | map_num[other]]
+        return _SYNC_TYPES[self._bits | other._bits]
 
     def __and__(self, other):
         if not isinstance(other, SyncType):
             return NotImplemented
-
-        map_num = {SyncType.none: 0, SyncType.before: 1, SyncType.after: 2, SyncType.both: 3}
-        return list(map_num.keys())[map_num[self] & map_num[other]]
+        return _SYNC_TYPES[self._bits & other._bits]
 
     def __xor__(self, other):
         if not isinstance(other, SyncType):
             return NotImplemented
+        return _SYNC_TYPES[self._bits ^ other._bits]
 
-        map_num = {SyncType.none: 0, SyncType.before: 1, SyncType.after: 2, SyncType.both: 3}
-        return list(map_num.keys())[map_num[self] ^ map_num[other]]
+
+# Bit representation of each SyncType member, indexed by its bits: before = 1, after = 2.
+_SYNC_TYPES = (SyncType.none, SyncType.before, SyncType.after, SyncType.both)
+for _bits, _sync_type in enumerate(_SYNC_TYPES):
+    _sync_type._bits = _bits
 
 
 class ReduceOperationType(Enum):
@@ -163,21 +163,35 @@ class DataAccessType(Enum):
     def __or__(self, other):
         if not isinstance(other, DataAccessType):
             return NotImplemented
-
-        map_num = {DataAccessType.read: 1, DataAccessType.write: 2, DataAccessType.both: 3}
-        return list(map_num.keys())[map_num[self] | map_num[other]]
+        return _DATA_ACCESS_TYPES[self._bits | other._bits]
 
     def __str__(self):
         return self.value
 
 
-@dataclass
+# Bit representation of each DataAccessType member, indexed by its bits: read = 1, write = 2.
+_DATA_ACCESS_TYPES = (None, DataAccessType.read, DataAccessType.write, DataAccessType.both)
+for _bits, _data_access_type in enumerate(_DATA_ACCESS_TYPES[1:], start=1):
+    _data_access_type._bits = _bits
+
+
 class DataAccess:
-    operation_id: int
-    start: int
-    end: int
-    buffer_type: BufferType
-    data_access_type: DataAccessType
+    __slots__ = ("operation_id", "start", "end", "buffer_type", "data_access_type")
+
+    def __init__(
+        self, operation_id: int, start: int, end: int, buffer_type: BufferType, data_access_type: DataAccessType
+    ):
+        self.operation_id = operation_id
+        self.start = start
+        self.end = end
+        self.buffer_type = buffer_type
+        self.data_access_type = data_access_type
+
+    def __repr__(self):
+        return (
+            f"DataAccess(operation_id={self.operation_id!r}, start={self.start!r}, end={self.end!r}, "
+            f"buffer_type={self.buffer_type!r}, data_access_type={self.data_access_type!r})"
+        )
 
     def __lt__(self, other):
         if self.start != other.start:
@@ -5,12 +5,18 @@ from mscclpp.language.collectives import Collective
 from mscclpp.language.internal.globals import set_program
 from mscclpp.language.internal.types import BufferType, RemoteBuffer, ChannelType
 from mscclpp.language.internal.gpu import Gpu
+from mscclpp.language.internal.operations import operation_limit_violations
+from mscclpp.language.internal.passes import CompilerPass, PassManager
+from mscclpp.language.internal.scratch_reuse import apply_scratch_layouts, plan_scratch_reuse
+from mscclpp.language.internal.channel_sharing import apply_channel_sharing, plan_channel_sharing
 from mscclpp.language.channel import *
 from mscclpp.language.rank import Semaphore
 from mscclpp.language.collectives import *
 from mscclpp.language.utils import AlgoSpec, ReplicationPolicy
+from mscclpp.plan_format import RankTemplates, encode_plan, replicate_threadblock
 from typing import List
 import json
+import time
 
 
 class CollectiveProgram:
@@ -28,6 +34,11 @@ class CollectiveProgram:
         instances (int): The number of instances to replicate.
         protocol (str): The communication protocol ("Simple" or "LL").
         instr_fusion (bool): Whether to enable instruction fusion optimization.
+        reorder_operations (bool): Whether independent operations are reordered before fusion.
+        remove_redundant_syncs (bool): Whether thread block syncs that order nothing are removed.
+        coalesce_chunks (bool): Whether transfers of contiguous chunks are merged.
+        reuse_scratch (bool): Whether scratch chunks with ordered accesses share offsets.
+        share_channels (bool): Whether channels and semaphores used one after the other are merged.
         replication_policy (ReplicationPolicy): The policy for replicating operations.
         reuse_resources (bool): Whether to reuse resources across instances.
         num_threads_per_block (int): Number of threads per GPU thread block.
@@ -35,9 +46,12 @@ class CollectiveProgram:
         buffer_alignment (int): Buffer alignment in bytes.
         min_message_size (int): Minimum message size for this program.
         max_message_size (int): Maximum message size for this program.
+        compact_instances (bool): Whether threadblocks are written once and replicated by the plan loader.
+        deduplicate_ranks (bool): Whether GPU sections identical up to a rank relabeling are written once.
         buffers (list): Buffer configurations for each rank.
         gpus (List[Gpu]): List of GPU objects representing each rank.
         loop_context: Current pipeline loop context, if any.
+        pass_manager (PassManager): The compiler pass pipeline run by post_process_operations.
     """
 
     def __init__(
@@ -56,6 +70,13 @@ class CollectiveProgram:
         buffer_alignment: int = 16,
         min_message_size: int = 0,
         max_message_size: int = 2**64 - 1,
+        compact_instances: bool = False,
+        deduplicate_ranks: bool = False,
+        reorder_operations: bool = False,
+        remove_redundant_syncs: bool = False,
+        coalesce_chunks: bool = False,
+        reuse_scratch: bool = False,
+        share_channels: bool = False,
     ):
         """Initialize a new CollectiveProgram.
 
@@ -77,6 +98,32 @@ class CollectiveProgram:
             buffer_alignment (int, optional): Buffer alignment in bytes. Defaults to 16.
             min_message_size (int, optional): Minimum message size. Defaults to 0.
             max_message_size (int, optional): Maximum message size. Defaults to 2^64-1.
+            compact_instances (bool, optional): Write each threadblock once instead of once per
+                instance, together with the replication policy, and let the plan loader expand the
+                instances. Plans shrink by roughly the number of instances. Plans with operations
+                the loader cannot replicate are written fully replicated. Defaults to False.
+            deduplicate_ranks (bool, optional): Write the GPU sections of whole-world JSON plans
+                as shared templates plus a per-rank relabeling table, see
+                ``mscclpp.plan_format.RankTemplates``. Plans the templates would not shrink are
+                written with plain sections. Defaults to False.
+            reorder_operations (bool, optional): Before fusion, reorder independent operations
+                within each thread block so that fusable operations become adjacent, see
+                ``schedule_operations``. Only used with instr_fusion. Defaults to False.
+            remove_redundant_syncs (bool, optional): After synchronization is inserted, remove the
+                thread block syncs that provably order no operations, see
+                ``remove_redundant_syncs``. Defaults to False.
+            coalesce_chunks (bool, optional): Merge copies, puts and gets of contiguous chunks
+                into single transfers of the combined chunks, see ``coalesce_operations``. Not used
+                with several interleaved instances, which split the merged chunks differently.
+                Defaults to False.
+            reuse_scratch (bool, optional): Place scratch chunks whose accesses are ordered by the
+                synchronization of the program at overlapping offsets, which shrinks the scratch
+                buffer of each rank, see ``plan_scratch_reuse``. Only used with a single instance.
+                Defaults to False.
+            share_channels (bool, optional): Merge the channels between two ranks, and the
+                semaphores of a rank, whose signals and waits are ordered by the synchronization of
+                the program, which reduces the connections and semaphores set up by the executor,
+                see ``plan_channel_sharing``. Defaults to False.
 
         Raises:
             AssertionError: If protocol is not "Simple" or "LL".
@@ -102,6 +149,13 @@ class CollectiveProgram:
         self.buffer_alignment = buffer_alignment
         self.min_message_size = min_message_size
         self.max_message_size = max_message_size
+        self.compact_instances = compact_instances
+        self.deduplicate_ranks = deduplicate_ranks
+        self.reorder_operations = reorder_operations
+        self.remove_redundant_syncs = remove_redundant_syncs
+        self.coalesce_chunks = coalesce_chunks
+        self.reuse_scratch = reuse_scratch
+        self.share_channels = share_channels
         assert protocol == "Simple" or protocol == "LL", f"Given protocol: {protocol}. Must be either Simple, LL"
         self.buffers = collective.init_buffers()
         self.gpus: List[Gpu] = []
@@ -111,6 +165,10 @@ class CollectiveProgram:
             )
 
         self.loop_context = None
+        self._pass_manager = None
+        self._template_ranks = set()
+        self._scratch_layouts = None
+        self._channel_sharings = None
 
     @classmethod
     def from_spec(cls, spec: AlgoSpec):
@@ -159,6 +217,13 @@ class CollectiveProgram:
             buffer_alignment=spec.buffer_alignment,
             min_message_size=spec.min_message_size,
             max_message_size=spec.max_message_size,
+            compact_instances=spec.compact_instances,
+            deduplicate_ranks=spec.deduplicate_ranks,
+            reorder_operations=spec.reorder_operations,
+            remove_redundant_syncs=spec.remove_redundant_syncs,
+            coalesce_chunks=spec.coalesce_chunks,
+            reuse_scratch=spec.reuse_scratch,
+            share_channels=spec.share_channels,
         )
 
     def __enter__(self):
@@ -201,23 +266,110 @@ class CollectiveProgram:
         self.gpus[semaphore.rank].add_semaphore(semaphore)
 
     def add_operation(self, rank, tb, operation):
+        violations = operation_limit_violations(operation)
+        if violations:
+            raise RuntimeError(
+                f"Operation {operation.name.value} of rank {rank} thread block {tb} has {', '.join(violations)}, "
+                f"more than the executor supports. Split it into several operations."
+            )
         if self.loop_context != None:
             self.loop_context.add_operation(rank, tb, operation)
         else:
             self.gpus[rank].add_operation(tb, operation)
 
-    def post_process_operations(self):
-        for gpu in self.gpus:
-            if self.instr_fusion:
-                gpu.optimize_operations()
-            gpu.adding_data_sync()
-            if self.auto_sync:
-                gpu.resolve_data_dependency()
-            gpu.replicate_instances(
-                self.instances,
-                self.get_default_replication_policy_function(),
-                self.get_buffer_replication_policy_function(),
-            )
+    @property
+    def pass_manager(self) -> PassManager:
+        """The compiler pass pipeline, built from the program options on first use."""
+        if self._pass_manager is None:
+            self._pass_manager = self.build_pass_pipeline()
+        return self._pass_manager
+
+    def build_pass_pipeline(self) -> PassManager:
+        pass_manager = PassManager()
+        if self.reuse_scratch and self.instances == 1:
+            pass_manager.add_pass(CompilerPass("scratch_reuse", self._reuse_scratch, lowered_only=False))
+        if self.share_channels:
+            pass_manager.add_pass(CompilerPass("channel_sharing", self._share_channels, lowered_only=False))
+        if self.instr_fusion:
+            if self.reorder_operations:
+                pass_manager.add_pass(CompilerPass("scheduling", lambda gpu: gpu.schedule_operations()))
+            pass_manager.add_pass(CompilerPass("fusion", lambda gpu: gpu.optimize_operations()))
+        if self.coalesce_chunks and (self.instances == 1 or self.replication_policy != ReplicationPolicy.interleaved):
+            pass_manager.add_pass(CompilerPass("coalescing", lambda gpu: gpu.coalesce_operations()))
+        pass_manager.add_pass(CompilerPass("data_sync", lambda gpu: gpu.adding_data_sync()))
+        if self.auto_sync:
+            pass_manager.add_pass(CompilerPass("dependency_resolution", lambda gpu: gpu.resolve_data_dependency()))
+        if self.remove_redundant_syncs:
+            pass_manager.add_pass(CompilerPass("sync_elimination", lambda gpu: gpu.remove_redundant_syncs()))
+        pass_manager.add_pass(
+            CompilerPass("replicate_resources", lambda gpu: gpu.replicate_resources(self.instances), lowered_only=False)
+        )
+        pass_manager.add_pass(CompilerPass("replicate_threadblocks", self._replicate_threadblocks))
+        return pass_manager
+
+    def _reuse_scratch(self, gpu: Gpu):
+        # The layouts depend on the operations of all ranks, which are all still as written
+        # when the first rank runs this pass.
+        if self._scratch_layouts is None:
+            self._scratch_layouts = plan_scratch_reuse(self.gpus)
+        apply_scratch_layouts(gpu, self._scratch_layouts)
+
+    def _share_channels(self, gpu: Gpu):
+        # Runs before fusion, so that no fused operation uses two channels that get merged.
+        if self._channel_sharings is None:
+            self._channel_sharings = plan_channel_sharing(self.gpus)
+        apply_channel_sharing(gpu, self._channel_sharings)
+
+    def _compacts_instances(self) -> bool:
+        return self.compact_instances and self.instances > 1
+
+    def _replicate_threadblocks(self, gpu: Gpu):
+        threadblocks = gpu.replicated_threadblocks(
+            self.instances,
+            self.get_default_replication_policy_function(),
+            self.get_buffer_replication_policy_function(),
+        )
+        if self._compacts_instances():
+            # Keep the templates only if the plan loader rebuilds exactly these threadblocks.
+            interleaved = self.replication_policy == ReplicationPolicy.interleaved
+            templates = [tb.to_dict() for tb in gpu.threadblocks]
+            expected = [
+                replicate_threadblock(template, instance, self.instances, interleaved)
+                for template in templates
+                for instance in range(self.instances)
+            ]
+            if [tb.to_dict() for tb in threadblocks] == expected:
+                self._template_ranks.add(gpu.id)
+                return
+        gpu.threadblocks = threadblocks
+
+    def _is_compact(self, rank: int = None) -> bool:
+        ranks = [rank] if rank is not None else range(self.num_ranks)
+        return self._compacts_instances() and all(r in self._template_ranks for r in ranks)
+
+    def post_process_operations(self, rank: int = None):
+        """Run the optimization, synchronization and replication passes.
+
+        Passes that already ran on a rank are not run again, so calling this method
+        several times (or before ``to_json``) is safe.
+
+        Args:
+            rank (int, optional): When given, only the operations of this rank are
+                processed. The other ranks only get their channels and semaphores
+                replicated, which is all the cross-rank metadata the executor needs
+                to set up connections. Defaults to None (process every rank).
+        """
+        self.pass_manager.run(self.gpus, rank)
+        if not self._is_compact(rank):
+            # A plan is either compact as a whole or fully replicated.
+            for gpu in self.gpus:
+                if (rank is None or gpu.id == rank) and gpu.id in self._template_ranks:
+                    self._template_ranks.discard(gpu.id)
+                    gpu.replicate_threadblocks(
+                        self.instances,
+                        self.get_default_replication_policy_function(),
+                        self.get_buffer_replication_policy_function(),
+                    )
 
     def get_default_replication_policy_function(self):
         return lambda value, instance, num_instances: value * num_instances + instance
@@ -226,27 +378,168 @@ class CollectiveProgram:
         if self.replication_policy == ReplicationPolicy.interleaved:
             return lambda value, size, instance, num_instances: value * num_instances + instance * size
         else:
-            return lambda value, instance, num_instances: value
+            return lambda value, size, instance, num_instances: value
 
     def set_loop_context(self, loop_context):
         if self.loop_context is not None and loop_context is not None:
             raise RuntimeError("Nested Pipelines are not Supported.")
         self.loop_context = loop_context
 
-    def to_json(self, indent=2, **kwargs):
-        self.post_process_operations()
-        json_obj = {
+    def to_json(self, indent=2, rank: int = None, **kwargs):
+        """Serialize the program to the JSON execution plan format.
+
+        Args:
+            indent (int, optional): Indentation passed to ``json.dumps``. Defaults to 2.
+            rank (int, optional): When given, emit a rank-scoped plan. Only ``gpus[rank]``
+                carries threadblocks and operations; the other entries keep the channel
+                and remote buffer metadata needed for connection setup. The plan records
+                the rank in ``rank_scope`` and can only be loaded by that rank.
+                Defaults to None (emit the whole-world plan).
+            **kwargs: Additional keyword arguments passed to ``json.dumps``.
+
+        Returns:
+            str: The serialized execution plan.
+        """
+        self._check_rank(rank)
+        self.post_process_operations(rank)
+        start = time.perf_counter()
+        json_obj = self._plan_header()
+        json_obj["gpus"] = [
+            gpu.to_dict() if rank is None or gpu.id == rank else gpu.to_metadata_dict() for gpu in self.gpus
+        ]
+        if self._deduplicates_ranks(rank):
+            rank_templates = RankTemplates()
+            entries = [rank_templates.add(gpu) for gpu in json_obj["gpus"]]
+            if rank_templates.reduces_plan(entries):
+                json_obj["gpus"] = entries
+                json_obj["gpu_templates"] = rank_templates.templates
+        json_obj.update(self._plan_trailer(rank))
+
+        plan = json.dumps(json_obj, indent=indent, **kwargs)
+        self.pass_manager.record("serialization", self.gpus, time.perf_counter() - start)
+        return plan
+
+    def write_json(self, fp, rank: int = None):
+        """Stream the execution plan to a file object in compact JSON format.
+
+        Unlike ``to_json``, the plan is never materialized as a whole: each GPU and
+        threadblock is encoded and written on its own, so memory use does not grow with
+        the world size. The output is identical to
+        ``to_json(indent=None, rank=rank, separators=(",", ":"), ensure_ascii=False)``.
+
+        Args:
+            fp: A text file object to write to.
+            rank (int, optional): Emit the rank-scoped plan of this rank, see ``to_json``.
+                Defaults to None (emit the whole-world plan).
+        """
+        self._check_rank(rank)
+        self.post_process_operations(rank)
+        start = time.perf_counter()
+        encode = json.JSONEncoder(separators=(",", ":"), ensure_ascii=False).encode
+        fp.write(encode(self._plan_header())[:-1] + ',"gpus":[')
+        entries = None
+        if self._deduplicates_ranks(rank):
+            # The entries are small, but whether they replace the sections is only known once all are added.
+            rank_templates = RankTemplates()
+            entries = [rank_templates.add(gpu.to_dict()) for gpu in self.gpus]
+            if not rank_templates.reduces_plan(entries):
+                entries = None
+        for i, gpu in enumerate(self.gpus):
+            if i > 0:
+                fp.write(",")
+            if entries is not None:
+                fp.write(encode(entries[i]))
+            elif rank is None or gpu.id == rank:
+                gpu.write_json(fp, encode)
+            else:
+                fp.write(encode(gpu.to_metadata_dict()))
+        fp.write("],")
+        if entries is not None:
+            fp.write('"gpu_templates":' + encode(rank_templates.templates) + ",")
+        fp.write(encode(self._plan_trailer(rank))[1:])
+        self.pass_manager.record("serialization", self.gpus, time.perf_counter() - start)
+
+    def to_binary(self, rank: int = None) -> bytes:
+        """Serialize the program to the binary execution plan format.
+
+        Binary plans are smaller than JSON plans and let each rank read only its own
+        operations, see ``mscclpp.plan_format``.
+
+        Args:
+            rank (int, optional): Emit the rank-scoped plan of this rank, see ``to_json``.
+                Defaults to None (emit the whole-world plan).
+
+        Returns:
+            bytes: The serialized execution plan.
+        """
+        self._check_rank(rank)
+        self.post_process_operations(rank)
+        start = time.perf_counter()
+        plan = self._plan_header()
+        plan["gpus"] = [
+            gpu.to_dict() if rank is None or gpu.id == rank else gpu.to_metadata_dict() for gpu in self.gpus
+        ]
+        plan.update(self._plan_trailer(rank))
+        data = encode_plan(plan)
+        self.pass_manager.record("serialization", self.gpus, time.perf_counter() - start)
+        return data
+
+    def write_rank_plans(self, path_pattern: str) -> List[str]:
+        """Write one rank-scoped plan file per rank.
+
+        Args:
+            path_pattern (str): Output path containing a ``{rank}`` placeholder,
+                e.g. ``"plans/allreduce.rank{rank}.json"``.
+
+        Returns:
+            List[str]: The paths of the written plans, indexed by rank.
+        """
+        paths = []
+        for rank in range(self.num_ranks):
+            path = path_pattern.format(rank=rank)
+            with open(path, "w") as f:
+                self.write_json(f, rank=rank)
+            paths.append(path)
+        return paths
+
+    def _deduplicates_ranks(self, rank: int = None) -> bool:
+        # Rank-scoped plans carry a single full section.
+        return self.deduplicate_ranks and rank is None
+
+    def _check_rank(self, rank: int):
+        if rank is not None and not 0 <= rank < self.num_ranks:
+            raise ValueError(f"Rank {rank} is out of range for a program with {self.num_ranks} ranks")
+
+    def plan_metadata(self, rank: int = None) -> dict:
+        """Return the top-level fields of the plan, without the per-GPU sections.
+
+        Args:
+            rank (int, optional): The rank of a rank-scoped plan. Defaults to None.
+
+        Returns:
+            dict: The fields a plan loader needs to register the plan before reading the whole file.
+        """
+        return {**self._plan_header(), **self._plan_trailer(rank)}
+
+    def _plan_header(self) -> dict:
+        return {
             "name": self.name,
             "collective": self.collective.name,
             "protocol": self.protocol,
             "inplace": self.collective.inplace,
             "reuse_resources": self.reuse_resources,
-            "gpus": [gpu.to_dict() for gpu in self.gpus],
+        }
+
+    def _plan_trailer(self, rank: int = None) -> dict:
+        trailer = {
             "num_threads_per_block": self.num_threads_per_block,
             "use_double_scratch_buffer": self.use_double_scratch_buffer,
             "buffer_alignment": self.buffer_alignment,
             "min_message_size": self.min_message_size,
             "max_message_size": self.max_message_size,
         }
-
-        return json.dumps(json_obj, indent=indent, **kwargs)
+        if self._is_compact(rank):
+            trailer["replication"] = {"instances": self.instances, "policy": str(self.replication_policy)}
+        if rank is not None:
+            trailer["rank_scope"] = rank
+        return trailer
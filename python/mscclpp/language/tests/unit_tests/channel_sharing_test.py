@@ -0,0 +1,71 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+"""
+Channel Sharing Test
+
+This file demonstrates channel sharing in MSCCLPP. Each rank first synchronizes
+with its peer over a dedicated channel, then puts its input to the output of the
+peer and signals it over a second channel. With share_channels enabled, the
+handshake channel is done with before the data channel is used, so both are
+merged and each rank sets up a single channel to its peer instead of two.
+
+WARNING: This algorithm is designed solely for demonstrating the use of a single
+operation (channel sharing) and is NOT intended for production use. This test
+may not work correctly in the MSCCLPP executor.
+"""
+
+import argparse
+from mscclpp.language.channel import *
+from mscclpp.language.rank import *
+from mscclpp.language.general import *
+from mscclpp.language.program import *
+from mscclpp.language.collectives import *
+
+
+def channel_sharing_test(num_threads_per_block, min_message_size, max_message_size):
+    # Set up 2 GPUs, each with 1 input chunk and room for both inputs in its output
+    gpus = 2
+    collective = TestCollective(gpus, 1, gpus)
+
+    with CollectiveProgram(
+        "channel_sharing_test",
+        collective,
+        gpus,
+        protocol="Simple",
+        num_threads_per_block=num_threads_per_block,
+        use_double_scratch_buffer=False,
+        min_message_size=min_message_size,
+        max_message_size=max_message_size,
+        share_channels=True,
+    ):
+        for src_rank in range(gpus):
+            rank = Rank(src_rank)
+            input_buffer = rank.get_input_buffer()
+            for dst_rank in range(gpus):
+                if src_rank != dst_rank:
+                    dst_buffer = Rank(dst_rank).get_output_buffer()
+
+                    # Synchronize with the peer over a handshake channel
+                    sync_channel = MemoryChannel(dst_rank, src_rank)
+                    sync_channel.signal(tb=0, relaxed=True)
+                    sync_channel.wait(tb=0, data_sync=SyncType.after, relaxed=True)
+
+                    # Put the input to the peer over a data channel, which is merged with the handshake channel
+                    data_channel = MemoryChannel(dst_rank, src_rank)
+                    data_channel.put(dst_buffer[src_rank : src_rank + 1], input_buffer[0:1], tb=0)
+                    data_channel.signal(tb=0, data_sync=SyncType.before)
+                    data_channel.wait(tb=0, data_sync=SyncType.after)
+
+        print(JSON())
+
+
+parser = argparse.ArgumentParser()
+
+parser.add_argument("--num_threads_per_block", type=int, default=1024, help="number of threads per block")
+parser.add_argument("--min_message_size", type=int, default=0, help="minimum message size")
+parser.add_argument("--max_message_size", type=int, default=2**64 - 1, help="maximum message size")
+
+args = parser.parse_args()
+
+channel_sharing_test(args.num_threads_per_block, args.min_message_size, args.max_message_size)
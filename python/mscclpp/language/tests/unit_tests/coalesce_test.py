@@ -0,0 +1,84 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+"""
+Coalesce Operation Test
+
+This file demonstrates chunk coalescing in MSCCLPP. Each rank copies its input
+to its output and puts it to the output of its peer one chunk at a time, as
+per-chunk loops do. With coalesce_chunks enabled the four copies of adjacent
+chunks become a single copy of four chunks, and the four puts, fused into one
+put of four chunks, become a single put of four chunks as well.
+
+WARNING: This algorithm is designed solely for demonstrating the use of a single
+operation (coalesce) and is NOT intended for production use. This test
+may not work correctly in the MSCCLPP executor.
+"""
+
+import argparse
+from mscclpp.language.channel import *
+from mscclpp.language.rank import *
+from mscclpp.language.general import *
+from mscclpp.language.program import *
+from mscclpp.language.collectives import *
+
+
+def coalesce_test(num_threads_per_block, min_message_size, max_message_size):
+    # Set up 2 GPUs, each with 4 input chunks and room for both inputs in its output
+    gpus = 2
+    chunks = 4
+    collective = TestCollective(gpus, chunks, gpus * chunks)
+
+    with CollectiveProgram(
+        "coalesce_test",
+        collective,
+        gpus,
+        protocol="Simple",
+        num_threads_per_block=num_threads_per_block,
+        use_double_scratch_buffer=False,
+        min_message_size=min_message_size,
+        max_message_size=max_message_size,
+        coalesce_chunks=True,
+    ):
+        for src_rank in range(gpus):
+            rank = Rank(src_rank)
+            input_buffer = rank.get_input_buffer()
+            output_buffer = rank.get_output_buffer()
+
+            # Copy the input to the own part of the output, one chunk at a time
+            for i in range(chunks):
+                rank.copy(
+                    output_buffer[src_rank * chunks + i : src_rank * chunks + i + 1], input_buffer[i : i + 1], tb=0
+                )
+
+            for dst_rank in range(gpus):
+                if src_rank != dst_rank:
+                    dst_buffer = Rank(dst_rank).get_output_buffer()
+                    ch = MemoryChannel(dst_rank, src_rank)
+
+                    # Synchronize before the puts
+                    ch.signal(tb=0, relaxed=True)
+                    ch.wait(tb=0, data_sync=SyncType.after, relaxed=True)
+
+                    # Put the input to the part of the peer output, one chunk at a time
+                    for i in range(chunks):
+                        ch.put(
+                            dst_buffer[src_rank * chunks + i : src_rank * chunks + i + 1],
+                            input_buffer[i : i + 1],
+                            tb=0,
+                        )
+                    ch.signal(tb=0, data_sync=SyncType.before)
+                    ch.wait(tb=0, data_sync=SyncType.after)
+
+        print(JSON())
+
+
+parser = argparse.ArgumentParser()
+
+parser.add_argument("--num_threads_per_block", type=int, default=1024, help="number of threads per block")
+parser.add_argument("--min_message_size", type=int, default=0, help="minimum message size")
+parser.add_argument("--max_message_size", type=int, default=2**64 - 1, help="maximum message size")
+
+args = parser.parse_args()
+
+coalesce_test(args.num_threads_per_block, args.min_message_size, args.max_message_size)
@@ -0,0 +1,81 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+"""
+Reorder Fuse Operation Test
+
+This file demonstrates operation reordering before instruction fusion in MSCCLPP.
+The puts and signals below are separated by a signal and by an unrelated local
+copy, so they are not adjacent and do not fuse as written. With
+reorder_operations enabled the copy is moved ahead of the puts and the puts and
+signals are grouped, so each pair fuses into a single operation.
+
+WARNING: This algorithm is designed solely for demonstrating the use of a single
+operation (reorder-fuse) and is NOT intended for production use. This test
+may not work correctly in the MSCCLPP executor.
+"""
+
+import argparse
+from mscclpp.language.channel import *
+from mscclpp.language.rank import *
+from mscclpp.language.general import *
+from mscclpp.language.program import *
+from mscclpp.language.collectives import *
+
+
+def reorder_fuse_test(num_threads_per_block, min_message_size, max_message_size):
+    # Set up 2 GPUs, each putting two input chunks into the output buffer of its peer
+    gpus = 2
+    collective = TestCollective(gpus, 4, 2)
+
+    with CollectiveProgram(
+        "reorder_fuse_test",
+        collective,
+        gpus,
+        protocol="Simple",
+        num_threads_per_block=num_threads_per_block,
+        use_double_scratch_buffer=False,
+        min_message_size=min_message_size,
+        max_message_size=max_message_size,
+        reorder_operations=True,
+    ):
+        for src_rank in range(gpus):
+            rank = Rank(src_rank)
+            src_buff = rank.get_input_buffer()
+            for dst_rank in range(gpus):
+                if src_rank != dst_rank:
+                    dst_buff = Rank(dst_rank).get_output_buffer()
+                    ch0 = MemoryChannel(dst_rank, src_rank)
+
+                    # Synchronize before the puts
+                    ch0.signal(tb=0, relaxed=True)
+                    ch0.wait(tb=0, data_sync=SyncType.after, relaxed=True)
+
+                    # First put, announced right away
+                    ch0.put(dst_buff[0:1], src_buff[0:1], tb=0)
+                    ch0.signal(tb=0, data_sync=SyncType.before)
+
+                    # Unrelated local copy between the two puts
+                    rank.copy(src_buff[3:4], src_buff[2:3], tb=0)
+
+                    # Second put, fused with the first one after reordering
+                    ch1 = MemoryChannel(dst_rank, src_rank)
+                    ch1.put(dst_buff[1:2], src_buff[1:2], tb=0)
+                    ch1.signal(tb=0, data_sync=SyncType.before)
+
+                    # Wait for both puts of the peer
+                    ch0.wait(tb=0, data_sync=SyncType.after)
+                    ch1.wait(tb=0, data_sync=SyncType.after)
+
+        print(JSON())
+
+
+parser = argparse.ArgumentParser()
+
+parser.add_argument("--num_threads_per_block", type=int, default=1024, help="number of threads per block")
+parser.add_argument("--min_message_size", type=int, default=0, help="minimum message size")
+parser.add_argument("--max_message_size", type=int, default=2**64 - 1, help="maximum message size")
+
+args = parser.parse_args()
+
+reorder_fuse_test(args.num_threads_per_block, args.min_message_size, args.max_message_size)
@@ -32,4 +32,11 @@ class AlgoSpec:
     buffer_alignment: int = 16
     min_message_size: int = 0
     max_message_size: int = 2**64 - 1
+    compact_instances: bool = False
+    deduplicate_ranks: bool = False
+    reorder_operations: bool = False
+    remove_redundant_syncs: bool = False
+    coalesce_chunks: bool = False
+    reuse_scratch: bool = False
+    share_channels: bool = False
     tags: dict = field(default_factory=dict)
@@ -0,0 +1,436 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+"""Helpers managing the on-disk execution plan cache used by ``mscclpp.compile``."""
+
+from dataclasses import dataclass, field
+import fcntl
+import os
+from pathlib import Path
+import re
+import time
+from typing import Callable, Dict, Iterable, List
+
+DEFAULT_LOCK_TIMEOUT = 600.0
+LOCK_POLL_INTERVAL = 0.05
+DEFAULT_CACHE_MAX_BYTES = 1 << 30
+DEFAULT_CACHE_MAX_PLANS = 0
+# Temporary files of live processes are left alone for this long, and removed after STALE_TMP_MAX_AGE regardless of
+# their owner, which may run on another host sharing the plan directory.
+STALE_TMP_MIN_AGE = 60.0
+STALE_TMP_MAX_AGE = 3600.0
+
+# Only files created by mscclpp.compile are managed, other plans in the directory are never touched.
+_PLAN_FILE_RE = re.compile(r"^([0-9a-f]{64})(?:\.rank\d+)?\.json$")
+_LOCK_FILE_RE = re.compile(r"^([0-9a-f]{64})(?:\.node\d+)?\.lock$")
+_TMP_FILE_RE = re.compile(r"^([0-9a-f]{64})(?:\.rank\d+)?\.json\.tmp\.(\d+)$")
+
+
+@dataclass
+class CompileStats:
+    """Counters of how ``mscclpp.compile`` obtained its plan files in this process.
+
+    Attributes:
+        compiled (int): Plans built by this process.
+        cache_hits (int): Plans that were already on disk.
+        waited (int): Plans built by another local process while this one was waiting.
+        fallbacks (int): Plans built without coordination because waiting timed out or
+            the plan directory does not support file locks.
+    """
+
+    compiled: int = 0
+    cache_hits: int = 0
+    waited: int = 0
+    fallbacks: int = 0
+
+    @property
+    def avoided(self) -> int:
+        """Number of compiles this process did not have to run."""
+        return self.cache_hits + self.waited
+
+    def reset(self):
+        self.compiled = 0
+        self.cache_hits = 0
+        self.waited = 0
+        self.fallbacks = 0
+
+
+compile_stats = CompileStats()
+
+
+def get_lock_timeout() -> float:
+    return float(os.environ.get("MSCCLPP_COMPILE_LOCK_TIMEOUT", DEFAULT_LOCK_TIMEOUT))
+
+
+def get_cache_max_bytes() -> int:
+    return int(os.environ.get("MSCCLPP_EXECUTION_PLAN_CACHE_MAX_BYTES", DEFAULT_CACHE_MAX_BYTES))
+
+
+def get_cache_max_plans() -> int:
+    return int(os.environ.get("MSCCLPP_EXECUTION_PLAN_CACHE_MAX_PLANS", DEFAULT_CACHE_MAX_PLANS))
+
+
+def write_plan_file(plan_path: str, write: Callable):
+    """Atomically create ``plan_path`` with the content written by ``write(fp)``.
+
+    The plan is written to ``<plan_path>.tmp.<pid>`` first and renamed once complete, so
+    readers never see a partial plan.
+    """
+    tmp_path = f"{plan_path}.tmp.{os.getpid()}"
+    try:
+        with open(tmp_path, "w") as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        if not os.path.exists(plan_path):
+            os.rename(tmp_path, plan_path)
+        else:
+            os.remove(tmp_path)
+    except BaseException:
+        Path(tmp_path).unlink(missing_ok=True)
+        raise
+
+
+def coordinate_build(plan_path: str, lock_path: str, build: Callable, timeout: float = None):
+    """Make sure ``plan_path`` exists while building it in at most one local process.
+
+    The first process taking the file lock at ``lock_path`` runs ``build()``, which must
+    create ``plan_path`` (typically with ``write_plan_file``). Other processes wait until
+    the plan appears. If waiting takes longer than ``timeout`` seconds, or the file system
+    does not support locks, the process falls back to building the plan itself.
+
+    Args:
+        plan_path (str): The plan file to wait for.
+        lock_path (str): The lock file shared by all processes building this plan.
+        build (Callable): Function creating the plan file(s).
+        timeout (float, optional): Seconds to wait for another process. Defaults to the
+            ``MSCCLPP_COMPILE_LOCK_TIMEOUT`` environment variable, or 600 seconds.
+
+    Returns:
+        bool: True if the plan was already on disk, False if it was built by this or another process.
+    """
+    if os.path.exists(plan_path):
+        compile_stats.cache_hits += 1
+        return True
+    timeout = get_lock_timeout() if timeout is None else timeout
+    try:
+        fd = os.open(lock_path, os.O_CREAT | os.O_RDWR, 0o644)
+    except OSError:
+        compile_stats.fallbacks += 1
+        build()
+        return False
+
+    try:
+        deadline = time.monotonic() + timeout
+        waited = False
+        while True:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except BlockingIOError:
+                waited = True
+            except OSError:
+                compile_stats.fallbacks += 1
+                build()
+                return False
+            if os.path.exists(plan_path):
+                compile_stats.waited += 1
+                return False
+            if time.monotonic() >= deadline:
+                compile_stats.fallbacks += 1
+                build()
+                return False
+            time.sleep(LOCK_POLL_INTERVAL)
+
+        try:
+            if os.path.exists(plan_path):
+                if waited:
+                    compile_stats.waited += 1
+                    return False
+                compile_stats.cache_hits += 1
+                return True
+            build()
+            compile_stats.compiled += 1
+            return False
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+    finally:
+        os.close(fd)
+
+
+@dataclass
+class PlanCacheStats:
+    """Counters of a PlanCache in this process.
+
+    Attributes:
+        hits (int): Plans found on disk.
+        misses (int): Plans that had to be built, by this or another local process.
+        evictions (int): Plans removed to stay within the cache budget.
+        evicted_bytes (int): Bytes freed by evictions.
+        stale_files_removed (int): Temporary files left behind by crashed processes.
+    """
+
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    evicted_bytes: int = 0
+    stale_files_removed: int = 0
+
+    def reset(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.evicted_bytes = 0
+        self.stale_files_removed = 0
+
+
+@dataclass
+class PlanCacheEntry:
+    """The files of one plan id in the cache.
+
+    Attributes:
+        plan_id (str): The plan id.
+        plan_paths (List[str]): The plan files, one per rank for rank-scoped plans.
+        lock_paths (List[str]): The lock files used to build and pin the plan.
+        size (int): Total size of the plan files in bytes.
+        last_used (float): Most recent modification time of the plan files, which is
+            refreshed every time the plan is loaded.
+    """
+
+    plan_id: str
+    plan_paths: List[str] = field(default_factory=list)
+    lock_paths: List[str] = field(default_factory=list)
+    size: int = 0
+    last_used: float = 0.0
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _try_lock(path: str):
+    """Return an fd holding an exclusive lock on ``path``, or None if the lock is held elsewhere."""
+    try:
+        fd = os.open(path, os.O_RDWR)
+    except OSError:
+        return None
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        os.close(fd)
+        return None
+    return fd
+
+
+def _unlock(fd: int):
+    fcntl.flock(fd, fcntl.LOCK_UN)
+    os.close(fd)
+
+
+def _unlink(path: str) -> bool:
+    try:
+        os.unlink(path)
+    except OSError:
+        return False
+    return True
+
+
+class PlanCache:
+    """Size-bounded LRU cache of the plans written by ``mscclpp.compile`` to a plan directory.
+
+    The last use time of a plan is the modification time of its files, refreshed every time
+    the plan is loaded, so it is shared by every process using the directory. When the cache
+    grows beyond its budget, the least recently used plans are removed.
+
+    Processes pin the plans they loaded by holding a shared lock on the plan's lock file, as
+    the executor reads the plan file again when it runs. Pinned plans and plans being built
+    are never evicted. Lock files are never removed: another process may have opened one and be
+    about to lock it, and a lock taken on a removed file would not exclude the process locking
+    the file created in its place.
+
+    Args:
+        plan_dir (str): The plan directory.
+        max_bytes (int, optional): Byte budget, 0 for no limit. Defaults to the
+            ``MSCCLPP_EXECUTION_PLAN_CACHE_MAX_BYTES`` environment variable, or 1 GiB.
+        max_plans (int, optional): Maximum number of plan ids, 0 for no limit. Defaults to the
+            ``MSCCLPP_EXECUTION_PLAN_CACHE_MAX_PLANS`` environment variable, or 0.
+    """
+
+    def __init__(self, plan_dir: str, max_bytes: int = None, max_plans: int = None):
+        self.plan_dir = str(plan_dir)
+        self.max_bytes = get_cache_max_bytes() if max_bytes is None else max_bytes
+        self.max_plans = get_cache_max_plans() if max_plans is None else max_plans
+        self.stats = PlanCacheStats()
+        self._pins: Dict[str, int] = {}
+        self._cleaned = False
+
+    def entries(self) -> List[PlanCacheEntry]:
+        """List the cached plans, least recently used first."""
+        entries: Dict[str, PlanCacheEntry] = {}
+        try:
+            names = os.listdir(self.plan_dir)
+        except FileNotFoundError:
+            return []
+        for name in names:
+            plan_match = _PLAN_FILE_RE.match(name)
+            lock_match = None if plan_match else _LOCK_FILE_RE.match(name)
+            if plan_match is None and lock_match is None:
+                continue
+            path = os.path.join(self.plan_dir, name)
+            if lock_match is not None:
+                entries.setdefault(lock_match.group(1), PlanCacheEntry(lock_match.group(1))).lock_paths.append(path)
+                continue
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entry = entries.setdefault(plan_match.group(1), PlanCacheEntry(plan_match.group(1)))
+            entry.plan_paths.append(path)
+            entry.size += stat.st_size
+            entry.last_used = max(entry.last_used, stat.st_mtime)
+        return sorted((entry for entry in entries.values() if entry.plan_paths), key=lambda entry: entry.last_used)
+
+    def total_size(self) -> int:
+        return sum(entry.size for entry in self.entries())
+
+    def touch(self, plan_path: str):
+        """Mark a plan file as used now."""
+        try:
+            os.utime(plan_path)
+        except OSError:
+            pass
+
+    def pin(self, plan_id: str, lock_path: str):
+        """Prevent other processes from evicting ``plan_id`` while this process uses it."""
+        if plan_id in self._pins:
+            return
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_RDWR, 0o644)
+        except OSError:
+            return
+        try:
+            fcntl.flock(fd, fcntl.LOCK_SH | fcntl.LOCK_NB)
+        except OSError:
+            # Being built or evicted right now, the plan stays unpinned.
+            os.close(fd)
+            return
+        self._pins[plan_id] = fd
+
+    def unpin(self, plan_id: str):
+        fd = self._pins.pop(plan_id, None)
+        if fd is not None:
+            _unlock(fd)
+
+    def unpin_all(self):
+        for plan_id in list(self._pins):
+            self.unpin(plan_id)
+
+    def record_use(self, plan_id: str, plan_path: str, lock_path: str, hit: bool):
+        """Update the cache after ``mscclpp.compile`` obtained a plan.
+
+        Refreshes the last use time of the plan and pins it. Stale files are removed the first
+        time the cache is used by this process, and the budget is enforced after every miss.
+
+        Args:
+            plan_id (str): The plan id.
+            plan_path (str): The plan file that will be loaded.
+            lock_path (str): The lock file used to build the plan.
+            hit (bool): Whether the plan was already on disk.
+        """
+        if hit:
+            self.stats.hits += 1
+        else:
+            self.stats.misses += 1
+        self.touch(plan_path)
+        self.pin(plan_id, lock_path)
+        if not self._cleaned:
+            self._cleaned = True
+            self.clean_stale_files()
+        if not hit:
+            self.evict(keep=(plan_id,))
+
+    def clean_stale_files(self) -> int:
+        """Remove temporary files of crashed processes.
+
+        Returns:
+            int: Number of files removed.
+        """
+        try:
+            names = os.listdir(self.plan_dir)
+        except FileNotFoundError:
+            return 0
+        now = time.time()
+        removed = 0
+        for name in names:
+            path = os.path.join(self.plan_dir, name)
+            tmp_match = _TMP_FILE_RE.match(name)
+            if tmp_match is None:
+                continue
+            try:
+                age = now - os.path.getmtime(path)
+            except OSError:
+                continue
+            pid = int(tmp_match.group(2))
+            if age >= STALE_TMP_MAX_AGE or (age >= STALE_TMP_MIN_AGE and not _pid_alive(pid)):
+                removed += _unlink(path)
+        self.stats.stale_files_removed += removed
+        return removed
+
+    def evict(self, keep: Iterable[str] = ()) -> List[str]:
+        """Remove least recently used plans until the cache fits its budget.
+
+        Args:
+            keep (Iterable[str]): Plan ids that must not be evicted.
+
+        Returns:
+            List[str]: The evicted plan ids.
+        """
+        if self.max_bytes <= 0 and self.max_plans <= 0:
+            return []
+        entries = self.entries()
+        total_size = sum(entry.size for entry in entries)
+        num_plans = len(entries)
+        keep = set(keep) | set(self._pins)
+        evicted = []
+        for entry in entries:
+            over_bytes = self.max_bytes > 0 and total_size > self.max_bytes
+            over_plans = self.max_plans > 0 and num_plans > self.max_plans
+            if not over_bytes and not over_plans:
+                break
+            if entry.plan_id in keep:
+                continue
+            fds = [_try_lock(path) for path in entry.lock_paths]
+            try:
+                if any(fd is None for fd in fds):
+                    # Pinned or being built by another process.
+                    continue
+                for path in entry.plan_paths:
+                    _unlink(path)
+            finally:
+                for fd in fds:
+                    if fd is not None:
+                        _unlock(fd)
+            total_size -= entry.size
+            num_plans -= 1
+            evicted.append(entry.plan_id)
+            self.stats.evictions += 1
+            self.stats.evicted_bytes += entry.size
+        return evicted
+
+
+_plan_caches: Dict[str, PlanCache] = {}
+
+
+def get_plan_cache(plan_dir: str) -> PlanCache:
+    """Return the PlanCache of ``plan_dir`` shared by this process."""
+    plan_dir = os.path.abspath(plan_dir)
+    cache = _plan_caches.get(plan_dir)
+    if cache is None:
+        cache = _plan_caches[plan_dir] = PlanCache(plan_dir)
+    return cache
@@ -0,0 +1,497 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+"""Binary execution plan format, read by ``ExecutionPlan`` alongside JSON plans.
+
+All integers are little-endian. The file starts with a fixed header::
+
+    magic              8 bytes  b"MSCCLPPB"
+    version            u32
+    num_gpus           u32
+    header             u64 offset, u64 size   compact JSON of the top-level plan fields
+    strings            u64 offset, u64 size   string table
+    gpus[num_gpus]     u64 metadata offset, u64 metadata size, u64 body offset, u64 body size
+
+A rank reads the header, the string table and the metadata sections (channels and remote
+buffers) of every GPU, then seeks to the body section of its own GPU. The body of a GPU is
+empty in a rank-scoped plan unless the plan is scoped to that GPU.
+
+Operation names, channel types and buffer types are stored as ``u16`` indexes into the string
+table, ``0xffff`` marks an absent value. Operations are fixed-width records followed by their
+channel ids, buffer references, semaphore ids and pipelined operations. Only the fields read
+by the plan loader are kept.
+"""
+
+import json
+import os
+import struct
+from pathlib import Path
+from typing import Callable, Dict, List
+
+BINARY_PLAN_MAGIC = b"MSCCLPPB"
+BINARY_PLAN_VERSION = 1
+
+_NO_STRING = 0xFFFF
+_FILE_HEADER = struct.Struct("<8sII4Q")
+_GPU_ENTRY = struct.Struct("<4Q")
+_OPERATION = struct.Struct("<8H6I")
+_BUFFER_REF = struct.Struct("<IIHHii")
+
+# Presence bits of the optional operation fields.
+_OP_CHANNEL_IDS = 1 << 0
+_OP_TBG_INFO = 1 << 1
+_OP_SRC_BUFF = 1 << 2
+_OP_DST_BUFF = 1 << 3
+_OP_BARRIER_ID = 1 << 4
+_OP_NUM_THREADBLOCKS = 1 << 5
+_OP_SEMAPHORE_IDS = 1 << 6
+_OP_ITER_CONTEXT = 1 << 7
+_OP_OPS = 1 << 8
+
+# Presence bits of the optional buffer reference fields.
+_BUFF_BUFFER_ID = 1 << 0
+_BUFF_SWITCH_CHANNEL_ID = 1 << 1
+
+
+class _Encoder:
+    def __init__(self):
+        self.strings: List[str] = []
+        self._string_ids: Dict[str, int] = {}
+
+    def string(self, value) -> int:
+        if value is None:
+            return _NO_STRING
+        index = self._string_ids.get(value)
+        if index is None:
+            if len(self.strings) >= _NO_STRING:
+                raise ValueError("Too many distinct strings in execution plan")
+            index = self._string_ids[value] = len(self.strings)
+            self.strings.append(value)
+        return index
+
+    def string_table(self) -> bytes:
+        out = bytearray(struct.pack("<I", len(self.strings)))
+        for value in self.strings:
+            data = value.encode()
+            out += struct.pack("<H", len(data)) + data
+        return bytes(out)
+
+    @staticmethod
+    def ints(out: bytearray, values):
+        out += struct.pack(f"<I{len(values)}i", len(values), *values)
+
+    def metadata(self, gpu: dict) -> bytes:
+        out = bytearray(struct.pack("<iI", gpu["id"], len(gpu["channels"])))
+        for channel in gpu["channels"]:
+            channel_type = self.string(channel["channel_type"])
+            if channel["channel_type"] == "switch":
+                groups = channel["rank_groups"]
+                out += struct.pack("<HHI", channel_type, self.string(channel.get("buffer_type")), len(groups))
+                for group in groups:
+                    out += struct.pack("<I", group["size"])
+                    self.ints(out, group["ranks"])
+            else:
+                out += struct.pack("<HHI", channel_type, _NO_STRING, len(channel["connected_to"]))
+                out += struct.pack(f"<{len(channel['connected_to'])}i", *channel["connected_to"])
+        out += struct.pack("<I", len(gpu["remote_buffers"]))
+        for remote_buffer in gpu["remote_buffers"]:
+            access = [self.string(t) for t in remote_buffer["access_channel_types"]]
+            out += struct.pack(
+                f"<iHH{len(access)}H", remote_buffer["rank"], self.string(remote_buffer["type"]), len(access), *access
+            )
+        return bytes(out)
+
+    def body(self, gpu: dict) -> bytes:
+        if "threadblocks" not in gpu:
+            return b""
+        out = bytearray(struct.pack("<3I", gpu["input_chunks"], gpu["output_chunks"], gpu["scratch_chunks"]))
+        self.ints(out, [semaphore["init_value"] for semaphore in gpu.get("semaphores", [])])
+        out += struct.pack("<I", len(gpu["threadblocks"]))
+        for threadblock in gpu["threadblocks"]:
+            out += struct.pack("<iI", threadblock["id"], len(threadblock["channels"]))
+            for channel in threadblock["channels"]:
+                out += struct.pack("<H", self.string(channel["channel_type"]))
+                self.ints(out, channel["channel_ids"])
+            refs = threadblock.get("remote_buffer_refs", [])
+            out += struct.pack("<I", len(refs))
+            for ref in refs:
+                out += struct.pack("<H", self.string(ref["access_channel_type"]))
+                self.ints(out, ref["remote_buffer_ids"])
+            out += struct.pack("<I", len(threadblock["ops"]))
+            for op in threadblock["ops"]:
+                self.operation(out, op)
+        return bytes(out)
+
+    def operation(self, out: bytearray, op: dict):
+        flags = 0
+        for key, flag in (
+            ("channel_ids", _OP_CHANNEL_IDS),
+            ("tbg_info", _OP_TBG_INFO),
+            ("src_buff", _OP_SRC_BUFF),
+            ("dst_buff", _OP_DST_BUFF),
+            ("barrier_id", _OP_BARRIER_ID),
+            ("num_threadblocks", _OP_NUM_THREADBLOCKS),
+            ("semaphore_ids", _OP_SEMAPHORE_IDS),
+            ("iter_context", _OP_ITER_CONTEXT),
+            ("ops", _OP_OPS),
+        ):
+            if key in op:
+                flags |= flag
+        channel_ids = op.get("channel_ids", [])
+        src_buff = op.get("src_buff", [])
+        dst_buff = op.get("dst_buff", [])
+        semaphore_ids = op.get("semaphore_ids", [])
+        ops = op.get("ops", [])
+        tbg_info = op.get("tbg_info", {"tb_id": 0, "tbg_size": 1})
+        iter_context = op.get("iter_context", {"unit_size": 0, "num_chunks": 0})
+        out += _OPERATION.pack(
+            self.string(op["name"]),
+            self.string(op.get("channel_type")),
+            flags,
+            len(channel_ids),
+            len(src_buff),
+            len(dst_buff),
+            len(semaphore_ids),
+            len(ops),
+            tbg_info["tb_id"],
+            tbg_info["tbg_size"],
+            op.get("barrier_id", 0),
+            op.get("num_threadblocks", 0),
+            iter_context["unit_size"],
+            iter_context["num_chunks"],
+        )
+        out += struct.pack(f"<{len(channel_ids)}I", *channel_ids)
+        for buff in src_buff + dst_buff:
+            buff_flags = (_BUFF_BUFFER_ID if "buffer_id" in buff else 0) | (
+                _BUFF_SWITCH_CHANNEL_ID if "switch_channel_id" in buff else 0
+            )
+            out += _BUFFER_REF.pack(
+                buff["index"],
+                buff["size"],
+                self.string(buff.get("type")),
+                buff_flags,
+                buff.get("buffer_id", 0),
+                buff.get("switch_channel_id", 0),
+            )
+        out += struct.pack(f"<{len(semaphore_ids)}I", *semaphore_ids)
+        for inner_op in ops:
+            self.operation(out, inner_op)
+
+
+def encode_plan(plan: dict) -> bytes:
+    """Encode an execution plan, in the structure of its JSON form, to the binary format.
+
+    GPU sections written as rank templates are stored in full, since each rank only reads
+    its own section of a binary plan.
+
+    Args:
+        plan (dict): The execution plan, e.g. ``json.loads(program.to_json())``.
+
+    Returns:
+        bytes: The binary execution plan.
+    """
+    plan = expand_rank_templates(plan)
+    encoder = _Encoder()
+    header = json.dumps({key: value for key, value in plan.items() if key != "gpus"}, separators=(",", ":")).encode()
+    sections = [(encoder.metadata(gpu), encoder.body(gpu)) for gpu in plan["gpus"]]
+    strings = encoder.string_table()
+
+    offset = _FILE_HEADER.size + _GPU_ENTRY.size * len(sections)
+    layout = [(offset, len(header)), (offset + len(header), len(strings))]
+    offset += len(header) + len(strings)
+    entries = bytearray()
+    for metadata, body in sections:
+        entries += _GPU_ENTRY.pack(offset, len(metadata), offset + len(metadata), len(body))
+        offset += len(metadata) + len(body)
+
+    out = bytearray(_FILE_HEADER.pack(BINARY_PLAN_MAGIC, BINARY_PLAN_VERSION, len(sections), *layout[0], *layout[1]))
+    out += entries + header + strings
+    for metadata, body in sections:
+        out += metadata + body
+    return bytes(out)
+
+
+def _shift_operation(op: dict, instance: int, num_instances: int, interleaved: bool) -> dict:
+    op = dict(op)
+    if interleaved:
+        for key in ("src_buff", "dst_buff"):
+            if key in op:
+                op[key] = [
+                    {**buff, "index": buff["index"] * num_instances + instance * buff["size"]} for buff in op[key]
+                ]
+    if "semaphore_ids" in op:
+        op["semaphore_ids"] = [id * num_instances + instance for id in op["semaphore_ids"]]
+    if "barrier_id" in op:
+        op["barrier_id"] = op["barrier_id"] * num_instances + instance
+    if "ops" in op:
+        op["ops"] = [_shift_operation(inner, instance, num_instances, interleaved) for inner in op["ops"]]
+    return op
+
+
+def replicate_threadblock(threadblock: dict, instance: int, num_instances: int, interleaved: bool) -> dict:
+    """Return one instance of a threadblock of a plan written with ``compact_instances``.
+
+    Threadblock, channel, semaphore and barrier ids ``x`` become ``x * num_instances + instance``.
+    With the interleaved policy buffer indexes become ``index * num_instances + instance * size``.
+    The plan loader applies the same rules.
+
+    Args:
+        threadblock (dict): The threadblock, in the structure of its JSON form.
+        instance (int): The instance to return.
+        num_instances (int): The number of instances.
+        interleaved (bool): Whether the buffers are replicated with the interleaved policy.
+
+    Returns:
+        dict: The threadblock of the instance.
+    """
+    return {
+        **threadblock,
+        "id": threadblock["id"] * num_instances + instance,
+        "ops": [_shift_operation(op, instance, num_instances, interleaved) for op in threadblock["ops"]],
+        "channels": [
+            {**channel, "channel_ids": [id * num_instances + instance for id in channel["channel_ids"]]}
+            for channel in threadblock["channels"]
+        ],
+    }
+
+
+def expand_instances(plan: dict) -> dict:
+    """Expand the threadblocks of a plan written with ``compact_instances``.
+
+    Each threadblock is replaced by its instances, see ``replicate_threadblock``.
+
+    Args:
+        plan (dict): The execution plan, in the structure of its JSON form.
+
+    Returns:
+        dict: The plan with one threadblock per instance, or ``plan`` itself if it is not compact.
+    """
+    replication = plan.get("replication")
+    if replication is None:
+        return plan
+    num_instances = replication["instances"]
+    interleaved = replication["policy"] == "interleaved"
+    gpus = []
+    for gpu in plan["gpus"]:
+        if "threadblocks" in gpu:
+            threadblocks = [
+                replicate_threadblock(tb, instance, num_instances, interleaved)
+                for tb in gpu["threadblocks"]
+                for instance in range(num_instances)
+            ]
+            gpu = {**gpu, "threadblocks": threadblocks}
+        gpus.append(gpu)
+    expanded = {key: value for key, value in plan.items() if key != "replication"}
+    expanded["gpus"] = gpus
+    return expanded
+
+
+def _relabel_gpu(gpu: dict, rank_of: Callable[[int], int]) -> dict:
+    relabeled = {}
+    for key, value in gpu.items():
+        if key == "channels":
+            value = [_relabel_channel(channel, rank_of) for channel in value]
+        elif key == "remote_buffers":
+            value = [{**remote_buffer, "rank": rank_of(remote_buffer["rank"])} for remote_buffer in value]
+        relabeled[key] = value
+    return relabeled
+
+
+def _relabel_channel(channel: dict, rank_of: Callable[[int], int]) -> dict:
+    channel = dict(channel)
+    if "connected_to" in channel:
+        channel["connected_to"] = [rank_of(rank) for rank in channel["connected_to"]]
+    if "rank_groups" in channel:
+        channel["rank_groups"] = [
+            {**group, "ranks": [rank_of(rank) for rank in group["ranks"]]} for group in channel["rank_groups"]
+        ]
+    return channel
+
+
+def _compact_json(value) -> str:
+    return json.dumps(value, separators=(",", ":"))
+
+
+def _chunk_counts(gpu: dict) -> Dict[str, int]:
+    return {"i": gpu["input_chunks"], "o": gpu["output_chunks"], "s": gpu["scratch_chunks"]}
+
+
+def _buffer_refs(gpu: dict):
+    """Yield each buffer reference of the operations of ``gpu`` with the type of the buffer.
+
+    The type of a remote buffer is resolved like the plan loader does. References through
+    switch channels and unresolved remote references yield ``None``.
+    """
+    for tb in gpu.get("threadblocks", []):
+        remote_buffer_ids = {}
+        for ref in tb.get("remote_buffer_refs", []):
+            remote_buffer_ids.setdefault(ref["access_channel_type"], []).extend(ref["remote_buffer_ids"])
+        ops = list(tb["ops"])
+        while ops:
+            op = ops.pop()
+            ops.extend(op.get("ops", []))
+            for buff in op.get("src_buff", []) + op.get("dst_buff", []):
+                if "switch_channel_id" in buff:
+                    yield buff, None
+                elif "buffer_id" in buff:
+                    ids = remote_buffer_ids.get(op.get("channel_type"), [])
+                    if 0 <= buff["buffer_id"] < len(ids):
+                        yield buff, gpu["remote_buffers"][ids[buff["buffer_id"]]]["type"]
+                    else:
+                        yield buff, None
+                else:
+                    yield buff, buff.get("type")
+
+
+def _rotate_chunks(gpu: dict, shifts: Dict[str, int]) -> dict:
+    """Return a copy of ``gpu`` with the chunk indexes of each buffer type rotated by ``shifts``."""
+    gpu = json.loads(json.dumps(gpu))
+    counts = _chunk_counts(gpu)
+    for buff, buffer_type in _buffer_refs(gpu):
+        if buffer_type in shifts:
+            buff["index"] = (buff["index"] + shifts[buffer_type]) % counts[buffer_type]
+    return gpu
+
+
+class RankTemplates:
+    """Deduplicates the GPU sections of a plan that are identical up to a relabeling of ranks.
+
+    The ranks referenced by a section (channel peers, switch groups and remote buffers) are
+    replaced by labels in order of first appearance, the GPU itself being label 0. Chunk
+    indexes may additionally be rotated by a constant per buffer type, local or remote, which
+    captures programs where each rank works on its own slice of the buffers. Sections with the
+    same relabeled form share a template in the top-level ``gpu_templates`` list, and each GPU
+    entry becomes ``{"id": rank, "template": index, "ranks": [...], "chunk_shifts": {...}}``,
+    where ``ranks[label]`` is the rank of each label and ``chunk_shifts`` the rotation of each
+    buffer type, if any. The plan loader restores the sections the same way.
+
+    Plans of asymmetric programs may have about as many templates as GPUs, and the entries then
+    make the plan larger. Writers check ``reduces_plan`` and keep the plain sections otherwise.
+
+    Attributes:
+        templates (List[dict]): The distinct relabeled sections, without their ``id``.
+        section_bytes (int): Compact JSON size of the sections added so far.
+    """
+
+    def __init__(self):
+        self.templates: List[dict] = []
+        self.section_bytes = 0
+        # Templates by their form with the rotatable chunk indexes masked.
+        self._shapes: Dict[str, List[int]] = {}
+
+    def add(self, gpu: dict) -> dict:
+        """Return the entry replacing the section ``gpu`` of a plan."""
+        self.section_bytes += len(_compact_json(gpu))
+        ranks = [gpu["id"]]
+        labels = {gpu["id"]: 0}
+
+        def label(rank: int) -> int:
+            if rank not in labels:
+                labels[rank] = len(ranks)
+                ranks.append(rank)
+            return labels[rank]
+
+        template = _relabel_gpu({key: value for key, value in gpu.items() if key != "id"}, label)
+        entry = {"id": gpu["id"], "template": None, "ranks": ranks}
+        shape, refs = self._shape(template)
+        for template_id in self._shapes.get(shape, []):
+            candidate = self.templates[template_id]
+            counts = _chunk_counts(candidate)
+            # Only the masked chunk indexes can differ within a shape.
+            shifts = {}
+            for (buff, buffer_type), (candidate_buff, _) in zip(refs, _buffer_refs(candidate)):
+                if buffer_type is None:
+                    continue
+                shift = shifts.setdefault(buffer_type, (buff["index"] - candidate_buff["index"]) % counts[buffer_type])
+                if (candidate_buff["index"] + shift) % counts[buffer_type] != buff["index"]:
+                    break
+            else:
+                entry["template"] = template_id
+                shifts = {buffer_type: shift for buffer_type, shift in shifts.items() if shift != 0}
+                if shifts:
+                    entry["chunk_shifts"] = shifts
+                return entry
+        entry["template"] = len(self.templates)
+        self._shapes.setdefault(shape, []).append(len(self.templates))
+        self.templates.append(template)
+        return entry
+
+    def reduces_plan(self, entries: List[dict]) -> bool:
+        """Return whether ``entries`` and the templates are fewer and smaller than the sections they replace."""
+        if len(self.templates) >= len(entries):
+            return False
+        return len(_compact_json(entries)) + len(_compact_json(self.templates)) < self.section_bytes
+
+    @staticmethod
+    def _shape(template: dict):
+        """Return the form of ``template`` with the rotatable chunk indexes masked, and its buffer references."""
+        counts = _chunk_counts(template) if "threadblocks" in template else {}
+        refs = list(_buffer_refs(template))
+        # Rotating is only reversible for indexes within the buffer of the rank.
+        rotatable = {buffer_type for buffer_type, count in counts.items() if count > 0}
+        rotatable -= {buffer_type for buff, buffer_type in refs if buff["index"] >= counts.get(buffer_type, 0)}
+        refs = [(buff, buffer_type if buffer_type in rotatable else None) for buff, buffer_type in refs]
+        indexes = [buff["index"] for buff, _ in refs]
+        for buff, buffer_type in refs:
+            if buffer_type is not None:
+                buff["index"] = None
+        shape = json.dumps(template, separators=(",", ":"))
+        for (buff, _), index in zip(refs, indexes):
+            buff["index"] = index
+        return shape, refs
+
+
+def expand_rank_templates(plan: dict) -> dict:
+    """Restore the GPU sections of a plan written with ``RankTemplates``.
+
+    Args:
+        plan (dict): The execution plan, in the structure of its JSON form.
+
+    Returns:
+        dict: The plan with a full section per GPU, or ``plan`` itself if it has no templates.
+    """
+    templates = plan.get("gpu_templates")
+    if templates is None:
+        return plan
+    gpus = []
+    for gpu in plan["gpus"]:
+        if "template" in gpu:
+            section = _relabel_gpu(templates[gpu["template"]], gpu["ranks"].__getitem__)
+            if "chunk_shifts" in gpu:
+                section = _rotate_chunks(section, gpu["chunk_shifts"])
+            gpu = {"id": gpu["id"], **section}
+        gpus.append(gpu)
+    expanded = {key: value for key, value in plan.items() if key != "gpu_templates"}
+    expanded["gpus"] = gpus
+    return expanded
+
+
+def is_binary_plan(path: str) -> bool:
+    """Return whether the file at ``path`` is a binary execution plan."""
+    with open(path, "rb") as f:
+        return f.read(len(BINARY_PLAN_MAGIC)) == BINARY_PLAN_MAGIC
+
+
+def convert_plan(json_path: str, binary_path: str = None) -> str:
+    """Convert a JSON execution plan file to the binary format.
+
+    Args:
+        json_path (str): The JSON plan to convert.
+        binary_path (str, optional): The output file. Defaults to ``json_path`` with a ``.bin`` suffix.
+
+    Returns:
+        str: The path of the binary plan.
+    """
+    if binary_path is None:
+        binary_path = str(Path(json_path).with_suffix(".bin"))
+    with open(json_path) as f:
+        data = encode_plan(json.load(f))
+    tmp_path = f"{binary_path}.tmp.{os.getpid()}"
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, binary_path)
+    except BaseException:
+        Path(tmp_path).unlink(missing_ok=True)
+        raise
+    return binary_path
@@ -0,0 +1,124 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+"""Index of registered execution plans used by ``ExecutionPlanRegistry.select``."""
+
+from bisect import bisect_right
+from typing import Any, Dict, Hashable, List, Optional
+
+MAX_BUFFER_ALIGNMENT = 4096
+DEFAULT_SELECTION_CACHE_SIZE = 0
+
+
+def buffer_alignment(ptr: int) -> int:
+    """Alignment of a buffer address, capped to a page."""
+    alignment = ptr & -ptr
+    return MAX_BUFFER_ALIGNMENT if alignment == 0 or alignment > MAX_BUFFER_ALIGNMENT else alignment
+
+
+class _PlanBucket:
+    """Plans sharing a collective, world size and ranks per node.
+
+    The message size ranges of the plans are split into disjoint segments, ``segments[i]``
+    holds the plans covering ``[bounds[i], bounds[i + 1])`` in registration order.
+    """
+
+    __slots__ = ("plans", "bounds", "segments")
+
+    def __init__(self):
+        self.plans = []
+        self.bounds = None
+        self.segments = None
+
+    def build(self, tag_filter: Dict[str, int]):
+        plans = [
+            (plan, min_size, max_size)
+            for plan, min_size, max_size, tags in self.plans
+            if all(tags.get(key) == value for key, value in tag_filter.items())
+        ]
+        bounds = set()
+        for _, min_size, max_size in plans:
+            bounds.add(min_size)
+            bounds.add(max_size + 1)
+        self.bounds = sorted(bounds)
+        self.segments = [
+            [plan for plan, min_size, max_size in plans if min_size <= bound <= max_size] for bound in self.bounds
+        ]
+
+    def find(self, message_size: int) -> list:
+        index = bisect_right(self.bounds, message_size) - 1
+        return self.segments[index] if index >= 0 else []
+
+
+class PlanIndex:
+    """Execution plans bucketed by (collective, world size, ranks per node), with an interval
+    index over their message size ranges.
+
+    Looking up the candidates of a request is a dictionary lookup followed by a binary search.
+    """
+
+    def __init__(self):
+        self._buckets: Dict[tuple, _PlanBucket] = {}
+        self._tag_filter: Dict[str, int] = {}
+
+    def add(
+        self,
+        plan: Any,
+        collective: str,
+        world_size: int,
+        n_ranks_per_node: int,
+        min_message_size: int,
+        max_message_size: int,
+        tags: Optional[Dict[str, int]] = None,
+    ):
+        bucket = self._buckets.setdefault((collective, world_size, n_ranks_per_node), _PlanBucket())
+        bucket.plans.append((plan, min_message_size, max_message_size, dict(tags or {})))
+        bucket.bounds = None
+
+    def set_tag_filter(self, tags: Optional[Dict[str, int]]):
+        """Only return plans carrying all the given tags with the given values."""
+        self._tag_filter = dict(tags or {})
+        for bucket in self._buckets.values():
+            bucket.bounds = None
+
+    def candidates(self, collective: str, world_size: int, n_ranks_per_node: int, message_size: int) -> list:
+        """Return the plans whose constraints and message size range match, in registration order."""
+        bucket = self._buckets.get((collective, world_size, n_ranks_per_node))
+        if bucket is None:
+            return []
+        if bucket.bounds is None:
+            bucket.build(self._tag_filter)
+        if collective == "allgather":
+            message_size *= world_size
+        return bucket.find(message_size)
+
+    def clear(self):
+        self._buckets = {}
+        self._tag_filter = {}
+
+
+class SelectionCache:
+    """Bounded memo of recent selection decisions.
+
+    The cache is emptied when it is full, which keeps lookups a single dictionary access.
+    """
+
+    def __init__(self, size: int = DEFAULT_SELECTION_CACHE_SIZE):
+        self.size = size
+        self._decisions: Dict[Hashable, Any] = {}
+
+    def get(self, key: Hashable, default=None):
+        return self._decisions.get(key, default)
+
+    def put(self, key: Hashable, decision: Any):
+        if self.size <= 0:
+            return
+        if len(self._decisions) >= self.size:
+            self._decisions.clear()
+        self._decisions[key] = decision
+
+    def clear(self):
+        self._decisions.clear()
+
+    def __len__(self) -> int:
+        return len(self._decisions)
@@ -0,0 +1,86 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+"""Manifest of a plan directory, read by ``ExecutionPlanRegistry::loadManifest``.
+
+The manifest holds the selection metadata of every plan in the directory, so registries can
+register the plans without parsing the plan files. A plan file is only read when the plan is
+executed.
+"""
+
+import json
+import os
+from pathlib import Path
+from typing import Dict, List
+
+from blake3 import blake3
+
+MANIFEST_FILENAME = "manifest.json"
+MANIFEST_VERSION = 1
+
+
+def manifest_entry(
+    plan_path: str,
+    metadata: dict,
+    world_size: int,
+    nranks_per_node: int,
+    tags: Dict[str, int] = None,
+    plan_id: str = None,
+) -> dict:
+    """Describe a plan file for the manifest.
+
+    Args:
+        plan_path (str): The plan file, which must be in the manifest directory.
+        metadata (dict): The top-level fields of the plan, see ``CollectiveProgram.plan_metadata``.
+        world_size (int): The world size the plan is compiled for.
+        nranks_per_node (int): The number of ranks per node the plan is compiled for.
+        tags (Dict[str, int], optional): The tags of the plan handle.
+        plan_id (str, optional): The id of the plan handle. Defaults to the hash of the plan file.
+
+    Returns:
+        dict: The manifest entry.
+    """
+    content = Path(plan_path).read_bytes()
+    return {
+        **metadata,
+        "id": plan_id if plan_id is not None else blake3(content).hexdigest(),
+        "filename": os.path.basename(plan_path),
+        "world_size": world_size,
+        "nranks_per_node": nranks_per_node,
+        "tags": dict(tags or {}),
+        "size": len(content),
+    }
+
+
+def read_manifest(plan_dir: str) -> List[dict]:
+    """Return the entries of the manifest in ``plan_dir``, or an empty list if there is none."""
+    try:
+        with open(os.path.join(plan_dir, MANIFEST_FILENAME)) as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        return []
+    if manifest.get("version") != MANIFEST_VERSION:
+        return []
+    return manifest["plans"]
+
+
+def write_manifest(plan_dir: str, entries: List[dict]):
+    """Atomically replace the manifest in ``plan_dir``.
+
+    Raises:
+        ValueError: If two entries share a plan id.
+    """
+    ids = [entry["id"] for entry in entries]
+    if len(set(ids)) != len(ids):
+        raise ValueError("Plan ids in a manifest must be unique")
+    manifest_path = os.path.join(plan_dir, MANIFEST_FILENAME)
+    tmp_path = f"{manifest_path}.tmp.{os.getpid()}"
+    try:
+        with open(tmp_path, "w") as f:
+            json.dump({"version": MANIFEST_VERSION, "plans": entries}, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, manifest_path)
+    except BaseException:
+        Path(tmp_path).unlink(missing_ok=True)
+        raise
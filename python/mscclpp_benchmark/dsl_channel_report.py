@@ -0,0 +1,68 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+"""Report how many channels and semaphores channel sharing saves on the emitted plans.
+
+Every default plan is compiled twice, once as configured and once with ``share_channels`` enabled, and
+the memory and port channels and the semaphores of the emitted JSON plans are counted in total
+over all ranks. Each channel costs the executor a semaphore connection at setup, and the channel
+count of the busiest thread block is bounded by the executor.
+
+Usage:
+    python3 dsl_channel_report.py [--programs <regex>] [--max_world_size 64]
+"""
+
+import argparse
+
+from mscclpp.__main__ import build_plan, select_configs
+
+
+def plan_resources(config: dict, share_channels: bool):
+    plan = build_plan(config, share_channels=share_channels)
+    channels = sum(
+        len(channel["connected_to"])
+        for gpu in plan["gpus"]
+        for channel in gpu["channels"]
+        if channel["channel_type"] in ("memory", "port")
+    )
+    semaphores = sum(len(gpu["semaphores"]) for gpu in plan["gpus"])
+    tb_channels = max(
+        (
+            len(channel["channel_ids"])
+            for gpu in plan["gpus"]
+            for tb in gpu["threadblocks"]
+            for channel in tb["channels"]
+            if channel["channel_type"] in ("memory", "port")
+        ),
+        default=0,
+    )
+    return channels, semaphores, tb_channels
+
+
+def format_row(name: str, counts) -> str:
+    return f"{name:<52} " + " ".join(f"{count:>{width}}" for count, width in zip(counts, (8, 7, 10, 7, 7, 7)))
+
+
+def main(configs):
+    print(format_row("program", ["channels", "shared", "semaphores", "shared", "tb max", "shared"]))
+    totals = [0] * 4
+    for config in configs:
+        name = config["spec"].name
+        try:
+            channels, semaphores, tb_channels = plan_resources(config, False)
+            shared_channels, shared_semaphores, shared_tb_channels = plan_resources(config, True)
+        except Exception as e:
+            print(f"{name:<52} failed: {e!r}")
+            continue
+        counts = [channels, shared_channels, semaphores, shared_semaphores]
+        totals = [total + count for total, count in zip(totals, counts)]
+        print(format_row(name, counts + [tb_channels, shared_tb_channels]))
+    print(format_row("total", totals))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--programs", help="regular expression selecting the default plans by name")
+    parser.add_argument("--max_world_size", type=int, default=64, help="skip plans with more ranks")
+    args = parser.parse_args()
+    main(select_configs(args.programs, args.max_world_size))
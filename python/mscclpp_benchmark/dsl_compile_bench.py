@@ -0,0 +1,65 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+"""Measure DSL compile time and peak memory of the default plans for several instance counts.
+
+Each plan of ``mscclpp.__main__.default_algo_configs`` is built with its AlgoSpec ``instances``
+replaced by each of the instance counts and serialized to JSON.
+
+Usage:
+    python3 dsl_compile_bench.py [--instances 1 2 4 8 16] [--programs <regex>] [--max_world_size 16]
+"""
+
+import argparse
+import time
+import tracemalloc
+
+from mscclpp.__main__ import build_program, select_configs
+from mscclpp.language.internal.passes import set_pass_hook
+
+
+def compile_plan(config: dict, instances: int, trace_memory: bool):
+    pass_times = {}
+    set_pass_hook(lambda record: pass_times.__setitem__(record.name, pass_times.get(record.name, 0) + record.elapsed))
+    if trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        build_program(config, instances=instances).to_json()
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1] if trace_memory else 0
+    finally:
+        if trace_memory:
+            tracemalloc.stop()
+        set_pass_hook(None)
+    return elapsed, pass_times, peak
+
+
+def main(configs, instances_list, repeat: int):
+    columns = ["inst", "total(ms)", "replicate(ms)", "serialize(ms)", "peak(MiB)"]
+    print(f"{'program':<44} " + " ".join(f"{column:>{len(column) + 1}}" for column in columns))
+    for config in configs:
+        name = config["spec"].name
+        for instances in instances_list:
+            try:
+                runs = [compile_plan(config, instances, False) for _ in range(repeat)]
+                _, _, peak = compile_plan(config, instances, True)
+            except Exception as e:
+                print(f"{name:<44} {instances:>5} failed: {e!r}")
+                break
+            elapsed, pass_times, _ = min(runs, key=lambda run: run[0])
+            replicate = pass_times.get("replicate_resources", 0) + pass_times.get("replicate_threadblocks", 0)
+            print(
+                f"{name:<44} {instances:>5} {elapsed * 1e3:>10.1f} {replicate * 1e3:>14.1f} "
+                f"{pass_times.get('serialization', 0) * 1e3:>14.1f} {peak / 2**20:>10.1f}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--programs", help="regular expression selecting the default plans by name")
+    parser.add_argument("--max_world_size", type=int, default=16, help="skip plans with more ranks")
+    parser.add_argument("--instances", type=int, nargs="+", default=[1, 2, 4, 8, 16], help="instance counts")
+    parser.add_argument("--repeat", type=int, default=3, help="number of timed runs, the fastest is reported")
+    args = parser.parse_args()
+    main(select_configs(args.programs, args.max_world_size), args.instances, args.repeat)
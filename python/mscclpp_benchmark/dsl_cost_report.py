@@ -0,0 +1,54 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+"""Report the execution time the cost model estimates for the emitted plans.
+
+Every default plan is compiled and simulated with ``mscclpp.language.cost_model`` at several
+message sizes, without any GPU. With ``--critical_path`` the operations on the critical path of
+the largest size are printed below each program.
+
+Usage:
+    python3 dsl_cost_report.py [--programs <regex>] [--max_world_size 64] [--sizes 1K,64K,1M,16M]
+                               [--critical_path]
+"""
+
+import argparse
+
+from mscclpp.__main__ import build_plan, parse_size, select_configs
+from mscclpp.language.cost_model import HardwareModel, estimate_time
+
+
+def format_row(name: str, values) -> str:
+    return f"{name:<52} " + " ".join(f"{value:>10}" for value in values)
+
+
+def main(configs, sizes, critical_path: bool):
+    print(format_row("program", [f"{size} B" for size in sizes]))
+    for config in configs:
+        name = config["spec"].name
+        hardware = HardwareModel(gpus_per_node=config["spec"].nranks_per_node)
+        try:
+            plan = build_plan(config)
+            estimates = [estimate_time(plan, size, hardware) for size in sizes]
+        except Exception as e:
+            print(f"{name:<52} failed: {e!r}")
+            continue
+        print(format_row(name, [f"{estimate.time:.1f} us" for estimate in estimates]))
+        if critical_path:
+            for step in estimates[-1].critical_path:
+                location = f"rank {step.rank:>3} tb {step.threadblock:>3}"
+                print(f"    {location} {step.operation:<12} {step.start:>10.2f} {step.end:>10.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--programs", help="regular expression selecting the default plans by name")
+    parser.add_argument("--max_world_size", type=int, default=64, help="skip plans with more ranks")
+    parser.add_argument("--sizes", default="1K,64K,1M,16M", help="comma separated message sizes, e.g. 1K,1M")
+    parser.add_argument("--critical_path", action="store_true", help="print the critical path of the largest size")
+    args = parser.parse_args()
+    main(
+        select_configs(args.programs, args.max_world_size),
+        [parse_size(size) for size in args.sizes.split(",")],
+        args.critical_path,
+    )
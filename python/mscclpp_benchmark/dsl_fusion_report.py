@@ -0,0 +1,64 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+"""Report how many operations instruction fusion eliminates with and without operation reordering.
+
+Every default plan is compiled twice, once as configured and once with ``reorder_operations``
+enabled. The operation counts are summed over all ranks and taken before fusion, after fusion
+and in the emitted plan, which also includes the synchronization inserted after fusion.
+
+Usage:
+    python3 dsl_fusion_report.py [--programs <regex>] [--max_world_size 64]
+"""
+
+import argparse
+
+from mscclpp.__main__ import build_program, select_configs
+from mscclpp.language.internal.passes import set_pass_hook
+
+
+def count_operations(config: dict, reorder_operations: bool):
+    counts = {}
+
+    def hook(record):
+        if record.name not in counts:
+            counts[record.name] = [0, 0]
+        counts[record.name][0] += record.ops_before
+        counts[record.name][1] += record.ops_after
+
+    set_pass_hook(hook)
+    try:
+        build_program(config, reorder_operations=reorder_operations).to_json()
+    finally:
+        set_pass_hook(None)
+    first_pass = "scheduling" if reorder_operations else "fusion"
+    return counts[first_pass][0], counts["fusion"][1], counts["serialization"][1]
+
+
+def format_row(name: str, counts) -> str:
+    return f"{name:<52} " + " ".join(f"{count:>{width}}" for count, width in zip(counts, (6, 6, 10, 6, 10)))
+
+
+def main(configs):
+    print(format_row("program", ["ops", "fused", "reordered", "plan", "reordered"]))
+    totals = [0] * 5
+    for config in configs:
+        name = config["spec"].name
+        try:
+            ops, fused, plan = count_operations(config, False)
+            _, reordered_fused, reordered_plan = count_operations(config, True)
+        except Exception as e:
+            print(f"{name:<52} failed: {e!r}")
+            continue
+        row = [ops, fused, reordered_fused, plan, reordered_plan]
+        totals = [total + count for total, count in zip(totals, row)]
+        print(format_row(name, row))
+    print(format_row("total", totals))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--programs", help="regular expression selecting the default plans by name")
+    parser.add_argument("--max_world_size", type=int, default=64, help="skip plans with more ranks")
+    args = parser.parse_args()
+    main(select_configs(args.programs, args.max_world_size))
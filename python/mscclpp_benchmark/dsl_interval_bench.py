@@ -0,0 +1,86 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+"""Measure the data access conflict detection of the DSL on synthetic access patterns.
+
+Each pattern is a sequence of chunk accesses as produced by the operations of a thread block,
+fed one by one to ``BuffersAccess.compute_data_access``:
+
+- disjoint: every operation writes its own chunk, the map only grows.
+- reads: operations read random overlapping ranges, so intervals are split but never conflict.
+- mixed: random reads and writes, one in eight conflicts and clears the map.
+- sweep: every operation reads a range written by the previous one, so every access conflicts.
+
+Usage:
+    python3 dsl_interval_bench.py [--sizes 10000 100000 1000000] [--repeat 3]
+"""
+
+import argparse
+import random
+import time
+
+from mscclpp.language.internal.buffer_access import BuffersAccess
+from mscclpp.language.internal.types import BufferType, DataAccess, DataAccessType
+
+
+def disjoint(num_accesses: int):
+    return [DataAccess(i, 4 * i, 4 * i + 3, BufferType.scratch, DataAccessType.write) for i in range(num_accesses)]
+
+
+def reads(num_accesses: int):
+    rng = random.Random(0)
+    accesses = []
+    for i in range(num_accesses):
+        start = rng.randrange(4 * num_accesses)
+        accesses.append(DataAccess(i, start, start + rng.randrange(1, 16), BufferType.input, DataAccessType.read))
+    return accesses
+
+
+def mixed(num_accesses: int):
+    rng = random.Random(0)
+    accesses = []
+    for i in range(num_accesses):
+        start = rng.randrange(4 * num_accesses)
+        access_type = DataAccessType.write if rng.randrange(8) == 0 else DataAccessType.read
+        buffer_type = rng.choice((BufferType.input, BufferType.output, BufferType.scratch))
+        accesses.append(DataAccess(i, start, start + rng.randrange(1, 16), buffer_type, access_type))
+    return accesses
+
+
+def sweep(num_accesses: int):
+    accesses = []
+    for i in range(num_accesses // 2):
+        accesses.append(DataAccess(i, 4 * i, 4 * i + 7, BufferType.output, DataAccessType.read))
+        accesses.append(DataAccess(i, 4 * i + 4, 4 * i + 11, BufferType.output, DataAccessType.write))
+    return accesses
+
+
+PATTERNS = {"disjoint": disjoint, "reads": reads, "mixed": mixed, "sweep": sweep}
+
+
+def run(accesses, repeat: int):
+    best = float("inf")
+    for _ in range(repeat):
+        buffers_access = BuffersAccess()
+        start = time.perf_counter()
+        conflicts = sum(buffers_access.compute_data_access(access) for access in accesses)
+        best = min(best, time.perf_counter() - start)
+    return best, conflicts
+
+
+def main(sizes, repeat: int):
+    print(f"{'pattern':<10} {'accesses':>10} {'conflicts':>10} {'total(ms)':>10} {'per access(us)':>15}")
+    for name, pattern in PATTERNS.items():
+        for size in sizes:
+            elapsed, conflicts = run(pattern(size), repeat)
+            print(f"{name:<10} {size:>10} {conflicts:>10} {elapsed * 1e3:>10.1f} {elapsed / size * 1e6:>15.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[10000, 100000, 1000000], help="numbers of accesses per pattern"
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="number of timed runs, the fastest is reported")
+    args = parser.parse_args()
+    main(args.sizes, args.repeat)
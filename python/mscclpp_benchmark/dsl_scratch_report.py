@@ -0,0 +1,71 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+"""Report how much scratch memory scratch chunk reuse saves on the emitted plans.
+
+Every default plan is compiled twice, once as configured and once with ``reuse_scratch`` enabled, and
+the scratch buffer of each rank is sized as the executor does for an input of ``--size`` bytes:
+the chunk size follows from the input (or output) chunks of the rank, doubled for packet
+protocols and double scratch buffers. The report shows the scratch chunks summed over all
+ranks and the largest scratch buffer of a rank, which is what has to be allocated.
+
+Usage:
+    python3 dsl_scratch_report.py [--programs <regex>] [--max_world_size 64] [--size 1M]
+"""
+
+import argparse
+
+from mscclpp.__main__ import build_plan, parse_size, select_configs
+
+
+def scratch_bytes(plan, gpu, size: int) -> int:
+    if gpu["input_chunks"] > 0:
+        chunk_size = -(-size // gpu["input_chunks"])
+    elif gpu["output_chunks"] > 0:
+        chunk_size = -(-size // gpu["output_chunks"])
+    else:
+        return 0
+    scratch_size = chunk_size * gpu["scratch_chunks"]
+    if plan["protocol"] == "LL":
+        scratch_size *= 2
+    if plan["use_double_scratch_buffer"]:
+        scratch_size *= 2
+    alignment = plan["buffer_alignment"]
+    return -(-scratch_size // alignment) * alignment
+
+
+def plan_scratch(config: dict, reuse_scratch: bool, size: int):
+    plan = build_plan(config, reuse_scratch=reuse_scratch)
+    chunks = sum(gpu["scratch_chunks"] for gpu in plan["gpus"])
+    max_bytes = max((scratch_bytes(plan, gpu, size) for gpu in plan["gpus"]), default=0)
+    return chunks, max_bytes
+
+
+def format_row(name: str, counts) -> str:
+    return f"{name:<52} " + " ".join(f"{count:>{width}}" for count, width in zip(counts, (7, 7, 12, 12)))
+
+
+def main(configs, size: int):
+    print(format_row("program", ["chunks", "reused", "max bytes", "reused"]))
+    totals = [0] * 4
+    for config in configs:
+        name = config["spec"].name
+        try:
+            chunks, max_bytes = plan_scratch(config, False, size)
+            reused_chunks, reused_max_bytes = plan_scratch(config, True, size)
+        except Exception as e:
+            print(f"{name:<52} failed: {e!r}")
+            continue
+        counts = [chunks, reused_chunks, max_bytes, reused_max_bytes]
+        totals = [total + count for total, count in zip(totals, counts)]
+        print(format_row(name, counts))
+    print(format_row("total", totals))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--programs", help="regular expression selecting the default plans by name")
+    parser.add_argument("--max_world_size", type=int, default=64, help="skip plans with more ranks")
+    parser.add_argument("--size", type=str, default="1M", help="input size per rank, e.g. 64K, 1M or 1G")
+    args = parser.parse_args()
+    main(select_configs(args.programs, args.max_world_size), parse_size(args.size))
@@ -0,0 +1,61 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+"""Report how many thread block syncs redundant sync elimination removes from the emitted plans.
+
+Every default plan is compiled twice, once as configured and once with ``remove_redundant_syncs``
+enabled, and the ``nop`` operations of the emitted JSON plans are counted: in total over all
+ranks and thread blocks, and on the thread block with the most syncs, which bounds the syncs on
+the critical path.
+
+Usage:
+    python3 dsl_sync_report.py [--programs <regex>] [--max_world_size 64]
+"""
+
+import argparse
+
+from mscclpp.__main__ import build_plan, select_configs
+
+
+def count_syncs(operations) -> int:
+    syncs = 0
+    for operation in operations:
+        if operation["name"] == "nop":
+            syncs += 1
+        elif operation["name"] == "pipeline":
+            syncs += count_syncs(operation["ops"])
+    return syncs
+
+
+def plan_syncs(config: dict, remove_redundant_syncs: bool):
+    plan = build_plan(config, remove_redundant_syncs=remove_redundant_syncs)
+    syncs = [count_syncs(tb["ops"]) for gpu in plan["gpus"] for tb in gpu["threadblocks"]]
+    return sum(syncs), max(syncs, default=0)
+
+
+def format_row(name: str, counts) -> str:
+    return f"{name:<52} " + " ".join(f"{count:>{width}}" for count, width in zip(counts, (7, 7, 8, 7, 7)))
+
+
+def main(configs):
+    print(format_row("program", ["syncs", "kept", "removed", "tb max", "kept"]))
+    totals = [0] * 3
+    for config in configs:
+        name = config["spec"].name
+        try:
+            syncs, max_syncs = plan_syncs(config, False)
+            kept, max_kept = plan_syncs(config, True)
+        except Exception as e:
+            print(f"{name:<52} failed: {e!r}")
+            continue
+        totals = [totals[0] + syncs, totals[1] + kept, totals[2] + syncs - kept]
+        print(format_row(name, [syncs, kept, syncs - kept, max_syncs, max_kept]))
+    print(format_row("total", totals))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--programs", help="regular expression selecting the default plans by name")
+    parser.add_argument("--max_world_size", type=int, default=64, help="skip plans with more ranks")
+    args = parser.parse_args()
+    main(select_configs(args.programs, args.max_world_size))
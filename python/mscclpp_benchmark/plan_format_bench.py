@@ -0,0 +1,57 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+"""Compare the file size and load time of JSON and binary execution plans.
+
+Every JSON plan is converted to the binary format in a temporary directory, then both files are
+loaded with ``ExecutionPlan`` by every rank of the plan.
+
+Usage:
+    python3 plan_format_bench.py [--plans_dir <dir>] [--repeat 5]
+"""
+
+import argparse
+import json
+from pathlib import Path
+import tempfile
+import time
+
+from mscclpp import ExecutionPlan
+from mscclpp.plan_format import convert_plan
+
+DEFAULT_PLANS_DIR = Path(__file__).resolve().parent.parent.parent / "test" / "execution-files"
+
+
+def load_time(path: str, ranks, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for rank in ranks:
+            ExecutionPlan(path, rank)
+        best = min(best, time.perf_counter() - start)
+    return best / len(ranks)
+
+
+def main(plans_dir: Path, repeat: int):
+    print(f"{'plan':<36} {'json(KiB)':>10} {'bin(KiB)':>10} {'json(ms)':>10} {'bin(ms)':>10} {'speedup':>8}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for json_path in sorted(plans_dir.glob("*.json")):
+            with open(json_path) as f:
+                plan = json.load(f)
+            ranks = [plan["rank_scope"]] if "rank_scope" in plan else range(len(plan["gpus"]))
+            binary_path = convert_plan(str(json_path), str(Path(tmp_dir) / json_path.with_suffix(".bin").name))
+            json_time = load_time(str(json_path), ranks, repeat)
+            binary_time = load_time(binary_path, ranks, repeat)
+            print(
+                f"{json_path.name:<36} {json_path.stat().st_size / 1024:>10.1f} "
+                f"{Path(binary_path).stat().st_size / 1024:>10.1f} {json_time * 1e3:>10.3f} "
+                f"{binary_time * 1e3:>10.3f} {json_time / binary_time:>7.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--plans_dir", type=Path, default=DEFAULT_PLANS_DIR, help="directory of JSON execution plans")
+    parser.add_argument("--repeat", type=int, default=5, help="number of timed runs, the fastest is reported")
+    args = parser.parse_args()
+    main(args.plans_dir, args.repeat)
@@ -0,0 +1,399 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+"""Check execution plans without GPUs: executor limits and the data each rank ends with.
+
+The data check replays a plan on symbolic chunks. Each chunk holds the multiset of input chunks
+``(rank, index)`` it was computed from, so a copy moves the multiset and a reduction adds them.
+Operations are applied in the order ``mscclpp.language.cost_model`` simulates them, which
+follows the signals, waits, semaphores, barriers and packets of the plan. The plan is replayed
+under several hardware models, so that reads not ordered after their writes are likely to run
+early in at least one of them.
+"""
+
+from collections import Counter, defaultdict
+import contextlib
+import io
+import json
+from pathlib import Path
+import runpy
+import sys
+from typing import Callable, Dict, List
+
+from mscclpp.__main__ import build_plan
+from mscclpp import language
+from mscclpp.language import cost_model, default_algos
+from mscclpp.language.collectives import AllGather, AllReduce, AllToAll, ReduceScatter
+from mscclpp.language.cost_model import HardwareModel, LinkModel
+from mscclpp.language.internal.operations import (
+    MAX_BUFFER_PER_OPERATION,
+    MAX_CHANNEL_PER_OPERATION,
+    MAX_DEVICE_SEMAPHORES,
+)
+from mscclpp.language.utils import AlgoSpec
+
+# Limits of the executor on thread blocks, see src/include/execution_common.hpp and execution_kernel.hpp.
+MAX_OPERATION = 64
+MAX_CHANNEL = 16
+MAX_DEVICE_FUNCTIONS_IN_PIPELINE = 16
+
+_REDUCTIONS = {"re", "repkt", "recpkt", "res", "respkt", "recspkt", "rre", "rres"}
+
+
+def check_limits(plan) -> List[str]:
+    """Return the operations and thread blocks of ``plan`` the executor cannot load."""
+    plan = cost_model.load_plan(plan)
+    violations = []
+    for gpu in plan["gpus"]:
+        for tb in gpu["threadblocks"]:
+            where = f"rank {gpu['id']} tb {tb['id']}"
+            num_ops = 0
+            for op in tb["ops"]:
+                num_ops += 1 + len(op.get("ops", []))
+                if len(op.get("ops", [])) > MAX_DEVICE_FUNCTIONS_IN_PIPELINE:
+                    violations.append(f"{where}: pipeline of {len(op['ops'])} operations")
+                for inner in [op] + op.get("ops", []):
+                    for key, limit in (
+                        ("channel_ids", MAX_CHANNEL_PER_OPERATION),
+                        ("src_buff", MAX_BUFFER_PER_OPERATION),
+                        ("dst_buff", MAX_BUFFER_PER_OPERATION),
+                        ("semaphore_ids", MAX_DEVICE_SEMAPHORES),
+                    ):
+                        if len(inner.get(key, [])) > limit:
+                            violations.append(f"{where}: {inner['name']} with {len(inner[key])} {key}")
+                    remote = any("buffer_id" in buff for buff in inner.get("src_buff", []) + inner.get("dst_buff", []))
+                    if remote and "channel_type" not in inner:
+                        violations.append(f"{where}: {inner['name']} with a remote buffer and no channel_type")
+            if num_ops > MAX_OPERATION:
+                violations.append(f"{where}: {num_ops} operations")
+            for channel in tb["channels"]:
+                if channel["channel_type"] in ("memory", "port") and len(channel["channel_ids"]) > MAX_CHANNEL:
+                    violations.append(f"{where}: {len(channel['channel_ids'])} {channel['channel_type']} channels")
+    return violations
+
+
+def send_peers(plan) -> dict:
+    """The ranks each thread block of each rank writes data to, by rank and thread block."""
+    plan = cost_model.load_plan(plan)
+    peers = defaultdict(lambda: defaultdict(set))
+    for gpu in plan["gpus"]:
+        for tb in gpu["threadblocks"]:
+            remote_buffers = {
+                refs["access_channel_type"]: refs["remote_buffer_ids"] for refs in tb.get("remote_buffer_refs", [])
+            }
+            for op in [inner for op in tb["ops"] for inner in [op] + op.get("ops", [])]:
+                for buff in op.get("dst_buff", []):
+                    if "buffer_id" in buff:
+                        remote_buffer_id = remote_buffers[cost_model._channel_type(op)][buff["buffer_id"]]
+                        peers[gpu["id"]][tb["id"]].add(gpu["remote_buffers"][remote_buffer_id]["rank"])
+    return peers
+
+
+class PlanVerifier(cost_model._Simulation):
+    """Replays a plan on symbolic chunks in the order of the cost model simulation."""
+
+    def __init__(self, plan: dict, hardware: HardwareModel):
+        super().__init__(plan, 1 << 20, hardware)
+        self.memory = {}
+        for gpu in self.gpus:
+            for index in range(gpu["input_chunks"]):
+                self.memory[(gpu["id"], "i", index)] = Counter({(gpu["id"], index): 1})
+        self.errors = []
+
+    def read(self, rank: int, buffer_type: str, index: int) -> Counter:
+        return self.memory.get((rank, buffer_type, index), Counter())
+
+    def _run(self, tb, op, unit, overhead, dependencies):
+        if op["name"] in cost_model._PACKET_READS and tb.skip_packets:
+            self.errors.append(f"rank {tb.rank} tb {tb.id} {op['name']} reads packets that are never written")
+        return super()._run(tb, op, unit, overhead, dependencies)
+
+    def _finish(self, tb, op, start, end, cause):
+        # Thread block groups split each chunk among their thread blocks, the first applies it whole.
+        if "tbg_info" not in op or op["tbg_info"]["tb_id"] == 0:
+            self._apply(tb, op)
+        return super()._finish(tb, op, start, end, cause)
+
+    def _location(self, tb, op, buff):
+        if "buffer_id" in buff:
+            remote_buffer_id = tb.remote_buffers[cost_model._channel_type(op)][buff["buffer_id"]]
+            remote_buffer = self.gpus[tb.rank]["remote_buffers"][remote_buffer_id]
+            return remote_buffer["rank"], remote_buffer["type"]
+        return tb.rank, buff["type"]
+
+    def _apply(self, tb, op):
+        name = op["name"]
+        if name in ("glre", "gstore"):
+            switch_channels = [
+                channel for channel in self.gpus[tb.rank]["channels"] if channel["channel_type"] == "switch"
+            ]
+            channel = switch_channels[tb.channels["switch"][op["channel_ids"][0]]]
+            ranks = [rank for group in channel["rank_groups"] for rank in group["ranks"]]
+            for k in range(op["size"]):
+                if name == "glre":
+                    value = sum(
+                        (self.read(rank, op["buffer_type"], op["buffer_offset"] + k) for rank in ranks), Counter()
+                    )
+                    self.memory[(tb.rank, op["dst_chunk"]["type"], op["dst_chunk"]["index"] + k)] = value
+                else:
+                    value = self.read(tb.rank, op["src_chunk"]["type"], op["src_chunk"]["index"] + k)
+                    for rank in ranks:
+                        self.memory[(rank, op["buffer_type"], op["buffer_offset"] + k)] = Counter(value)
+            return
+        src, dst = op.get("src_buff", []), op.get("dst_buff", [])
+        if not src and not dst:
+            return
+        for k in range((src or dst)[0].get("size", 1)):
+            values = [self.read(*self._location(tb, op, buff), buff["index"] + k) for buff in src]
+            if name in _REDUCTIONS:
+                outputs = [sum(values, Counter())] * len(dst)
+            elif len(src) == len(dst):
+                outputs = values
+            else:
+                outputs = [values[0]] * len(dst)
+            for buff, value in zip(dst, outputs):
+                rank, buffer_type = self._location(tb, op, buff)
+                self.memory[(rank, buffer_type, buff["index"] + k)] = Counter(value)
+
+
+def hardware_models(gpus_per_node: int) -> List[HardwareModel]:
+    return [
+        HardwareModel(gpus_per_node=gpus_per_node),
+        # Slow local links and a fast network reorder operations that are not synchronized.
+        HardwareModel(
+            gpus_per_node=gpus_per_node,
+            nvlink=LinkModel(bandwidth=1.0, latency=50.0),
+            network=LinkModel(bandwidth=1000.0, latency=0.1),
+        ),
+    ]
+
+
+Expectation = Callable[[dict, int], Dict[tuple, Counter]]
+
+
+def verify(program, expect: Expectation, init: Expectation = None, gpus_per_node: int = 8) -> List[str]:
+    """Replay a program and return how the data of its ranks differs from ``expect``.
+
+    Args:
+        program: The CollectiveProgram or plan, see ``cost_model.load_plan``.
+        expect (Callable): Maps the plan and a rank to the expected ``{(buffer_type, index): Counter}``.
+        init (Callable, optional): Maps the plan and a rank to initial chunks besides the input.
+        gpus_per_node (int, optional): Ranks per node of the hardware models. Defaults to 8.
+
+    Returns:
+        List[str]: The errors, empty if every rank ends with the expected data.
+    """
+    plan = json.loads(program.to_json()) if hasattr(program, "to_json") else program
+    plan = json.loads(json.dumps(cost_model.load_plan(plan)))
+    for gpu in plan["gpus"]:
+        for tb in gpu["threadblocks"]:
+            for op in tb["ops"]:
+                # Chunks are symbolic, a single iteration covers each chunk at once.
+                if op["name"] == "pipeline":
+                    op["iter_context"]["unit_size"] = 1 << 62
+    errors = []
+    for hardware in hardware_models(gpus_per_node):
+        verifier = PlanVerifier(plan, hardware)
+        if init is not None:
+            for gpu in plan["gpus"]:
+                for (buffer_type, index), value in init(plan, gpu["id"]).items():
+                    verifier.memory[(gpu["id"], buffer_type, index)] = value
+        verifier.run()
+        errors += verifier.errors
+        for gpu in plan["gpus"]:
+            for (buffer_type, index), want in expect(plan, gpu["id"]).items():
+                got = verifier.read(gpu["id"], buffer_type, index)
+                if got != want:
+                    errors.append(f"rank {gpu['id']} {buffer_type}[{index}]: {dict(got)} instead of {dict(want)}")
+        if errors:
+            break
+    return errors
+
+
+def _result_type(plan: dict) -> str:
+    return "i" if plan["inplace"] else "o"
+
+
+def allgather_init(plan: dict, rank: int) -> Dict[tuple, Counter]:
+    if not plan["inplace"]:
+        return {}
+    num_chunks = plan["gpus"][rank]["input_chunks"]
+    return {("o", rank * num_chunks + k): Counter({(rank, k): 1}) for k in range(num_chunks)}
+
+
+def allgather_expect(plan: dict, rank: int) -> Dict[tuple, Counter]:
+    num_chunks = plan["gpus"][rank]["input_chunks"]
+    return {
+        ("o", peer * num_chunks + k): Counter({(peer, k): 1})
+        for peer in range(len(plan["gpus"]))
+        for k in range(num_chunks)
+    }
+
+
+def reducescatter_expect(plan: dict, rank: int) -> Dict[tuple, Counter]:
+    num_ranks = len(plan["gpus"])
+    num_chunks = plan["gpus"][rank]["input_chunks"] // num_ranks
+    first = rank * num_chunks if plan["inplace"] else 0
+    return {
+        (_result_type(plan), first + k): Counter({(peer, rank * num_chunks + k): 1 for peer in range(num_ranks)})
+        for k in range(num_chunks)
+    }
+
+
+def allreduce_expect(plan: dict, rank: int) -> Dict[tuple, Counter]:
+    num_ranks = len(plan["gpus"])
+    return {
+        (_result_type(plan), k): Counter({(peer, k): 1 for peer in range(num_ranks)})
+        for k in range(plan["gpus"][rank]["input_chunks"])
+    }
+
+
+def alltoall_expect(plan: dict, rank: int) -> Dict[tuple, Counter]:
+    num_ranks = len(plan["gpus"])
+    num_chunks = plan["gpus"][rank]["input_chunks"] // num_ranks
+    return {
+        (_result_type(plan), peer * num_chunks + k): Counter({(peer, rank * num_chunks + k): 1})
+        for peer in range(num_ranks)
+        for k in range(num_chunks)
+    }
+
+
+# Expected result and initial output of each collective, by collective name
+EXPECTATIONS = {
+    "allgather": (allgather_expect, allgather_init),
+    "reducescatter": (reducescatter_expect, None),
+    "allreduce": (allreduce_expect, None),
+    "alltoall": (alltoall_expect, None),
+}
+
+
+def verify_config(config: dict) -> List[str]:
+    """Build an installed config of ``mscclpp.__main__`` and verify the data each rank ends with."""
+    spec = config["spec"]
+    expect, init = EXPECTATIONS[spec.collective.name]
+    return verify(build_plan(config), expect, init, spec.nranks_per_node)
+
+
+def _spec(collective, world_size, nranks_per_node, protocol, instances=1, **options):
+    return AlgoSpec(
+        name="test",
+        collective=collective,
+        nranks_per_node=nranks_per_node,
+        world_size=world_size,
+        in_place=collective.inplace,
+        instances=instances,
+        protocol=protocol,
+        auto_sync=False,
+        reuse_resources=True,
+        use_double_scratch_buffer=protocol == "LL",
+        **options,
+    )
+
+
+def small_programs() -> Dict[str, tuple]:
+    """Small programs of the default algorithms, with their expectations and ranks per node.
+
+    Returns:
+        Dict[str, tuple]: ``(build, expect, init, gpus_per_node)`` by name, where ``build(**options)``
+        returns the program with the given AlgoSpec options.
+    """
+
+    def program(function, collective, world_size, nranks_per_node, protocol, **kwargs):
+        return lambda **options: function(_spec(collective, world_size, nranks_per_node, protocol, **options), **kwargs)
+
+    return {
+        "allreduce_2nodes": (
+            program(default_algos.allreduce_2nodes, AllReduce(8, 1, True), 8, 4, "LL", thread_block_group_size=1),
+            allreduce_expect,
+            None,
+            4,
+        ),
+        "allreduce_hierarchical_ll": (
+            program(
+                default_algos.allreduce_hierarchical, AllReduce(12, 1, True), 12, 4, "LL", thread_block_group_size=1
+            ),
+            allreduce_expect,
+            None,
+            4,
+        ),
+        "allreduce_hierarchical_simple": (
+            program(
+                default_algos.allreduce_hierarchical, AllReduce(8, 1, True), 8, 2, "Simple", thread_block_group_size=1
+            ),
+            allreduce_expect,
+            None,
+            2,
+        ),
+        "allgather_ring": (
+            program(default_algos.allgather_ring, AllGather(8, 2, True), 8, 4, "Simple", num_rings=2),
+            allgather_expect,
+            allgather_init,
+            4,
+        ),
+        "reducescatter_ring": (
+            program(default_algos.reducescatter_ring, ReduceScatter(8, 2, True), 8, 4, "Simple", num_rings=2),
+            reducescatter_expect,
+            None,
+            4,
+        ),
+        "allreduce_ring": (
+            program(default_algos.allreduce_ring, AllReduce(4, 4, False), 4, 4, "Simple"),
+            allreduce_expect,
+            None,
+            4,
+        ),
+        "allreduce_binary_tree_ll": (
+            program(default_algos.allreduce_binary_tree, AllReduce(8, 1, True), 8, 4, "LL"),
+            allreduce_expect,
+            None,
+            4,
+        ),
+        "allreduce_double_binary_tree": (
+            program(default_algos.allreduce_double_binary_tree, AllReduce(8, 2, True), 8, 4, "Simple"),
+            allreduce_expect,
+            None,
+            4,
+        ),
+        "alltoall_pairwise_ll": (
+            program(default_algos.alltoall_pairwise, AllToAll(8, 1, False), 8, 4, "LL"),
+            alltoall_expect,
+            None,
+            4,
+        ),
+        "alltoall_pairwise_simple": (
+            program(default_algos.alltoall_pairwise, AllToAll(8, 1, True), 8, 4, "Simple"),
+            alltoall_expect,
+            None,
+            4,
+        ),
+        "alltoall_pipelined": (
+            program(default_algos.alltoall_pipelined, AllToAll(6, 1, True), 6, 2, "Simple"),
+            alltoall_expect,
+            None,
+            2,
+        ),
+        "alltoall_hierarchical": (
+            program(default_algos.alltoall_hierarchical, AllToAll(12, 1, True), 12, 4, "LL"),
+            alltoall_expect,
+            None,
+            4,
+        ),
+    }
+
+
+def run_example(name: str) -> dict:
+    """Run an example of ``mscclpp/language/tests/unit_tests`` with its default arguments and return its plan."""
+    path = Path(language.__file__).parent / "tests" / "unit_tests" / name
+    argv, sys.argv = sys.argv, [str(path)]
+    try:
+        with contextlib.redirect_stdout(io.StringIO()) as output:
+            runpy.run_path(str(path), run_name="__main__")
+    finally:
+        sys.argv = argv
+    return json.loads(output.getvalue())
+
+
+def count_operations(plan) -> int:
+    """Return the number of operations of a plan, counting those in pipelines."""
+    plan = cost_model.load_plan(plan)
+    return sum(1 + len(op.get("ops", [])) for gpu in plan["gpus"] for tb in gpu["threadblocks"] for op in tb["ops"])
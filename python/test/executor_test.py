@@ -2,6 +2,7 @@
 # Licensed under the MIT License.
 
 import argparse
+import json
 from mscclpp import (
     DataType,
     Executor,
@@ -179,6 +180,7 @@ def main(
     packet_type: PacketType = PacketType.LL16,
     n_iters: int = 10,
     n_graph_iters: int = 10,
+    results_path: str = None,
 ):
     mscclpp_group = mscclpp_comm.CommGroup(MPI.COMM_WORLD)
     cp.cuda.Device(mscclpp_group.my_rank % mscclpp_group.nranks_per_node).use()
@@ -234,6 +236,10 @@ def main(
         f"data size: {result_buf.nbytes} bytes data type: {dtype().dtype.name} "
         f"packet type: {packet_type}"
     )
+    max_execution_time = MPI.COMM_WORLD.allreduce(execution_time, op=MPI.MAX)
+    if results_path is not None and mscclpp_group.my_rank == 0:
+        with open(results_path, "a") as f:
+            f.write(json.dumps({"plan": execution_plan.name, "message_size": size, "time": max_execution_time}) + "\n")
     executor = None
     mscclpp_group = None
 
@@ -247,6 +253,9 @@ if __name__ == "__main__":
     parser.add_argument("--packet_type", type=str, default="LL16", help="Choose from LL8, LL16")
     parser.add_argument("--n_iters", type=int, default=10)
     parser.add_argument("--n_graph_iters", type=int, default=10)
+    parser.add_argument(
+        "--results", type=str, default=None, help="JSON Lines file to append the time of the slowest rank to"
+    )
     args = parser.parse_args()
 
     packet_type = PacketType.LL16
@@ -262,4 +271,5 @@ if __name__ == "__main__":
         packet_type,
         args.n_iters,
         args.n_graph_iters,
+        args.results,
     )
@@ -0,0 +1,213 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+import itertools
+import json
+import math
+
+import pytest
+
+from mscclpp.language import default_algos
+from mscclpp.language.autotune import Autotuner, CostModelScorer, MeasuredScorer
+from mscclpp.language.collectives import AllReduce, AllToAll
+from mscclpp.language.cost_model import HardwareModel
+from mscclpp.language.utils import AlgoSpec
+from mscclpp.plan_manifest import read_manifest
+
+MESSAGE_SIZES = [1 << shift for shift in range(10, 26)]
+SPACE = {"instances": [1, 2, 4, 8], "protocol": ["LL", "Simple"], "thread_block_group_size": [1, 2, 4, 8]}
+
+
+def make_spec(**fields) -> AlgoSpec:
+    fields = {
+        "name": "tuned",
+        "collective": AllReduce(8, 1, True),
+        "nranks_per_node": 8,
+        "world_size": 8,
+        "in_place": True,
+        "instances": 1,
+        "protocol": "Simple",
+        **fields,
+    }
+    return AlgoSpec(**fields)
+
+
+def synthetic_time(parameters: dict, size: int) -> float:
+    """A cost adding up one term per parameter, so that each parameter can be tuned on its own.
+
+    LL wins small sizes and Simple large ones, more instances pay off for larger sizes, and thread
+    block groups of 2 are best everywhere.
+    """
+    packet = parameters["protocol"] == "LL"
+    instances = parameters["instances"]
+    time = size / (20e3 if packet else 50e3) + (2 if packet else 10)
+    time += size / (1e4 * instances) + 3 * instances
+    return time + abs(parameters["thread_block_group_size"] - 2)
+
+
+class SyntheticScorer:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, candidate, program, message_sizes):
+        self.calls.append((candidate.name, tuple(message_sizes)))
+        parameters = dict(candidate.parameters)
+        return {size: synthetic_time(parameters, size) for size in message_sizes}
+
+    def evaluations(self) -> int:
+        return sum(len(sizes) for _, sizes in self.calls)
+
+
+def best_parameters(size: int) -> dict:
+    names = list(SPACE)
+    assignments = [dict(zip(names, values)) for values in itertools.product(*(SPACE[name] for name in names))]
+    return min(assignments, key=lambda parameters: synthetic_time(parameters, size))
+
+
+def selected_parameters(ranges, size: int) -> dict:
+    (size_range,) = [r for r in ranges if r.min_message_size <= size <= r.max_message_size]
+    return dict(size_range.candidate.parameters)
+
+
+def make_tuner(scorer, **fields) -> Autotuner:
+    return Autotuner(lambda spec, **kwargs: None, make_spec(**fields), SPACE, MESSAGE_SIZES, scorer)
+
+
+def test_rejects_empty_space_and_sizes_out_of_range():
+    with pytest.raises(ValueError):
+        Autotuner(lambda spec: None, make_spec(), {}, MESSAGE_SIZES, SyntheticScorer())
+    with pytest.raises(ValueError):
+        Autotuner(lambda spec: None, make_spec(), {"instances": []}, MESSAGE_SIZES, SyntheticScorer())
+    with pytest.raises(ValueError):
+        Autotuner(lambda spec: None, make_spec(min_message_size=1 << 12), SPACE, MESSAGE_SIZES, SyntheticScorer())
+
+
+def test_candidate_splits_spec_fields_and_kwargs():
+    tuner = make_tuner(SyntheticScorer())
+    candidate = tuner.candidate({"instances": 2, "protocol": "LL", "thread_block_group_size": 4})
+    assert candidate.name == "tuned_i2_LL_tbg4"
+    assert (candidate.spec.name, candidate.spec.instances, candidate.spec.protocol) == ("tuned_i2_LL_tbg4", 2, "LL")
+    assert candidate.kwargs == {"thread_block_group_size": 4}
+    assert tuner.candidate({"thread_block_group_size": 4, "protocol": "LL", "instances": 2}) is candidate
+
+
+def test_evaluate_caches_and_scores_failures_as_slow():
+    scorer = SyntheticScorer()
+    tuner = make_tuner(scorer)
+    candidate = tuner.candidate({"instances": 1, "protocol": "LL", "thread_block_group_size": 1})
+    tuner.evaluate(candidate, MESSAGE_SIZES[:4])
+    tuner.evaluate(candidate)
+    assert scorer.calls == [(candidate.name, tuple(MESSAGE_SIZES[:4])), (candidate.name, tuple(MESSAGE_SIZES[4:]))]
+
+    def failing_scorer(candidate, program, message_sizes):
+        raise RuntimeError("cannot build")
+
+    tuner = make_tuner(failing_scorer)
+    times = tuner.evaluate(tuner.candidate({"instances": 1, "protocol": "LL", "thread_block_group_size": 1}))
+    assert all(math.isinf(time) for time in times.values())
+
+
+@pytest.mark.parametrize("search", ["exhaustive", "coordinate_descent"])
+def test_search_finds_the_best_candidate_of_each_size(search):
+    scorer = SyntheticScorer()
+    tuner = make_tuner(scorer)
+    getattr(tuner, search)()
+    ranges = tuner.partition(tolerance=0)
+    for size in MESSAGE_SIZES:
+        assert selected_parameters(ranges, size) == best_parameters(size), size
+    num_candidates = math.prod(len(values) for values in SPACE.values())
+    if search == "exhaustive":
+        assert scorer.evaluations() == num_candidates * len(MESSAGE_SIZES)
+    else:
+        assert scorer.evaluations() < num_candidates * len(MESSAGE_SIZES)
+
+
+def test_successive_halving_keeps_the_winners_of_the_grid_ends():
+    scorer = SyntheticScorer()
+    tuner = make_tuner(scorer)
+    survivors = tuner.successive_halving()
+    names = {tuner.candidate(best_parameters(size)).name for size in (MESSAGE_SIZES[0], MESSAGE_SIZES[-1])}
+    assert len(names) == 2 and names <= {candidate.name for candidate in survivors}
+    num_candidates = math.prod(len(values) for values in SPACE.values())
+    assert len(survivors) < num_candidates
+    assert scorer.evaluations() < num_candidates * len(MESSAGE_SIZES) / 2
+    # The survivors are scored on the full grid, so the partition only selects among them.
+    ranges = tuner.partition()
+    assert {size_range.candidate.name for size_range in ranges} <= {candidate.name for candidate in survivors}
+
+
+def test_partition_covers_the_spec_range():
+    tuner = make_tuner(SyntheticScorer(), min_message_size=1 << 8, max_message_size=1 << 30)
+    tuner.exhaustive()
+    ranges = tuner.partition(tolerance=0)
+    assert len(ranges) > 2
+    assert ranges[0].min_message_size == 1 << 8 and ranges[-1].max_message_size == 1 << 30
+    assert all(first.max_message_size + 1 == second.min_message_size for first, second in zip(ranges, ranges[1:]))
+    # Each range after the first starts at the first grid size its candidate wins.
+    for size_range in ranges[1:]:
+        assert size_range.min_message_size in MESSAGE_SIZES
+        assert dict(size_range.candidate.parameters) == best_parameters(size_range.min_message_size)
+        previous_size = MESSAGE_SIZES[MESSAGE_SIZES.index(size_range.min_message_size) - 1]
+        assert dict(size_range.candidate.parameters) != best_parameters(previous_size)
+
+
+def test_partition_tolerance_extends_ranges():
+    tuner = make_tuner(SyntheticScorer())
+    tuner.exhaustive()
+    exact = tuner.partition(tolerance=0)
+    loose = tuner.partition(tolerance=1.0)
+    assert len(loose) < len(exact)
+    assert loose[0].candidate == exact[0].candidate
+
+
+def test_partition_fails_without_scores():
+    tuner = make_tuner(lambda candidate, program, message_sizes: {size: math.inf for size in message_sizes})
+    tuner.exhaustive()
+    with pytest.raises(RuntimeError):
+        tuner.partition()
+
+
+def test_measured_scorer_averages_measurements(tmp_path):
+    results = tmp_path / "results.jsonl"
+    records = [
+        {"plan": "tuned_i1_LL_tbg1", "message_size": 1024, "time": 10.0},
+        {"plan": "tuned_i1_LL_tbg1", "message_size": 1024, "time": 20.0},
+        {"plan": "tuned_i1_LL_tbg1", "message_size": 2048, "time": 30.0},
+    ]
+    results.write_text("\n".join(json.dumps(record) for record in records) + "\n\n")
+    tuner = make_tuner(MeasuredScorer(str(results)))
+    candidate = tuner.candidate({"instances": 1, "protocol": "LL", "thread_block_group_size": 1})
+    times = tuner.evaluate(candidate, [1024, 2048, 4096])
+    assert times == {1024: 15.0, 2048: 30.0, 4096: math.inf}
+
+
+def test_cost_model_family(tmp_path):
+    spec = AlgoSpec(
+        name="alltoall",
+        collective=AllToAll(8, 1, False),
+        nranks_per_node=8,
+        world_size=8,
+        in_place=False,
+        instances=1,
+        protocol="LL",
+        use_double_scratch_buffer=True,
+    )
+    tuner = Autotuner(
+        default_algos.alltoall_pairwise,
+        spec,
+        {"protocol": ["LL", "Simple"]},
+        [1 << 10, 1 << 16, 1 << 22, 1 << 26],
+        CostModelScorer(HardwareModel(gpus_per_node=8)),
+    )
+    tuner.exhaustive()
+    ranges = tuner.partition()
+    assert [size_range.candidate.spec.protocol for size_range in ranges] == ["LL", "Simple"]
+
+    entries = tuner.write_family(str(tmp_path))
+    assert all((tmp_path / entry["filename"]).exists() for entry in entries)
+    assert entries[-1]["filename"].endswith("_max.json")
+    assert read_manifest(str(tmp_path)) == entries
+    assert [(entry["min_message_size"], entry["max_message_size"]) for entry in entries] == [
+        (size_range.min_message_size, size_range.max_message_size) for size_range in ranges
+    ]
+    assert [entry["protocol"] for entry in entries] == ["LL", "Simple"]
@@ -0,0 +1,161 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+import random
+
+import pytest
+from sortedcontainers import SortedDict
+
+from mscclpp.language.internal.buffer_access import BuffersAccess, IntervalMap
+from mscclpp.language.internal.operations import SyncOperation
+from mscclpp.language.internal.types import BufferType, DataAccess, DataAccessType, Instruction
+
+
+class ReferenceBuffersAccess:
+    """The previous implementation of ``BuffersAccess``, with a recursive lower bound over a ``SortedDict``."""
+
+    def __init__(self):
+        self.intervals = {buffer_type: SortedDict() for buffer_type in BufferType}
+
+    def process_operations(self, operations):
+        result_operations = []
+        for operation in operations:
+            if operation.name == Instruction.nop or operation.name == Instruction.barrier:
+                self.clear_data_access()
+            else:
+                if operation.name == Instruction.pipeline:
+                    operation.operations = ReferenceBuffersAccess().process_operations(operation.operations)
+                sync_added = False
+                for data_access_element in operation.local_data_access():
+                    if self.compute_data_access(data_access_element) and not sync_added:
+                        result_operations.append(SyncOperation())
+                        sync_added = True
+            result_operations.append(operation)
+        return result_operations
+
+    def compute_data_access(self, data_access):
+        intervals = self.intervals[data_access.buffer_type]
+        keys = intervals.keys()
+        idx = self.lower_bound(0, len(keys) - 1, keys, data_access)
+        conflict = False
+        while len(keys) > 0 and data_access.overlaps(keys[idx]):
+            conflict_data_access = keys[idx]
+            conflict_operation_type = intervals[conflict_data_access]
+            if data_access.check_conflict(conflict_data_access):
+                self.clear_data_access()
+                conflict = True
+                break
+            intervals.pop(conflict_data_access)
+            if conflict_data_access.end > data_access.end:
+                remainder = DataAccess(
+                    conflict_data_access.operation_id,
+                    data_access.end + 1,
+                    conflict_data_access.end,
+                    conflict_data_access.buffer_type,
+                    conflict_operation_type,
+                )
+                intervals[remainder] = conflict_operation_type
+            if conflict_data_access.start < data_access.start:
+                remainder = DataAccess(
+                    conflict_data_access.operation_id,
+                    conflict_data_access.start,
+                    data_access.start - 1,
+                    conflict_data_access.buffer_type,
+                    conflict_operation_type,
+                )
+                intervals[remainder] = conflict_operation_type
+            keys = intervals.keys()
+            idx = self.lower_bound(0, len(keys) - 1, keys, data_access)
+        intervals[data_access] = data_access.data_access_type
+        return conflict
+
+    def clear_data_access(self):
+        for intervals in self.intervals.values():
+            intervals.clear()
+
+    def lower_bound(self, init_pos, final_pos, data_access_list, data_access):
+        if init_pos >= final_pos:
+            return init_pos
+        mid_pos = (init_pos + final_pos) // 2
+        if data_access.start <= data_access_list[mid_pos].end:
+            final_pos = mid_pos
+        else:
+            init_pos = mid_pos + 1
+        return self.lower_bound(init_pos, final_pos, data_access_list, data_access)
+
+
+class FakeOperation:
+    def __init__(self, name, operation_id, data_accesses=(), operations=None):
+        self.name = name
+        self.id = operation_id
+        self.data_accesses = list(data_accesses)
+        self.operations = operations
+
+    def local_data_access(self):
+        return self.data_accesses
+
+
+def random_operations(rng, buffer_size, num_operations, first_id=0, nested=True):
+    operations = []
+    for operation_id in range(first_id, first_id + num_operations):
+        kind = rng.random()
+        if kind < 0.08:
+            operations.append(FakeOperation(Instruction.nop, operation_id))
+        elif kind < 0.1:
+            operations.append(FakeOperation(Instruction.barrier, operation_id))
+        else:
+            data_accesses = []
+            for _ in range(rng.randint(0, 4)):
+                start = rng.randrange(buffer_size)
+                end = min(buffer_size - 1, start + rng.choice([0, 0, 1, 3, rng.randrange(buffer_size)]))
+                data_access_type = rng.choice([DataAccessType.read, DataAccessType.write])
+                buffer_type = rng.choice(list(BufferType))
+                data_accesses.append(DataAccess(operation_id, start, end, buffer_type, data_access_type))
+            if nested and kind < 0.15:
+                body = random_operations(rng, buffer_size, rng.randint(1, 8), first_id=operation_id * 100, nested=False)
+                operations.append(FakeOperation(Instruction.pipeline, operation_id, data_accesses, body))
+            else:
+                operations.append(FakeOperation(Instruction.copy, operation_id, data_accesses))
+    return operations
+
+
+def describe(operations):
+    return [
+        "sync" if operation.name == Instruction.nop else (operation.id, describe(operation.operations or []))
+        for operation in operations
+    ]
+
+
+def reference_state(buffers_access):
+    return {
+        buffer_type: {(key.start, key.end): (key.operation_id, value) for key, value in intervals.items()}
+        for buffer_type, intervals in buffers_access.intervals.items()
+    }
+
+
+def state(buffers_access):
+    return {buffer_type: dict(intervals.accesses) for buffer_type, intervals in buffers_access.intervals.items()}
+
+
+@pytest.mark.parametrize("seed", range(200))
+def test_matches_reference(seed):
+    buffer_size = random.Random(seed).choice([4, 16, 64, 1024])
+    reference, buffers_access = ReferenceBuffersAccess(), BuffersAccess()
+    expected = reference.process_operations(random_operations(random.Random(seed), buffer_size, 200))
+    result = buffers_access.process_operations(random_operations(random.Random(seed), buffer_size, 200))
+    assert describe(result) == describe(expected)
+    assert state(buffers_access) == reference_state(reference)
+
+
+def test_interval_map_keeps_disjoint_remnants():
+    intervals = IntervalMap()
+    intervals.replace([], DataAccess(0, 0, 9, BufferType.input, DataAccessType.read))
+    intervals.replace([], DataAccess(1, 20, 29, BufferType.input, DataAccessType.read))
+    overlapping_keys = intervals.overlapping(5, 24)
+    assert overlapping_keys == [(0, 9), (20, 29)]
+    intervals.replace(overlapping_keys, DataAccess(2, 5, 24, BufferType.input, DataAccessType.write))
+    assert list(intervals.keys) == [(0, 4), (5, 24), (25, 29)]
+    assert intervals.accesses[(0, 4)] == (0, DataAccessType.read)
+    assert intervals.accesses[(25, 29)] == (1, DataAccessType.read)
+    assert intervals.overlapping(10, 19) == [(5, 24)]
+    assert intervals.overlapping(30, 40) == []
@@ -0,0 +1,30 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+import json
+
+import pytest
+
+from mscclpp.language.utils import ReplicationPolicy
+from mscclpp.plan_format import expand_instances
+
+from .dsl_verifier import small_programs
+
+PROGRAMS = small_programs()
+# Programs whose interleaved instances the loader cannot rebuild from a template, which are written in full.
+PLAIN_WHEN_INTERLEAVED = {"allreduce_2nodes", "allreduce_binary_tree_ll", "allreduce_hierarchical_ll"}
+
+
+@pytest.mark.parametrize("policy", [ReplicationPolicy.interleaved, ReplicationPolicy.none])
+@pytest.mark.parametrize("name", sorted(PROGRAMS))
+def test_compact_instances_expand_to_plain_plan(name, policy):
+    build = PROGRAMS[name][0]
+    plain = json.loads(build(instances=2, replication_policy=policy).to_json())
+    compact = json.loads(build(instances=2, replication_policy=policy, compact_instances=True).to_json())
+    assert "replication" not in plain
+    if policy == ReplicationPolicy.interleaved and name in PLAIN_WHEN_INTERLEAVED:
+        assert compact == plain
+        return
+    assert compact["replication"] == {"instances": 2, "policy": str(policy)}
+    assert expand_instances(compact) == plain
+    assert len(json.dumps(compact)) < len(json.dumps(plain))
@@ -0,0 +1,47 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+import json
+from types import SimpleNamespace
+
+import pytest
+
+import mscclpp
+from mscclpp.language.collectives import AllReduce
+from mscclpp.language.default_algos import allreduce_ring
+
+from .dsl_verifier import _spec
+
+SPEC = _spec(AllReduce(4, 4, True), 4, 2, "Simple")
+
+
+@pytest.fixture
+def plan_dir(tmp_path, monkeypatch):
+    # Plan files are written by compile, the native plan objects are only recorded.
+    monkeypatch.setenv("MSCCLPP_EXECUTION_PLAN_DIR", str(tmp_path))
+    monkeypatch.setattr(mscclpp, "_compiled_plans", {})
+    monkeypatch.setattr(mscclpp, "ExecutionPlan", lambda path, rank: (path, rank))
+    monkeypatch.setattr(
+        mscclpp, "_ExecutionPlanHandle", SimpleNamespace(create=lambda **kwargs: SimpleNamespace(**kwargs))
+    )
+    return tmp_path
+
+
+def test_compile_writes_rank_scoped_plans_of_the_node(plan_dir):
+    handle = mscclpp.compile(allreduce_ring, SPEC, rank=3)
+    plan_id = handle.id
+    assert handle.plan == (str(plan_dir / f"{plan_id}.rank3.json"), 3)
+    # The ranks of the second node get a plan each, with the operations of that rank only.
+    assert sorted(path.name for path in plan_dir.glob("*.json")) == [f"{plan_id}.rank2.json", f"{plan_id}.rank3.json"]
+    for rank in (2, 3):
+        plan = json.loads((plan_dir / f"{plan_id}.rank{rank}.json").read_text())
+        assert plan["rank_scope"] == rank
+        assert [gpu["id"] for gpu in plan["gpus"] if "threadblocks" in gpu] == [rank]
+
+
+def test_compile_writes_whole_world_plan(plan_dir):
+    handle = mscclpp.compile(allreduce_ring, SPEC, rank=3, rank_scoped=False)
+    assert handle.plan == (str(plan_dir / f"{handle.id}.json"), 3)
+    plan = json.loads((plan_dir / f"{handle.id}.json").read_text())
+    assert "rank_scope" not in plan
+    assert all("threadblocks" in gpu for gpu in plan["gpus"])
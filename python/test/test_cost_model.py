@@ -0,0 +1,100 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+import json
+
+import pytest
+
+from mscclpp.language import collectives
+from mscclpp.language.channel import MemoryChannel
+from mscclpp.language.cost_model import HardwareModel, LinkModel, estimate_time, estimate_times
+from mscclpp.language.internal.types import SyncType
+from mscclpp.language.program import CollectiveProgram
+from mscclpp.language.rank import Rank
+
+from .dsl_verifier import small_programs
+
+PROGRAMS = small_programs()
+MESSAGE_SIZES = [1 << 10, 1 << 16, 1 << 20, 1 << 24]
+
+
+def put_and_signal() -> CollectiveProgram:
+    with CollectiveProgram("put_and_signal", collectives.TestCollective(2, 1, 1), 2) as program:
+        channel = MemoryChannel(1, 0)
+        channel.put(Rank(1).get_output_buffer()[0:1], Rank(0).get_input_buffer()[0:1], tb=0)
+        channel.signal(tb=0, data_sync=SyncType.before)
+        MemoryChannel(0, 1).wait(tb=0, data_sync=SyncType.after)
+    return program
+
+
+def test_estimate_of_put_and_signal():
+    hardware = HardwareModel(gpus_per_node=2)
+    estimate = estimate_time(put_and_signal(), 1 << 20, hardware)
+    overheads = hardware.operation_overheads
+    # The put moves the chunk at the bandwidth of one thread block, the signal arrives after the
+    # NVLink latency, and each rank ends with the sync after its last operation.
+    put_end = overheads["put"] + (1 << 20) / (hardware.threadblock_bandwidth * 1e3)
+    signal_end = put_end + overheads["nop"] + overheads["signal"]
+    wait_end = signal_end + hardware.nvlink.latency + overheads["wait"]
+    assert estimate.rank_times == pytest.approx([signal_end, wait_end + overheads["nop"]])
+    assert estimate.time == pytest.approx(hardware.kernel_launch + wait_end + overheads["nop"])
+    assert [(step.rank, step.operation) for step in estimate.critical_path] == [
+        (0, "put"),
+        (0, "nop"),
+        (0, "signal"),
+        (1, "wait"),
+        (1, "nop"),
+    ]
+    assert estimate.critical_path[3].start == pytest.approx(signal_end + hardware.nvlink.latency)
+
+
+@pytest.mark.parametrize("name", sorted(PROGRAMS))
+def test_estimates_grow_with_message_size(name):
+    build, _, _, gpus_per_node = PROGRAMS[name]
+    times = estimate_times(build(), MESSAGE_SIZES, HardwareModel(gpus_per_node=gpus_per_node))
+    assert all(times[smaller] <= times[larger] for smaller, larger in zip(MESSAGE_SIZES, MESSAGE_SIZES[1:]))
+    assert times[MESSAGE_SIZES[-1]] > times[MESSAGE_SIZES[0]]
+
+
+def test_estimates_follow_the_network():
+    build, _, _, gpus_per_node = PROGRAMS["allreduce_2nodes"]
+    program = build()
+    slow = HardwareModel(gpus_per_node=gpus_per_node, network=LinkModel(bandwidth=10.0, latency=10.0))
+    fast = HardwareModel(gpus_per_node=gpus_per_node, network=LinkModel(bandwidth=100.0, latency=1.0))
+    assert estimate_time(program, 1 << 20, slow).time > estimate_time(program, 1 << 20, fast).time
+
+    # A single node program never uses the network.
+    build, _, _, _ = PROGRAMS["allgather_ring"]
+    program = build()
+    assert estimate_time(program, 1 << 20, HardwareModel(network=LinkModel(bandwidth=1.0))).time == pytest.approx(
+        estimate_time(program, 1 << 20, HardwareModel()).time
+    )
+
+
+def test_packets_win_for_small_messages_only():
+    hardware = HardwareModel(gpus_per_node=8)
+    packets = estimate_times(PROGRAMS["alltoall_pairwise_ll"][0](), [1 << 10, 1 << 26], hardware)
+    simple = estimate_times(PROGRAMS["alltoall_pairwise_simple"][0](), [1 << 10, 1 << 26], hardware)
+    assert packets[1 << 10] < simple[1 << 10]
+    assert packets[1 << 26] > simple[1 << 26]
+
+
+def test_compact_plans_estimate_as_plain_plans():
+    build, _, _, gpus_per_node = PROGRAMS["allgather_ring"]
+    hardware = HardwareModel(gpus_per_node=gpus_per_node)
+    plain = estimate_time(json.loads(build().to_json()), 1 << 20, hardware)
+    compact = estimate_time(json.loads(build(deduplicate_ranks=True).to_json()), 1 << 20, hardware)
+    assert compact.time == pytest.approx(plain.time)
+    assert compact.rank_times == pytest.approx(plain.rank_times)
+
+
+def test_rank_scoped_plan_is_rejected():
+    with pytest.raises(ValueError):
+        estimate_time(json.loads(put_and_signal().to_json(rank=0)), 1 << 20)
+
+
+def test_deadlock_is_reported():
+    with CollectiveProgram("unmatched_wait", collectives.TestCollective(2, 1, 1), 2) as program:
+        MemoryChannel(0, 1).wait(tb=0)
+    with pytest.raises(RuntimeError, match="deadlocks"):
+        estimate_time(program, 1 << 20)
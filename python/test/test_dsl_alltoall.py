@@ -0,0 +1,97 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+import json
+
+import pytest
+
+from mscclpp.__main__ import default_algo_configs, installed_configs
+from mscclpp.language import default_algos
+from mscclpp.language.collectives import AllToAll
+
+from .dsl_verifier import _spec, alltoall_expect, check_limits, send_peers, verify, verify_config
+
+ALLTOALL_CONFIGS = {
+    config["spec"].name: config for config in default_algo_configs if config["spec"].collective.name == "alltoall"
+}
+
+
+@pytest.mark.parametrize("name", sorted(ALLTOALL_CONFIGS))
+def test_installed_alltoall_plans_data(name):
+    assert verify_config(ALLTOALL_CONFIGS[name]) == []
+
+
+def test_large_alltoall_plans_installed_on_request():
+    # The 16-node plans take tens of MB each.
+    def installed(max_nodes):
+        return {
+            config["spec"].name for config in installed_configs(max_nodes) if config["spec"].name in ALLTOALL_CONFIGS
+        }
+
+    assert installed(8) == {name for name in ALLTOALL_CONFIGS if not name.startswith("alltoall_16nodes")}
+    assert installed(16) == set(ALLTOALL_CONFIGS)
+
+
+@pytest.mark.parametrize(
+    "function, collective, world_size, nranks_per_node, protocol, kwargs",
+    [
+        (default_algos.alltoall_pairwise, AllToAll(5, 1, False), 5, 5, "LL", {}),
+        (default_algos.alltoall_pairwise, AllToAll(6, 2, True), 6, 2, "LL", {}),
+        (default_algos.alltoall_pairwise, AllToAll(7, 1, True), 7, 1, "Simple", {}),
+        (default_algos.alltoall_pairwise, AllToAll(12, 1, False), 12, 4, "Simple", {"num_thread_blocks": 3}),
+        (default_algos.alltoall_pipelined, AllToAll(4, 4, False), 4, 2, "Simple", {"pipeline_unit_size": 1}),
+        (default_algos.alltoall_pipelined, AllToAll(5, 2, True), 5, 5, "Simple", {}),
+        (default_algos.alltoall_hierarchical, AllToAll(6, 2, False), 6, 2, "LL", {}),
+        (default_algos.alltoall_hierarchical, AllToAll(16, 1, True), 16, 2, "LL", {}),
+        (default_algos.alltoall_hierarchical, AllToAll(15, 1, False), 15, 3, "LL", {}),
+    ],
+)
+def test_alltoall_data(function, collective, world_size, nranks_per_node, protocol, kwargs):
+    program = function(_spec(collective, world_size, nranks_per_node, protocol), **kwargs)
+    plan = json.loads(program.to_json())
+    assert check_limits(plan) == []
+    assert verify(plan, alltoall_expect, gpus_per_node=nranks_per_node) == []
+
+
+@pytest.mark.parametrize("protocol", ["LL", "Simple"])
+def test_pairwise_peers_share_thread_block(protocol):
+    # Both ranks of a pair run their step on the same thread block.
+    num_ranks = 8
+    program = default_algos.alltoall_pairwise(_spec(AllToAll(num_ranks, 1, False), num_ranks, 4, protocol))
+    peers = send_peers(json.loads(program.to_json()))
+    assert all(
+        sorted(peer for tb_peers in peers[rank].values() for peer in tb_peers) == sorted(set(range(num_ranks)) - {rank})
+        for rank in range(num_ranks)
+    )
+    for rank, tbs in peers.items():
+        for tb, tb_peers in tbs.items():
+            assert all(rank in peers[peer][tb] for peer in tb_peers)
+
+
+def test_hierarchical_sends_through_node_leaders():
+    # Local rank g of node n sends over the network only to local rank n of the nodes it leads.
+    num_nodes, gpus_per_node = 5, 2
+    program = default_algos.alltoall_hierarchical(
+        _spec(AllToAll(num_nodes * gpus_per_node, 1, False), num_nodes * gpus_per_node, gpus_per_node, "LL")
+    )
+    peers = send_peers(json.loads(program.to_json()))
+    for node in range(num_nodes):
+        for local_gpu in range(gpus_per_node):
+            rank = node * gpus_per_node + local_gpu
+            remote_peers = {
+                peer for tb_peers in peers[rank].values() for peer in tb_peers if peer // gpus_per_node != node
+            }
+            assert remote_peers == {
+                peer_node * gpus_per_node + node % gpus_per_node
+                for peer_node in range(num_nodes)
+                if peer_node != node and peer_node % gpus_per_node == local_gpu
+            }
+
+
+def test_alltoall_rejects_unsupported_specs():
+    with pytest.raises(RuntimeError, match="thread blocks"):
+        default_algos.alltoall_pairwise(_spec(AllToAll(12, 1, True), 12, 4, "LL"), num_thread_blocks=2)
+    with pytest.raises(RuntimeError, match="Too many nodes"):
+        default_algos.alltoall_hierarchical(_spec(AllToAll(20, 1, True), 20, 2, "LL"))
+    with pytest.raises(RuntimeError):
+        default_algos.alltoall_hierarchical(_spec(AllToAll(8, 1, True), 8, 4, "Simple"))
@@ -0,0 +1,110 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+import json
+from collections import Counter
+
+import pytest
+
+from mscclpp.language import collectives, cost_model
+from mscclpp.language.channel import MemoryChannel
+from mscclpp.language.internal.types import SyncType
+from mscclpp.language.program import CollectiveProgram
+from mscclpp.language.rank import Rank, Semaphore
+
+from .dsl_verifier import check_limits, run_example, small_programs, verify
+
+PROGRAMS = small_programs()
+
+
+def resources(plan) -> list:
+    """The number of channels and semaphores of each rank."""
+    return [
+        (sum(len(channel.get("connected_to", [])) for channel in gpu["channels"]), len(gpu["semaphores"]))
+        for gpu in cost_model.load_plan(plan)["gpus"]
+    ]
+
+
+@pytest.mark.parametrize("name", sorted(PROGRAMS))
+def test_channel_sharing_keeps_data(name):
+    build, expect, init, gpus_per_node = PROGRAMS[name]
+    plan = json.loads(build(share_channels=True).to_json())
+    assert verify(plan, expect, init, gpus_per_node) == []
+    assert check_limits(plan) == []
+    shared, original = resources(plan), resources(json.loads(build().to_json()))
+    assert all(
+        channels <= original_channels and semaphores <= original_semaphores
+        for (channels, semaphores), (original_channels, original_semaphores) in zip(shared, original)
+    )
+
+
+def test_channel_sharing_keeps_concurrent_channels():
+    # The two rings of the allgather use their channels to the same peer at the same time.
+    build = PROGRAMS["allgather_ring"][0]
+    assert resources(json.loads(build(share_channels=True).to_json())) == resources(json.loads(build().to_json()))
+
+
+def handshake_then_put(share_channels: bool) -> CollectiveProgram:
+    # A handshake over one channel, then a put and signal over a second channel to the same peer.
+    num_ranks = 2
+    with CollectiveProgram(
+        "handshake_then_put",
+        collectives.TestCollective(num_ranks, 1, num_ranks),
+        num_ranks,
+        share_channels=share_channels,
+    ) as program:
+        for src_rank in range(num_ranks):
+            dst_rank = 1 - src_rank
+            input_buffer = Rank(src_rank).get_input_buffer()
+            dst_buffer = Rank(dst_rank).get_output_buffer()
+            sync_channel = MemoryChannel(dst_rank, src_rank)
+            sync_channel.signal(tb=0, relaxed=True)
+            sync_channel.wait(tb=0, data_sync=SyncType.after, relaxed=True)
+            data_channel = MemoryChannel(dst_rank, src_rank)
+            data_channel.put(dst_buffer[src_rank : src_rank + 1], input_buffer[0:1], tb=0)
+            data_channel.signal(tb=0, data_sync=SyncType.before)
+            data_channel.wait(tb=0, data_sync=SyncType.after)
+    return program
+
+
+def handshake_expect(plan: dict, rank: int) -> dict:
+    return {("o", 1 - rank): Counter({(1 - rank, 0): 1})}
+
+
+def test_channel_sharing_merges_sequential_channels():
+    plan = json.loads(handshake_then_put(True).to_json())
+    assert resources(plan) == [(1, 0), (1, 0)]
+    assert resources(json.loads(handshake_then_put(False).to_json())) == [(2, 0), (2, 0)]
+    assert verify(plan, handshake_expect, gpus_per_node=2) == []
+
+
+def test_channel_sharing_example():
+    plan = run_example("channel_sharing_test.py")
+    assert resources(plan) == [(1, 0), (1, 0)]
+    assert all(gpu["channels"] == [{"channel_type": "memory", "connected_to": [1 - gpu["id"]]}] for gpu in plan["gpus"])
+    assert verify(plan, handshake_expect, gpus_per_node=2) == []
+
+
+def sequential_semaphores(share_channels: bool) -> CollectiveProgram:
+    # Each semaphore hands a chunk over from one thread block to another, one after the other.
+    num_ranks = 1
+    with CollectiveProgram(
+        "sequential_semaphores",
+        collectives.TestCollective(num_ranks, 2, 2),
+        num_ranks,
+        share_channels=share_channels,
+    ) as program:
+        rank = Rank(0)
+        input_buffer, output_buffer = rank.get_input_buffer(), rank.get_output_buffer()
+        for index in range(2):
+            semaphore = Semaphore(0, initial_value=0)
+            rank.copy(output_buffer[index : index + 1], input_buffer[index : index + 1], tb=0)
+            semaphore.release(tb=0)
+            semaphore.acquire(tb=1)
+            rank.copy(input_buffer[index : index + 1], output_buffer[index : index + 1], tb=1)
+    return program
+
+
+def test_channel_sharing_merges_sequential_semaphores():
+    assert resources(json.loads(sequential_semaphores(False).to_json())) == [(0, 2)]
+    assert resources(json.loads(sequential_semaphores(True).to_json())) == [(0, 1)]
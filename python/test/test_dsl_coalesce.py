@@ -0,0 +1,79 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+import json
+
+import pytest
+
+from mscclpp.language import collectives
+from mscclpp.language.channel import MemoryChannel
+from mscclpp.language.internal.types import SyncType
+from mscclpp.language.program import CollectiveProgram
+from mscclpp.language.rank import Rank
+
+from .dsl_verifier import allgather_expect, check_limits, count_operations, run_example, small_programs, verify
+
+PROGRAMS = small_programs()
+
+
+@pytest.mark.parametrize("name", sorted(PROGRAMS))
+def test_coalescing_keeps_data(name):
+    build, expect, init, gpus_per_node = PROGRAMS[name]
+    plan = json.loads(build(coalesce_chunks=True).to_json())
+    assert verify(plan, expect, init, gpus_per_node) == []
+    assert check_limits(plan) == []
+    assert count_operations(plan) <= count_operations(build())
+
+
+def chunked_allgather(coalesce_chunks: bool, stride: int = 1) -> CollectiveProgram:
+    # Each rank copies its input to its part of the output and puts it to the output of its peer,
+    # one chunk at a time. Output chunks are ``stride`` apart.
+    num_ranks, num_chunks = 2, 4
+    collective = collectives.TestCollective(num_ranks, num_chunks, num_ranks * num_chunks * stride)
+    with CollectiveProgram("chunked_allgather", collective, num_ranks, coalesce_chunks=coalesce_chunks) as program:
+        for src_rank in range(num_ranks):
+            rank = Rank(src_rank)
+            input_buffer = rank.get_input_buffer()
+            output_buffer = rank.get_output_buffer()
+            first = src_rank * num_chunks * stride
+            for i in range(num_chunks):
+                rank.copy(output_buffer[first + i * stride : first + i * stride + 1], input_buffer[i : i + 1], tb=0)
+            dst_rank = 1 - src_rank
+            dst_buffer = Rank(dst_rank).get_output_buffer()
+            channel = MemoryChannel(dst_rank, src_rank)
+            channel.signal(tb=0, relaxed=True)
+            channel.wait(tb=0, data_sync=SyncType.after, relaxed=True)
+            for i in range(num_chunks):
+                channel.put(dst_buffer[first + i * stride : first + i * stride + 1], input_buffer[i : i + 1], tb=0)
+            channel.signal(tb=0, data_sync=SyncType.before)
+            channel.wait(tb=0, data_sync=SyncType.after)
+    return program
+
+
+def transfers(plan: dict, rank: int) -> list:
+    return [
+        (op["name"], [buff["size"] for buff in op["dst_buff"]])
+        for op in plan["gpus"][rank]["threadblocks"][0]["ops"]
+        if op["name"] in ("copy", "put")
+    ]
+
+
+def test_coalescing_merges_contiguous_chunks():
+    plan = json.loads(chunked_allgather(True).to_json())
+    # The four copies become one copy of four chunks, the four puts, fused into one put, one put of four chunks.
+    for rank in range(2):
+        assert transfers(plan, rank) == [("copy", [4]), ("put", [4])]
+    assert verify(plan, allgather_expect, gpus_per_node=2) == []
+    assert transfers(json.loads(chunked_allgather(False).to_json()), 0) == [("copy", [1])] * 4 + [("put", [1] * 4)]
+
+
+def test_coalescing_keeps_separate_chunks():
+    plan = json.loads(chunked_allgather(True, stride=2).to_json())
+    assert transfers(plan, 0) == [("copy", [1])] * 4 + [("put", [1] * 4)]
+
+
+def test_coalesce_example():
+    plan = run_example("coalesce_test.py")
+    for rank in range(2):
+        assert transfers(plan, rank) == [("copy", [4]), ("put", [4])]
+    assert verify(plan, allgather_expect, gpus_per_node=2) == []
@@ -0,0 +1,82 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+import json
+from collections import Counter
+
+import pytest
+
+from mscclpp.language.channel import MemoryChannel
+from mscclpp.language import collectives
+from mscclpp.language.internal.types import SyncType
+from mscclpp.language.program import CollectiveProgram
+from mscclpp.language.rank import Rank
+
+from .dsl_verifier import check_limits, count_operations, run_example, small_programs, verify
+
+PROGRAMS = small_programs()
+
+
+@pytest.mark.parametrize("name", sorted(PROGRAMS))
+def test_reordering_keeps_data(name):
+    build, expect, init, gpus_per_node = PROGRAMS[name]
+    program = build(reorder_operations=True)
+    plan = json.loads(program.to_json())
+    assert verify(plan, expect, init, gpus_per_node) == []
+    assert check_limits(plan) == []
+    assert count_operations(plan) <= count_operations(build())
+
+
+def separated_puts(reorder_operations: bool) -> CollectiveProgram:
+    # Two puts and signals to each peer, separated by a signal and an unrelated local copy.
+    num_ranks = 2
+    with CollectiveProgram(
+        "separated_puts", collectives.TestCollective(num_ranks, 4, 2), num_ranks, reorder_operations=reorder_operations
+    ) as program:
+        for src_rank in range(num_ranks):
+            rank = Rank(src_rank)
+            src_buff = rank.get_input_buffer()
+            dst_rank = 1 - src_rank
+            dst_buff = Rank(dst_rank).get_output_buffer()
+            ch0 = MemoryChannel(dst_rank, src_rank)
+            ch1 = MemoryChannel(dst_rank, src_rank)
+            ch0.put(dst_buff[0:1], src_buff[0:1], tb=0)
+            ch0.signal(tb=0, data_sync=SyncType.before)
+            rank.copy(src_buff[3:4], src_buff[2:3], tb=0)
+            ch1.put(dst_buff[1:2], src_buff[1:2], tb=0)
+            ch1.signal(tb=0, data_sync=SyncType.before)
+            ch0.wait(tb=0, data_sync=SyncType.after)
+            ch1.wait(tb=0, data_sync=SyncType.after)
+    return program
+
+
+def separated_puts_expect(plan: dict, rank: int) -> dict:
+    # The peer's first two input chunks land in the output buffer, and input chunk 2 is copied to chunk 3.
+    peer = 1 - rank
+    return {
+        ("o", 0): Counter({(peer, 0): 1}),
+        ("o", 1): Counter({(peer, 1): 1}),
+        ("i", 3): Counter({(rank, 2): 1}),
+    }
+
+
+def assert_fused_puts(plan: dict):
+    # Both puts become one put with two destinations, both signals one signal on two channels.
+    for gpu in plan["gpus"]:
+        ops = gpu["threadblocks"][0]["ops"]
+        puts = [op for op in ops if op["name"] == "put"]
+        assert len(puts) == 1 and len(puts[0]["dst_buff"]) == 2
+        assert [op["channel_ids"] for op in ops if op["name"] == "signal"] == [[0, 1]]
+
+
+def test_reordering_fuses_separated_operations():
+    plan = json.loads(separated_puts(True).to_json())
+    assert count_operations(plan) < count_operations(json.loads(separated_puts(False).to_json()))
+    assert_fused_puts(plan)
+    assert verify(plan, separated_puts_expect, gpus_per_node=2) == []
+
+
+def test_reorder_fuse_example():
+    plan = run_example("reorder_fuse_test.py")
+    assert_fused_puts(plan)
+    assert verify(plan, separated_puts_expect, gpus_per_node=2) == []
@@ -0,0 +1,79 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+import copy
+import itertools
+import json
+
+import pytest
+
+from mscclpp.language.internal.types import DataAccessType, SyncType
+
+from .dsl_verifier import small_programs
+
+PROGRAMS = small_programs()
+
+SYNC_SETS = {
+    SyncType.none: frozenset(),
+    SyncType.before: frozenset({"before"}),
+    SyncType.after: frozenset({"after"}),
+    SyncType.both: frozenset({"before", "after"}),
+}
+DATA_ACCESS_SETS = {
+    DataAccessType.read: frozenset({"read"}),
+    DataAccessType.write: frozenset({"write"}),
+    DataAccessType.both: frozenset({"read", "write"}),
+}
+
+
+def sync_type(accesses: frozenset) -> SyncType:
+    return next(member for member, member_accesses in SYNC_SETS.items() if member_accesses == accesses)
+
+
+@pytest.mark.parametrize("a, b", list(itertools.product(SyncType, repeat=2)))
+def test_sync_type_operators(a, b):
+    assert a | b is sync_type(SYNC_SETS[a] | SYNC_SETS[b])
+    assert a & b is sync_type(SYNC_SETS[a] & SYNC_SETS[b])
+    assert a ^ b is sync_type(SYNC_SETS[a] ^ SYNC_SETS[b])
+
+
+@pytest.mark.parametrize("a, b", list(itertools.product(DataAccessType, repeat=2)))
+def test_data_access_type_or(a, b):
+    accesses = DATA_ACCESS_SETS[a] | DATA_ACCESS_SETS[b]
+    assert a | b is next(member for member, member_accesses in DATA_ACCESS_SETS.items() if member_accesses == accesses)
+
+
+def test_types_reject_other_operands():
+    with pytest.raises(TypeError):
+        SyncType.before | DataAccessType.read
+    with pytest.raises(TypeError):
+        DataAccessType.read | SyncType.before
+
+
+def shift_id(value, instance, num_instances):
+    return value * num_instances + instance
+
+
+def shift_index(index, size, instance, num_instances):
+    return index + size * (instance + 1)
+
+
+def replicate(threadblock, instance: int = 1, num_instances: int = 2):
+    threadblock.shift_channels(instance, num_instances, shift_id)
+    threadblock.shift_buffers(instance, num_instances, shift_index)
+    threadblock.shift_ids(instance, num_instances, shift_id)
+    return threadblock
+
+
+@pytest.mark.parametrize("name", sorted(PROGRAMS))
+def test_clone_is_independent(name):
+    # Replicating a clone matches replicating a deep copy and leaves the original untouched.
+    program = PROGRAMS[name][0]()
+    program.to_json()
+    for gpu in program.gpus:
+        for threadblock in gpu.threadblocks:
+            original = json.dumps(threadblock.to_dict())
+            clone = replicate(threadblock.clone())
+            assert clone.to_dict() == replicate(copy.deepcopy(threadblock)).to_dict()
+            assert json.dumps(threadblock.to_dict()) == original
+            assert [op.id for op in clone.ops] == [op.id for op in threadblock.ops]
@@ -0,0 +1,56 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+import json
+
+import pytest
+
+from mscclpp.__main__ import build_plan, default_algo_configs
+from mscclpp.language import collectives, default_algos
+from mscclpp.language.collectives import AllReduce
+from mscclpp.language.internal.operations import MAX_BUFFER_PER_OPERATION
+from mscclpp.language.program import CollectiveProgram
+from mscclpp.language.rank import Rank
+
+from .dsl_verifier import _spec, allreduce_expect, check_limits, verify
+
+CONFIGS = {config["spec"].name: config for config in default_algo_configs}
+
+
+@pytest.mark.parametrize("name", sorted(CONFIGS))
+def test_installed_plans_within_limits(name):
+    assert check_limits(build_plan(CONFIGS[name])) == []
+
+
+def chained_reduce(num_chunks: int, fused: bool) -> CollectiveProgram:
+    # Reduces every chunk of the input into the first one, one chunk per operation or all at once.
+    with CollectiveProgram("chained_reduce", collectives.TestCollective(1, num_chunks, 0), 1) as program:
+        input_buffer = Rank(0).get_input_buffer()
+        others = [input_buffer[index : index + 1] for index in range(1, num_chunks)]
+        if fused:
+            Rank(0).reduce(input_buffer[0:1], others, tb=0)
+        else:
+            for other in others:
+                Rank(0).reduce(input_buffer[0:1], [other], tb=0)
+    return program
+
+
+def test_add_operation_rejects_operations_over_limits():
+    with pytest.raises(RuntimeError, match="12 src_buff"):
+        chained_reduce(12, fused=True)
+
+
+def test_fusion_stops_at_limits():
+    plan = json.loads(chained_reduce(12, fused=False).to_json())
+    assert check_limits(plan) == []
+    reduces = [op for op in plan["gpus"][0]["threadblocks"][0]["ops"] if op["name"] == "re"]
+    assert [len(op["src_buff"]) for op in reduces] == [MAX_BUFFER_PER_OPERATION, 3]
+
+
+@pytest.mark.parametrize("protocol", ["LL", "Simple"])
+def test_allreduce_hierarchical_many_nodes(protocol):
+    # Each rank reduces the parts of 11 other nodes, more than one operation takes.
+    program = default_algos.allreduce_hierarchical(_spec(AllReduce(12, 1, True), 12, 1, protocol))
+    plan = json.loads(program.to_json())
+    assert check_limits(plan) == []
+    assert verify(plan, allreduce_expect, gpus_per_node=1) == []
@@ -0,0 +1,151 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+from types import SimpleNamespace
+
+import pytest
+
+from mscclpp.language.collectives import AllGather
+from mscclpp.language.default_algos import allgather_ring
+from mscclpp.language.internal.passes import CompilerPass, PassManager, PassRecord, get_pass_hook, set_pass_hook
+from mscclpp.language.utils import AlgoSpec
+
+
+def make_gpus(num_ranks, num_ops=2):
+    return [SimpleNamespace(id=rank, threadblocks=[SimpleNamespace(ops=[None] * num_ops)]) for rank in range(num_ranks)]
+
+
+def counting_pass(name, calls, **kwargs):
+    return CompilerPass(name, lambda gpu: calls.append((name, gpu.id)), **kwargs)
+
+
+@pytest.fixture(autouse=True)
+def no_pass_hook(monkeypatch):
+    monkeypatch.delenv("MSCCLPP_DSL_PASS_PROFILE", raising=False)
+    set_pass_hook(None)
+    yield
+    set_pass_hook(None)
+
+
+def test_add_pass_order():
+    manager = PassManager()
+    manager.add_pass(CompilerPass("a", lambda gpu: None))
+    manager.add_pass(CompilerPass("c", lambda gpu: None))
+    manager.add_pass(CompilerPass("b", lambda gpu: None), before="c")
+    assert [p.name for p in manager.passes] == ["a", "b", "c"]
+
+
+def test_add_pass_rejects_duplicate_and_unknown():
+    manager = PassManager()
+    manager.add_pass(CompilerPass("a", lambda gpu: None))
+    with pytest.raises(ValueError):
+        manager.add_pass(CompilerPass("a", lambda gpu: None))
+    with pytest.raises(ValueError):
+        manager.add_pass(CompilerPass("b", lambda gpu: None), before="missing")
+
+
+def test_run_is_pass_major():
+    calls = []
+    manager = PassManager([counting_pass("a", calls), counting_pass("b", calls)])
+    manager.run(make_gpus(2))
+    assert calls == [("a", 0), ("a", 1), ("b", 0), ("b", 1)]
+    assert manager.has_run("a", 0) and manager.has_run("b", 1)
+
+
+def test_non_idempotent_passes_run_once_per_rank():
+    calls = []
+    manager = PassManager([counting_pass("once", calls), counting_pass("again", calls, idempotent=True)])
+    gpus = make_gpus(2)
+    manager.run(gpus)
+    manager.run(gpus)
+    assert calls.count(("once", 0)) == 1 and calls.count(("once", 1)) == 1
+    assert calls.count(("again", 0)) == 2 and calls.count(("again", 1)) == 2
+
+
+def test_lowered_only_passes_follow_rank():
+    calls = []
+    manager = PassManager([counting_pass("lower", calls), counting_pass("metadata", calls, lowered_only=False)])
+    gpus = make_gpus(3)
+    manager.run(gpus, rank=1)
+    assert calls == [("lower", 1), ("metadata", 0), ("metadata", 1), ("metadata", 2)]
+    assert not manager.has_run("lower", 0)
+
+    # Lowering another rank later runs the pending passes of that rank only.
+    calls.clear()
+    manager.run(gpus, rank=2)
+    assert calls == [("lower", 2)]
+
+
+def test_pass_hook_records():
+    records = []
+    set_pass_hook(records.append)
+    assert get_pass_hook() is not None
+
+    def drop_op(gpu):
+        gpu.threadblocks[0].ops.pop()
+
+    manager = PassManager([CompilerPass("drop", drop_op)])
+    gpus = make_gpus(2, num_ops=3)
+    manager.run(gpus)
+    manager.record("serialization", gpus, 0.5)
+    assert len(records) == 2
+    assert records[0].name == "drop" and records[0].num_ranks == 2
+    assert (records[0].ops_before, records[0].ops_after) == (6, 4)
+    assert records[0].elapsed >= 0
+    assert records[1] == PassRecord("serialization", 2, 0.5, 4, 4)
+
+
+def test_no_hook_by_default():
+    assert get_pass_hook() is None
+    # Without a hook, the pipeline still runs but reports nothing.
+    calls = []
+    PassManager([counting_pass("a", calls)]).run(make_gpus(1))
+    assert calls == [("a", 0)]
+
+
+@pytest.mark.parametrize("value,enabled", [("1", True), ("0", False), ("", False)])
+def test_profile_environment_variable(monkeypatch, capsys, value, enabled):
+    monkeypatch.setenv("MSCCLPP_DSL_PASS_PROFILE", value)
+    PassManager([CompilerPass("a", lambda gpu: None)]).run(make_gpus(2))
+    err = capsys.readouterr().err
+    if enabled:
+        assert "pass a:" in err and "ranks 2" in err and "ops 4 -> 4" in err
+    else:
+        assert err == ""
+
+
+def test_program_pipeline(monkeypatch, capsys):
+    spec = AlgoSpec(
+        name="allgather_ring",
+        collective=AllGather(4, 1, True),
+        nranks_per_node=4,
+        world_size=4,
+        in_place=True,
+        instances=2,
+        protocol="Simple",
+        reorder_operations=True,
+        remove_redundant_syncs=True,
+    )
+    records = []
+    set_pass_hook(records.append)
+    prog = allgather_ring(spec)
+    prog.post_process_operations(rank=0)
+    names = [p.name for p in prog.pass_manager.passes]
+    assert names == [
+        "scheduling",
+        "fusion",
+        "data_sync",
+        "dependency_resolution",
+        "sync_elimination",
+        "replicate_resources",
+        "replicate_threadblocks",
+    ]
+    ran = {record.name: record.num_ranks for record in records}
+    assert ran["fusion"] == 1 and ran["replicate_resources"] == 4
+
+    # Serializing lowers the remaining ranks without running any pass on rank 0 again.
+    records.clear()
+    prog.to_json()
+    ran = {record.name: record.num_ranks for record in records}
+    assert ran["fusion"] == 3 and "replicate_resources" not in ran and "serialization" in ran
+    assert capsys.readouterr().err == ""
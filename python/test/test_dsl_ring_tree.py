@@ -0,0 +1,134 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+import json
+import math
+
+import pytest
+
+from mscclpp.__main__ import default_algo_configs
+from mscclpp.language import default_algos
+from mscclpp.language.collectives import AllGather, AllReduce, ReduceScatter
+from mscclpp.language.default_algos.tree import _binary_tree
+
+from .dsl_verifier import EXPECTATIONS, _spec, check_limits, send_peers, verify, verify_config
+
+RING_CONFIGS = {config["spec"].name: config for config in default_algo_configs if "_ring_" in config["spec"].name}
+
+
+@pytest.mark.parametrize("num_ranks", list(range(1, 18)) + [31, 32, 33, 64])
+def test_binary_tree_shape(num_ranks):
+    tree = [_binary_tree(num_ranks, rank) for rank in range(num_ranks)]
+    assert tree[0][0] is None and len(tree[0][1]) == min(1, num_ranks - 1)
+    for rank, (parent, children) in enumerate(tree):
+        assert len(children) <= 2
+        assert all(tree[child][0] == rank for child in children)
+        if parent is not None:
+            assert rank in tree[parent][1]
+
+    def subtree(rank):
+        return [rank] + [member for child in tree[rank][1] for member in subtree(child)]
+
+    def depth(rank):
+        return 0 if tree[rank][0] is None else 1 + depth(tree[rank][0])
+
+    # Every rank is reached from the root, and subtrees are ranges of consecutive ranks.
+    assert sorted(subtree(0)) == list(range(num_ranks))
+    for rank in range(num_ranks):
+        members = sorted(subtree(rank))
+        assert members == list(range(members[0], members[-1] + 1))
+    assert max(depth(rank) for rank in range(num_ranks)) <= math.ceil(math.log2(num_ranks)) + 1
+
+
+@pytest.mark.parametrize("num_ranks", [4, 8, 16])
+def test_double_binary_tree_reduces_once_per_rank(num_ranks):
+    # Leaves only write to their parent, so a rank writing to several ranks is inside a tree.
+    program = default_algos.allreduce_double_binary_tree(
+        _spec(AllReduce(num_ranks, 2, True), num_ranks, num_ranks // 2, "Simple")
+    )
+    peers = send_peers(json.loads(program.to_json()))
+    assert sorted(peers) == list(range(num_ranks))
+    for rank, tbs in peers.items():
+        assert sum(len(tb_peers) > 1 for tb_peers in tbs.values()) <= 1, f"rank {rank} is inside both trees"
+
+
+@pytest.mark.parametrize(
+    "function, collective, num_rings",
+    [
+        (default_algos.allgather_ring, AllGather(16, 2, True), 2),
+        (default_algos.reducescatter_ring, ReduceScatter(16, 2, False), 2),
+        (default_algos.allreduce_ring, AllReduce(16, 16, True), 1),
+    ],
+)
+def test_ring_sends_to_next_rank(function, collective, num_rings):
+    num_ranks = 16
+    program = function(_spec(collective, num_ranks, 8, "Simple"), num_rings=num_rings)
+    peers = send_peers(json.loads(program.to_json()))
+    assert sorted(peers) == list(range(num_ranks))
+    for rank in range(num_ranks):
+        # The steps of a ring are split over thread blocks, odd rings run in the opposite direction.
+        tbs_per_ring = len(peers[rank]) // num_rings
+        for tb, tb_peers in peers[rank].items():
+            direction = 1 if tb // tbs_per_ring % 2 == 0 else -1
+            assert tb_peers == {(rank + direction) % num_ranks}
+
+
+@pytest.mark.parametrize(
+    "function, collective, world_size, nranks_per_node, protocol, kwargs",
+    [
+        (default_algos.allgather_ring, AllGather(3, 1, False), 3, 3, "Simple", {}),
+        (default_algos.allgather_ring, AllGather(12, 2, True), 12, 4, "Simple", {"num_rings": 2}),
+        (default_algos.reducescatter_ring, ReduceScatter(5, 5, True), 5, 1, "Simple", {}),
+        (default_algos.reducescatter_ring, ReduceScatter(16, 4, False), 16, 8, "Simple", {"num_rings": 4}),
+        (default_algos.allreduce_ring, AllReduce(6, 6, False), 6, 2, "Simple", {}),
+        (default_algos.allreduce_ring, AllReduce(16, 32, True), 16, 8, "Simple", {"num_rings": 2}),
+        (default_algos.allreduce_binary_tree, AllReduce(5, 1, True), 5, 5, "Simple", {}),
+        (default_algos.allreduce_binary_tree, AllReduce(12, 2, False), 12, 4, "Simple", {"pipeline_unit_size": 1}),
+        (default_algos.allreduce_binary_tree, AllReduce(6, 1, False), 6, 3, "LL", {}),
+        (default_algos.allreduce_double_binary_tree, AllReduce(5, 2, True), 5, 1, "Simple", {}),
+        (default_algos.allreduce_double_binary_tree, AllReduce(16, 2, False), 16, 8, "LL", {}),
+        (default_algos.allreduce_double_binary_tree, AllReduce(7, 2, True), 7, 7, "LL", {}),
+    ],
+)
+def test_ring_and_tree_data(function, collective, world_size, nranks_per_node, protocol, kwargs):
+    program = function(_spec(collective, world_size, nranks_per_node, protocol), **kwargs)
+    plan = json.loads(program.to_json())
+    assert check_limits(plan) == []
+    expect, init = EXPECTATIONS[collective.name]
+    assert verify(plan, expect, init, nranks_per_node) == []
+
+
+@pytest.mark.parametrize("name", sorted(RING_CONFIGS))
+def test_installed_ring_plans_data(name):
+    assert verify_config(RING_CONFIGS[name]) == []
+
+
+@pytest.mark.parametrize(
+    "function, collective",
+    [
+        (default_algos.reducescatter_ring, ReduceScatter(4, 4, False)),
+        (default_algos.allreduce_ring, AllReduce(4, 4, True)),
+        (default_algos.allreduce_binary_tree, AllReduce(4, 1, True)),
+        (default_algos.allreduce_double_binary_tree, AllReduce(4, 2, True)),
+    ],
+)
+def test_fused_reduce_and_put_keep_channel_type(function, collective):
+    # The executor resolves the remote buffers of an operation through its channel type.
+    plan = json.loads(function(_spec(collective, 4, 4, "Simple")).to_json())
+    fused = [
+        inner
+        for gpu in plan["gpus"]
+        for tb in gpu["threadblocks"]
+        for op in tb["ops"]
+        for inner in [op] + op.get("ops", [])
+        if inner["name"] == "res"
+    ]
+    assert fused and all(op["channel_type"] == "memory" for op in fused)
+    assert check_limits(plan) == []
+
+
+def test_ring_and_tree_reject_uneven_chunks():
+    with pytest.raises(RuntimeError, match="rings"):
+        default_algos.allgather_ring(_spec(AllGather(4, 3, True), 4, 4, "Simple"), num_rings=2)
+    with pytest.raises(RuntimeError, match="two trees"):
+        default_algos.allreduce_double_binary_tree(_spec(AllReduce(5, 1, True), 5, 5, "Simple"))
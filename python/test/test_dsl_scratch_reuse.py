@@ -0,0 +1,65 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+import json
+
+import pytest
+
+from mscclpp.language import collectives, cost_model
+from mscclpp.language.channel import SwitchChannel
+from mscclpp.language.internal.types import BufferType
+from mscclpp.language.program import CollectiveProgram
+from mscclpp.language.rank import Buffer, Rank
+
+from .dsl_verifier import check_limits, small_programs, verify
+
+PROGRAMS = small_programs()
+
+
+def scratch_chunks(plan) -> list:
+    return [gpu["scratch_chunks"] for gpu in cost_model.load_plan(plan)["gpus"]]
+
+
+@pytest.mark.parametrize("name", sorted(PROGRAMS))
+def test_scratch_reuse_keeps_data(name):
+    build, expect, init, gpus_per_node = PROGRAMS[name]
+    plan = json.loads(build(reuse_scratch=True).to_json())
+    assert verify(plan, expect, init, gpus_per_node) == []
+    assert check_limits(plan) == []
+    reused, original = scratch_chunks(plan), scratch_chunks(json.loads(build().to_json()))
+    assert all(chunks <= original_chunks for chunks, original_chunks in zip(reused, original))
+
+
+@pytest.mark.parametrize(
+    "name", ["allreduce_hierarchical_ll", "allreduce_binary_tree_ll", "alltoall_pairwise_ll", "alltoall_hierarchical"]
+)
+def test_scratch_reuse_shrinks_scratch(name):
+    build = PROGRAMS[name][0]
+    reused = scratch_chunks(json.loads(build(reuse_scratch=True).to_json()))
+    original = scratch_chunks(json.loads(build().to_json()))
+    assert sum(reused) < sum(original)
+
+
+def switch_reduce(reuse_scratch: bool) -> CollectiveProgram:
+    # A dead scratch chunk, then a scratch chunk written and read only by switch channel operations.
+    num_ranks = 2
+    with CollectiveProgram(
+        "switch_reduce", collectives.AllReduce(num_ranks, 1, True), num_ranks, reuse_scratch=reuse_scratch
+    ) as program:
+        nvls_chan = SwitchChannel(rank_list=list(range(num_ranks)), buffer_type=BufferType.input)
+        for gpu in range(num_ranks):
+            rank = Rank(gpu)
+            input_buffer = rank.get_input_buffer()
+            staging, reduced = Buffer(gpu, 1), Buffer(gpu, 1)
+            rank.copy(staging[0:1], input_buffer[gpu : gpu + 1], tb=0)
+            rank.copy(input_buffer[gpu : gpu + 1], staging[0:1], tb=0)
+            nvls_chan.at_rank(gpu).reduce(buffer_offset=gpu, size=1, dst_chunk=reduced[0:1], tb=0)
+            nvls_chan.at_rank(gpu).broadcast(src_chunk=reduced[0:1], buffer_offset=gpu, size=1, tb=0)
+    return program
+
+
+def test_scratch_reuse_keeps_switch_channel_ranks():
+    # The group operations address scratch through chunks outside of the tracked accesses.
+    plan = json.loads(switch_reduce(True).to_json())
+    assert plan["gpus"] == json.loads(switch_reduce(False).to_json())["gpus"]
+    assert scratch_chunks(plan) == [2, 2]
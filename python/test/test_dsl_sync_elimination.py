@@ -0,0 +1,112 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+import json
+
+import pytest
+
+from mscclpp.language import cost_model
+
+from .dsl_verifier import check_limits, small_programs, verify
+
+PROGRAMS = small_programs()
+
+_WAITS = {"wait", "rlxwait", "sem_acquire"}
+_SIGNALS = {"signal", "rlxsignal", "sem_release", "pws", "pwsf"}
+_BOUNDARIES = {"nop", "barrier"}
+
+
+def count_syncs(plan) -> int:
+    plan = cost_model.load_plan(plan)
+    return sum(
+        inner["name"] == "nop"
+        for gpu in plan["gpus"]
+        for tb in gpu["threadblocks"]
+        for op in tb["ops"]
+        for inner in [op] + op.get("ops", [])
+    )
+
+
+def _chunks(buffs):
+    # Local chunks are keyed by buffer type, peer chunks by the remote buffer id of the thread block.
+    return {
+        (buff.get("type", buff.get("buffer_id")), index)
+        for buff in buffs
+        for index in range(buff["index"], buff["index"] + buff["size"])
+    }
+
+
+def _conflict(first, second) -> bool:
+    """Whether ``second`` may only start once all threads have finished ``first``.
+
+    This is a conservative rule written from the serialized operations alone, independent of the
+    rules of the sync elimination pass.
+    """
+    first_data = "src_buff" in first or "dst_buff" in first
+    second_data = "src_buff" in second or "dst_buff" in second
+    if first["name"] in _WAITS and (second_data or second["name"] in _SIGNALS):
+        return True
+    if first_data and (second["name"] in _SIGNALS or second["name"] == "flush"):
+        return True
+    if first_data and second_data:
+        first_reads, first_writes = _chunks(first.get("src_buff", [])), _chunks(first.get("dst_buff", []))
+        second_reads, second_writes = _chunks(second.get("src_buff", [])), _chunks(second.get("dst_buff", []))
+        return bool(first_writes & (second_reads | second_writes) or first_reads & second_writes)
+    return False
+
+
+def unordered_conflicts(plan, reference) -> list:
+    """Conflicting operations that a sync of ``reference`` separated and that ``plan`` leaves unordered.
+
+    ``plan`` must be ``reference`` with some of its syncs removed.
+    """
+    conflicts = []
+    for gpu, reference_gpu in zip(plan["gpus"], reference["gpus"]):
+        for tb, reference_tb in zip(gpu["threadblocks"], reference_gpu["threadblocks"]):
+            ops = tb["ops"]
+            # Sections between syncs of the reference plan and of the optimized plan, per operation.
+            operations, position, reference_section, section = [], 0, 0, 0
+            for op in reference_tb["ops"]:
+                if op["name"] in _BOUNDARIES:
+                    reference_section += 1
+                    if position < len(ops) and ops[position] == op:
+                        section += 1
+                        position += 1
+                    continue
+                assert ops[position] == op
+                position += 1
+                operations.append((op, reference_section, section))
+            assert position == len(ops)
+            for index, (first, first_reference, first_section) in enumerate(operations):
+                for second, second_reference, second_section in operations[index + 1 :]:
+                    if second_section != first_section:
+                        break
+                    if second_reference != first_reference and _conflict(first, second):
+                        conflicts.append((gpu["id"], tb["id"], first["name"], second["name"]))
+    return conflicts
+
+
+@pytest.mark.parametrize("name", sorted(PROGRAMS))
+def test_sync_elimination_keeps_data(name):
+    build, expect, init, gpus_per_node = PROGRAMS[name]
+    plan = json.loads(build(remove_redundant_syncs=True).to_json())
+    assert verify(plan, expect, init, gpus_per_node) == []
+    assert check_limits(plan) == []
+    reference = json.loads(build().to_json())
+    assert count_syncs(plan) <= count_syncs(reference)
+    assert unordered_conflicts(cost_model.load_plan(plan), cost_model.load_plan(reference)) == []
+
+
+@pytest.mark.parametrize("name", ["allgather_ring", "alltoall_pairwise_simple", "allreduce_hierarchical_simple"])
+def test_sync_elimination_removes_syncs(name):
+    build = PROGRAMS[name][0]
+    assert count_syncs(build(remove_redundant_syncs=True)) < count_syncs(build())
+
+
+def test_sync_elimination_with_all_passes():
+    # The passes run in one pipeline, sync elimination last among the optimizations.
+    options = dict(reorder_operations=True, coalesce_chunks=True, reuse_scratch=True, share_channels=True)
+    for name, (build, expect, init, gpus_per_node) in PROGRAMS.items():
+        plan = json.loads(build(remove_redundant_syncs=True, **options).to_json())
+        assert verify(plan, expect, init, gpus_per_node) == [], name
+        assert check_limits(plan) == [], name
@@ -0,0 +1,58 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+import json
+
+import pytest
+
+import mscclpp.__main__ as installer
+from mscclpp.__main__ import build_program, default_algo_configs
+from mscclpp.plan_manifest import read_manifest
+
+CONFIGS = {config["spec"].name: config for config in default_algo_configs}
+
+
+@pytest.fixture
+def plan_dir(tmp_path, monkeypatch):
+    plan_dir = tmp_path / "plans"
+    monkeypatch.setenv("MSCCLPP_EXECUTION_PLAN_DIR", str(plan_dir))
+    return plan_dir
+
+
+def test_install_skips_plans_of_more_nodes(plan_dir, monkeypatch):
+    names = ["allreduce_2nodes_1K_64K", "allreduce_hierarchical_4nodes_1M_max", "allreduce_hierarchical_16nodes_1K_max"]
+    monkeypatch.setattr(installer, "default_algo_configs", [CONFIGS[name] for name in names])
+    installer.create_default_plans(max_nodes=4)
+    assert [entry["name"] for entry in read_manifest(plan_dir)] == names[:2]
+    assert sorted(path.name for path in plan_dir.glob("*.json")) == sorted(
+        ["manifest.json"] + [CONFIGS[name]["filename"] for name in names[:2]]
+    )
+
+
+def test_installed_configs():
+    names = {config["spec"].name for config in installer.installed_configs()}
+    assert "allreduce_hierarchical_8nodes_1M_max" in names
+    assert "allreduce_hierarchical_16nodes_1K_max" not in names
+    assert "allreduce_hierarchical_32nodes_1K_max" in {
+        config["spec"].name for config in installer.installed_configs(32)
+    }
+    assert len(installer.installed_configs(32)) == len(default_algo_configs)
+
+
+def test_install_writes_compact_plans(plan_dir, monkeypatch):
+    config = CONFIGS["allreduce_2nodes_1K_64K"]
+    monkeypatch.setattr(installer, "default_algo_configs", [config])
+    installer.create_default_plans()
+    content = (plan_dir / config["filename"]).read_text()
+    assert content == build_program(config).to_json(indent=None, separators=(",", ":"), ensure_ascii=False)
+    assert read_manifest(plan_dir)[0]["size"] == len(content)
+    assert json.loads(content)["name"] == config["spec"].name
+
+
+@pytest.mark.parametrize("args, max_nodes", [([], installer.DEFAULT_MAX_NODES), (["--max-nodes", "32"], 32)])
+def test_install_max_nodes_option(args, max_nodes, monkeypatch):
+    calls = []
+    monkeypatch.setattr(installer, "create_default_plans", calls.append)
+    monkeypatch.setattr("sys.argv", ["mscclpp", "--install"] + args)
+    installer.main()
+    assert calls == [max_nodes]
@@ -0,0 +1,272 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+import fcntl
+import multiprocessing
+import os
+import time
+
+import pytest
+
+from mscclpp.plan_cache import (
+    STALE_TMP_MAX_AGE,
+    STALE_TMP_MIN_AGE,
+    PlanCache,
+    compile_stats,
+    coordinate_build,
+    write_plan_file,
+)
+
+# Child processes inherit the modules imported by the test session.
+mp = multiprocessing.get_context("fork")
+
+
+def plan_id(index: int) -> str:
+    return f"{index:064x}"
+
+
+@pytest.fixture(autouse=True)
+def reset_compile_stats():
+    compile_stats.reset()
+    yield
+    compile_stats.reset()
+
+
+def slow_build(plan_path: str, log_path: str, delay: float):
+    with open(log_path, "a") as f:
+        f.write(f"{os.getpid()}\n")
+    time.sleep(delay)
+    write_plan_file(plan_path, lambda fp: fp.write("{}"))
+
+
+def build_in_process(plan_path: str, lock_path: str, log_path: str, barrier, results):
+    barrier.wait()
+    hit = coordinate_build(plan_path, lock_path, lambda: slow_build(plan_path, log_path, 0.2), timeout=30)
+    results.put((hit, compile_stats.compiled, compile_stats.waited, compile_stats.fallbacks))
+
+
+def hold_lock(lock_path: str, mode: int, locked, release):
+    fd = os.open(lock_path, os.O_CREAT | os.O_RDWR, 0o644)
+    fcntl.flock(fd, mode)
+    locked.set()
+    release.wait(30)
+    fcntl.flock(fd, fcntl.LOCK_UN)
+    os.close(fd)
+
+
+def build_after(lock_path: str, plan_path: str, locked, delay: float):
+    fd = os.open(lock_path, os.O_CREAT | os.O_RDWR, 0o644)
+    fcntl.flock(fd, fcntl.LOCK_EX)
+    locked.set()
+    time.sleep(delay)
+    write_plan_file(plan_path, lambda fp: fp.write("{}"))
+    fcntl.flock(fd, fcntl.LOCK_UN)
+    os.close(fd)
+
+
+def make_plan(plan_dir, index: int, size: int = 16, last_used: float = None, lock: bool = True) -> str:
+    plan_path = plan_dir / f"{plan_id(index)}.json"
+    plan_path.write_text("x" * size)
+    if lock:
+        (plan_dir / f"{plan_id(index)}.lock").touch()
+    if last_used is not None:
+        os.utime(plan_path, (last_used, last_used))
+    return str(plan_path)
+
+
+def test_write_plan_file_is_atomic(tmp_path):
+    plan_path = str(tmp_path / "plan.json")
+
+    def write(fp):
+        fp.write("{")
+        assert not os.path.exists(plan_path)
+        fp.write("}")
+
+    write_plan_file(plan_path, write)
+    assert open(plan_path).read() == "{}"
+    assert os.listdir(tmp_path) == ["plan.json"]
+
+
+def test_write_plan_file_keeps_existing_plan(tmp_path):
+    plan_path = tmp_path / "plan.json"
+    plan_path.write_text("old")
+    write_plan_file(str(plan_path), lambda fp: fp.write("new"))
+    assert plan_path.read_text() == "old"
+    assert os.listdir(tmp_path) == ["plan.json"]
+
+
+def test_write_plan_file_removes_partial_plan(tmp_path):
+    def write(fp):
+        fp.write("{")
+        raise RuntimeError("compile failed")
+
+    with pytest.raises(RuntimeError):
+        write_plan_file(str(tmp_path / "plan.json"), write)
+    assert os.listdir(tmp_path) == []
+
+
+def test_coordinate_build_cache_hit(tmp_path):
+    plan_path = tmp_path / "plan.json"
+    plan_path.write_text("{}")
+    assert coordinate_build(str(plan_path), str(tmp_path / "plan.lock"), pytest.fail)
+    assert compile_stats.cache_hits == 1 and compile_stats.compiled == 0
+
+
+def test_coordinate_build_single_builder(tmp_path):
+    plan_path, lock_path, log_path = (str(tmp_path / name) for name in ("plan.json", "plan.lock", "builds.log"))
+    num_processes = 4
+    barrier = mp.Barrier(num_processes)
+    results = mp.Queue()
+    processes = [
+        mp.Process(target=build_in_process, args=(plan_path, lock_path, log_path, barrier, results))
+        for _ in range(num_processes)
+    ]
+    for process in processes:
+        process.start()
+    outcomes = [results.get(timeout=60) for _ in processes]
+    for process in processes:
+        process.join(60)
+        assert process.exitcode == 0
+
+    assert len(open(log_path).read().split()) == 1
+    assert sum(compiled for _, compiled, _, _ in outcomes) == 1
+    assert sum(waited for _, _, waited, _ in outcomes) == num_processes - 1
+    assert all(not hit and fallbacks == 0 for hit, _, _, fallbacks in outcomes)
+    assert open(plan_path).read() == "{}"
+
+
+def test_coordinate_build_waits_for_lock_holder(tmp_path):
+    plan_path, lock_path = str(tmp_path / "plan.json"), str(tmp_path / "plan.lock")
+    locked = mp.Event()
+    holder = mp.Process(target=build_after, args=(lock_path, plan_path, locked, 0.3))
+    holder.start()
+    assert locked.wait(30)
+    assert not coordinate_build(plan_path, lock_path, pytest.fail, timeout=30)
+    holder.join(30)
+    assert compile_stats.waited == 1 and compile_stats.compiled == 0
+    assert os.path.exists(plan_path)
+
+
+def test_coordinate_build_falls_back_after_timeout(tmp_path):
+    plan_path, lock_path = str(tmp_path / "plan.json"), str(tmp_path / "plan.lock")
+    locked, release = mp.Event(), mp.Event()
+    holder = mp.Process(target=hold_lock, args=(lock_path, fcntl.LOCK_EX, locked, release))
+    holder.start()
+    try:
+        assert locked.wait(30)
+        start = time.monotonic()
+        build = lambda: write_plan_file(plan_path, lambda fp: fp.write("{}"))
+        assert not coordinate_build(plan_path, lock_path, build, timeout=0.2)
+        assert time.monotonic() - start >= 0.2
+    finally:
+        release.set()
+        holder.join(30)
+    assert compile_stats.fallbacks == 1 and compile_stats.compiled == 0
+    assert os.path.exists(plan_path)
+
+
+def test_entries_are_least_recently_used_first(tmp_path):
+    now = time.time()
+    make_plan(tmp_path, 0, last_used=now - 10)
+    make_plan(tmp_path, 1, last_used=now - 30)
+    touched = make_plan(tmp_path, 2, last_used=now - 20)
+    (tmp_path / "other_plan.json").write_text("{}")
+    cache = PlanCache(str(tmp_path), max_bytes=0, max_plans=0)
+    cache.touch(touched)
+    assert [entry.plan_id for entry in cache.entries()] == [plan_id(1), plan_id(0), plan_id(2)]
+    assert cache.total_size() == 48
+
+
+def test_evict_least_recently_used(tmp_path):
+    now = time.time()
+    for index in range(4):
+        make_plan(tmp_path, index, last_used=now - 100 + index)
+    cache = PlanCache(str(tmp_path), max_bytes=0, max_plans=2)
+    assert cache.evict(keep=(plan_id(0),)) == [plan_id(1), plan_id(2)]
+    assert [entry.plan_id for entry in cache.entries()] == [plan_id(0), plan_id(3)]
+    assert cache.stats.evictions == 2 and cache.stats.evicted_bytes == 32
+    # The lock files stay, so that processes that opened them still exclude each other.
+    assert (tmp_path / f"{plan_id(1)}.lock").exists()
+
+
+def test_evict_to_byte_budget(tmp_path):
+    now = time.time()
+    make_plan(tmp_path, 0, size=100, last_used=now - 2)
+    make_plan(tmp_path, 1, size=100, last_used=now - 1)
+    make_plan(tmp_path, 2, size=100, last_used=now)
+    cache = PlanCache(str(tmp_path), max_bytes=250, max_plans=0)
+    assert cache.evict() == [plan_id(0)]
+    assert cache.total_size() == 200
+    assert PlanCache(str(tmp_path), max_bytes=0, max_plans=0).evict() == []
+
+
+def test_evict_skips_plans_pinned_by_other_processes(tmp_path):
+    now = time.time()
+    make_plan(tmp_path, 0, last_used=now - 2)
+    make_plan(tmp_path, 1, last_used=now - 1)
+    locked, release = mp.Event(), mp.Event()
+    pinner = mp.Process(target=hold_lock, args=(str(tmp_path / f"{plan_id(0)}.lock"), fcntl.LOCK_SH, locked, release))
+    pinner.start()
+    try:
+        assert locked.wait(30)
+        cache = PlanCache(str(tmp_path), max_bytes=0, max_plans=1)
+        assert cache.evict() == [plan_id(1)]
+    finally:
+        release.set()
+        pinner.join(30)
+    make_plan(tmp_path, 2, last_used=now)
+    assert cache.evict() == [plan_id(0)]
+
+
+def test_pin_protects_plan_in_this_process(tmp_path):
+    now = time.time()
+    make_plan(tmp_path, 0, last_used=now - 2)
+    make_plan(tmp_path, 1, last_used=now - 1)
+    cache = PlanCache(str(tmp_path), max_bytes=0, max_plans=1)
+    cache.pin(plan_id(0), str(tmp_path / f"{plan_id(0)}.lock"))
+    other = PlanCache(str(tmp_path), max_bytes=0, max_plans=1)
+    assert cache.evict() == [plan_id(1)]
+    make_plan(tmp_path, 1, last_used=now - 1)
+    assert other.evict() == [plan_id(1)]
+    cache.unpin_all()
+    assert other.evict() == []
+    assert [entry.plan_id for entry in other.entries()] == [plan_id(0)]
+
+
+def test_record_use_pins_and_evicts(tmp_path):
+    now = time.time()
+    make_plan(tmp_path, 0, last_used=now - 2)
+    make_plan(tmp_path, 1, last_used=now - 1)
+    cache = PlanCache(str(tmp_path), max_bytes=0, max_plans=1)
+    plan_path = make_plan(tmp_path, 2, last_used=now - 3)
+    cache.record_use(plan_id(2), plan_path, str(tmp_path / f"{plan_id(2)}.lock"), hit=False)
+    assert [entry.plan_id for entry in cache.entries()] == [plan_id(2)]
+    assert cache.stats.misses == 1 and cache.stats.evictions == 2
+    assert plan_id(2) in cache._pins
+    cache.unpin_all()
+
+
+def test_clean_stale_files(tmp_path):
+    dead = mp.Process(target=time.sleep, args=(0,))
+    dead.start()
+    dead.join()
+    now = time.time()
+    make_plan(tmp_path, 0)
+    (tmp_path / f"{plan_id(1)}.lock").touch()
+    stale_files = {
+        f"{plan_id(2)}.json.tmp.{dead.pid}": now - STALE_TMP_MIN_AGE - 1,
+        f"{plan_id(3)}.rank0.json.tmp.{os.getpid()}": now - STALE_TMP_MAX_AGE - 1,
+    }
+    live_files = {
+        f"{plan_id(4)}.json.tmp.{os.getpid()}": now - STALE_TMP_MIN_AGE - 1,
+        f"{plan_id(5)}.json.tmp.{dead.pid}": now,
+    }
+    for name, mtime in {**stale_files, **live_files}.items():
+        (tmp_path / name).touch()
+        os.utime(tmp_path / name, (mtime, mtime))
+    cache = PlanCache(str(tmp_path), max_bytes=0, max_plans=0)
+    assert cache.clean_stale_files() == 2
+    assert cache.stats.stale_files_removed == 2
+    assert sorted(os.listdir(tmp_path)) == sorted(
+        [f"{plan_id(0)}.json", f"{plan_id(0)}.lock", f"{plan_id(1)}.lock"] + list(live_files)
+    )
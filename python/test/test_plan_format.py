@@ -0,0 +1,196 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+import json
+import struct
+
+import pytest
+
+import mscclpp.__main__ as installer
+from mscclpp.plan_format import (
+    BINARY_PLAN_MAGIC,
+    BINARY_PLAN_VERSION,
+    convert_plan,
+    encode_plan,
+    expand_rank_templates,
+    is_binary_plan,
+)
+
+from .dsl_verifier import small_programs
+
+PROGRAMS = small_programs()
+_NO_STRING = 0xFFFF
+
+
+class _Reader:
+    """Reads back the binary plan format documented in ``mscclpp.plan_format``."""
+
+    def __init__(self, data: bytes, offset: int = 0):
+        self.data = data
+        self.offset = offset
+
+    def unpack(self, fmt: str) -> tuple:
+        values = struct.unpack_from("<" + fmt, self.data, self.offset)
+        self.offset += struct.calcsize("<" + fmt)
+        return values
+
+    def ints(self, fmt: str = "i") -> list:
+        (count,) = self.unpack("I")
+        return list(self.unpack(f"{count}{fmt}"))
+
+
+def decode_plan(data: bytes) -> dict:
+    """Decode a binary plan to the structure of its JSON form, with the fields the format keeps."""
+    magic, version, num_gpus, header_offset, header_size, strings_offset, _ = struct.unpack_from("<8sII4Q", data)
+    assert (magic, version) == (BINARY_PLAN_MAGIC, BINARY_PLAN_VERSION)
+    plan = json.loads(data[header_offset : header_offset + header_size])
+    reader = _Reader(data, strings_offset)
+    strings = []
+    for _ in range(reader.unpack("I")[0]):
+        (size,) = reader.unpack("H")
+        strings.append(data[reader.offset : reader.offset + size].decode())
+        reader.offset += size
+
+    def string(index):
+        return None if index == _NO_STRING else strings[index]
+
+    def operation(reader):
+        name, channel_type, flags, *counts = reader.unpack("8H")
+        tb_id, tbg_size, barrier_id, num_threadblocks, unit_size, num_chunks = reader.unpack("6I")
+        num_channel_ids, num_src, num_dst, num_semaphores, num_ops = counts
+        op = {"name": string(name)}
+        if channel_type != _NO_STRING:
+            op["channel_type"] = string(channel_type)
+        channel_ids = list(reader.unpack(f"{num_channel_ids}I"))
+        buffs = []
+        for _ in range(num_src + num_dst):
+            index, size, buff_type, buff_flags, buffer_id, switch_channel_id = reader.unpack("IIHHii")
+            buff = {"index": index, "size": size}
+            if buff_type != _NO_STRING:
+                buff["type"] = string(buff_type)
+            if buff_flags & 1:
+                buff["buffer_id"] = buffer_id
+            if buff_flags & 2:
+                buff["switch_channel_id"] = switch_channel_id
+            buffs.append(buff)
+        semaphore_ids = list(reader.unpack(f"{num_semaphores}I"))
+        ops = [operation(reader) for _ in range(num_ops)]
+        for flag, key, value in (
+            (1 << 0, "channel_ids", channel_ids),
+            (1 << 1, "tbg_info", {"tb_id": tb_id, "tbg_size": tbg_size}),
+            (1 << 2, "src_buff", buffs[:num_src]),
+            (1 << 3, "dst_buff", buffs[num_src:]),
+            (1 << 4, "barrier_id", barrier_id),
+            (1 << 5, "num_threadblocks", num_threadblocks),
+            (1 << 6, "semaphore_ids", semaphore_ids),
+            (1 << 7, "iter_context", {"unit_size": unit_size, "num_chunks": num_chunks}),
+            (1 << 8, "ops", ops),
+        ):
+            if flags & flag:
+                op[key] = value
+        return op
+
+    plan["gpus"] = []
+    for rank in range(num_gpus):
+        metadata_offset, _, body_offset, body_size = struct.unpack_from("<4Q", data, 48 + 32 * rank)
+        reader = _Reader(data, metadata_offset)
+        gpu_id, num_channels = reader.unpack("iI")
+        gpu = {"id": gpu_id, "channels": []}
+        for _ in range(num_channels):
+            channel_type, buffer_type, count = reader.unpack("HHI")
+            channel = {"channel_type": string(channel_type)}
+            if channel["channel_type"] == "switch":
+                if buffer_type != _NO_STRING:
+                    channel["buffer_type"] = string(buffer_type)
+                channel["rank_groups"] = [{"size": reader.unpack("I")[0], "ranks": reader.ints()} for _ in range(count)]
+            else:
+                channel["connected_to"] = list(reader.unpack(f"{count}i"))
+            gpu["channels"].append(channel)
+        gpu["remote_buffers"] = []
+        for _ in range(reader.unpack("I")[0]):
+            remote_rank, buffer_type, num_access = reader.unpack("iHH")
+            access = [string(index) for index in reader.unpack(f"{num_access}H")]
+            gpu["remote_buffers"].append(
+                {"rank": remote_rank, "type": string(buffer_type), "access_channel_types": access}
+            )
+        if body_size > 0:
+            reader = _Reader(data, body_offset)
+            gpu["input_chunks"], gpu["output_chunks"], gpu["scratch_chunks"] = reader.unpack("3I")
+            gpu["semaphores"] = [{"init_value": value} for value in reader.ints()]
+            gpu["threadblocks"] = []
+            for _ in range(reader.unpack("I")[0]):
+                tb_id, num_tb_channels = reader.unpack("iI")
+                threadblock = {"id": tb_id, "channels": []}
+                for _ in range(num_tb_channels):
+                    (channel_type,) = reader.unpack("H")
+                    threadblock["channels"].append({"channel_type": string(channel_type), "channel_ids": reader.ints()})
+                threadblock["remote_buffer_refs"] = []
+                for _ in range(reader.unpack("I")[0]):
+                    (channel_type,) = reader.unpack("H")
+                    threadblock["remote_buffer_refs"].append(
+                        {"access_channel_type": string(channel_type), "remote_buffer_ids": reader.ints()}
+                    )
+                threadblock["ops"] = [operation(reader) for _ in range(reader.unpack("I")[0])]
+                gpu["threadblocks"].append(threadblock)
+            assert reader.offset == body_offset + body_size
+        plan["gpus"].append(gpu)
+    return plan
+
+
+def loaded_fields(plan: dict) -> dict:
+    """Return ``plan`` with full GPU sections and without the operation fields the loader ignores."""
+
+    def operation(op):
+        op = {key: value for key, value in op.items() if key != "reduce_op"}
+        if "ops" in op:
+            op["ops"] = [operation(inner) for inner in op["ops"]]
+        return op
+
+    plan = expand_rank_templates(plan)
+    for gpu in plan["gpus"]:
+        for threadblock in gpu.get("threadblocks", []):
+            threadblock["ops"] = [operation(op) for op in threadblock["ops"]]
+    return plan
+
+
+@pytest.mark.parametrize("name", sorted(PROGRAMS))
+def test_encode_plan_round_trip(name):
+    build = PROGRAMS[name][0]
+    plan = json.loads(build(deduplicate_ranks=True).to_json())
+    assert decode_plan(encode_plan(plan)) == loaded_fields(plan)
+
+
+@pytest.mark.parametrize("rank", [None, 0, 3])
+def test_to_binary_matches_encode_plan(rank):
+    build = PROGRAMS["alltoall_pipelined"][0]
+    binary = build().to_binary(rank=rank)
+    assert binary == encode_plan(json.loads(build().to_json(rank=rank)))
+    # Only the scoped rank has a body section in a rank-scoped plan.
+    assert [("threadblocks" in gpu) for gpu in decode_plan(binary)["gpus"]] == [rank in (None, gpu) for gpu in range(6)]
+
+
+def test_convert_plan(tmp_path):
+    plan = PROGRAMS["allreduce_ring"][0]().to_json()
+    json_path = tmp_path / "plan.json"
+    json_path.write_text(plan)
+    assert not is_binary_plan(json_path)
+
+    binary_path = convert_plan(str(json_path))
+    assert binary_path == str(tmp_path / "plan.bin")
+    assert is_binary_plan(binary_path)
+    assert (tmp_path / "plan.bin").read_bytes() == encode_plan(json.loads(plan))
+    assert convert_plan(str(json_path), str(tmp_path / "other.bin")) == str(tmp_path / "other.bin")
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["other.bin", "plan.bin", "plan.json"]
+
+
+def test_convert_option(tmp_path, monkeypatch):
+    paths = []
+    for name in ("allreduce_ring", "allgather_ring"):
+        paths.append(tmp_path / f"{name}.json")
+        paths[-1].write_text(PROGRAMS[name][0]().to_json())
+    monkeypatch.setattr("sys.argv", ["mscclpp", "--convert", *map(str, paths), "--output-dir", str(tmp_path / "out")])
+    installer.main()
+    for path in paths:
+        assert (tmp_path / "out" / path.with_suffix(".bin").name).read_bytes() == encode_plan(
+            json.loads(path.read_text())
+        )
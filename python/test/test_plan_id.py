@@ -0,0 +1,85 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+from dataclasses import fields, replace
+
+import pytest
+
+from mscclpp import _plan_id
+from mscclpp.language.collectives import AllGather, AllReduce
+from mscclpp.language.utils import AlgoSpec, ReplicationPolicy
+
+SPEC = AlgoSpec(
+    name="allreduce",
+    collective=AllReduce(8, 1, True),
+    nranks_per_node=8,
+    world_size=8,
+    in_place=True,
+    instances=1,
+    protocol="Simple",
+    tags={"default": 1},
+)
+
+CHANGED_FIELDS = {
+    "name": "allreduce2",
+    "collective": AllReduce(8, 2, True),
+    "nranks_per_node": 4,
+    "world_size": 16,
+    "in_place": False,
+    "instances": 2,
+    "protocol": "LL",
+    "instr_fusion": False,
+    "auto_sync": False,
+    "replication_policy": ReplicationPolicy.none,
+    "reuse_resources": True,
+    "num_threads_per_block": 512,
+    "use_double_scratch_buffer": True,
+    "buffer_alignment": 32,
+    "min_message_size": 1 << 10,
+    "max_message_size": 1 << 20,
+    "compact_instances": True,
+    "deduplicate_ranks": True,
+    "reorder_operations": True,
+    "remove_redundant_syncs": True,
+    "coalesce_chunks": True,
+    "reuse_scratch": True,
+    "share_channels": True,
+    "tags": {"default": 2},
+}
+
+
+def algo(spec, **kwargs):
+    pass
+
+
+def other_algo(spec, **kwargs):
+    return None
+
+
+def test_every_spec_field_is_covered():
+    assert set(CHANGED_FIELDS) == {f.name for f in fields(AlgoSpec)}
+
+
+@pytest.mark.parametrize("field_name", sorted(CHANGED_FIELDS))
+def test_spec_fields_change_plan_id(field_name):
+    changed = replace(SPEC, **{field_name: CHANGED_FIELDS[field_name]})
+    assert _plan_id(algo, changed, {}) != _plan_id(algo, SPEC, {})
+
+
+def test_plan_id_is_stable():
+    same = replace(SPEC, collective=AllReduce(8, 1, True), tags={"default": 1})
+    assert _plan_id(algo, same, {"a": 1, "b": [1, 2]}) == _plan_id(algo, SPEC, {"b": [1, 2], "a": 1})
+    assert _plan_id(algo, SPEC, {}) != _plan_id(algo, replace(SPEC, collective=AllGather(8, 1, True)), {})
+
+
+def test_kwargs_and_source_change_plan_id():
+    assert _plan_id(algo, SPEC, {"a": 1}) != _plan_id(algo, SPEC, {"a": 2})
+    assert _plan_id(algo, SPEC, {}) != _plan_id(algo, SPEC, {"a": 1})
+    assert _plan_id(algo, SPEC, {}) != _plan_id(other_algo, SPEC, {})
+
+
+def test_non_json_kwargs_are_rejected():
+    with pytest.raises(TypeError):
+        _plan_id(algo, SPEC, {"callback": object()})
+    with pytest.raises(TypeError):
+        _plan_id(algo, replace(SPEC, tags={"key": object()}), {})
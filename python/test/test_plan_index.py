@@ -0,0 +1,20 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+from mscclpp.plan_index import SelectionCache
+
+
+def test_selection_cache_disabled_by_default():
+    cache = SelectionCache()
+    cache.put("key", "plan")
+    assert len(cache) == 0
+    assert cache.get("key") is None
+
+
+def test_selection_cache_empties_when_full():
+    cache = SelectionCache(size=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1 and cache.get("b") == 2
+    cache.put("c", 3)
+    assert len(cache) == 1 and cache.get("c") == 3
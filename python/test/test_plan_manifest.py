@@ -0,0 +1,89 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+import json
+from types import SimpleNamespace
+
+import pytest
+from blake3 import blake3
+
+import mscclpp
+from mscclpp.plan_manifest import MANIFEST_FILENAME, MANIFEST_VERSION, manifest_entry, read_manifest, write_manifest
+
+METADATA = {"name": "allreduce", "collective": "allreduce", "inplace": True, "min_message_size": 0}
+
+
+def plan_entries(plan_dir, names) -> list:
+    entries = []
+    for name in names:
+        plan_path = plan_dir / f"{name}.json"
+        plan_path.write_text(json.dumps({**METADATA, "name": name}))
+        entries.append(manifest_entry(str(plan_path), {**METADATA, "name": name}, 8, 8, {"default": 1}))
+    return entries
+
+
+def test_manifest_entry(tmp_path):
+    plan_path = tmp_path / "plan.json"
+    plan_path.write_text("{}")
+    assert manifest_entry(str(plan_path), METADATA, 16, 8, {"default": 1}) == {
+        **METADATA,
+        "id": blake3(b"{}").hexdigest(),
+        "filename": "plan.json",
+        "world_size": 16,
+        "nranks_per_node": 8,
+        "tags": {"default": 1},
+        "size": 2,
+    }
+    assert manifest_entry(str(plan_path), METADATA, 16, 8, plan_id="plan")["id"] == "plan"
+
+
+def test_manifest_round_trip(tmp_path):
+    entries = plan_entries(tmp_path, ["a", "b"])
+    write_manifest(str(tmp_path), entries)
+    assert read_manifest(str(tmp_path)) == entries
+    # The manifest is replaced as a whole, without leaving its temporary file behind.
+    write_manifest(str(tmp_path), entries[1:])
+    assert read_manifest(str(tmp_path)) == entries[1:]
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["a.json", "b.json", MANIFEST_FILENAME]
+
+
+def test_read_manifest_without_manifest(tmp_path):
+    assert read_manifest(str(tmp_path)) == []
+    (tmp_path / MANIFEST_FILENAME).write_text(json.dumps({"version": MANIFEST_VERSION + 1, "plans": [{"id": "a"}]}))
+    assert read_manifest(str(tmp_path)) == []
+
+
+def test_write_manifest_rejects_duplicate_ids(tmp_path):
+    entries = plan_entries(tmp_path, ["a"])
+    write_manifest(str(tmp_path), entries)
+    with pytest.raises(ValueError, match="unique"):
+        write_manifest(str(tmp_path), entries + entries)
+    assert read_manifest(str(tmp_path)) == entries
+
+
+def test_registry_load_manifest(tmp_path, monkeypatch):
+    # The native registry registers the plans of the manifest, the Python registry indexes them.
+    def load_manifest(plan_dir, rank):
+        return [
+            SimpleNamespace(
+                id=entry["id"],
+                tags=entry["tags"],
+                plan=SimpleNamespace(collective=entry["collective"], min_message_size=0, max_message_size=1 << 20),
+                constraint=SimpleNamespace(world_size=entry["world_size"], n_ranks_per_node=entry["nranks_per_node"]),
+            )
+            for entry in read_manifest(plan_dir)
+        ]
+
+    native = SimpleNamespace(load_manifest=load_manifest, set_selector=lambda selector: None)
+    monkeypatch.setattr(mscclpp, "_ExecutionPlanRegistry", SimpleNamespace(get_instance=lambda: native))
+    monkeypatch.setattr(mscclpp.ExecutionPlanRegistry, "_instance", None)
+    entries = plan_entries(tmp_path, ["a", "b"])
+    write_manifest(str(tmp_path), entries)
+
+    registry = mscclpp.ExecutionPlanRegistry()
+    plans = registry.load_manifest(tmp_path, 0)
+    assert [plan.id for plan in plans] == [entry["id"] for entry in entries]
+    assert all(registry.get(plan.id) is plan for plan in plans)
+    registry.set_selector(lambda plans, request: plans)
+    assert registry.select("allreduce", 8, 8, 0, 0, 1024) == plans
+    assert registry.select("allreduce", 16, 8, 0, 0, 1024) is None
@@ -0,0 +1,47 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+import io
+import json
+
+import pytest
+
+from mscclpp.language.collectives import AllGather, AllReduce
+from mscclpp.language.default_algos import allgather_ring, allreduce_binary_tree
+
+from .dsl_verifier import _spec
+
+PROGRAMS = {
+    "ring": (allgather_ring, AllGather(4, 1, True), {"deduplicate_ranks": True}),
+    "binary_tree": (allreduce_binary_tree, AllReduce(4, 1, True), {}),
+}
+
+
+@pytest.mark.parametrize("name", sorted(PROGRAMS))
+@pytest.mark.parametrize("rank", range(4))
+def test_rank_scoped_plan_has_one_full_section(name, rank):
+    function, collective, options = PROGRAMS[name]
+    full = json.loads(function(_spec(collective, 4, 4, "Simple")).to_json())
+    program = function(_spec(collective, 4, 4, "Simple", **options))
+    scoped = json.loads(program.to_json(rank=rank))
+
+    # Sections are never deduplicated in rank-scoped plans, and the other ranks only keep connection metadata.
+    assert "gpu_templates" not in scoped
+    assert scoped["rank_scope"] == rank
+    assert scoped["gpus"][rank] == full["gpus"][rank]
+    for gpu, full_gpu in zip(scoped["gpus"], full["gpus"]):
+        if gpu["id"] != rank:
+            assert gpu == {key: full_gpu[key] for key in ("id", "channels", "remote_buffers")}
+    assert {key: value for key, value in scoped.items() if key not in ("gpus", "rank_scope")} == {
+        key: value for key, value in full.items() if key != "gpus"
+    }
+
+    stream = io.StringIO()
+    function(_spec(collective, 4, 4, "Simple", **options)).write_json(stream, rank=rank)
+    assert json.loads(stream.getvalue()) == scoped
+
+
+def test_rank_scoped_plan_rejects_unknown_ranks():
+    function, collective, _ = PROGRAMS["ring"]
+    with pytest.raises(ValueError):
+        function(_spec(collective, 4, 4, "Simple")).to_json(rank=4)
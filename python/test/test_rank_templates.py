@@ -0,0 +1,96 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+from dataclasses import replace
+import io
+import json
+
+import pytest
+
+from mscclpp.language.collectives import AllGather, AllReduce
+from mscclpp.language.default_algos import allgather_ring, allreduce_binary_tree, allreduce_double_binary_tree
+from mscclpp.language.utils import AlgoSpec
+from mscclpp.plan_format import RankTemplates, expand_instances, expand_rank_templates
+
+from .dsl_verifier import small_programs
+
+PROGRAMS = {
+    "ring": (allgather_ring, AllGather(8, 1, True)),
+    "binary_tree": (allreduce_binary_tree, AllReduce(8, 1, True)),
+    "double_binary_tree": (allreduce_double_binary_tree, AllReduce(8, 1, True)),
+}
+
+
+def spec(collective, deduplicate_ranks):
+    return AlgoSpec(
+        name="test",
+        collective=collective,
+        nranks_per_node=8,
+        world_size=8,
+        in_place=True,
+        instances=1,
+        protocol="Simple",
+        deduplicate_ranks=deduplicate_ranks,
+    )
+
+
+def compact_plan(function, collective, deduplicate_ranks) -> str:
+    program = function(spec(collective, deduplicate_ranks))
+    return program.to_json(indent=None, separators=(",", ":"), ensure_ascii=False)
+
+
+@pytest.mark.parametrize("name", sorted(PROGRAMS))
+def test_deduplicated_plan_is_never_larger(name):
+    function, collective = PROGRAMS[name]
+    plain = compact_plan(function, collective, False)
+    deduplicated = compact_plan(function, collective, True)
+    assert len(deduplicated) <= len(plain)
+    assert expand_rank_templates(json.loads(deduplicated)) == json.loads(plain)
+
+    stream = io.StringIO()
+    function(spec(collective, True)).write_json(stream)
+    assert stream.getvalue() == deduplicated
+
+
+@pytest.mark.parametrize("name", sorted(small_programs()))
+def test_deduplicated_compact_plan_expands_to_plain_plan(name):
+    build = small_programs()[name][0]
+    plain = json.loads(build(instances=2).to_json())
+    deduplicated = json.loads(build(instances=2, deduplicate_ranks=True).to_json())
+    assert expand_rank_templates(deduplicated) == plain
+    # Rank templates hold compact threadblocks, which are expanded once the GPU sections are restored.
+    both = json.loads(build(instances=2, deduplicate_ranks=True, compact_instances=True).to_json())
+    assert expand_instances(expand_rank_templates(both)) == plain
+
+
+def test_symmetric_plan_uses_templates():
+    function, collective = PROGRAMS["ring"]
+    plan = json.loads(compact_plan(function, collective, True))
+    # Every rank after the first runs the same steps on rotated output chunks.
+    assert len(plan["gpu_templates"]) == 2
+    assert all(
+        gpu["template"] == 1 and gpu["chunk_shifts"] == {"o": rank - 1} for rank, gpu in enumerate(plan["gpus"][2:], 2)
+    )
+
+
+def test_asymmetric_plan_keeps_plain_sections():
+    function, collective = PROGRAMS["double_binary_tree"]
+    deduplicated = compact_plan(function, collective, True)
+    assert "gpu_templates" not in json.loads(deduplicated)
+    assert deduplicated == compact_plan(function, collective, False)
+
+
+def test_reduces_plan():
+    templates = RankTemplates()
+    gpus = [
+        {"id": rank, "input_chunks": 1, "output_chunks": 1, "scratch_chunks": 0, "value": rank} for rank in range(4)
+    ]
+    entries = [templates.add(gpu) for gpu in gpus]
+    assert len(templates.templates) == 4
+    assert not templates.reduces_plan(entries)
+
+    templates = RankTemplates()
+    gpus = [{"id": rank, "input_chunks": 1, "output_chunks": 1, "scratch_chunks": 0, "value": 0} for rank in range(4)]
+    entries = [templates.add(gpu) for gpu in gpus]
+    assert len(templates.templates) == 1
+    assert templates.reduces_plan(entries)
@@ -0,0 +1,12 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+import pytest
+
+from .unit_plans import PLAN_DIR, UNIT_PLANS
+
+
+@pytest.mark.parametrize("name", sorted(UNIT_PLANS))
+def test_unit_plans_match_dsl(name):
+    # Regenerate with `python -m test.unit_plans` when the DSL changes the plans on purpose.
+    assert (PLAN_DIR / name).read_bytes() == UNIT_PLANS[name]()
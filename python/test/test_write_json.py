@@ -0,0 +1,40 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+import io
+import json
+
+import pytest
+
+from .dsl_verifier import small_programs
+
+PROGRAMS = small_programs()
+
+
+def compact_json(program, rank: int = None) -> str:
+    return program.to_json(indent=None, rank=rank, separators=(",", ":"), ensure_ascii=False)
+
+
+@pytest.mark.parametrize("name", sorted(PROGRAMS))
+@pytest.mark.parametrize("options", [{}, {"deduplicate_ranks": True}, {"instances": 2}])
+def test_write_json_matches_to_json(name, options):
+    build = PROGRAMS[name][0]
+    for rank in (None, 0):
+        stream = io.StringIO()
+        build(**options).write_json(stream, rank=rank)
+        assert stream.getvalue() == compact_json(build(**options), rank)
+
+
+def test_write_rank_plans(tmp_path):
+    build = PROGRAMS["allreduce_ring"][0]
+    program = build()
+    paths = program.write_rank_plans(str(tmp_path / "allreduce.rank{rank}.json"))
+    assert paths == [str(tmp_path / f"allreduce.rank{rank}.json") for rank in range(program.num_ranks)]
+    assert sorted(path.name for path in tmp_path.iterdir()) == sorted(
+        f"allreduce.rank{rank}.json" for rank in range(program.num_ranks)
+    )
+    for rank, path in enumerate(paths):
+        with open(path) as f:
+            plan = f.read()
+        assert plan == compact_json(build(), rank)
+        assert json.loads(plan)["rank_scope"] == rank
@@ -0,0 +1,61 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+"""Execution plans generated by the DSL for the C++ unit tests in test/unit/execution_plan_tests.cc.
+
+The plans are checked in under test/unit/execution-plans, and test_unit_plans.py fails when they no
+longer match the DSL. Regenerate them from the python directory with ``python -m test.unit_plans``.
+"""
+
+import json
+from pathlib import Path
+from typing import Callable, Dict
+
+from mscclpp.language import default_algos
+from mscclpp.language.collectives import AllReduce, ReduceScatter
+from mscclpp.plan_format import encode_plan
+
+from .dsl_verifier import _spec
+
+PLAN_DIR = Path(__file__).resolve().parents[2] / "test" / "unit" / "execution-plans"
+
+
+def _json(
+    function: Callable, collective, world_size: int, nranks_per_node: int, protocol: str, rank: int = None
+) -> Callable:
+    def generate():
+        program = function(_spec(collective, world_size, nranks_per_node, protocol))
+        return (program.to_json(indent=None, rank=rank) + "\n").encode()
+
+    return generate
+
+
+def _binary(json_name: str) -> Callable:
+    return lambda: encode_plan(json.loads(UNIT_PLANS[json_name]()))
+
+
+# Plans with local reductions followed by sends, which the executor resolves through their channel type.
+UNIT_PLANS: Dict[str, Callable[[], bytes]] = {
+    "reducescatter_ring.json": _json(default_algos.reducescatter_ring, ReduceScatter(4, 4, False), 4, 4, "Simple"),
+    "allreduce_ring.json": _json(default_algos.allreduce_ring, AllReduce(4, 4, True), 4, 4, "Simple"),
+    "allreduce_binary_tree.json": _json(default_algos.allreduce_binary_tree, AllReduce(4, 1, True), 4, 4, "Simple"),
+    "allreduce_double_binary_tree.json": _json(
+        default_algos.allreduce_double_binary_tree, AllReduce(4, 2, True), 4, 4, "Simple"
+    ),
+    # A rank-scoped plan, which only rank 1 can load.
+    "allreduce_ring.rank1.json": _json(default_algos.allreduce_ring, AllReduce(4, 4, True), 4, 4, "Simple", rank=1),
+    # Binary plans encoded by mscclpp.plan_format, which must load like their JSON plans.
+    "allreduce_ring.bin": _binary("allreduce_ring.json"),
+    "allreduce_binary_tree.bin": _binary("allreduce_binary_tree.json"),
+}
+
+
+def write_unit_plans(plan_dir: Path = PLAN_DIR):
+    """Write every plan of ``UNIT_PLANS`` to ``plan_dir``."""
+    plan_dir.mkdir(parents=True, exist_ok=True)
+    for name, generate in UNIT_PLANS.items():
+        (plan_dir / name).write_bytes(generate())
+
+
+if __name__ == "__main__":
+    write_unit_plans()
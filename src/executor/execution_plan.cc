@@ -3,11 +3,17 @@
 
 #include "execution_plan.hpp"
 
+#include <algorithm>
+#include <array>
+#include <atomic>
 #include <cassert>
 #include <cstdlib>
+#include <cstring>
 #include <filesystem>
 #include <fstream>
 #include <iomanip>
+#include <limits>
+#include <optional>
 #include <set>
 #include <sstream>
 
@@ -15,6 +21,9 @@
 
 namespace {
 
+constexpr char manifestFilename[] = "manifest.json";
+constexpr int manifestVersion = 1;
+
 static const std::vector<mscclpp::AlgoConfig> defaultAlgoConfigs = {
     {"allreduce_2nodes_1K_64K.json", "allreduce", 8, 16, {{"default", 1}}},
     {"allreduce_2nodes_128K_2M.json", "allreduce", 8, 16, {{"default", 1}}}};
@@ -29,6 +38,28 @@ std::string simpleHash(const std::string& input) {
 
 std::string generateFileId(const std::string& filePath) { return simpleHash(filePath); }
 
+// Alignment of a buffer address, capped to a page, used to tell requests apart in the selection cache.
+uintptr_t bufferAlignment(const void* ptr) {
+  constexpr uintptr_t maxAlignment = 4096;
+  uintptr_t addr = reinterpret_cast<uintptr_t>(ptr);
+  uintptr_t alignment = addr & (~addr + 1);
+  return (alignment == 0 || alignment > maxAlignment) ? maxAlignment : alignment;
+}
+
+size_t effectiveMessageSize(const mscclpp::ExecutionRequest& request) {
+  return (request.collective == "allgather") ? (request.messageSize * request.worldSize) : request.messageSize;
+}
+
+bool hasTags(const mscclpp::ExecutionPlanHandle& handle, const std::unordered_map<std::string, uint64_t>& tags) {
+  for (const auto& [key, value] : tags) {
+    auto it = handle.tags.find(key);
+    if (it == handle.tags.end() || it->second != value) {
+      return false;
+    }
+  }
+  return true;
+}
+
 template <typename T, typename Predicate>
 std::vector<T> filter(const std::vector<T>& vec, Predicate pred) {
   std::vector<T> filtered;
@@ -124,15 +155,560 @@ auto convertToChannelType = [](const std::string& str) {
   }
 };
 
+std::vector<mscclpp::BufferRefSpec> parseBufferRefs(const nlohmann::json& buffs) {
+  std::vector<mscclpp::BufferRefSpec> refs;
+  for (const auto& buff : buffs) {
+    mscclpp::BufferRefSpec ref{buff.at("index").get<uint32_t>(), buff.at("size").get<uint32_t>()};
+    if (buff.contains("type")) {
+      ref.type = convertToBufferType(buff.at("type"));
+    }
+    if (buff.contains("buffer_id")) {
+      ref.bufferId = buff.at("buffer_id").get<int>();
+    }
+    if (buff.contains("switch_channel_id")) {
+      ref.switchChannelId = buff.at("switch_channel_id").get<int>();
+    }
+    refs.push_back(ref);
+  }
+  return refs;
+}
+
+mscclpp::OperationSpec parseOperation(const nlohmann::json& op) {
+  mscclpp::OperationSpec spec;
+  spec.type = getOpType(op.at("name"));
+  if (op.contains("channel_type")) {
+    spec.channelType = convertToChannelType(op.at("channel_type"));
+  }
+  if (op.contains("channel_ids")) {
+    spec.channelIds = op.at("channel_ids").get<std::vector<uint8_t>>();
+  }
+  if (op.contains("tbg_info")) {
+    spec.tbId = op.at("tbg_info").at("tb_id");
+    spec.tbgSize = op.at("tbg_info").at("tbg_size");
+  }
+  if (op.contains("src_buff")) {
+    spec.srcBuffs = parseBufferRefs(op.at("src_buff"));
+  }
+  if (op.contains("dst_buff")) {
+    spec.dstBuffs = parseBufferRefs(op.at("dst_buff"));
+  }
+  if (op.contains("barrier_id")) {
+    spec.barrierId = op.at("barrier_id").get<uint32_t>();
+  }
+  if (op.contains("num_threadblocks")) {
+    spec.nThreadBlocks = op.at("num_threadblocks").get<uint32_t>();
+  }
+  if (op.contains("semaphore_ids")) {
+    spec.semaphoreIds = op.at("semaphore_ids").get<std::vector<uint32_t>>();
+  }
+  if (op.contains("ops")) {
+    for (const auto& innerOp : op.at("ops")) {
+      spec.ops.push_back(parseOperation(innerOp));
+    }
+  }
+  if (op.contains("iter_context")) {
+    spec.unitSize = op.at("iter_context").at("unit_size").get<uint32_t>();
+    spec.nChunks = op.at("iter_context").at("num_chunks");
+  }
+  return spec;
+}
+
 }  // namespace
 
 namespace mscclpp {
 using json = nlohmann::json;
 
+namespace {
+
+std::atomic<uint64_t> planParseCount{0};
+
+// Layout of binary plans, see python/mscclpp/plan_format.py.
+constexpr char binaryPlanMagic[8] = {'M', 'S', 'C', 'C', 'L', 'P', 'P', 'B'};
+constexpr uint32_t binaryPlanVersion = 1;
+constexpr uint16_t binaryPlanNoString = 0xffff;
+
+enum BinaryOperationField : uint16_t {
+  OpChannelIds = 1 << 0,
+  OpTbgInfo = 1 << 1,
+  OpSrcBuff = 1 << 2,
+  OpDstBuff = 1 << 3,
+  OpBarrierId = 1 << 4,
+  OpNumThreadblocks = 1 << 5,
+  OpSemaphoreIds = 1 << 6,
+  OpIterContext = 1 << 7,
+  OpOps = 1 << 8,
+};
+
+enum BinaryBufferRefField : uint16_t {
+  BuffBufferId = 1 << 0,
+  BuffSwitchChannelId = 1 << 1,
+};
+
+std::shared_ptr<PlanSpec> specFromHeader(const json& obj) {
+  auto spec = std::make_shared<PlanSpec>();
+  spec->name = obj.at("name");
+  spec->collective = obj.at("collective");
+  spec->protocol = obj.at("protocol");
+  spec->isInPlace = obj.at("inplace");
+  spec->nThreadsPerBlock = obj.value("num_threads_per_block", 1024);
+  spec->minMessageSize = obj.value("min_message_size", 0);
+  spec->maxMessageSize = obj.value("max_message_size", std::numeric_limits<uint64_t>::max());
+  return spec;
+}
+
+// Rotates the chunk indexes of each buffer type of the loading rank, see RankTemplates in
+// python/mscclpp/plan_format.py.
+void shiftChunks(PlanSpec& spec, const GpuSpec& gpu, const json& shifts) {
+  std::unordered_map<BufferType, std::pair<uint32_t, uint32_t>> rotations;
+  for (const auto& [type, shift] : shifts.items()) {
+    BufferType bufferType = convertToBufferType(type);
+    uint32_t nChunks = bufferType == BufferType::INPUT    ? spec.inputChunks
+                       : bufferType == BufferType::OUTPUT ? spec.outputChunks
+                                                          : spec.scratchChunks;
+    rotations[bufferType] = {shift.get<uint32_t>(), nChunks};
+  }
+  for (auto& tb : spec.threadblocks) {
+    std::unordered_map<ChannelType, std::vector<int>> remoteBufferIds;
+    for (const auto& ref : tb.remoteBufferRefs) {
+      auto& ids = remoteBufferIds[ref.accessChannelType];
+      ids.insert(ids.end(), ref.remoteBufferIds.begin(), ref.remoteBufferIds.end());
+    }
+    auto shiftOperation = [&](auto& self, OperationSpec& op) -> void {
+      for (auto* buffs : {&op.srcBuffs, &op.dstBuffs}) {
+        if (!buffs->has_value()) continue;
+        for (auto& buff : **buffs) {
+          std::optional<BufferType> type = buff.type;
+          if (buff.switchChannelId) {
+            type.reset();
+          } else if (buff.bufferId) {
+            type.reset();
+            auto it = op.channelType ? remoteBufferIds.find(*op.channelType) : remoteBufferIds.end();
+            if (it != remoteBufferIds.end() && *buff.bufferId >= 0 &&
+                static_cast<size_t>(*buff.bufferId) < it->second.size()) {
+              type = gpu.remoteBuffers.at(it->second[*buff.bufferId]).bufferType;
+            }
+          }
+          auto rotation = type ? rotations.find(*type) : rotations.end();
+          if (rotation != rotations.end()) {
+            buff.index = (buff.index + rotation->second.first) % rotation->second.second;
+          }
+        }
+      }
+      for (auto& inner : op.ops) {
+        self(self, inner);
+      }
+    };
+    for (auto& op : tb.ops) {
+      shiftOperation(shiftOperation, op);
+    }
+  }
+}
+
+std::shared_ptr<PlanSpec> specFromJson(const json& obj, int rank) {
+  auto spec = specFromHeader(obj);
+
+  // Sections of GPUs written as a template with relabeled ranks, see RankTemplates in
+  // python/mscclpp/plan_format.py.
+  auto section = [&obj](const json& gpu) -> const json& {
+    return gpu.contains("template") ? obj.at("gpu_templates").at(gpu.at("template").get<size_t>()) : gpu;
+  };
+  auto rankOf = [](const json& gpu, int label) {
+    return gpu.contains("ranks") ? gpu.at("ranks").at(label).get<int>() : label;
+  };
+  const auto& gpus = obj.at("gpus");
+  for (const auto& entry : gpus) {
+    const json& gpu = section(entry);
+    GpuSpec& gpuSpec = spec->gpus.emplace_back();
+    gpuSpec.id = entry.at("id");
+    for (const auto& channel : gpu.at("channels")) {
+      GpuSpec::Channel& chan = gpuSpec.channels.emplace_back();
+      chan.channelType = convertToChannelType(channel.at("channel_type"));
+      if (chan.channelType == ChannelType::SWITCH) {
+        chan.bufferType = convertToBufferType(channel.at("buffer_type"));
+        for (const auto& group : channel.at("rank_groups")) {
+          auto& ranks = chan.rankGroups.emplace_back(group.at("size").get<uint32_t>(), std::vector<int>()).second;
+          for (const auto& label : group.at("ranks")) {
+            ranks.push_back(rankOf(entry, label));
+          }
+        }
+      } else {
+        chan.bufferType = BufferType::NONE;
+        for (const auto& label : channel.at("connected_to")) {
+          chan.connectedTo.push_back(rankOf(entry, label));
+        }
+      }
+    }
+    for (const auto& remoteBuffer : gpu.at("remote_buffers")) {
+      GpuSpec::RemoteBuffer& buffer = gpuSpec.remoteBuffers.emplace_back();
+      buffer.rank = rankOf(entry, remoteBuffer.at("rank"));
+      buffer.bufferType = convertToBufferType(remoteBuffer.at("type"));
+      for (const auto& channel : remoteBuffer.at("access_channel_types")) {
+        buffer.accessChannelTypes.push_back(convertToChannelType(channel));
+      }
+    }
+  }
+
+  // The rank is only checked when the plan is loaded for execution.
+  if (static_cast<size_t>(rank) < gpus.size() && gpus[rank].at("id") == rank) {
+    const auto& gpu = section(gpus[rank]);
+    spec->hasRank = true;
+    spec->inputChunks = gpu.at("input_chunks");
+    spec->outputChunks = gpu.at("output_chunks");
+    spec->scratchChunks = gpu.at("scratch_chunks");
+    if (gpu.contains("semaphores")) {
+      for (const auto& sem : gpu.at("semaphores")) {
+        spec->semaphoreInitValues.push_back(sem.at("init_value"));
+      }
+    }
+    for (const auto& threadblock : gpu.at("threadblocks")) {
+      ThreadblockSpec& tb = spec->threadblocks.emplace_back();
+      tb.id = threadblock.at("id");
+      for (const auto& channel : threadblock.at("channels")) {
+        tb.channels.push_back(
+            {convertToChannelType(channel.at("channel_type")), channel.at("channel_ids").get<std::vector<int>>()});
+      }
+      if (threadblock.contains("remote_buffer_refs")) {
+        for (const auto& remoteBuffRef : threadblock.at("remote_buffer_refs")) {
+          tb.remoteBufferRefs.push_back({convertToChannelType(remoteBuffRef.at("access_channel_type")),
+                                         remoteBuffRef.at("remote_buffer_ids").get<std::vector<int>>()});
+        }
+      }
+      for (const auto& op : threadblock.at("ops")) {
+        tb.ops.push_back(parseOperation(op));
+      }
+    }
+    if (gpus[rank].contains("chunk_shifts")) {
+      shiftChunks(*spec, spec->gpus[rank], gpus[rank].at("chunk_shifts"));
+    }
+  }
+  return spec;
+}
+
+// Replication rules of plans written with compact_instances, see replicate_threadblock in
+// python/mscclpp/plan_format.py.
+void replicateOperation(OperationSpec& op, uint32_t instance, uint32_t nInstances, bool interleaved) {
+  if (interleaved) {
+    for (auto* buffs : {&op.srcBuffs, &op.dstBuffs}) {
+      if (buffs->has_value()) {
+        for (auto& buff : **buffs) {
+          buff.index = buff.index * nInstances + instance * buff.size;
+        }
+      }
+    }
+  }
+  if (op.semaphoreIds.has_value()) {
+    for (auto& id : *op.semaphoreIds) {
+      id = id * nInstances + instance;
+    }
+  }
+  if (op.barrierId.has_value()) {
+    op.barrierId = *op.barrierId * nInstances + instance;
+  }
+  for (auto& inner : op.ops) {
+    replicateOperation(inner, instance, nInstances, interleaved);
+  }
+}
+
+void expandInstances(PlanSpec& spec, const json& replication) {
+  uint32_t nInstances = replication.at("instances");
+  bool interleaved = replication.at("policy") == "interleaved";
+  std::vector<ThreadblockSpec> threadblocks;
+  threadblocks.reserve(spec.threadblocks.size() * nInstances);
+  for (const auto& templateTb : spec.threadblocks) {
+    for (uint32_t instance = 0; instance < nInstances; instance++) {
+      ThreadblockSpec& tb = threadblocks.emplace_back(templateTb);
+      tb.id = templateTb.id * nInstances + instance;
+      for (auto& channel : tb.channels) {
+        for (auto& id : channel.channelIds) {
+          id = id * nInstances + instance;
+        }
+      }
+      for (auto& op : tb.ops) {
+        replicateOperation(op, instance, nInstances, interleaved);
+      }
+    }
+  }
+  spec.threadblocks = std::move(threadblocks);
+}
+
+// Little-endian reader over a section of a binary plan.
+class ByteReader {
+ public:
+  ByteReader(std::string data) : data_(std::move(data)) {}
+
+  template <typename T>
+  T read() {
+    T value;
+    std::memcpy(&value, this->advance(sizeof(T)), sizeof(T));
+    return value;
+  }
+
+  template <typename T>
+  std::vector<T> readArray(size_t count) {
+    std::vector<T> values(count);
+    std::memcpy(values.data(), this->advance(count * sizeof(T)), count * sizeof(T));
+    return values;
+  }
+
+  std::string readString(size_t size) { return std::string(this->advance(size), size); }
+
+ private:
+  const char* advance(size_t size) {
+    if (size > data_.size() - pos_) {
+      throw Error("Binary execution plan is truncated", ErrorCode::ExecutorError);
+    }
+    const char* ptr = data_.data() + pos_;
+    pos_ += size;
+    return ptr;
+  }
+
+  std::string data_;
+  size_t pos_ = 0;
+};
+
+// A plan file opened for loading. JSON plans are parsed as a whole, binary plans only read the sections a rank
+// needs.
+class PlanFile {
+ public:
+  PlanFile(const std::string& planPath) : file_(planPath, std::ios::binary) {
+    if (!file_) {
+      throw Error("Failed to open execution plan " + planPath, ErrorCode::ExecutorError);
+    }
+    planParseCount++;
+    char magic[sizeof(binaryPlanMagic)] = {};
+    file_.read(magic, sizeof(magic));
+    isBinary_ = file_.gcount() == sizeof(magic) && std::memcmp(magic, binaryPlanMagic, sizeof(magic)) == 0;
+    if (!isBinary_) {
+      file_.clear();
+      file_.seekg(0);
+      header_ = json::parse(file_);
+      return;
+    }
+    constexpr size_t fixedSize = 2 * sizeof(uint32_t) + 4 * sizeof(uint64_t);
+    ByteReader reader(this->readSection(sizeof(magic), fixedSize));
+    uint32_t version = reader.read<uint32_t>();
+    if (version != binaryPlanVersion) {
+      throw Error("Unsupported binary execution plan version " + std::to_string(version), ErrorCode::ExecutorError);
+    }
+    uint32_t nGpus = reader.read<uint32_t>();
+    uint64_t headerOffset = reader.read<uint64_t>();
+    uint64_t headerSize = reader.read<uint64_t>();
+    uint64_t stringsOffset = reader.read<uint64_t>();
+    uint64_t stringsSize = reader.read<uint64_t>();
+    ByteReader entries(this->readSection(sizeof(magic) + fixedSize, nGpus * 4 * sizeof(uint64_t)));
+    gpuSections_ = entries.readArray<std::array<uint64_t, 4>>(nGpus);
+    header_ = json::parse(this->readSection(headerOffset, headerSize));
+    ByteReader strings(this->readSection(stringsOffset, stringsSize));
+    strings_.resize(strings.read<uint32_t>());
+    for (auto& str : strings_) {
+      str = strings.readString(strings.read<uint16_t>());
+    }
+  }
+
+  // The top-level fields of the plan, or the whole document of a JSON plan.
+  const json& header() const { return header_; }
+
+  std::shared_ptr<PlanSpec> readSpec(int rank) {
+    auto spec = isBinary_ ? this->readBinarySpec(rank) : specFromJson(header_, rank);
+    if (header_.contains("replication")) {
+      expandInstances(*spec, header_.at("replication"));
+    }
+    return spec;
+  }
+
+ private:
+  std::shared_ptr<PlanSpec> readBinarySpec(int rank) {
+    auto spec = specFromHeader(header_);
+    for (const auto& [metadataOffset, metadataSize, bodyOffset, bodySize] : gpuSections_) {
+      ByteReader reader(this->readSection(metadataOffset, metadataSize));
+      spec->gpus.push_back(this->readGpu(reader));
+    }
+    // The rank is only checked when the plan is loaded for execution.
+    if (static_cast<size_t>(rank) < spec->gpus.size() && spec->gpus[rank].id == rank && gpuSections_[rank][3] > 0) {
+      ByteReader reader(this->readSection(gpuSections_[rank][2], gpuSections_[rank][3]));
+      this->readBody(reader, *spec);
+    }
+    return spec;
+  }
+
+  std::string readSection(uint64_t offset, uint64_t size) {
+    std::string data(size, '\0');
+    file_.seekg(offset);
+    file_.read(data.data(), size);
+    if (!file_) {
+      throw Error("Binary execution plan is truncated", ErrorCode::ExecutorError);
+    }
+    return data;
+  }
+
+  const std::string& string(uint16_t index) const {
+    static const std::string none;
+    return index == binaryPlanNoString ? none : strings_.at(index);
+  }
+
+  GpuSpec readGpu(ByteReader& reader) {
+    GpuSpec gpu;
+    gpu.id = reader.read<int32_t>();
+    gpu.channels.resize(reader.read<uint32_t>());
+    for (auto& channel : gpu.channels) {
+      channel.channelType = convertToChannelType(this->string(reader.read<uint16_t>()));
+      uint16_t bufferType = reader.read<uint16_t>();
+      uint32_t count = reader.read<uint32_t>();
+      if (channel.channelType == ChannelType::SWITCH) {
+        channel.bufferType = convertToBufferType(this->string(bufferType));
+        for (uint32_t i = 0; i < count; i++) {
+          uint32_t nChunks = reader.read<uint32_t>();
+          channel.rankGroups.emplace_back(nChunks, reader.readArray<int32_t>(reader.read<uint32_t>()));
+        }
+      } else {
+        channel.bufferType = BufferType::NONE;
+        channel.connectedTo = reader.readArray<int32_t>(count);
+      }
+    }
+    gpu.remoteBuffers.resize(reader.read<uint32_t>());
+    for (auto& buffer : gpu.remoteBuffers) {
+      buffer.rank = reader.read<int32_t>();
+      buffer.bufferType = convertToBufferType(this->string(reader.read<uint16_t>()));
+      for (uint16_t index : reader.readArray<uint16_t>(reader.read<uint16_t>())) {
+        buffer.accessChannelTypes.push_back(convertToChannelType(this->string(index)));
+      }
+    }
+    return gpu;
+  }
+
+  void readBody(ByteReader& reader, PlanSpec& spec) {
+    spec.hasRank = true;
+    spec.inputChunks = reader.read<uint32_t>();
+    spec.outputChunks = reader.read<uint32_t>();
+    spec.scratchChunks = reader.read<uint32_t>();
+    spec.semaphoreInitValues = reader.readArray<int32_t>(reader.read<uint32_t>());
+    spec.threadblocks.resize(reader.read<uint32_t>());
+    for (auto& threadblock : spec.threadblocks) {
+      threadblock.id = reader.read<int32_t>();
+      threadblock.channels.resize(reader.read<uint32_t>());
+      for (auto& channel : threadblock.channels) {
+        channel.channelType = convertToChannelType(this->string(reader.read<uint16_t>()));
+        channel.channelIds = reader.readArray<int32_t>(reader.read<uint32_t>());
+      }
+      threadblock.remoteBufferRefs.resize(reader.read<uint32_t>());
+      for (auto& ref : threadblock.remoteBufferRefs) {
+        ref.accessChannelType = convertToChannelType(this->string(reader.read<uint16_t>()));
+        ref.remoteBufferIds = reader.readArray<int32_t>(reader.read<uint32_t>());
+      }
+      threadblock.ops.resize(reader.read<uint32_t>());
+      for (auto& op : threadblock.ops) {
+        this->readOperation(reader, op);
+      }
+    }
+  }
+
+  void readOperation(ByteReader& reader, OperationSpec& op) {
+    op.type = getOpType(this->string(reader.read<uint16_t>()));
+    uint16_t channelType = reader.read<uint16_t>();
+    uint16_t fields = reader.read<uint16_t>();
+    uint16_t nChannelIds = reader.read<uint16_t>();
+    uint16_t nSrcBuffs = reader.read<uint16_t>();
+    uint16_t nDstBuffs = reader.read<uint16_t>();
+    uint16_t nSemaphoreIds = reader.read<uint16_t>();
+    uint16_t nOps = reader.read<uint16_t>();
+    uint32_t tbId = reader.read<uint32_t>();
+    uint32_t tbgSize = reader.read<uint32_t>();
+    uint32_t barrierId = reader.read<uint32_t>();
+    uint32_t nThreadBlocks = reader.read<uint32_t>();
+    uint32_t unitSize = reader.read<uint32_t>();
+    uint32_t nChunks = reader.read<uint32_t>();
+
+    if (channelType != binaryPlanNoString) {
+      op.channelType = convertToChannelType(this->string(channelType));
+    }
+    std::vector<uint32_t> channelIds = reader.readArray<uint32_t>(nChannelIds);
+    if (fields & OpChannelIds) {
+      op.channelIds = std::vector<uint8_t>(channelIds.begin(), channelIds.end());
+    }
+    if (fields & OpTbgInfo) {
+      op.tbId = tbId;
+      op.tbgSize = tbgSize;
+    }
+    std::vector<BufferRefSpec> srcBuffs = this->readBufferRefs(reader, nSrcBuffs);
+    std::vector<BufferRefSpec> dstBuffs = this->readBufferRefs(reader, nDstBuffs);
+    if (fields & OpSrcBuff) {
+      op.srcBuffs = std::move(srcBuffs);
+    }
+    if (fields & OpDstBuff) {
+      op.dstBuffs = std::move(dstBuffs);
+    }
+    if (fields & OpBarrierId) {
+      op.barrierId = barrierId;
+    }
+    if (fields & OpNumThreadblocks) {
+      op.nThreadBlocks = nThreadBlocks;
+    }
+    std::vector<uint32_t> semaphoreIds = reader.readArray<uint32_t>(nSemaphoreIds);
+    if (fields & OpSemaphoreIds) {
+      op.semaphoreIds = std::move(semaphoreIds);
+    }
+    op.ops.resize(nOps);
+    for (auto& innerOp : op.ops) {
+      this->readOperation(reader, innerOp);
+    }
+    if (fields & OpIterContext) {
+      op.unitSize = unitSize;
+      op.nChunks = nChunks;
+    }
+  }
+
+  std::vector<BufferRefSpec> readBufferRefs(ByteReader& reader, uint16_t count) {
+    std::vector<BufferRefSpec> refs(count);
+    for (auto& ref : refs) {
+      ref.index = reader.read<uint32_t>();
+      ref.size = reader.read<uint32_t>();
+      uint16_t type = reader.read<uint16_t>();
+      uint16_t fields = reader.read<uint16_t>();
+      int32_t bufferId = reader.read<int32_t>();
+      int32_t switchChannelId = reader.read<int32_t>();
+      if (type != binaryPlanNoString) {
+        ref.type = convertToBufferType(this->string(type));
+      }
+      if (fields & BuffBufferId) {
+        ref.bufferId = bufferId;
+      }
+      if (fields & BuffSwitchChannelId) {
+        ref.switchChannelId = switchChannelId;
+      }
+    }
+    return refs;
+  }
+
+  std::ifstream file_;
+  bool isBinary_;
+  json header_;
+  std::vector<std::string> strings_;
+  // (metadata offset, metadata size, body offset, body size) of every gpu.
+  std::vector<std::array<uint64_t, 4>> gpuSections_;
+};
+
+}  // namespace
+
 ExecutionPlan::Impl::Impl(const std::string& planPath, int rank)
     : planPath(planPath), isUsingPacket(false), rank(rank) {
-  std::ifstream file(this->planPath);
-  json obj = json::parse(file);
+  PlanFile file(planPath);
+  this->loadHeader(file.header());
+  try {
+    this->spec_ = file.readSpec(rank);
+  } catch (const std::exception&) {
+    // Errors in the plan body are reported when the plan is loaded for execution, without parsing the file again.
+    this->specError_ = std::current_exception();
+  }
+}
+
+ExecutionPlan::Impl::Impl(const std::string& planPath, int rank, const json& header)
+    : planPath(planPath), isUsingPacket(false), rank(rank) {
+  this->loadHeader(header);
+}
+
+uint64_t ExecutionPlan::Impl::parseCount() { return planParseCount.load(); }
+
+void ExecutionPlan::Impl::loadHeader(const json& obj) {
   this->name = obj["name"];
   this->collective = obj["collective"];
   this->isInPlace = obj["inplace"];
@@ -141,6 +717,23 @@ ExecutionPlan::Impl::Impl(const std::string& planPath, int rank)
   this->bufferAlignment = obj.value("buffer_alignment", 16);
   this->minMessageSize = obj.value("min_message_size", 0);
   this->maxMessageSize = obj.value("max_message_size", std::numeric_limits<uint64_t>::max());
+  // Rank-scoped plans only carry the operations of a single rank, other ranks only keep channel and remote buffer
+  // metadata.
+  if (obj.contains("rank_scope") && obj["rank_scope"] != rank) {
+    throw Error("Plan is compiled for rank " + std::to_string(obj["rank_scope"].get<int>()) +
+                    " and cannot be loaded by rank " + std::to_string(rank),
+                ErrorCode::ExecutorError);
+  }
+}
+
+const PlanSpec& ExecutionPlan::Impl::getSpec() {
+  if (this->specError_) {
+    std::rethrow_exception(this->specError_);
+  }
+  if (!this->spec_) {
+    this->spec_ = PlanFile(this->planPath).readSpec(rank);
+  }
+  return *this->spec_;
 }
 
 std::vector<ChannelInfo> ExecutionPlan::Impl::getChannelInfos(ChannelType channelType) const {
@@ -244,66 +837,57 @@ int ExecutionPlan::Impl::getThreadblockCount() const { return this->operations.s
 
 void ExecutionPlan::Impl::loadExecutionPlan(size_t inputSize, size_t outputSize, size_t contsSrcOffset,
                                             size_t constDstOffset) {
-  std::ifstream file(this->planPath);
-  json obj = json::parse(file);
-  if (this->name != obj["name"]) {
+  const PlanSpec& spec = this->getSpec();
+  if (this->name != spec.name) {
     throw Error("Plan name does not match", ErrorCode::ExecutorError);
   }
-  this->collective = obj["collective"];
-  std::string protocol = obj["protocol"];
-  if (protocol == "LL") {
+  this->collective = spec.collective;
+  if (spec.protocol == "LL") {
     this->isUsingPacket = true;
   }
   this->inputSize = inputSize;
   this->outputSize = outputSize;
-  this->nThreadsPerBlock = obj.value("num_threads_per_block", 1024);
-  this->minMessageSize = obj.value("min_message_size", 0);
-  this->maxMessageSize = obj.value("max_message_size", std::numeric_limits<uint64_t>::max());
-
-  this->isInPlace = obj["inplace"];
-  const auto& gpus = obj["gpus"];
+  this->nThreadsPerBlock = spec.nThreadsPerBlock;
+  this->minMessageSize = spec.minMessageSize;
+  this->maxMessageSize = spec.maxMessageSize;
 
-  auto& gpu = gpus[rank];
-  if (gpu["id"] != rank) {
+  this->isInPlace = spec.isInPlace;
+  if (!spec.hasRank) {
     throw Error("GPU rank does not match", ErrorCode::ExecutorError);
   }
-  this->inputChunks = gpu["input_chunks"];
-  this->outputChunks = gpu["output_chunks"];
-  this->scratchChunks = gpu["scratch_chunks"];
+  this->inputChunks = spec.inputChunks;
+  this->outputChunks = spec.outputChunks;
+  this->scratchChunks = spec.scratchChunks;
   checkMessageSize();
 
-  this->setupChannels(gpus);
-  this->setupRemoteBuffers(gpus);
-  this->setupSemaphores(gpu);
-  this->setupOperations(gpu, contsSrcOffset, constDstOffset);
+  this->setupChannels(spec);
+  this->setupRemoteBuffers(spec);
+  this->setupSemaphores(spec);
+  this->setupOperations(spec, contsSrcOffset, constDstOffset);
 }
 
 void ExecutionPlan::Impl::lightLoadExecutionPlan(size_t inputSize, size_t outputSize, size_t contsSrcOffset,
                                                  size_t constDstOffset) {
-  std::ifstream file(this->planPath);
-  json obj = json::parse(file);
-  if (this->name != obj["name"]) {
+  const PlanSpec& spec = this->getSpec();
+  if (this->name != spec.name) {
     throw Error("Plan name does not match", ErrorCode::ExecutorError);
   }
-  std::string protocol = obj["protocol"];
-  if (protocol == "LL") {
+  if (spec.protocol == "LL") {
     this->isUsingPacket = true;
   }
-  const auto& gpus = obj["gpus"];
-  const auto& gpu = gpus[rank];
-  if (gpu["id"] != rank) {
+  if (!spec.hasRank) {
     throw Error("GPU rank does not match", ErrorCode::ExecutorError);
   }
 
-  this->inputChunks = gpu["input_chunks"];
-  this->outputChunks = gpu["output_chunks"];
-  this->scratchChunks = gpu["scratch_chunks"];
+  this->inputChunks = spec.inputChunks;
+  this->outputChunks = spec.outputChunks;
+  this->scratchChunks = spec.scratchChunks;
 
   this->inputSize = inputSize;
   this->outputSize = outputSize;
 
   checkMessageSize();
-  this->setupOperations(gpu, contsSrcOffset, constDstOffset);
+  this->setupOperations(spec, contsSrcOffset, constDstOffset);
 }
 
 void ExecutionPlan::Impl::checkMessageSize() const {
@@ -320,28 +904,23 @@ void ExecutionPlan::Impl::checkMessageSize() const {
   }
 }
 
-void ExecutionPlan::Impl::parseChannels(const json& gpu, std::vector<ChannelInfo>& channelInfos,
+void ExecutionPlan::Impl::parseChannels(const GpuSpec& gpu, std::vector<ChannelInfo>& channelInfos,
                                         std::vector<NvlsInfo>& nvlsInfos,
                                         std::map<std::pair<int, ChannelType>, std::vector<int>>& chanConnectedPeersMap,
                                         int rank) {
-  for (const auto& channel : gpu["channels"]) {
-    ChannelType chanType = convertToChannelType(channel["channel_type"]);
-
-    if (chanType == ChannelType::SWITCH) {
+  for (const auto& channel : gpu.channels) {
+    if (channel.channelType == ChannelType::SWITCH) {
       NvlsInfo info;
-      info.bufferType = convertToBufferType(channel["buffer_type"]);
-      for (const auto& group : channel["rank_groups"]) {
-        info.nChunks = (int)group["size"];
-        info.ranks.clear();
-        for (int rank : group["ranks"]) {
-          info.ranks.push_back(rank);
-        }
+      info.bufferType = channel.bufferType;
+      for (const auto& [nChunks, ranks] : channel.rankGroups) {
+        info.nChunks = nChunks;
+        info.ranks = ranks;
         nvlsInfos.push_back(info);
       }
     } else {
       ChannelInfo info;
-      info.channelType = chanType;
-      for (const auto& peer : channel["connected_to"]) {
+      info.channelType = channel.channelType;
+      for (int peer : channel.connectedTo) {
         info.connectedPeers.push_back(peer);
         chanConnectedPeersMap[{peer, info.channelType}].push_back(rank);
         this->channelCountMap_[{rank, info.channelType}][peer]++;
@@ -351,36 +930,31 @@ void ExecutionPlan::Impl::parseChannels(const json& gpu, std::vector<ChannelInfo
   }
 }
 
-void ExecutionPlan::Impl::parseRemoteBuffer(const nlohmann::json& gpus) {
+void ExecutionPlan::Impl::parseRemoteBuffer(const std::vector<GpuSpec>& gpus) {
   for (const auto& gpu : gpus) {
     std::unordered_map<ChannelType, int> channelCountMap;
-    int gpuRank = gpu["id"];
+    int gpuRank = gpu.id;
     auto& bufferInfos = this->remoteBufferInfos_[gpuRank];
     auto& bufferIndexMap = this->bufferIndexMap_[gpuRank];
-    for (auto& remoteBuffer : gpu["remote_buffers"]) {
+    for (const auto& remoteBuffer : gpu.remoteBuffers) {
       int bufferId = bufferInfos.size();
-      int oriRank = remoteBuffer["rank"];
-      BufferType bufferType = convertToBufferType(remoteBuffer["type"]);
-      std::vector<ChannelType> accessChannels;
-      for (const auto& channel : remoteBuffer["access_channel_types"]) {
-        ChannelType chanType = convertToChannelType(channel);
-        accessChannels.push_back(chanType);
+      for (ChannelType chanType : remoteBuffer.accessChannelTypes) {
         bufferIndexMap[{bufferId, chanType}] = channelCountMap[chanType]++;
       }
-      BufferInfo info{oriRank, gpuRank, bufferType, accessChannels};
+      BufferInfo info{remoteBuffer.rank, gpuRank, remoteBuffer.bufferType, remoteBuffer.accessChannelTypes};
       bufferInfos.push_back(info);
-      this->localBufferToSend_[oriRank].push_back(info);
+      this->localBufferToSend_[remoteBuffer.rank].push_back(info);
     }
   }
 }
 
 // Construct the channel info. Step 1. Flatten MEMORY and PORT channels into separate vectors.
 // Step 2. For each threadblock, construct a vector of channel indexes and keys.
-void ExecutionPlan::Impl::setupChannels(const json& gpus) {
+void ExecutionPlan::Impl::setupChannels(const PlanSpec& spec) {
   using mapKey = std::pair<int, ChannelType>;
   std::map<mapKey, std::vector<int>> chanConnectedPeersMap;
-  for (const auto& gpu : gpus) {
-    int rank = gpu["id"];
+  for (const auto& gpu : spec.gpus) {
+    int rank = gpu.id;
     std::vector<ChannelInfo> channelInfos;
     std::vector<NvlsInfo> nvlsInfos;
     this->parseChannels(gpu, channelInfos, nvlsInfos, chanConnectedPeersMap, rank);
@@ -397,55 +971,45 @@ void ExecutionPlan::Impl::setupChannels(const json& gpus) {
   }
 
   // setup threadblockChannels
-  const auto& gpu = gpus[rank];
-  int nthreadblocks = gpu["threadblocks"].size();
+  int nthreadblocks = spec.threadblocks.size();
   this->threadblockMemoryChannels.resize(nthreadblocks);
   this->threadblockPortChannels.resize(nthreadblocks);
   this->threadblockNvlsChannels.resize(nthreadblocks);
-  for (const auto& threadblock : gpu["threadblocks"]) {
-    for (const auto& channel : threadblock["channels"]) {
-      ChannelType channelType = convertToChannelType(channel["channel_type"]);
-      ChannelKey key = {BufferType::NONE, channelType};
-      if (channel.contains("buff")) {
-        key = {convertToBufferType(channel["buff"]), channelType};
-      }
-      for (int id : channel["channel_ids"]) {
-        if (channelType == ChannelType::MEMORY) {
-          this->threadblockMemoryChannels[threadblock["id"]].emplace_back(id);
-        } else if (channelType == ChannelType::PORT) {
-          this->threadblockPortChannels[threadblock["id"]].emplace_back(id);
-        } else if (channelType == ChannelType::SWITCH) {
-          this->threadblockNvlsChannels[threadblock["id"]].emplace_back(id);
+  for (const auto& threadblock : spec.threadblocks) {
+    for (const auto& channel : threadblock.channels) {
+      for (int id : channel.channelIds) {
+        if (channel.channelType == ChannelType::MEMORY) {
+          this->threadblockMemoryChannels[threadblock.id].emplace_back(id);
+        } else if (channel.channelType == ChannelType::PORT) {
+          this->threadblockPortChannels[threadblock.id].emplace_back(id);
+        } else if (channel.channelType == ChannelType::SWITCH) {
+          this->threadblockNvlsChannels[threadblock.id].emplace_back(id);
         }
       }
     }
   }
 }
 
-void ExecutionPlan::Impl::setupRemoteBuffers(const json& gpus) {
-  this->parseRemoteBuffer(gpus);
+void ExecutionPlan::Impl::setupRemoteBuffers(const PlanSpec& spec) {
+  this->parseRemoteBuffer(spec.gpus);
 
   // setup threadblockBuffers
-  const auto& gpu = gpus[rank];
-  int nthreadblocks = gpu["threadblocks"].size();
+  int nthreadblocks = spec.threadblocks.size();
   this->threadblockMemoryChannelBuffers.resize(nthreadblocks);
   this->threadblockPortChannelBuffers.resize(nthreadblocks);
-  for (const auto& threadblock : gpu["threadblocks"]) {
-    if (!threadblock.contains("remote_buffer_refs")) {
-      continue;
-    }
-    for (const auto& remoteBuffRef : threadblock["remote_buffer_refs"]) {
-      ChannelType accessChanType = convertToChannelType(remoteBuffRef["access_channel_type"]);
+  for (const auto& threadblock : spec.threadblocks) {
+    for (const auto& remoteBuffRef : threadblock.remoteBufferRefs) {
+      ChannelType accessChanType = remoteBuffRef.accessChannelType;
       if (accessChanType == ChannelType::PORT) {
-        for (const auto& bufferId : remoteBuffRef["remote_buffer_ids"]) {
+        for (int bufferId : remoteBuffRef.remoteBufferIds) {
           BufferType type = this->remoteBufferInfos_[rank][bufferId].bufferType;
-          this->threadblockPortChannelBuffers[threadblock["id"]].push_back(
+          this->threadblockPortChannelBuffers[threadblock.id].push_back(
               {this->bufferIndexMap_[rank][{bufferId, accessChanType}], type});
         }
       } else if (accessChanType == ChannelType::MEMORY) {
-        for (const auto& bufferId : remoteBuffRef["remote_buffer_ids"]) {
+        for (int bufferId : remoteBuffRef.remoteBufferIds) {
           BufferType type = this->remoteBufferInfos_[rank][bufferId].bufferType;
-          this->threadblockMemoryChannelBuffers[threadblock["id"]].push_back(
+          this->threadblockMemoryChannelBuffers[threadblock.id].push_back(
               {this->bufferIndexMap_[rank][{bufferId, accessChanType}], type});
         }
       }
@@ -453,30 +1017,26 @@ void ExecutionPlan::Impl::setupRemoteBuffers(const json& gpus) {
   }
 }
 
-void ExecutionPlan::Impl::setupSemaphores(const json& gpu) {
-  if (!gpu.contains("semaphores")) {
-    return;
-  }
-  for (const auto& sem : gpu["semaphores"]) {
+void ExecutionPlan::Impl::setupSemaphores(const PlanSpec& spec) {
+  for (int initValue : spec.semaphoreInitValues) {
     SemaphoreInfo info;
-    info.initValue = sem["init_value"];
+    info.initValue = initValue;
     this->semaphoreInfos.push_back(info);
   }
 }
 
-void ExecutionPlan::Impl::setupOperations(const json& gpu, size_t constSrcOffset, size_t constDstOffset) {
+void ExecutionPlan::Impl::setupOperations(const PlanSpec& spec, size_t constSrcOffset, size_t constDstOffset) {
   // setup threadblocks and operations
-  for (const auto& threadblock : gpu["threadblocks"]) {
-    int threadBlockId = threadblock["id"];
+  for (const auto& threadblock : spec.threadblocks) {
     std::vector<Operation> ops;
-    for (const auto& op : threadblock["ops"]) {
+    for (const auto& op : threadblock.ops) {
       Operation operation = {};
-      this->setupOperation(op, operation, rank, threadBlockId, constSrcOffset, constDstOffset);
+      this->setupOperation(op, operation, rank, threadblock.id, constSrcOffset, constDstOffset);
       ops.push_back(operation);
       if (operation.type == OperationType::PIPELINE) {
-        for (const auto& innerOp : op["ops"]) {
+        for (const auto& innerOp : op.ops) {
           Operation pipelineOp = {};
-          this->setupOperation(innerOp, pipelineOp, rank, threadBlockId, constSrcOffset, constDstOffset);
+          this->setupOperation(innerOp, pipelineOp, rank, threadblock.id, constSrcOffset, constDstOffset);
           ops.push_back(pipelineOp);
         }
       }
@@ -485,7 +1045,7 @@ void ExecutionPlan::Impl::setupOperations(const json& gpu, size_t constSrcOffset
   }
 }
 
-void ExecutionPlan::Impl::setupOperation(const nlohmann::json& op, Operation& operation, int rank, int threadBlockId,
+void ExecutionPlan::Impl::setupOperation(const OperationSpec& op, Operation& operation, int rank, int threadBlockId,
                                          size_t constSrcOffset, size_t constDstOffset) {
   auto getConstOffset = [&](BufferType type) -> size_t {
     switch (type) {
@@ -510,99 +1070,108 @@ void ExecutionPlan::Impl::setupOperation(const nlohmann::json& op, Operation& op
     throw Error("Invalid channel type", ErrorCode::ExecutorError);
   };
 
-  uint32_t tbId = 0;
-  uint32_t tbgSize = 1;
+  auto checkCount = [&](size_t count, size_t limit, const std::string& what) {
+    if (count > limit) {
+      throw Error("Operation of thread block " + std::to_string(threadBlockId) + " on rank " + std::to_string(rank) +
+                      " has " + std::to_string(count) + " " + what + ", exceeding device execution plan support (" +
+                      std::to_string(limit) + ")",
+                  ErrorCode::ExecutorError);
+    }
+  };
 
-  operation.type = static_cast<mscclpp::OperationType>(getOpType(op["name"]));
-  if (op.contains("channel_type")) {
-    operation.channelType = convertToChannelType(op["channel_type"]);
+  uint32_t tbId = op.tbId;
+  uint32_t tbgSize = op.tbgSize;
+
+  operation.type = op.type;
+  if (op.channelType) {
+    operation.channelType = *op.channelType;
   }
-  if (op.contains("channel_ids")) {
-    operation.nChannels = op["channel_ids"].size();
-    for (uint32_t i = 0; i < op["channel_ids"].size(); i++) {
-      operation.channelIndexes[i] = op["channel_ids"][i];
+  if (op.channelIds) {
+    checkCount(op.channelIds->size(), MAX_CHANNEL_PER_OPERATION, "channels");
+    operation.nChannels = op.channelIds->size();
+    for (uint32_t i = 0; i < op.channelIds->size(); i++) {
+      operation.channelIndexes[i] = (*op.channelIds)[i];
     }
   }
-  if (op.contains("tbg_info")) {
-    tbId = op["tbg_info"]["tb_id"];
-    tbgSize = op["tbg_info"]["tbg_size"];
-  }
-  if (op.contains("src_buff")) {
-    operation.nInputs = op["src_buff"].size();
+  if (op.srcBuffs) {
+    checkCount(op.srcBuffs->size(), MAX_LOCAL_BUFFER_PER_OPERATION + MAX_CHANNEL_PER_OPERATION, "source buffers");
+    operation.nInputs = op.srcBuffs->size();
     for (int i = 0; i < operation.nInputs; i++) {
-      auto& buff = op["src_buff"][i];
+      const auto& buff = (*op.srcBuffs)[i];
       size_t constOffset = 0;
       BufferType bufferType = BufferType::NONE;
-      if (buff.contains("type")) {
-        bufferType = convertToBufferType(buff["type"]);
+      if (buff.type) {
+        bufferType = *buff.type;
         operation.inputBufferRefs[i].type = bufferType;
       }
-      if (buff.contains("buffer_id")) {
-        operation.inputBufferRefs[i].id = buff["buffer_id"];
-        bufferType = getRemoteBufferTypeWithId(buff["buffer_id"], threadBlockId, operation.channelType);
+      if (buff.bufferId) {
+        operation.inputBufferRefs[i].id = *buff.bufferId;
+        bufferType = getRemoteBufferTypeWithId(*buff.bufferId, threadBlockId, operation.channelType);
         constOffset = getConstOffset(bufferType);
       }
-      if (buff.contains("switch_channel_id")) {
-        int switchChannelIdx = this->threadblockNvlsChannels[threadBlockId][buff["switch_channel_id"]];
+      if (buff.switchChannelId) {
+        int switchChannelIdx = this->threadblockNvlsChannels[threadBlockId][*buff.switchChannelId];
         bufferType = this->nvlsInfos[rank][switchChannelIdx].bufferType;
         constOffset = getConstOffset(bufferType);
         operation.nvlsInputBufferType = bufferType;
-        operation.nvlsInputIndex = buff["switch_channel_id"];
+        operation.nvlsInputIndex = *buff.switchChannelId;
       }
-      size_t inputOffset = this->getOffset(this->inputSize, this->outputSize, buff["index"], bufferType) + constOffset;
-      size_t inputBufferSize = this->getBufferSize(this->inputSize, this->outputSize, buff["index"], buff["size"]);
+      size_t inputOffset = this->getOffset(this->inputSize, this->outputSize, buff.index, bufferType) + constOffset;
+      size_t inputBufferSize = this->getBufferSize(this->inputSize, this->outputSize, buff.index, buff.size);
       inputOffset += calcOffset(inputBufferSize, tbId, tbgSize);
       inputBufferSize = calcSize(inputBufferSize, tbId, tbgSize);
       operation.inputOffsets[i] = inputOffset;
       operation.inputBufferSizes[i] = inputBufferSize;
     }
   }
-  if (op.contains("dst_buff")) {
-    operation.nOutputs = op["dst_buff"].size();
+  if (op.dstBuffs) {
+    checkCount(op.dstBuffs->size(), MAX_LOCAL_BUFFER_PER_OPERATION + MAX_CHANNEL_PER_OPERATION, "destination buffers");
+    operation.nOutputs = op.dstBuffs->size();
     for (int i = 0; i < operation.nOutputs; i++) {
-      auto& buff = op["dst_buff"][i];
+      const auto& buff = (*op.dstBuffs)[i];
       size_t constOffset = 0;
       BufferType bufferType = BufferType::NONE;
-      if (buff.contains("type")) {
-        bufferType = convertToBufferType(buff["type"]);
+      if (buff.type) {
+        bufferType = *buff.type;
         operation.outputBufferRefs[i].type = bufferType;
       }
-      if (buff.contains("buffer_id")) {
-        operation.outputBufferRefs[i].id = buff["buffer_id"];
-        bufferType = getRemoteBufferTypeWithId(buff["buffer_id"], threadBlockId, operation.channelType);
+      if (buff.bufferId) {
+        operation.outputBufferRefs[i].id = *buff.bufferId;
+        bufferType = getRemoteBufferTypeWithId(*buff.bufferId, threadBlockId, operation.channelType);
         constOffset = getConstOffset(bufferType);
       }
-      if (buff.contains("switch_channel_id")) {
-        int switchChannelIdx = this->threadblockNvlsChannels[threadBlockId][buff["switch_channel_id"]];
+      if (buff.switchChannelId) {
+        int switchChannelIdx = this->threadblockNvlsChannels[threadBlockId][*buff.switchChannelId];
         bufferType = this->nvlsInfos[rank][switchChannelIdx].bufferType;
         constOffset = getConstOffset(bufferType);
         operation.nvlsOutputBufferType = bufferType;
-        operation.nvlsOutputIndex = buff["switch_channel_id"];
+        operation.nvlsOutputIndex = *buff.switchChannelId;
       }
-      size_t outputOffset = this->getOffset(this->inputSize, this->outputSize, buff["index"], bufferType) + constOffset;
-      size_t outputBufferSize = this->getBufferSize(this->inputSize, this->outputSize, buff["index"], buff["size"]);
+      size_t outputOffset = this->getOffset(this->inputSize, this->outputSize, buff.index, bufferType) + constOffset;
+      size_t outputBufferSize = this->getBufferSize(this->inputSize, this->outputSize, buff.index, buff.size);
       outputOffset += calcOffset(outputBufferSize, tbId, tbgSize);
       outputBufferSize = calcSize(outputBufferSize, tbId, tbgSize);
       operation.outputOffsets[i] = outputOffset;
       operation.outputBufferSizes[i] = outputBufferSize;
     }
   }
-  if (op.contains("barrier_id")) {
-    operation.deviceSyncerIndex = op["barrier_id"];
+  if (op.barrierId) {
+    operation.deviceSyncerIndex = *op.barrierId;
   }
-  if (op.contains("num_threadblocks")) {
-    operation.nThreadBlocks = op["num_threadblocks"];
+  if (op.nThreadBlocks) {
+    operation.nThreadBlocks = *op.nThreadBlocks;
   }
-  if (op.contains("semaphore_ids")) {
-    operation.nDeviceSemaphores = op["semaphore_ids"].size();
+  if (op.semaphoreIds) {
+    checkCount(op.semaphoreIds->size(), MAX_DEVICE_SEMAPHORES, "semaphores");
+    operation.nDeviceSemaphores = op.semaphoreIds->size();
     for (uint32_t id = 0; id < operation.nDeviceSemaphores; id++) {
-      operation.deviceSemaphoreIds[id] = op["semaphore_ids"][id];
+      operation.deviceSemaphoreIds[id] = (*op.semaphoreIds)[id];
     }
   }
-  if (op.contains("iter_context")) {
-    operation.unitSize = op["iter_context"]["unit_size"];
-    operation.nOperations = op["ops"].size();
-    int nChunks = op["iter_context"]["num_chunks"];
+  if (op.unitSize) {
+    operation.unitSize = *op.unitSize;
+    operation.nOperations = op.ops.size();
+    int nChunks = op.nChunks;
     size_t sizes = nChunks * getUpperBoundChunkSize(this->inputSize, this->outputSize);
     operation.nIterations = (sizes + (operation.unitSize - 1)) / operation.unitSize;
   }
@@ -699,6 +1268,8 @@ void ExecutionPlan::Impl::operationsReset() { this->operations.clear(); }
 
 ExecutionPlan::ExecutionPlan(const std::string& planPath, int rank) : impl_(std::make_shared<Impl>(planPath, rank)) {}
 
+ExecutionPlan::ExecutionPlan(std::shared_ptr<Impl> impl) : impl_(impl) {}
+
 std::string ExecutionPlan::name() const { return this->impl_->name; }
 
 std::string ExecutionPlan::collective() const { return this->impl_->collective; }
@@ -709,31 +1280,113 @@ size_t ExecutionPlan::maxMessageSize() const { return this->impl_->maxMessageSiz
 
 bool ExecutionPlan::isInPlace() const { return this->impl_->isInPlace; }
 
-void ExecutionPlanRegistry::Impl::setSelector(ExecutionPlanSelector selector) { selector_ = selector; }
+void ExecutionPlanRegistry::Impl::setSelector(ExecutionPlanSelector selector) {
+  selector_ = selector;
+  selectionCache_.clear();
+}
+
+void ExecutionPlanRegistry::Impl::setDefaultSelector(ExecutionPlanSelector selector) {
+  defaultSelector_ = selector;
+  selectionCache_.clear();
+}
 
-void ExecutionPlanRegistry::Impl::setDefaultSelector(ExecutionPlanSelector selector) { defaultSelector_ = selector; }
+void ExecutionPlanRegistry::Impl::setTagFilter(const std::unordered_map<std::string, uint64_t>& tags) {
+  tagFilter_ = tags;
+  invalidate();
+}
+
+void ExecutionPlanRegistry::Impl::invalidate() {
+  for (auto& [key, bucket] : buckets_) {
+    bucket.indexed = false;
+  }
+  selectionCache_.clear();
+}
+
+void PlanBucket::buildIndex(const std::unordered_map<std::string, uint64_t>& tagFilter) {
+  std::vector<std::shared_ptr<ExecutionPlanHandle>> filtered =
+      filter(plans, [&](const std::shared_ptr<ExecutionPlanHandle>& plan) { return hasTags(*plan, tagFilter); });
+  bounds.clear();
+  segments.clear();
+  for (const auto& plan : filtered) {
+    bounds.push_back(plan->plan->minMessageSize());
+    if (plan->plan->maxMessageSize() != std::numeric_limits<size_t>::max()) {
+      bounds.push_back(plan->plan->maxMessageSize() + 1);
+    }
+  }
+  std::sort(bounds.begin(), bounds.end());
+  bounds.erase(std::unique(bounds.begin(), bounds.end()), bounds.end());
+  segments.resize(bounds.size());
+  for (size_t i = 0; i < bounds.size(); i++) {
+    for (const auto& plan : filtered) {
+      if (plan->plan->minMessageSize() <= bounds[i] && bounds[i] <= plan->plan->maxMessageSize()) {
+        segments[i].push_back(plan);
+      }
+    }
+  }
+  indexed = true;
+}
+
+const std::vector<std::shared_ptr<ExecutionPlanHandle>>* PlanBucket::find(size_t messageSize) const {
+  auto it = std::upper_bound(bounds.begin(), bounds.end(), messageSize);
+  if (it == bounds.begin()) {
+    return nullptr;
+  }
+  return &segments[std::distance(bounds.begin(), it) - 1];
+}
+
+std::vector<std::shared_ptr<ExecutionPlanHandle>> ExecutionPlanRegistry::Impl::getCandidates(
+    const ExecutionRequest& request) {
+  auto it = buckets_.find(PlanIndexKey{request.collective, request.worldSize, request.nRanksPerNode});
+  if (it == buckets_.end()) {
+    return {};
+  }
+  PlanBucket& bucket = it->second;
+  if (!bucket.indexed) {
+    bucket.buildIndex(tagFilter_);
+  }
+  const auto* segment = bucket.find(effectiveMessageSize(request));
+  if (segment == nullptr) {
+    return {};
+  }
+  bool inPlace = request.isInPlace();
+  return filter(*segment,
+                [&](const std::shared_ptr<ExecutionPlanHandle>& plan) { return plan->plan->isInPlace() == inPlace; });
+}
 
 std::shared_ptr<ExecutionPlanHandle> ExecutionPlanRegistry::Impl::select(const ExecutionRequest& request) {
-  std::vector<std::shared_ptr<ExecutionPlanHandle>> plans;
-  for (auto plan : planMap_[request.collective]) {
-    if (plan->match(request)) {
-      plans.push_back(plan);
+  bool cacheable = selectionCacheSize_ > 0 && request.hints.empty();
+  std::optional<SelectionKey> key;
+  if (cacheable) {
+    key = SelectionKey{{request.collective, request.worldSize, request.nRanksPerNode},
+                       request.rank,
+                       request.messageSize,
+                       request.isInPlace(),
+                       bufferAlignment(request.inputBuffer),
+                       bufferAlignment(request.outputBuffer)};
+    auto it = selectionCache_.find(*key);
+    if (it != selectionCache_.end()) {
+      return it->second;
     }
   }
+
+  std::vector<std::shared_ptr<ExecutionPlanHandle>> plans = getCandidates(request);
+  std::shared_ptr<ExecutionPlanHandle> plan = nullptr;
   if (selector_) {
-    auto plan = selector_(plans, request);
-    if (plan) {
-      return plan;
-    }
+    plan = selector_(plans, request);
+  }
+  if (!plan && defaultSelector_) {
+    plan = defaultSelector_(plans, request);
   }
-  if (defaultSelector_) {
-    auto plan = defaultSelector_(plans, request);
-    if (plan) {
-      return plan;
+  if (!plan) {
+    INFO(MSCCLPP_EXECUTOR, "No suitable execution plan found for collective: %s", request.collective.c_str());
+  }
+  if (cacheable) {
+    if (selectionCache_.size() >= selectionCacheSize_) {
+      selectionCache_.clear();
     }
+    selectionCache_.emplace(std::move(*key), plan);
   }
-  INFO(MSCCLPP_EXECUTOR, "No suitable execution plan found for collective: %s", request.collective.c_str());
-  return nullptr;
+  return plan;
 }
 
 void ExecutionPlanRegistry::Impl::registerPlan(const std::shared_ptr<ExecutionPlanHandle> planHandle) {
@@ -742,6 +1395,60 @@ void ExecutionPlanRegistry::Impl::registerPlan(const std::shared_ptr<ExecutionPl
   }
   planMap_[planHandle->plan->collective()].push_back(planHandle);
   idMap_[planHandle->id] = planHandle;
+  PlanBucket& bucket = buckets_[PlanIndexKey{planHandle->plan->collective(), planHandle->constraint.worldSize,
+                                             planHandle->constraint.nRanksPerNode}];
+  bucket.plans.push_back(planHandle);
+  bucket.indexed = false;
+  selectionCache_.clear();
+}
+
+std::vector<std::shared_ptr<ExecutionPlanHandle>> ExecutionPlanRegistry::Impl::loadManifest(const std::string& planDir,
+                                                                                            int rank) {
+  std::string manifestPath = planDir + "/" + manifestFilename;
+  std::ifstream file(manifestPath);
+  if (!file.is_open()) {
+    throw Error("Cannot open plan manifest " + manifestPath, ErrorCode::ExecutorError);
+  }
+  json manifest = json::parse(file);
+  if (manifest.value("version", 0) != manifestVersion) {
+    throw Error("Unsupported plan manifest version in " + manifestPath, ErrorCode::ExecutorError);
+  }
+
+  std::vector<std::shared_ptr<ExecutionPlanHandle>> handles;
+  for (const auto& entry : manifest["plans"]) {
+    std::string planPath;
+    try {
+      planPath = planDir + "/" + entry["filename"].get<std::string>();
+      std::string planId = entry["id"];
+      if (idMap_.find(planId) != idMap_.end()) {
+        INFO(MSCCLPP_EXECUTOR, "Plan already registered: %s", planId.c_str());
+        continue;
+      }
+      std::error_code ec;
+      auto fileSize = std::filesystem::file_size(planPath, ec);
+      if (ec) {
+        INFO(MSCCLPP_EXECUTOR, "Plan file does not exist: %s", planPath.c_str());
+        continue;
+      }
+      std::shared_ptr<ExecutionPlan> executionPlan;
+      if (fileSize == entry.value("size", uint64_t(0))) {
+        auto impl = std::make_shared<ExecutionPlan::Impl>(planPath, rank, entry);
+        executionPlan = std::shared_ptr<ExecutionPlan>(new ExecutionPlan(impl));
+      } else {
+        INFO(MSCCLPP_EXECUTOR, "Manifest entry of %s is stale, loading the plan file", planPath.c_str());
+        executionPlan = std::make_shared<ExecutionPlan>(planPath, rank);
+      }
+      auto handle = ExecutionPlanHandle::create(planId, entry["world_size"], entry["nranks_per_node"], executionPlan,
+                                                entry.value("tags", std::unordered_map<std::string, uint64_t>{}));
+      registerPlan(handle);
+      handles.push_back(handle);
+      INFO(MSCCLPP_EXECUTOR, "Successfully loaded plan: %s for collective: %s", planId.c_str(),
+           executionPlan->collective().c_str());
+    } catch (const std::exception& e) {
+      WARN("Failed to load plan %s from manifest %s: %s", planPath.c_str(), manifestPath.c_str(), e.what());
+    }
+  }
+  return handles;
 }
 
 void ExecutionPlanRegistry::Impl::loadDefaultPlans(int rank) {
@@ -750,6 +1457,14 @@ void ExecutionPlanRegistry::Impl::loadDefaultPlans(int rank) {
     INFO(MSCCLPP_EXECUTOR, "Plan directory does not exist: %s", planDir.c_str());
     return;
   }
+  if (std::filesystem::exists(planDir + "/" + manifestFilename)) {
+    try {
+      loadManifest(planDir, rank);
+      return;
+    } catch (const std::exception& e) {
+      WARN("Failed to load plan manifest in %s: %s", planDir.c_str(), e.what());
+    }
+  }
 
   for (const auto& config : defaultAlgoConfigs) {
     std::string planPath = planDir + "/" + config.filename;
@@ -789,6 +1504,15 @@ void ExecutionPlanRegistry::setSelector(ExecutionPlanSelector selector) { impl_-
 
 void ExecutionPlanRegistry::setDefaultSelector(ExecutionPlanSelector selector) { impl_->setDefaultSelector(selector); }
 
+void ExecutionPlanRegistry::setTagFilter(const std::unordered_map<std::string, uint64_t>& tags) {
+  impl_->setTagFilter(tags);
+}
+
+void ExecutionPlanRegistry::setSelectionCacheSize(size_t size) {
+  impl_->selectionCacheSize_ = size;
+  impl_->selectionCache_.clear();
+}
+
 std::shared_ptr<ExecutionPlanHandle> ExecutionPlanRegistry::select(
     const std::string& collective, int worldSize, int nRanksPerNode, int rank, const void* sendBuffer, void* recvBuffer,
     size_t messageSize, const std::unordered_map<std::string, std::vector<uint64_t>>& hints) {
@@ -819,10 +1543,18 @@ void ExecutionPlanRegistry::clear() {
   impl_->idMap_.clear();
   impl_->selector_ = nullptr;
   impl_->defaultSelector_ = nullptr;
+  impl_->buckets_.clear();
+  impl_->tagFilter_.clear();
+  impl_->selectionCache_.clear();
 }
 
 void ExecutionPlanRegistry::loadDefaultPlans(int rank) { impl_->loadDefaultPlans(rank); }
 
+std::vector<std::shared_ptr<ExecutionPlanHandle>> ExecutionPlanRegistry::loadManifest(const std::string& planDir,
+                                                                                      int rank) {
+  return impl_->loadManifest(planDir, rank);
+}
+
 bool ExecutionRequest::isInPlace() const {
   if (inputBuffer == outputBuffer) return true;
   if (collective == "allgather") {
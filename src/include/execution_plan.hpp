@@ -4,9 +4,11 @@
 #ifndef MSCCLPP_EXECUTOR_PLAN_HPP_
 #define MSCCLPP_EXECUTOR_PLAN_HPP_
 
+#include <exception>
 #include <mscclpp/core.hpp>
 #include <mscclpp/executor.hpp>
 #include <nlohmann/json.hpp>
+#include <optional>
 #include <string>
 #include <unordered_map>
 
@@ -14,6 +16,29 @@
 
 namespace mscclpp {
 
+struct PlanIndexKey {
+  std::string collective;
+  int worldSize;
+  int nRanksPerNode;
+  bool operator==(const PlanIndexKey& other) const {
+    return collective == other.collective && worldSize == other.worldSize && nRanksPerNode == other.nRanksPerNode;
+  }
+};
+
+struct SelectionKey {
+  PlanIndexKey indexKey;
+  int rank;
+  size_t messageSize;
+  bool inPlace;
+  uintptr_t inputAlignment;
+  uintptr_t outputAlignment;
+  bool operator==(const SelectionKey& other) const {
+    return indexKey == other.indexKey && rank == other.rank && messageSize == other.messageSize &&
+           inPlace == other.inPlace && inputAlignment == other.inputAlignment &&
+           outputAlignment == other.outputAlignment;
+  }
+};
+
 struct ChannelKey {
   BufferType bufferType;
   ChannelType channelType;
@@ -37,6 +62,28 @@ struct hash<mscclpp::ChannelKey> {
   }
 };
 
+template <>
+struct hash<mscclpp::PlanIndexKey> {
+  std::size_t operator()(const mscclpp::PlanIndexKey& key) const {
+    std::size_t h = std::hash<std::string>()(key.collective);
+    h ^= std::hash<int>()(key.worldSize) + 0x9e3779b9 + (h << 6) + (h >> 2);
+    h ^= std::hash<int>()(key.nRanksPerNode) + 0x9e3779b9 + (h << 6) + (h >> 2);
+    return h;
+  }
+};
+
+template <>
+struct hash<mscclpp::SelectionKey> {
+  std::size_t operator()(const mscclpp::SelectionKey& key) const {
+    std::size_t h = std::hash<mscclpp::PlanIndexKey>()(key.indexKey);
+    h ^= std::hash<int>()(key.rank) + 0x9e3779b9 + (h << 6) + (h >> 2);
+    h ^= std::hash<size_t>()(key.messageSize) + 0x9e3779b9 + (h << 6) + (h >> 2);
+    h ^= std::hash<uintptr_t>()(key.inputAlignment ^ (key.outputAlignment << 1) ^ key.inPlace) + 0x9e3779b9 + (h << 6) +
+         (h >> 2);
+    return h;
+  }
+};
+
 template <>
 struct hash<std::pair<int, mscclpp::ChannelType>> {
   std::size_t operator()(const std::pair<int, mscclpp::ChannelType>& key) const {
@@ -66,6 +113,87 @@ struct SemaphoreInfo {
   int initValue;
 };
 
+// Plan file sections needed by one rank, extracted once so that loading the plan for new message sizes does not
+// parse the file again. Field presence mirrors the JSON keys, as absent fields leave an Operation untouched.
+struct BufferRefSpec {
+  uint32_t index;
+  uint32_t size;
+  std::optional<BufferType> type;
+  std::optional<int> bufferId;
+  std::optional<int> switchChannelId;
+};
+
+struct OperationSpec {
+  OperationType type;
+  std::optional<ChannelType> channelType;
+  std::optional<std::vector<uint8_t>> channelIds;
+  uint32_t tbId = 0;
+  uint32_t tbgSize = 1;
+  std::optional<std::vector<BufferRefSpec>> srcBuffs;
+  std::optional<std::vector<BufferRefSpec>> dstBuffs;
+  std::optional<uint32_t> barrierId;
+  std::optional<uint32_t> nThreadBlocks;
+  std::optional<std::vector<uint32_t>> semaphoreIds;
+  std::optional<uint32_t> unitSize;
+  uint32_t nChunks = 0;
+  // Operations of a pipeline.
+  std::vector<OperationSpec> ops;
+};
+
+struct ThreadblockSpec {
+  struct ChannelRef {
+    ChannelType channelType;
+    std::vector<int> channelIds;
+  };
+  struct RemoteBufferRef {
+    ChannelType accessChannelType;
+    std::vector<int> remoteBufferIds;
+  };
+
+  int id;
+  std::vector<ChannelRef> channels;
+  std::vector<RemoteBufferRef> remoteBufferRefs;
+  std::vector<OperationSpec> ops;
+};
+
+struct GpuSpec {
+  struct Channel {
+    ChannelType channelType;
+    BufferType bufferType;
+    std::vector<int> connectedTo;
+    // (nChunks, ranks) of each switch channel group.
+    std::vector<std::pair<uint32_t, std::vector<int>>> rankGroups;
+  };
+  struct RemoteBuffer {
+    int rank;
+    BufferType bufferType;
+    std::vector<ChannelType> accessChannelTypes;
+  };
+
+  int id;
+  std::vector<Channel> channels;
+  std::vector<RemoteBuffer> remoteBuffers;
+};
+
+struct PlanSpec {
+  std::string name;
+  std::string collective;
+  std::string protocol;
+  bool isInPlace;
+  int nThreadsPerBlock;
+  size_t minMessageSize;
+  size_t maxMessageSize;
+  // Channels and remote buffers of every rank.
+  std::vector<GpuSpec> gpus;
+  // Everything else only for the loading rank, present if the plan has a matching gpu entry.
+  bool hasRank = false;
+  uint32_t inputChunks;
+  uint32_t outputChunks;
+  uint32_t scratchChunks;
+  std::vector<int> semaphoreInitValues;
+  std::vector<ThreadblockSpec> threadblocks;
+};
+
 struct AlgoConfig {
   std::string filename;
   std::string collective;
@@ -74,26 +202,51 @@ struct AlgoConfig {
   std::unordered_map<std::string, uint64_t> tags;
 };
 
+// Plans sharing a collective, world size and ranks per node. Their message size ranges are split into disjoint
+// segments, segments[i] holds the plans covering [bounds[i], bounds[i + 1]) in registration order.
+struct PlanBucket {
+  std::vector<std::shared_ptr<ExecutionPlanHandle>> plans;
+  std::vector<size_t> bounds;
+  std::vector<std::vector<std::shared_ptr<ExecutionPlanHandle>>> segments;
+  bool indexed = false;
+
+  void buildIndex(const std::unordered_map<std::string, uint64_t>& tagFilter);
+  const std::vector<std::shared_ptr<ExecutionPlanHandle>>* find(size_t messageSize) const;
+};
+
 struct ExecutionPlanRegistry::Impl {
   void setSelector(ExecutionPlanSelector selector);
   void setDefaultSelector(ExecutionPlanSelector selector);
+  void setTagFilter(const std::unordered_map<std::string, uint64_t>& tags);
   void registerPlan(const std::shared_ptr<ExecutionPlanHandle> planHandle);
   std::shared_ptr<ExecutionPlanHandle> select(const ExecutionRequest& request);
+  std::vector<std::shared_ptr<ExecutionPlanHandle>> getCandidates(const ExecutionRequest& request);
   std::vector<ExecutionPlanHandle> getPlans(const std::string& collective);
   std::shared_ptr<ExecutionPlanHandle> get(const std::string& id);
   void loadDefaultPlans(int rank);
+  std::vector<std::shared_ptr<ExecutionPlanHandle>> loadManifest(const std::string& planDir, int rank);
+  void invalidate();
 
   ExecutionPlanSelector selector_ = nullptr;
   ExecutionPlanSelector defaultSelector_ = nullptr;
   std::unordered_map<std::string, std::vector<std::shared_ptr<ExecutionPlanHandle>>> planMap_;
   std::unordered_map<std::string, std::shared_ptr<ExecutionPlanHandle>> idMap_;
+  std::unordered_map<PlanIndexKey, PlanBucket> buckets_;
+  std::unordered_map<std::string, uint64_t> tagFilter_;
+  std::unordered_map<SelectionKey, std::shared_ptr<ExecutionPlanHandle>> selectionCache_;
+  size_t selectionCacheSize_ = 0;
 };
 
 struct ExecutionPlan::Impl {
  public:
   Impl(const std::string& planPath, int rank);
+  // Create a plan from its header fields only, the plan file is read when the plan is loaded for execution.
+  Impl(const std::string& planPath, int rank, const nlohmann::json& header);
   ~Impl() = default;
 
+  // Number of plan files parsed by this process.
+  static uint64_t parseCount();
+
   void loadExecutionPlan(size_t inputSize, size_t outputSize, size_t contsSrcOffset, size_t constDstOffset);
   void lightLoadExecutionPlan(size_t inputSize, size_t outputSize, size_t contsSrcOffset, size_t constDstOffset);
   size_t calScratchBufferSize(size_t inputSize, size_t outputSize) const;
@@ -152,19 +305,25 @@ struct ExecutionPlan::Impl {
   size_t getBufferSize(size_t inputSize, size_t outputSize, uint32_t index, uint32_t nChunks) const;
   size_t getUpperBoundChunkSize(size_t inputSize, size_t outputSize) const;
 
-  void setupChannels(const nlohmann::json& gpus);
-  void setupRemoteBuffers(const nlohmann::json& gpus);
-  void setupSemaphores(const nlohmann::json& gpu);
-  void setupOperations(const nlohmann::json& gpu, size_t contsSrcOffset, size_t constDstOffset);
-  void setupOperation(const nlohmann::json& op, Operation& operation, int rank, int threadBlockId,
-                      size_t constSrcOffset, size_t constDstOffset);
+  void loadHeader(const nlohmann::json& obj);
+  const PlanSpec& getSpec();
+  void setupChannels(const PlanSpec& spec);
+  void setupRemoteBuffers(const PlanSpec& spec);
+  void setupSemaphores(const PlanSpec& spec);
+  void setupOperations(const PlanSpec& spec, size_t contsSrcOffset, size_t constDstOffset);
+  void setupOperation(const OperationSpec& op, Operation& operation, int rank, int threadBlockId, size_t constSrcOffset,
+                      size_t constDstOffset);
   // helper functions to setup the channels
-  void parseChannels(const nlohmann::json& gpu, std::vector<ChannelInfo>& channelInfos,
-                     std::vector<NvlsInfo>& nvlsInfos,
+  void parseChannels(const GpuSpec& gpu, std::vector<ChannelInfo>& channelInfos, std::vector<NvlsInfo>& nvlsInfos,
                      std::map<std::pair<int, ChannelType>, std::vector<int>>& chanConnectedPeersMap, int rank);
-  void parseRemoteBuffer(const nlohmann::json& gpus);
+  void parseRemoteBuffer(const std::vector<GpuSpec>& gpus);
   void checkMessageSize() const;
 
+  // The parsed plan file, shared by every load of the plan.
+  std::shared_ptr<const PlanSpec> spec_;
+  // The error of parsing the plan body in the constructor, rethrown by every load of the plan.
+  std::exception_ptr specError_;
+
   std::unordered_map<std::pair<int, ChannelType>, std::unordered_map<int, int>> channelCountMap_;
   std::unordered_map<int, std::unordered_map<std::pair<int, ChannelType>, int>> bufferIndexMap_;
   std::unordered_map<int, std::vector<ChannelInfo>> channelInfos_;
@@ -0,0 +1,396 @@
+// Copyright (c) Microsoft Corporation.
+// Licensed under the MIT License.
+
+#include <gtest/gtest.h>
+
+#include <chrono>
+#include <cstring>
+#include <filesystem>
+#include <fstream>
+#include <limits>
+#include <mscclpp/executor.hpp>
+#include <nlohmann/json.hpp>
+
+#include "execution_plan.hpp"
+
+class ExecutionPlanRegistryTest : public ::testing::Test {
+ protected:
+  void SetUp() override {
+    planDir_ = std::filesystem::temp_directory_path() /
+               ("mscclpp_execution_plan_tests_" + std::to_string(::testing::UnitTest::GetInstance()->random_seed()));
+    std::filesystem::create_directories(planDir_);
+    registry_ = mscclpp::ExecutionPlanRegistry::getInstance();
+    registry_->clear();
+  }
+
+  void TearDown() override {
+    registry_->clear();
+    std::filesystem::remove_all(planDir_);
+  }
+
+  std::shared_ptr<mscclpp::ExecutionPlanHandle> addPlan(const std::string& name, size_t minMessageSize,
+                                                        size_t maxMessageSize,
+                                                        const std::unordered_map<std::string, uint64_t>& tags = {}) {
+    std::string path = (planDir_ / (name + ".json")).string();
+    std::ofstream file(path);
+    file << "{\"name\": \"" << name
+         << "\", \"collective\": \"allreduce\", \"inplace\": true, \"min_message_size\": " << minMessageSize
+         << ", \"max_message_size\": " << maxMessageSize << "}";
+    file.close();
+    auto handle =
+        mscclpp::ExecutionPlanHandle::create(name, 16, 8, std::make_shared<mscclpp::ExecutionPlan>(path, 0), tags);
+    registry_->registerPlan(handle);
+    return handle;
+  }
+
+  std::shared_ptr<mscclpp::ExecutionPlanHandle> select(
+      size_t messageSize, const std::unordered_map<std::string, std::vector<uint64_t>>& hints = {}) {
+    return registry_->select("allreduce", 16, 8, 0, buffer_, buffer_, messageSize, hints);
+  }
+
+  std::filesystem::path planDir_;
+  std::shared_ptr<mscclpp::ExecutionPlanRegistry> registry_;
+  alignas(256) char buffer_[256];
+};
+
+TEST_F(ExecutionPlanRegistryTest, SelectCandidatesBySize) {
+  auto small = addPlan("small", 0, 64 << 10);
+  auto large = addPlan("large", (64 << 10) + 1, 2 << 20);
+  auto tagged = addPlan("tagged", 1 << 10, 1 << 20, {{"nvls", 1}});
+  auto unbounded = addPlan("unbounded", 4 << 20, std::numeric_limits<uint64_t>::max());
+
+  std::vector<std::string> candidates;
+  registry_->setSelector([&](const std::vector<std::shared_ptr<mscclpp::ExecutionPlanHandle>> plans,
+                             const mscclpp::ExecutionRequest&) -> std::shared_ptr<mscclpp::ExecutionPlanHandle> {
+    candidates.clear();
+    for (const auto& plan : plans) candidates.push_back(plan->id);
+    return plans.empty() ? nullptr : plans.front();
+  });
+
+  EXPECT_EQ(select(512), small);
+  EXPECT_EQ(candidates, std::vector<std::string>({"small"}));
+  EXPECT_EQ(select(1 << 10), small);
+  EXPECT_EQ(candidates, std::vector<std::string>({"small", "tagged"}));
+  EXPECT_EQ(select(128 << 10), large);
+  EXPECT_EQ(candidates, std::vector<std::string>({"large", "tagged"}));
+  EXPECT_EQ(select(3 << 20), nullptr);
+  EXPECT_TRUE(candidates.empty());
+  EXPECT_EQ(select(1ULL << 40), unbounded);
+
+  registry_->setTagFilter({{"nvls", 1}});
+  EXPECT_EQ(select(1 << 10), tagged);
+  EXPECT_EQ(candidates, std::vector<std::string>({"tagged"}));
+  EXPECT_EQ(select(512), nullptr);
+
+  EXPECT_EQ(registry_->select("allreduce", 8, 8, 0, buffer_, buffer_, 512, {}), nullptr);
+  EXPECT_EQ(registry_->select("allgather", 16, 8, 0, buffer_, buffer_, 512, {}), nullptr);
+}
+
+TEST_F(ExecutionPlanRegistryTest, SelectionCache) {
+  auto small = addPlan("small", 0, 64 << 10);
+  int calls = 0;
+  registry_->setSelector([&](const std::vector<std::shared_ptr<mscclpp::ExecutionPlanHandle>> plans,
+                             const mscclpp::ExecutionRequest&) -> std::shared_ptr<mscclpp::ExecutionPlanHandle> {
+    calls++;
+    return plans.empty() ? nullptr : plans.back();
+  });
+
+  // The cache is disabled by default, so the selector runs on every call.
+  EXPECT_EQ(select(1024), small);
+  EXPECT_EQ(select(1024), small);
+  EXPECT_EQ(calls, 2);
+
+  registry_->setSelectionCacheSize(256);
+  EXPECT_EQ(select(1024), small);
+  EXPECT_EQ(select(1024), small);
+  EXPECT_EQ(calls, 3);
+  EXPECT_EQ(select(1 << 20), nullptr);
+  EXPECT_EQ(select(1 << 20), nullptr);
+  EXPECT_EQ(calls, 4);
+
+  // Requests with hints are never cached.
+  EXPECT_EQ(select(1024, {{"hint", {1}}}), small);
+  EXPECT_EQ(calls, 5);
+
+  // Registering a plan invalidates cached decisions.
+  auto other = addPlan("other", 0, 64 << 10);
+  EXPECT_EQ(select(1024), other);
+  EXPECT_EQ(calls, 6);
+
+  registry_->setSelectionCacheSize(0);
+  EXPECT_EQ(select(1024), other);
+  EXPECT_EQ(select(1024), other);
+  EXPECT_EQ(calls, 8);
+}
+
+TEST_F(ExecutionPlanRegistryTest, LoadManifest) {
+  auto writeFile = [&](const std::string& name, const std::string& content) {
+    std::ofstream file(planDir_ / name);
+    file << content;
+  };
+  auto entry = [](const std::string& name, size_t size) {
+    return nlohmann::json{{"id", name},       {"filename", name + ".json"}, {"size", size},
+                          {"name", name},     {"collective", "allreduce"},  {"inplace", true},
+                          {"world_size", 16}, {"nranks_per_node", 8}};
+  };
+  // Plan files are not parsed when their manifest entry is up to date.
+  std::string unparsed(64, ' ');
+  writeFile("lazy.json", unparsed);
+  writeFile("stale.json", unparsed + " ");
+  writeFile("valid.json",
+            "{\"name\": \"valid\", \"collective\": \"allreduce\", \"inplace\": true, \"min_message_size\": 1024, "
+            "\"max_message_size\": 65536}");
+  nlohmann::json lazy = entry("lazy", unparsed.size());
+  lazy["max_message_size"] = 512;
+  lazy["tags"] = {{"default", 1}};
+  nlohmann::json manifest = {
+      {"version", 1}, {"plans", {lazy, entry("valid", 0), entry("stale", unparsed.size()), entry("missing", 0)}}};
+  writeFile("manifest.json", manifest.dump());
+
+  auto handles = registry_->loadManifest(planDir_.string(), 0);
+  ASSERT_EQ(handles.size(), 2);
+  EXPECT_EQ(handles[0]->id, "lazy");
+  EXPECT_EQ(handles[0]->plan->name(), "lazy");
+  EXPECT_EQ(handles[0]->plan->maxMessageSize(), 512);
+  EXPECT_EQ(handles[0]->tags.at("default"), 1);
+  // The size of valid.json does not match its entry, so its header is read from the file.
+  EXPECT_EQ(handles[1]->id, "valid");
+  EXPECT_EQ(handles[1]->plan->minMessageSize(), 1024);
+  EXPECT_EQ(handles[1]->plan->maxMessageSize(), 65536);
+
+  registry_->setDefaultSelector([](const std::vector<std::shared_ptr<mscclpp::ExecutionPlanHandle>> plans,
+                                   const mscclpp::ExecutionRequest&) -> std::shared_ptr<mscclpp::ExecutionPlanHandle> {
+    return plans.empty() ? nullptr : plans.front();
+  });
+  EXPECT_EQ(select(256), handles[0]);
+  EXPECT_EQ(select(2048), handles[1]);
+  EXPECT_TRUE(registry_->loadManifest(planDir_.string(), 0).empty());
+}
+
+// Two ranks putting their input into the output of the peer.
+static nlohmann::json putPlan() {
+  nlohmann::json gpus = nlohmann::json::array();
+  for (int id = 0; id < 2; id++) {
+    nlohmann::json op = {{"name", "put"},
+                         {"channel_type", "memory"},
+                         {"channel_ids", {0}},
+                         {"src_buff", {{{"type", "i"}, {"index", 0}, {"size", 1}}}},
+                         {"dst_buff", {{{"buffer_id", 0}, {"index", 0}, {"size", 1}}}}};
+    nlohmann::json threadblock = {
+        {"id", 0},
+        {"channels", {{{"channel_type", "memory"}, {"channel_ids", {0}}}}},
+        {"remote_buffer_refs", {{{"access_channel_type", "memory"}, {"remote_buffer_ids", {0}}}}},
+        {"ops", {op}}};
+    gpus.push_back({{"id", id},
+                    {"input_chunks", 1},
+                    {"output_chunks", 1},
+                    {"scratch_chunks", 0},
+                    {"channels", {{{"channel_type", "memory"}, {"connected_to", {1 - id}}}}},
+                    {"remote_buffers", {{{"rank", 1 - id}, {"type", "o"}, {"access_channel_types", {"memory"}}}}},
+                    {"threadblocks", {threadblock}}});
+  }
+  return {{"name", "put"}, {"collective", "allreduce"}, {"inplace", false}, {"protocol", "Simple"}, {"gpus", gpus}};
+}
+
+TEST(ExecutionPlanTest, LoadParsesPlanOnce) {
+  using Impl = mscclpp::ExecutionPlan::Impl;
+  nlohmann::json plan = putPlan();
+  nlohmann::json header = {{"name", "put"}, {"collective", "allreduce"}, {"inplace", false}};
+  std::filesystem::path path = std::filesystem::temp_directory_path() / "mscclpp_execution_plan_tests_put.json";
+  std::ofstream(path) << plan.dump();
+
+  uint64_t parses = Impl::parseCount();
+  Impl impl(path.string(), 0);
+  EXPECT_EQ(Impl::parseCount(), parses + 1);
+  impl.loadExecutionPlan(1 << 10, 1 << 10, 0, 0);
+  auto start = std::chrono::steady_clock::now();
+  constexpr int nReloads = 1000;
+  for (int i = 0; i < nReloads; i++) {
+    size_t size = (i % 16 + 1) << 10;
+    impl.operationsReset();
+    impl.lightLoadExecutionPlan(size, size, 0, 0);
+    ASSERT_EQ(impl.getOperations(0).at(0).inputBufferSizes[0], size);
+  }
+  auto elapsed = std::chrono::duration_cast<std::chrono::nanoseconds>(std::chrono::steady_clock::now() - start);
+  ::testing::Test::RecordProperty("lightLoadNs", std::to_string(elapsed.count() / nReloads));
+  EXPECT_EQ(Impl::parseCount(), parses + 1);
+
+  // Plans registered from their header parse the file on their first load only.
+  Impl lazy(path.string(), 1, header);
+  EXPECT_EQ(Impl::parseCount(), parses + 1);
+  lazy.loadExecutionPlan(1 << 10, 1 << 10, 0, 0);
+  lazy.operationsReset();
+  lazy.lightLoadExecutionPlan(1 << 20, 1 << 20, 0, 0);
+  EXPECT_EQ(Impl::parseCount(), parses + 2);
+  EXPECT_EQ(lazy.getRemoteBufferInfos().at(0).rank, 0);
+  std::filesystem::remove(path);
+}
+
+TEST(ExecutionPlanTest, BinaryPlanMatchesJson) {
+  using Impl = mscclpp::ExecutionPlan::Impl;
+  // The binary plans are encoded from the JSON plans by mscclpp.plan_format, see python/test/unit_plans.py.
+  std::filesystem::path dir = MSCCLPP_UNIT_TEST_PLAN_DIR;
+  for (std::string name : {"allreduce_ring", "allreduce_binary_tree"}) {
+    std::filesystem::path jsonPath = dir / (name + ".json");
+    std::filesystem::path binaryPath = dir / (name + ".bin");
+    nlohmann::json plan = nlohmann::json::parse(std::ifstream(jsonPath));
+    size_t inputSize = plan["gpus"][0]["input_chunks"].get<size_t>() << 10;
+    size_t outputSize = plan["gpus"][0]["output_chunks"].get<size_t>() << 10;
+    for (int rank = 0; rank < static_cast<int>(plan["gpus"].size()); rank++) {
+      Impl fromJson(jsonPath.string(), rank);
+      Impl fromBinary(binaryPath.string(), rank);
+      EXPECT_EQ(fromBinary.name, fromJson.name);
+      EXPECT_EQ(fromBinary.isInPlace, fromJson.isInPlace);
+      fromJson.loadExecutionPlan(inputSize, outputSize, 0, 0);
+      fromBinary.loadExecutionPlan(inputSize, outputSize, 0, 0);
+      ASSERT_EQ(fromBinary.getThreadblockCount(), fromJson.getThreadblockCount());
+      for (int threadblock = 0; threadblock < fromJson.getThreadblockCount(); threadblock++) {
+        auto expected = fromJson.getOperations(threadblock);
+        auto actual = fromBinary.getOperations(threadblock);
+        ASSERT_EQ(actual.size(), expected.size());
+        EXPECT_EQ(std::memcmp(actual.data(), expected.data(), actual.size() * sizeof(mscclpp::Operation)), 0)
+            << name << " rank " << rank << " threadblock " << threadblock;
+      }
+      EXPECT_EQ(fromBinary.getConnectedPeers(), fromJson.getConnectedPeers());
+      auto expectedBuffers = fromJson.getRemoteBufferInfos();
+      auto actualBuffers = fromBinary.getRemoteBufferInfos();
+      ASSERT_EQ(actualBuffers.size(), expectedBuffers.size());
+      for (size_t i = 0; i < actualBuffers.size(); i++) {
+        EXPECT_EQ(actualBuffers[i].rank, expectedBuffers[i].rank);
+        EXPECT_EQ(actualBuffers[i].bufferType, expectedBuffers[i].bufferType);
+      }
+    }
+  }
+
+  // Truncated plans are rejected on every load, with the error of the first parse.
+  std::ifstream file(dir / "allreduce_ring.bin", std::ios::binary);
+  std::string truncated((std::istreambuf_iterator<char>(file)), std::istreambuf_iterator<char>());
+  truncated.resize(truncated.size() - 4);
+  std::filesystem::path truncatedPath = std::filesystem::temp_directory_path() / "mscclpp_execution_plan_tests.bin";
+  std::ofstream(truncatedPath, std::ios::binary) << truncated;
+  uint64_t parses = Impl::parseCount();
+  Impl impl(truncatedPath.string(), 3);
+  EXPECT_THROW(impl.loadExecutionPlan(4 << 10, 4 << 10, 0, 0), mscclpp::Error);
+  EXPECT_THROW(impl.loadExecutionPlan(4 << 10, 4 << 10, 0, 0), mscclpp::Error);
+  EXPECT_EQ(Impl::parseCount(), parses + 1);
+  std::filesystem::remove(truncatedPath);
+}
+
+TEST(ExecutionPlanTest, CompactPlanExpandsInstances) {
+  using Impl = mscclpp::ExecutionPlan::Impl;
+  // putPlan() with two interleaved instances, written once per instance and once as a template.
+  nlohmann::json full = putPlan();
+  for (auto& gpu : full["gpus"]) {
+    gpu["input_chunks"] = 2;
+    gpu["output_chunks"] = 2;
+    gpu["channels"][0]["connected_to"].push_back(gpu["channels"][0]["connected_to"][0]);
+  }
+  nlohmann::json compact = full;
+  compact["replication"] = {{"instances", 2}, {"policy", "interleaved"}};
+  for (auto& gpu : full["gpus"]) {
+    nlohmann::json threadblock = gpu["threadblocks"][0];
+    threadblock["id"] = 1;
+    threadblock["channels"][0]["channel_ids"] = {1};
+    threadblock["ops"][0]["src_buff"][0]["index"] = 1;
+    threadblock["ops"][0]["dst_buff"][0]["index"] = 1;
+    gpu["threadblocks"].push_back(threadblock);
+  }
+  std::filesystem::path dir = std::filesystem::temp_directory_path();
+  std::filesystem::path fullPath = dir / "mscclpp_execution_plan_tests_put_full.json";
+  std::filesystem::path compactPath = dir / "mscclpp_execution_plan_tests_put_compact.json";
+  std::ofstream(fullPath) << full.dump();
+  std::ofstream(compactPath) << compact.dump();
+
+  for (int rank = 0; rank < 2; rank++) {
+    Impl fromFull(fullPath.string(), rank);
+    Impl fromCompact(compactPath.string(), rank);
+    fromFull.loadExecutionPlan(4 << 10, 4 << 10, 0, 0);
+    fromCompact.loadExecutionPlan(4 << 10, 4 << 10, 0, 0);
+    ASSERT_EQ(fromCompact.getThreadblockCount(), 2);
+    for (int threadblock = 0; threadblock < 2; threadblock++) {
+      auto expected = fromFull.getOperations(threadblock);
+      auto actual = fromCompact.getOperations(threadblock);
+      ASSERT_EQ(actual.size(), expected.size());
+      EXPECT_EQ(std::memcmp(actual.data(), expected.data(), actual.size() * sizeof(mscclpp::Operation)), 0);
+    }
+  }
+  std::filesystem::remove(fullPath);
+  std::filesystem::remove(compactPath);
+}
+
+TEST(ExecutionPlanTest, RankTemplatesMatchFullPlan) {
+  using Impl = mscclpp::ExecutionPlan::Impl;
+  // Each rank puts chunk `rank` of its input into chunk `rank` of the output of the peer.
+  nlohmann::json full = putPlan();
+  for (auto& gpu : full["gpus"]) {
+    int id = gpu["id"];
+    gpu["input_chunks"] = 2;
+    gpu["output_chunks"] = 2;
+    gpu["threadblocks"][0]["ops"][0]["src_buff"][0]["index"] = id;
+    gpu["threadblocks"][0]["ops"][0]["dst_buff"][0]["index"] = id;
+  }
+  // The same plan written as the section of rank 0 with relabeled ranks and rotated chunks.
+  nlohmann::json deduplicated = full;
+  nlohmann::json section = full["gpus"][0];
+  section.erase("id");
+  deduplicated["gpu_templates"] = {section};
+  deduplicated["gpus"] = {{{"id", 0}, {"template", 0}, {"ranks", {0, 1}}},
+                          {{"id", 1}, {"template", 0}, {"ranks", {1, 0}}, {"chunk_shifts", {{"i", 1}, {"o", 1}}}}};
+  std::filesystem::path dir = std::filesystem::temp_directory_path();
+  std::filesystem::path fullPath = dir / "mscclpp_execution_plan_tests_put_full.json";
+  std::filesystem::path deduplicatedPath = dir / "mscclpp_execution_plan_tests_put_deduplicated.json";
+  std::ofstream(fullPath) << full.dump();
+  std::ofstream(deduplicatedPath) << deduplicated.dump();
+
+  for (int rank = 0; rank < 2; rank++) {
+    Impl fromFull(fullPath.string(), rank);
+    Impl fromDeduplicated(deduplicatedPath.string(), rank);
+    fromFull.loadExecutionPlan(4 << 10, 4 << 10, 0, 0);
+    fromDeduplicated.loadExecutionPlan(4 << 10, 4 << 10, 0, 0);
+    auto expected = fromFull.getOperations(0);
+    auto actual = fromDeduplicated.getOperations(0);
+    ASSERT_EQ(actual.size(), expected.size());
+    EXPECT_EQ(std::memcmp(actual.data(), expected.data(), actual.size() * sizeof(mscclpp::Operation)), 0);
+    EXPECT_EQ(fromDeduplicated.getConnectedPeers(), std::vector<int>{1 - rank});
+    ASSERT_EQ(fromDeduplicated.getRemoteBufferInfos().size(), 1);
+    EXPECT_EQ(fromDeduplicated.getRemoteBufferInfos()[0].rank, 1 - rank);
+  }
+  std::filesystem::remove(fullPath);
+  std::filesystem::remove(deduplicatedPath);
+}
+
+TEST(ExecutionPlanTest, GeneratedPlansLoad) {
+  using Impl = mscclpp::ExecutionPlan::Impl;
+  // Every operation with a remote buffer resolves it through its channel type, see python/test/unit_plans.py.
+  for (const char* name : {"reducescatter_ring.json", "allreduce_ring.json", "allreduce_binary_tree.json",
+                           "allreduce_double_binary_tree.json"}) {
+    std::filesystem::path path = std::filesystem::path(MSCCLPP_UNIT_TEST_PLAN_DIR) / name;
+    nlohmann::json plan = nlohmann::json::parse(std::ifstream(path));
+    size_t inputSize = plan["gpus"][0]["input_chunks"].get<size_t>() << 10;
+    size_t outputSize = plan["gpus"][0]["output_chunks"].get<size_t>() << 10;
+    for (int rank = 0; rank < static_cast<int>(plan["gpus"].size()); rank++) {
+      Impl impl(path.string(), rank);
+      EXPECT_NO_THROW(impl.loadExecutionPlan(inputSize, outputSize, 0, 0)) << name << " rank " << rank;
+      EXPECT_GT(impl.getThreadblockCount(), 0) << name << " rank " << rank;
+    }
+  }
+}
+
+TEST(ExecutionPlanTest, RankScopedPlanRejectsOtherRanks) {
+  using Impl = mscclpp::ExecutionPlan::Impl;
+  std::filesystem::path path = std::filesystem::path(MSCCLPP_UNIT_TEST_PLAN_DIR) / "allreduce_ring.rank1.json";
+  nlohmann::json plan = nlohmann::json::parse(std::ifstream(path));
+  nlohmann::json header = plan;
+  header.erase("gpus");
+  size_t inputSize = plan["gpus"][1]["input_chunks"].get<size_t>() << 10;
+  size_t outputSize = plan["gpus"][1]["output_chunks"].get<size_t>() << 10;
+
+  Impl impl(path.string(), 1);
+  impl.loadExecutionPlan(inputSize, outputSize, 0, 0);
+  EXPECT_GT(impl.getThreadblockCount(), 0);
+  for (int rank : {0, 2, 3}) {
+    EXPECT_THROW(Impl(path.string(), rank), mscclpp::Error);
+    // Plans registered from a manifest entry carry the rank scope in their header.
+    EXPECT_THROW(Impl(path.string(), rank, header), mscclpp::Error);
+  }
+}